@@ -1,7 +1,24 @@
-from .common import APIResult, APIResultAction  # noqa: F401
-from .node import NodeCreateModel, NodeModel, NodeResult, NodeResultCollection  # noqa: F401
+from .archive import (  # noqa: F401
+    ArchivedNodeModel,
+    ArchivedNodeResult,
+    ArchivedNodeResultCollection,
+    ArchivedSessionModel,
+    ArchivedSessionNodeModel,
+    ArchivedSessionResult,
+    ArchivedSessionResultCollection,
+)
+from .common import APIPaginatedResult, APIResult, APIResultAction  # noqa: F401
+from .metrics import ConnectionPoolMetricsModel, ConnectionPoolMetricsResultCollection  # noqa: F401
+from .node import (  # noqa: F401
+    NodeBriefModel,
+    NodeCreateModel,
+    NodeModel,
+    NodeResult,
+    NodeResultCollection,
+)
 from .pool import (  # noqa: F401
     PoolConciseModel,
+    PoolLevelsConciseModel,
     PoolLevelsModel,
     PoolModel,
     PoolResult,
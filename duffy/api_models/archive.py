@@ -0,0 +1,60 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+try:
+    from ..database.types import NodeState
+except ImportError:  # pragma: no cover
+    NodeState = str
+from .common import APIPaginatedResult, APIResult, CreatableMixin
+from .node import NodeBase
+
+# archived node model
+
+
+class ArchivedNodeModel(NodeBase, CreatableMixin):
+    id: int
+    state: NodeState
+    retired_at: Optional[datetime] = None
+    archived_at: datetime
+
+
+# archived session model
+
+
+class ArchivedSessionNodeModel(BaseModel):
+    node_id: int
+    pool: str
+    data: Dict[str, Any]
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ArchivedSessionModel(CreatableMixin):
+    id: int
+    tenant_id: int
+    expires_at: Optional[datetime] = None
+    retired_at: Optional[datetime] = None
+    archived_at: datetime
+    data: Dict[str, Any]
+    nodes: List[ArchivedSessionNodeModel]
+    model_config = ConfigDict(from_attributes=True)
+
+
+# API results
+
+
+class ArchivedNodeResult(APIResult):
+    node: ArchivedNodeModel
+
+
+class ArchivedNodeResultCollection(APIPaginatedResult):
+    nodes: List[ArchivedNodeModel]
+
+
+class ArchivedSessionResult(APIResult):
+    session: ArchivedSessionModel
+
+
+class ArchivedSessionResultCollection(APIPaginatedResult):
+    sessions: List[ArchivedSessionModel]
@@ -23,3 +23,7 @@ class APIResultAction(str, Enum):
 
 class APIResult(BaseModel, ABC):
     action: Optional[APIResultAction] = None
+
+
+class APIPaginatedResult(APIResult, ABC):
+    next_cursor: Optional[int] = None
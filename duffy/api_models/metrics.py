@@ -0,0 +1,26 @@
+from typing import List
+
+from pydantic import BaseModel, Field
+from typing_extensions import Annotated
+
+from .common import APIResult
+
+# metrics models
+
+
+class ConnectionPoolMetricsModel(BaseModel):
+    engine: str
+    size: Annotated[int, Field(ge=0)]
+    checked_in: Annotated[int, Field(ge=0)]
+    checked_out: Annotated[int, Field(ge=0)]
+    overflow: int
+    checkouts: Annotated[int, Field(ge=0)]
+    checkout_wait_total: Annotated[float, Field(ge=0)]
+    checkout_wait_max: Annotated[float, Field(ge=0)]
+
+
+# API results
+
+
+class ConnectionPoolMetricsResultCollection(APIResult):
+    connection_pools: List[ConnectionPoolMetricsModel]
@@ -1,28 +1,32 @@
 from abc import ABC
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Union
 
-from pydantic import BaseModel, ConfigDict, IPvAnyAddress
+from pydantic import BaseModel, ConfigDict, Field, IPvAnyAddress
+from typing_extensions import Annotated
 
 try:
     from ..database.types import NodeState
 except ImportError:  # pragma: no cover
     NodeState = str
-from .common import APIResult, CreatableMixin, RetirableMixin
+from .common import APIPaginatedResult, APIResult, CreatableMixin, RetirableMixin
 
 # abstract node
 
 
-class NodeBase(BaseModel, ABC):
+class NodeBriefBase(BaseModel, ABC):
     hostname: Optional[str] = None
     ipaddr: Optional[IPvAnyAddress] = None
     comment: Optional[str] = None
 
     pool: Optional[str] = None
     reusable: bool
-    data: Dict[str, Any]
     model_config = ConfigDict(from_attributes=True)
 
 
+class NodeBase(NodeBriefBase, ABC):
+    data: Dict[str, Any]
+
+
 class NodeCreateModel(NodeBase):
     hostname: str
     ipaddr: IPvAnyAddress
@@ -35,6 +39,13 @@ class NodeModel(NodeBase, CreatableMixin, RetirableMixin):
     state: NodeState
 
 
+class NodeBriefModel(NodeBriefBase, CreatableMixin, RetirableMixin):
+    """A node without its data."""
+
+    id: int
+    state: NodeState
+
+
 # API results
 
 
@@ -42,5 +53,5 @@ class NodeResult(APIResult):
     node: NodeModel
 
 
-class NodeResultCollection(APIResult):
-    nodes: List[NodeModel]
+class NodeResultCollection(APIPaginatedResult):
+    nodes: List[Annotated[Union[NodeModel, NodeBriefModel], Field(union_mode="left_to_right")]]
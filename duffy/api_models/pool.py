@@ -27,11 +27,16 @@ class PoolConciseModel(PoolBase):
     pass
 
 
+class PoolLevelsConciseModel(PoolConciseModel):
+    levels: PoolLevelsModel
+
+
 class PoolVerboseModel(PoolConciseModel):
+    target_fill_level: Annotated[int, Field(ge=0)] = Field(alias="target-fill-level")
     levels: PoolLevelsModel
 
 
-PoolModel = Union[PoolConciseModel, PoolVerboseModel]
+PoolModel = Union[PoolConciseModel, PoolLevelsConciseModel, PoolVerboseModel]
 
 
 # API results
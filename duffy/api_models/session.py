@@ -10,7 +10,7 @@ try:
 except ImportError:  # pragma: no cover
     NodeState = str
 from ..misc import APITimeDelta
-from .common import APIResult, CreatableMixin, RetirableMixin
+from .common import APIPaginatedResult, APIResult, CreatableMixin, RetirableMixin
 from .node import NodeBase
 from .tenant import TenantModel
 
@@ -62,5 +62,5 @@ class SessionResult(APIResult):
     session: SessionModel
 
 
-class SessionResultCollection(APIResult):
+class SessionResultCollection(APIPaginatedResult):
     sessions: List[SessionModel]
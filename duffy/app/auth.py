@@ -1,21 +1,31 @@
 from fastapi import Depends, HTTPException, Security
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from sqlalchemy import select
+from sqlalchemy import bindparam, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.status import HTTP_401_UNAUTHORIZED, HTTP_403_FORBIDDEN
 
 from ..database.model import Tenant
-from .database import req_db_async_session
+from .database import req_db_async_primary_read_only_session, req_db_async_session
 
+# Built once, as it's run for every authenticated request.
+TENANT_BY_NAME_QUERY = select(Tenant).filter_by(name=bindparam("name"))
 
-def _req_tenant_factory(optional: bool = False, **kwargs):
-    """Factory creating FastAPI dependencies for authenticating tenants."""
+
+def _req_tenant_factory(optional: bool = False, read_only: bool = False, **kwargs):
+    """Factory creating FastAPI dependencies for authenticating tenants.
+
+    Set `read_only` for endpoints which use the read-only database
+    session, so the tenant is looked up in it too, unless that reads
+    from a replica: tenants are always looked up on the primary.
+    """
     if optional:
         kwargs["auto_error"] = False
     security = HTTPBasic(realm="duffy", **kwargs)
 
+    req_db_session = req_db_async_primary_read_only_session if read_only else req_db_async_session
+
     async def _req_tenant(
-        db_async_session: AsyncSession = Depends(req_db_async_session),
+        db_async_session: AsyncSession = Depends(req_db_session),
         credentials: HTTPBasicCredentials = Security(security),
     ):
         if not credentials:
@@ -28,7 +38,7 @@ def _req_tenant_factory(optional: bool = False, **kwargs):
         api_key = credentials.password
 
         tenant = (
-            await db_async_session.execute(select(Tenant).filter_by(name=tenant_name))
+            await db_async_session.execute(TENANT_BY_NAME_QUERY, {"name": tenant_name})
         ).scalar_one_or_none()
 
         if not tenant or not tenant.validate_api_key(api_key):
@@ -44,3 +54,5 @@ def _req_tenant_factory(optional: bool = False, **kwargs):
 
 req_tenant = _req_tenant_factory()
 req_tenant_optional = _req_tenant_factory(optional=True)
+req_tenant_read_only = _req_tenant_factory(read_only=True)
+req_tenant_optional_read_only = _req_tenant_factory(optional=True, read_only=True)
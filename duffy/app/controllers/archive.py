@@ -0,0 +1,138 @@
+"""This is the controller for archived sessions and nodes."""
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from starlette.status import HTTP_403_FORBIDDEN, HTTP_404_NOT_FOUND
+
+from ...api_models import (
+    ArchivedNodeResult,
+    ArchivedNodeResultCollection,
+    ArchivedSessionResult,
+    ArchivedSessionResultCollection,
+)
+from ...database.model import ArchivedNode, ArchivedSession, Tenant
+from ..auth import req_tenant_read_only
+from ..database import req_db_async_read_only_session
+from ..util import KeysetPagination, req_pagination
+
+router = APIRouter(prefix="/archive")
+
+
+def _check_admin(tenant: Tenant):
+    if not tenant.is_admin:
+        raise HTTPException(HTTP_403_FORBIDDEN)
+
+
+# http get http://localhost:8080/api/v1/archive/sessions
+@router.get("/sessions", response_model=ArchivedSessionResultCollection, tags=["archive"])
+async def get_all_archived_sessions(
+    db_async_session: AsyncSession = Depends(req_db_async_read_only_session),
+    tenant: Tenant = Depends(req_tenant_read_only),
+    pagination: KeysetPagination = Depends(req_pagination),
+    tenant_id: Optional[int] = None,
+):
+    """Return all archived sessions.
+
+    Optionally, filter the sessions by tenant. Use `limit` and `after` to
+    page through them.
+
+    Only admin tenants may access this.
+    """
+    _check_admin(tenant)
+
+    query = select(ArchivedSession).options(selectinload(ArchivedSession.session_nodes))
+    if tenant_id is not None:
+        query = query.filter_by(tenant_id=tenant_id)
+    query = pagination.apply(query, ArchivedSession.id)
+
+    sessions = (await db_async_session.execute(query)).scalars().all()
+
+    return {
+        "action": "get",
+        "sessions": sessions,
+        "next_cursor": pagination.next_cursor(sessions),
+    }
+
+
+# http get http://localhost:8080/api/v1/archive/sessions/2
+@router.get("/sessions/{id}", response_model=ArchivedSessionResult, tags=["archive"])
+async def get_archived_session(
+    id: int,
+    db_async_session: AsyncSession = Depends(req_db_async_read_only_session),
+    tenant: Tenant = Depends(req_tenant_read_only),
+):
+    """Return the archived session with the specified **ID**.
+
+    Only admin tenants may access this.
+    """
+    _check_admin(tenant)
+
+    session = (
+        await db_async_session.execute(
+            select(ArchivedSession)
+            .filter_by(id=id)
+            .options(selectinload(ArchivedSession.session_nodes))
+        )
+    ).scalar_one_or_none()
+
+    if not session:
+        raise HTTPException(HTTP_404_NOT_FOUND)
+
+    return {"action": "get", "session": session}
+
+
+# http get http://localhost:8080/api/v1/archive/nodes
+@router.get("/nodes", response_model=ArchivedNodeResultCollection, tags=["archive"])
+async def get_all_archived_nodes(
+    db_async_session: AsyncSession = Depends(req_db_async_read_only_session),
+    tenant: Tenant = Depends(req_tenant_read_only),
+    pagination: KeysetPagination = Depends(req_pagination),
+    pool: Optional[str] = None,
+    hostname: Optional[str] = None,
+):
+    """Return all archived nodes.
+
+    Optionally, filter the nodes by pool or host name. Use `limit` and
+    `after` to page through them.
+
+    Only admin tenants may access this.
+    """
+    _check_admin(tenant)
+
+    query = select(ArchivedNode)
+    if pool is not None:
+        query = query.filter_by(pool=pool)
+    if hostname is not None:
+        query = query.filter_by(hostname=hostname)
+    query = pagination.apply(query, ArchivedNode.id)
+
+    nodes = (await db_async_session.execute(query)).scalars().all()
+
+    return {"action": "get", "nodes": nodes, "next_cursor": pagination.next_cursor(nodes)}
+
+
+# http get http://localhost:8080/api/v1/archive/nodes/2
+@router.get("/nodes/{id}", response_model=ArchivedNodeResult, tags=["archive"])
+async def get_archived_node(
+    id: int,
+    db_async_session: AsyncSession = Depends(req_db_async_read_only_session),
+    tenant: Tenant = Depends(req_tenant_read_only),
+):
+    """Return the archived node with the specified **ID**.
+
+    Only admin tenants may access this.
+    """
+    _check_admin(tenant)
+
+    node = (
+        await db_async_session.execute(select(ArchivedNode).filter_by(id=id))
+    ).scalar_one_or_none()
+
+    if not node:
+        raise HTTPException(HTTP_404_NOT_FOUND)
+
+    return {"action": "get", "node": node}
@@ -0,0 +1,70 @@
+"""This is the events controller."""
+
+import json
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from redis.asyncio import Redis
+
+from ...configuration import config
+from ...database.model import Tenant
+from ...tasks.events import CHANNEL
+from ..auth import req_tenant_read_only
+
+router = APIRouter(prefix="/events")
+
+# Send a comment line after this many seconds without events, so proxies don't close the connection.
+KEEPALIVE_INTERVAL = 15
+
+
+def _format_sse(event_type: str, data: dict) -> bytes:
+    return f"event: {event_type}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+async def _stream_events(tenant_id: Optional[int]) -> AsyncIterator[bytes]:
+    """Stream events from the Redis channel.
+
+    If `tenant_id` is set, only events about sessions of this tenant
+    are passed on.
+    """
+    async with Redis.from_url(config["tasks"]["locking"]["url"]) as redis, redis.pubsub(
+        ignore_subscribe_messages=True
+    ) as pubsub:
+        await pubsub.subscribe(CHANNEL)
+        # Tell the client the stream is established.
+        yield b": connected\n\n"
+        while True:
+            message = await pubsub.get_message(timeout=KEEPALIVE_INTERVAL)
+            if not message:
+                yield b": keepalive\n\n"
+                continue
+            evt = json.loads(message["data"])
+            if (
+                tenant_id is not None
+                and evt["type"] == "session"
+                and evt["data"]["tenant_id"] != tenant_id
+            ):
+                continue
+            yield _format_sse(evt["type"], evt["data"])
+
+
+# http --stream get http://localhost:8080/api/v1/events
+@router.get("", tags=["events"])
+async def get_events(tenant: Tenant = Depends(req_tenant_read_only)):
+    """Stream changes of sessions and pools as Server-Sent Events.
+
+    Events of type `session` are sent when sessions are created, their
+    nodes are deployed, or they're retired or otherwise updated. Their
+    data contains the `id`, `tenant_id`, `transition` (`created`,
+    `deployed`, `retired` or `updated`), `active` and `expires_at` of
+    the session. Tenants only get events about their own sessions.
+
+    Events of type `pool` are sent when the levels of pools change,
+    their data contains the `name` and `levels` of the pool.
+    """
+    return StreamingResponse(
+        _stream_events(None if tenant.is_admin else tenant.id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,45 @@
+"""This is the metrics controller."""
+
+from fastapi import APIRouter, Depends, HTTPException
+from starlette.status import HTTP_403_FORBIDDEN
+
+from ... import database
+from ...api_models import ConnectionPoolMetricsResultCollection
+from ...database.connection_pool import pool_metrics
+from ...database.model import Tenant
+from ..auth import req_tenant_read_only
+
+router = APIRouter(prefix="/metrics")
+
+
+# http get http://localhost:8080/api/v1/metrics/connection-pools
+@router.get(
+    "/connection-pools", response_model=ConnectionPoolMetricsResultCollection, tags=["metrics"]
+)
+async def get_connection_pools_metrics(tenant: Tenant = Depends(req_tenant_read_only)):
+    """Return metrics of the database connection pools of this process.
+
+    For each engine, this contains the current state of its pool, how
+    many connections were checked out of it, and how long it took in
+    total and at most (in seconds), i.e. how long requests had to wait
+    for connections.
+
+    Only admin tenants may access this.
+    """
+    if not tenant.is_admin:
+        raise HTTPException(HTTP_403_FORBIDDEN)
+
+    engines = {
+        "async": database.async_session_maker.kw.get("bind"),
+        "sync": database.sync_session_maker.kw.get("bind"),
+    }
+    for idx, read_engine in enumerate(database.async_read_engines):
+        engines[f"async-read-{idx}"] = read_engine
+
+    connection_pools = []
+    for name, engine in engines.items():
+        metrics = pool_metrics(engine) if engine else None
+        if metrics:
+            connection_pools.append({"engine": name, **metrics})
+
+    return {"action": "get", "connection_pools": connection_pools}
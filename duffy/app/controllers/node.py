@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy import Select, select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import defer, selectinload
 from starlette.status import (
     HTTP_201_CREATED,
     HTTP_403_FORBIDDEN,
@@ -10,39 +13,163 @@ from starlette.status import (
     HTTP_409_CONFLICT,
 )
 
-from ...api_models import NodeCreateModel, NodeResult, NodeResultCollection
+from ...api_models import (
+    NodeBriefModel,
+    NodeCreateModel,
+    NodeModel,
+    NodeResult,
+    NodeResultCollection,
+)
 from ...database.model import Node, Tenant
-from ..auth import req_tenant
-from ..database import req_db_async_session
+from ...database.types import NodeState
+from ..auth import req_tenant, req_tenant_read_only
+from ..database import (
+    read_only_db_async_session,
+    req_db_async_read_only_session,
+    req_db_async_session,
+    wrote_recently,
+)
+from ..fields import FieldSelection, req_field_selection
+from ..serialization import NDJSONStreamingResponse, accepts_ndjson
+from ..util import KeysetPagination, req_pagination
 
 router = APIRouter(prefix="/nodes")
 
+# The number of nodes fetched at a time when streaming them
+STREAM_CHUNK_SIZE = 1000
+
+
+async def _stream_node_views(
+    query: Select, with_data: bool, selection: FieldSelection, replica: bool = False
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Stream the API views of the nodes a query selects in chunks.
+
+    Nodes are fetched through a server-side cursor and their views built
+    straight from column values. This uses its own database session
+    because the one of the request is closed before the response is
+    sent.
+    """
+    columns = [
+        Node.hostname,
+        Node.ipaddr,
+        Node.comment,
+        Node.pool,
+        Node.reusable,
+        Node.created_at,
+        Node.retired_at,
+        Node.id,
+        Node.state,
+    ]
+    if with_data:
+        columns.append(Node.data)
+
+    async with read_only_db_async_session(replica=replica) as db_async_session:
+        result = await db_async_session.stream(
+            query.with_only_columns(*columns).execution_options(yield_per=STREAM_CHUNK_SIZE)
+        )
+        async for rows in result.partitions():
+            node_views = []
+            for row in rows:
+                node_view = row._asdict()
+                node_view["active"] = row.retired_at is None
+                node_views.append(selection.prune(node_view))
+            yield node_views
+
 
 @router.get("", response_model=NodeResultCollection, tags=["nodes"])
 async def get_all_nodes(
-    db_async_session: AsyncSession = Depends(req_db_async_session),
+    request: Request,
+    db_async_session: AsyncSession = Depends(req_db_async_read_only_session),
+    pagination: KeysetPagination = Depends(req_pagination),
+    pool: Optional[str] = None,
+    state: Optional[NodeState] = None,
+    reusable: Optional[bool] = None,
+    hostname_prefix: Optional[str] = None,
+    with_data: bool = True,
+    include_retired: bool = False,
+    selection: FieldSelection = Depends(req_field_selection),
 ):
-    """Return all nodes."""
-    query = select(Node).options(selectinload("*")).filter_by(active=True)
-    results = await db_async_session.execute(query)
-
-    return {"action": "get", "nodes": results.scalars().all()}
+    """Return all nodes.
+
+    Optionally, filter the nodes by pool, state, if they're reusable or
+    the beginning of their host names. Set `include_retired` to true to
+    return retired nodes as well. Use `limit` and `after` to page
+    through them. Set `with_data` to false to leave out the data of
+    nodes, it isn't even loaded from the database then. Alternatively,
+    use `fields` to return only some of their fields, this overrides
+    `with_data`.
+
+    Send `Accept: application/x-ndjson` to have the nodes streamed as
+    newline-delimited JSON, one node per line.
+    """
+    selection.model(NodeModel)
+    if not selection.all:
+        with_data = selection.includes("data")
+
+    query = select(Node)
+    if not include_retired:
+        query = query.filter_by(active=True)
+    if pool is not None:
+        query = query.filter_by(pool=pool)
+    if state is not None:
+        query = query.filter_by(state=state)
+    if reusable is not None:
+        query = query.filter_by(reusable=reusable)
+    if hostname_prefix is not None:
+        query = query.filter(Node.hostname.startswith(hostname_prefix, autoescape=True))
+    query = pagination.apply(query, Node.id)
+
+    if accepts_ndjson(request):
+        return NDJSONStreamingResponse(
+            _stream_node_views(query, with_data, selection, replica=not wrote_recently(request))
+        )
+
+    if not with_data:
+        query = query.options(defer(Node.data, raiseload=True))
+
+    nodes = (await db_async_session.execute(query)).scalars().all()
+    next_cursor = pagination.next_cursor(nodes)
+
+    if not selection.all:
+        return JSONResponse(
+            {
+                "action": "get",
+                "nodes": [selection.serialize(NodeModel, node) for node in nodes],
+                "next_cursor": next_cursor,
+            }
+        )
+
+    if not with_data:
+        nodes = [NodeBriefModel.model_validate(node) for node in nodes]
+
+    return {"action": "get", "nodes": nodes, "next_cursor": next_cursor}
 
 
 @router.get("/{id}", response_model=NodeResult, tags=["nodes"])
 async def get_node(
     id: int,
-    db_async_session: AsyncSession = Depends(req_db_async_session),
-    tenant: Tenant = Depends(req_tenant),
+    db_async_session: AsyncSession = Depends(req_db_async_read_only_session),
+    tenant: Tenant = Depends(req_tenant_read_only),
+    selection: FieldSelection = Depends(req_field_selection),
 ):
-    """Return the node with the specified **ID**."""
+    """Return the node with the specified **ID**.
+
+    Use `fields` to return only some of its fields.
+    """
+    selection.model(NodeModel)
+
     query = select(Node).filter_by(id=id).options(selectinload("*"))
+    if not selection.includes("data"):
+        query = query.options(defer(Node.data, raiseload=True))
     result = await db_async_session.execute(query)
     node = result.scalar_one_or_none()
 
     if not node:
         raise HTTPException(HTTP_404_NOT_FOUND)
 
+    if not selection.all:
+        return JSONResponse({"action": "get", "node": selection.serialize(NodeModel, node)})
+
     return {"action": "get", "node": node}
 
 
@@ -1,35 +1,112 @@
 """This is the pool controller."""
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import func, select
+from typing import Dict, Iterable, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.status import HTTP_404_NOT_FOUND, HTTP_422_UNPROCESSABLE_ENTITY
 
 from ...api_models import PoolResult, PoolResultCollection
-from ...database.model import Node
 from ...nodes.pools import ConcreteNodePool
-from ..database import req_db_async_session
+from ...tasks.events import LEVEL_STATES, LEVELS_QUERY
+from ..database import req_db_async_read_only_session
+from ..etags import etag_matches, make_etag, not_modified
+from ..pool_cache import pool_levels_cache
 
 router = APIRouter(prefix="/pools")
 
+# Allocation counts of autoscaled pools are cached along with their levels.
+ALLOCATION_COUNTS = "allocation-counts"
+
+
+async def _pools_levels(
+    db_async_session: AsyncSession, names: Iterable[str]
+) -> Dict[str, Dict[str, int]]:
+    """Look up the levels of pools from their maintained counters in one query.
+
+    Levels are taken from the cache if possible.
+    """
+    levels_per_pool = {}
+    missing_levels = {}
+    for name in names:
+        levels = pool_levels_cache.get(name)
+        if levels is None:
+            levels_per_pool[name] = missing_levels[name] = {state.name: 0 for state in LEVEL_STATES}
+        else:
+            levels_per_pool[name] = levels
+
+    if missing_levels:
+        generation = pool_levels_cache.generation
+        for pool, state, quantity in await db_async_session.execute(
+            LEVELS_QUERY, {"pools": list(missing_levels)}
+        ):
+            missing_levels[pool][state.name] = quantity
+        for name, levels in missing_levels.items():
+            pool_levels_cache.set(name, levels, generation)
+
+    return levels_per_pool
+
+
+async def _pool_allocation_counts(
+    db_async_session: AsyncSession, pool: ConcreteNodePool
+) -> Optional[Tuple[int, ...]]:
+    """Count the recent allocations from a pool, if it's autoscaled.
+
+    Counts are taken from the cache if possible.
+    """
+    autoscale_policy = pool.autoscale_policy
+    if not autoscale_policy:
+        return None
+
+    allocation_counts = pool_levels_cache.get(pool.name, ALLOCATION_COUNTS)
+    if allocation_counts is None:
+        generation = pool_levels_cache.generation
+        allocation_counts = tuple(
+            (await db_async_session.execute(autoscale_policy.allocations_query(pool.name))).one()
+        )
+        pool_levels_cache.set(pool.name, allocation_counts, generation, ALLOCATION_COUNTS)
+
+    return allocation_counts
+
 
 # http get http://localhost:8080/api/v1/pools
 @router.get("", response_model=PoolResultCollection, tags=["pools"])
-async def get_all_pools(db_async_session: AsyncSession = Depends(req_db_async_session)):
-    """Return all pools."""
+async def get_all_pools(
+    levels: bool = False, db_async_session: AsyncSession = Depends(req_db_async_read_only_session)
+):
+    """Return all pools.
+
+    Set `levels` to include the current levels of all pools, counted in
+    one go.
+    """
     pools = [
         {"name": pool.name, "fill-level": pool["fill-level"]}
         for pool in ConcreteNodePool.iter_pools()
         if "fill-level" in pool
     ]
 
+    if levels:
+        levels_per_pool = await _pools_levels(db_async_session, (pool["name"] for pool in pools))
+        for pool in pools:
+            pool["levels"] = levels_per_pool[pool["name"]]
+
     return {"action": "get", "pools": pools}
 
 
 # http get http://localhost:8080/api/v1/pool/name-of-the-pool
 @router.get("/{name}", response_model=PoolResult, tags=["pools"])
-async def get_pool(name: str, db_async_session: AsyncSession = Depends(req_db_async_session)):
-    """Return the pool with the specified **NAME**."""
+async def get_pool(
+    name: str,
+    request: Request,
+    response: Response,
+    db_async_session: AsyncSession = Depends(req_db_async_read_only_session),
+):
+    """Return the pool with the specified **NAME**.
+
+    The response carries an `ETag` header. Send it back in an
+    `If-None-Match` header to get an empty response with status 304 if
+    the pool hasn't changed in the meantime.
+    """
     pool = ConcreteNodePool.known_pools.get(name)
 
     if pool is None:
@@ -38,23 +115,22 @@ async def get_pool(name: str, db_async_session: AsyncSession = Depends(req_db_as
     if "fill-level" not in pool:
         raise HTTPException(HTTP_422_UNPROCESSABLE_ENTITY)
 
+    allocation_counts = await _pool_allocation_counts(db_async_session, pool)
+    target_fill_level = pool.target_fill_level(allocation_counts)
+
+    levels = (await _pools_levels(db_async_session, (name,)))[name]
+
+    # The result consists of only these values, so they identify it.
+    etag = make_etag("pool", name, pool["fill-level"], target_fill_level, *levels.values())
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
     pool_result = {
         "name": name,
         "fill-level": pool["fill-level"],
-        "levels": {
-            "provisioning": 0,
-            "ready": 0,
-            "contextualizing": 0,
-            "deployed": 0,
-            "deprovisioning": 0,
-        },
+        "target-fill-level": target_fill_level,
+        "levels": levels,
     }
 
-    for state, quantity in await db_async_session.execute(
-        select(Node.state, func.count(Node.state))
-        .filter(Node.active == True, Node.pool == name)  # noqa: E712
-        .group_by(Node.state)
-    ):
-        pool_result["levels"][state.name] = quantity
-
+    response.headers["ETag"] = etag
     return {"action": "get", "pool": pool_result}
@@ -1,12 +1,14 @@
 """This is the session controller."""
 import datetime as dt
 import logging
-from typing import Optional
+from collections import defaultdict
+from operator import itemgetter
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Union
 
-from fastapi import APIRouter, Depends, HTTPException, Response
-from sqlalchemy import delete, func, select
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import Row, Select, bindparam, delete, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import defer, raiseload, selectinload
 from starlette.status import (
     HTTP_201_CREATED,
     HTTP_403_FORBIDDEN,
@@ -17,70 +19,366 @@ from starlette.status import (
 
 from ...api_models import (
     SessionCreateModel,
+    SessionModel,
     SessionResult,
     SessionResultCollection,
     SessionUpdateModel,
+    TenantModel,
 )
+from ...database import disable_seqscan
 from ...database.model import Node, Session, SessionNode, Tenant
 from ...database.types import NodeState
 from ...nodes.context import contextualize, decontextualize
-from ...tasks import deprovision_nodes, fill_pools
-from ..auth import req_tenant, req_tenant_optional
-from ..database import req_db_async_session
-from ..util import SerializationErrorRetryContext
+from ...tasks import deprovision_nodes, fill_pools, outbox
+from ..auth import req_tenant, req_tenant_optional_read_only, req_tenant_read_only
+from ..database import (
+    read_only_db_async_session,
+    req_db_async_read_only_session,
+    req_db_async_session,
+    wrote_recently,
+)
+from ..etags import etag_matches, make_etag, not_modified
+from ..fields import FieldSelection, req_field_selection
+from ..serialization import FastJSONResponse, NDJSONStreamingResponse, accepts_ndjson
+from ..util import KeysetPagination, SerializationErrorRetryContext, req_pagination
 
 log = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/sessions")
 
 
+# The hot queries of creating sessions are built once, see duffy.tasks.events.LEVELS_QUERY.
+
+# Counts the nodes allocated to active sessions of the tenant `tenant_id`.
+_TENANT_ALLOCATION_QUERY = (
+    select(func.count())
+    .select_from(SessionNode)
+    .join(Session, Session.id == SessionNode.session_id)
+    .join(Node, Node.id == SessionNode.node_id)
+    .filter(Session.active == True, Session.tenant_id == bindparam("tenant_id"))  # noqa: E712
+)
+
+# Reserves `quantity` ready nodes of the pool `pool`.
+_RESERVE_NODES_QUERY = (
+    select(Node)
+    .filter_by(active=True, state=NodeState.ready, pool=bindparam("pool"))
+    .limit(bindparam("quantity"))
+    .with_for_update()
+)
+
+
 def wrap_with_http_422_exception(exc: Exception) -> Exception:
     return HTTPException(HTTP_422_UNPROCESSABLE_ENTITY, str(exc))
 
 
-# http get http://localhost:8080/api/v1/sessions
-@router.get("", response_model=SessionResultCollection, tags=["sessions"])
-async def get_all_sessions(
-    db_async_session: AsyncSession = Depends(req_db_async_session),
-    tenant: Optional[Tenant] = Depends(req_tenant_optional),
-):
-    """Return all sessions."""
-    query = (
-        select(Session)
-        .options(
+def _session_load_options(selection: FieldSelection) -> list:
+    """Load only what's needed for the selected fields of sessions."""
+    if selection.all:
+        return [
             selectinload(Session.tenant),
             selectinload(Session.session_nodes).selectinload(SessionNode.node),
+        ]
+
+    options = [
+        selectinload(Session.tenant) if selection.includes("tenant") else raiseload(Session.tenant)
+    ]
+    if not selection.includes("data"):
+        options.append(defer(Session.data, raiseload=True))
+    if selection.includes("nodes"):
+        nodes_load = selectinload(Session.session_nodes).selectinload(SessionNode.node)
+        if not selection.subselection("nodes").includes("data"):
+            nodes_load = nodes_load.defer(Node.data, raiseload=True)
+        options.append(nodes_load)
+    else:
+        options.append(raiseload(Session.session_nodes))
+
+    return options
+
+
+def _serialize_session(session: Session, selection: FieldSelection) -> dict:
+    """Serialize the selected fields of a session."""
+    values = {name: getattr(session, name) for name in selection.names() if name != "nodes"}
+    if selection.includes("nodes"):
+        node_fields = selection.subselection("nodes").names()
+        values["nodes"] = [
+            session_node.view_attrs(node_fields) for session_node in session.session_nodes
+        ]
+    return selection.serialize(SessionModel, values)
+
+
+_SESSION_VIEW_COLUMNS = (
+    Session.id,
+    Session.tenant_id,
+    Session.created_at,
+    Session.retired_at,
+    Session.expires_at,
+    Session.data,
+)
+
+# The number of sessions fetched at a time when streaming them
+STREAM_CHUNK_SIZE = 500
+
+
+async def _session_views(db_async_session: AsyncSession, query: Select) -> List[Dict[str, Any]]:
+    """Build the API views of the sessions a query selects.
+
+    The views are built straight from column values, without creating
+    ORM objects or validating API models, i.e. they can be serialized
+    without further ado. This matters for listings of many sessions and
+    their nodes.
+    """
+    session_rows = (
+        await db_async_session.execute(query.with_only_columns(*_SESSION_VIEW_COLUMNS))
+    ).all()
+    return await _session_views_for_rows(
+        db_async_session, session_rows, query.with_only_columns(Session.id), {}
+    )
+
+
+async def _session_views_for_rows(
+    db_async_session: AsyncSession,
+    session_rows: Sequence[Row],
+    session_ids: Union[Select, Sequence[int]],
+    tenant_views: Dict[int, Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    """Build the API views of sessions from their rows.
+
+    `session_ids` are either the IDs of the sessions or a query
+    selecting them. Views of tenants are cached in `tenant_views`, pass
+    the same dictionary to build the views of sessions chunk by chunk.
+    """
+    if not session_rows:
+        return []
+
+    # Sessions are owned by only a few tenants, serialize each of them once.
+    missing_tenant_ids = {row.tenant_id for row in session_rows} - tenant_views.keys()
+    if missing_tenant_ids:
+        tenant_views.update(
+            (tenant.id, TenantModel.model_validate(tenant).model_dump(mode="json"))
+            for tenant in (
+                await db_async_session.execute(
+                    select(Tenant).filter(Tenant.id.in_(missing_tenant_ids))
+                )
+            ).scalars()
         )
-        .filter_by(active=True)
+
+    node_views_per_session = defaultdict(list)
+    node_rows = await db_async_session.execute(
+        select(
+            SessionNode.session_id,
+            Node.id,
+            Node.hostname,
+            Node.ipaddr,
+            Node.pool,
+            Node.reusable,
+            Node.data,
+            Node.state,
+        )
+        .join(SessionNode.node)
+        .filter(SessionNode.session_id.in_(session_ids))
+        .order_by(SessionNode.session_id, SessionNode.node_id)
     )
+    for row in node_rows:
+        node_views_per_session[row.session_id].append(
+            {
+                "hostname": row.hostname,
+                "ipaddr": row.ipaddr,
+                "comment": None,
+                "pool": row.pool,
+                "reusable": row.reusable,
+                "data": row.data,
+                "id": row.id,
+                "state": row.state,
+            }
+        )
+
+    session_views = []
+    for row in session_rows:
+        active = row.retired_at is None
+        node_views = node_views_per_session[row.id]
+        if not active:
+            # see SessionNode.view_attrs()
+            for node_view in node_views:
+                node_view["state"] = None
+        session_views.append(
+            {
+                "created_at": row.created_at,
+                "retired_at": row.retired_at,
+                "active": active,
+                "id": row.id,
+                "expires_at": row.expires_at,
+                "tenant": tenant_views[row.tenant_id],
+                "data": row.data,
+                "nodes": node_views,
+            }
+        )
+
+    return session_views
+
+
+async def _stream_session_views(
+    query: Select, selection: FieldSelection, replica: bool = False
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Stream the API views of the sessions a query selects in chunks.
+
+    Sessions are fetched through a server-side cursor. This uses its own
+    database session because the one of the request is closed before
+    the response is sent.
+    """
+    tenant_views = {}
+    async with read_only_db_async_session(replica=replica) as db_async_session:
+        result = await db_async_session.stream(
+            query.with_only_columns(*_SESSION_VIEW_COLUMNS).execution_options(
+                yield_per=STREAM_CHUNK_SIZE
+            )
+        )
+        async for session_rows in result.partitions():
+            session_views = await _session_views_for_rows(
+                db_async_session, session_rows, [row.id for row in session_rows], tenant_views
+            )
+            yield [selection.prune(session_view) for session_view in session_views]
+
+
+# http get http://localhost:8080/api/v1/sessions
+@router.get("", response_model=SessionResultCollection, tags=["sessions"])
+async def get_all_sessions(
+    request: Request,
+    db_async_session: AsyncSession = Depends(req_db_async_read_only_session),
+    tenant: Optional[Tenant] = Depends(req_tenant_optional_read_only),
+    pagination: KeysetPagination = Depends(req_pagination),
+    tenant_id: Optional[int] = None,
+    pool: Optional[str] = None,
+    node_state: Optional[NodeState] = None,
+    created_after: Optional[dt.datetime] = None,
+    created_before: Optional[dt.datetime] = None,
+    expires_after: Optional[dt.datetime] = None,
+    expires_before: Optional[dt.datetime] = None,
+    include_retired: bool = False,
+    selection: FieldSelection = Depends(req_field_selection),
+):
+    """Return all sessions.
+
+    Optionally, filter the sessions by tenant, pool or state of their
+    nodes, or creation and expiration time ranges. Set `include_retired`
+    to true to return retired sessions as well. Use `limit` and `after`
+    to page through them, and `fields` to return only some of their
+    fields.
+
+    Send `Accept: application/x-ndjson` to have the sessions streamed as
+    newline-delimited JSON, one session per line.
+    """
+    selection.model(SessionModel)
+
+    query = select(Session)
+    if not include_retired:
+        query = query.filter_by(active=True)
     if tenant and not tenant.is_admin:
         query = query.filter_by(tenant=tenant)
-    results = await db_async_session.execute(query)
-    return {"action": "get", "sessions": results.scalars().all()}
+    if tenant_id is not None:
+        query = query.filter_by(tenant_id=tenant_id)
+    if pool is not None:
+        query = query.filter(Session.session_nodes.any(SessionNode.pool == pool))
+    if node_state is not None:
+        query = query.filter(
+            Session.session_nodes.any(SessionNode.node.has(Node.state == node_state))
+        )
+    if created_after is not None:
+        query = query.filter(Session.created_at >= created_after)
+    if created_before is not None:
+        query = query.filter(Session.created_at < created_before)
+    if expires_after is not None:
+        query = query.filter(Session.expires_at >= expires_after)
+    if expires_before is not None:
+        query = query.filter(Session.expires_at < expires_before)
+    query = pagination.apply(query, Session.id)
+
+    if accepts_ndjson(request):
+        return NDJSONStreamingResponse(
+            _stream_session_views(query, selection, replica=not wrote_recently(request))
+        )
+
+    if selection.all:
+        session_views = await _session_views(db_async_session, query)
+        return FastJSONResponse(
+            {
+                "action": "get",
+                "sessions": session_views,
+                "next_cursor": pagination.next_cursor(session_views, key=itemgetter("id")),
+            }
+        )
+
+    query = query.options(*_session_load_options(selection))
+    sessions = (await db_async_session.execute(query)).scalars().all()
+
+    return FastJSONResponse(
+        {
+            "action": "get",
+            "sessions": [_serialize_session(session, selection) for session in sessions],
+            "next_cursor": pagination.next_cursor(sessions),
+        }
+    )
 
 
 # http get http://localhost:8080/api/v1/sessions/2
 @router.get("/{id}", response_model=SessionResult, tags=["sessions"])
 async def get_session(
     id: int,
-    db_async_session: AsyncSession = Depends(req_db_async_session),
-    tenant: Tenant = Depends(req_tenant),
+    request: Request,
+    response: Response,
+    db_async_session: AsyncSession = Depends(req_db_async_read_only_session),
+    tenant: Tenant = Depends(req_tenant_read_only),
+    selection: FieldSelection = Depends(req_field_selection),
 ):
-    """Return a session with the specified **ID**."""
-    session = (
+    """Return a session with the specified **ID**.
+
+    Use `fields` to return only some of its fields.
+
+    The response carries an `ETag` header. Send it back in an
+    `If-None-Match` header to get an empty response with status 304 if
+    the session hasn't changed in the meantime.
+    """
+    selection.model(SessionModel)
+
+    # The versions of the session, its tenant and nodes identify what it looks like.
+    versions = (
         await db_async_session.execute(
-            select(Session)
-            .filter_by(id=id)
-            .options(
-                selectinload(Session.tenant),
-                selectinload(Session.session_nodes).selectinload(SessionNode.node),
+            select(
+                Session.tenant_id,
+                Session.version,
+                Tenant.version,
+                func.count(Node.id),
+                func.coalesce(func.sum(Node.version), 0),
             )
+            .join(Session.tenant)
+            .outerjoin(Session.session_nodes)
+            .outerjoin(SessionNode.node)
+            .filter(Session.id == id)
+            .group_by(Session.id, Tenant.id)
         )
-    ).scalar_one_or_none()
-    if not session:
+    ).one_or_none()
+    if not versions:
         raise HTTPException(HTTP_404_NOT_FOUND)
-    if not tenant.is_admin and session.tenant != tenant:
+    if not tenant.is_admin and versions.tenant_id != tenant.id:
         raise HTTPException(HTTP_403_FORBIDDEN)
+
+    # Different selections of fields are different representations of the session.
+    etag = make_etag("session", id, selection.frozen(), *versions)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    session = (
+        await db_async_session.execute(
+            select(Session).filter_by(id=id).options(*_session_load_options(selection))
+        )
+    ).scalar_one()
+
+    if not selection.all:
+        return FastJSONResponse(
+            {"action": "get", "session": _serialize_session(session, selection)},
+            headers={"ETag": etag},
+        )
+
+    response.headers["ETag"] = etag
     return {"action": "get", "session": session}
 
 
@@ -114,13 +412,7 @@ async def create_session(
         requested_nodes = sum(nodes_spec.quantity for nodes_spec in data.nodes_specs)
 
         current_allocation = (
-            await db_async_session.execute(
-                select(func.count())
-                .select_from(SessionNode)
-                .join(Session, Session.id == SessionNode.session_id)
-                .join(Node, Node.id == SessionNode.node_id)
-                .filter(Session.active == True, Session.tenant == tenant)  # noqa: E712
-            )
+            await db_async_session.execute(_TENANT_ALLOCATION_QUERY, {"tenant_id": tenant.id})
         ).scalar_one()
 
         if requested_nodes + current_allocation > tenant.effective_node_quota:
@@ -143,6 +435,8 @@ async def create_session(
         async for attempt in retry.attempts:
             try:
                 async with db_async_session.begin():
+                    await db_async_session.run_sync(disable_seqscan)
+
                     session = Session(
                         tenant_id=tenant.id,
                         data={"nodes_specs": [spec.model_dump() for spec in data.nodes_specs]},
@@ -160,30 +454,34 @@ async def create_session(
                     pools_to_fill_up = set()
                     for nodes_spec in data.nodes_specs:
                         pools_to_fill_up.add(nodes_spec.pool)
-                        nodes_spec_dict = nodes_spec.model_dump()
-                        quantity = nodes_spec_dict.pop("quantity")
-
-                        query = (
-                            select(Node)
-                            .filter_by(active=True, state=NodeState.ready, **nodes_spec_dict)
-                            .limit(quantity)
-                            .with_for_update()
-                        )
 
-                        nodes_to_reserve = (await db_async_session.execute(query)).scalars().all()
+                        nodes_to_reserve = (
+                            (
+                                await db_async_session.execute(
+                                    _RESERVE_NODES_QUERY,
+                                    {"pool": nodes_spec.pool, "quantity": nodes_spec.quantity},
+                                )
+                            )
+                            .scalars()
+                            .all()
+                        )
 
-                        if len(nodes_to_reserve) < quantity:
+                        if len(nodes_to_reserve) < nodes_spec.quantity:
                             raise HTTPException(
                                 HTTP_422_UNPROCESSABLE_ENTITY, f"can't reserve nodes: {nodes_spec}"
                             )
 
                         # take the nodes out of circulation and update data
                         for node in nodes_to_reserve:
-                            # record why this node was allocated for this session
+                            # record why this node was allocated for this session, the rest of
+                            # its data is only stored with the node
                             node.data["nodes_spec"] = nodes_spec.model_dump()
                             node.state = NodeState.contextualizing
                             session_node = SessionNode(
-                                session=session, node=node, pool=nodes_spec.pool, data=node.data
+                                session=session,
+                                node=node,
+                                pool=nodes_spec.pool,
+                                data={"nodes_spec": nodes_spec.model_dump()},
                             )
                             session_nodes.append(session_node)
                             db_async_session.add(session_node)
@@ -201,6 +499,8 @@ async def create_session(
         async for attempt in retry.attempts:
             try:
                 async with db_async_session.begin():
+                    await db_async_session.run_sync(disable_seqscan)
+
                     # New transaction -> reload session and related node objects
 
                     session = (
@@ -271,6 +571,11 @@ async def create_session(
                                     else:
                                         node.state = NodeState.ready
 
+                            # Some nodes are out of circulation, fill up pools.
+                            outbox.enqueue(
+                                db_async_session, fill_pools, pool_names=list(pools_to_fill_up)
+                            )
+
                             await db_async_session.commit()
                         except Exception as exc:
                             try:
@@ -283,24 +588,19 @@ async def create_session(
                                 headers={"Retry-After": "0"},
                             ) from exc
 
-                        # Some nodes are out of circulation, fill up pools.
-                        fill_pools.delay(pool_names=list(pools_to_fill_up)).forget()
-
                         raise HTTPException(
                             HTTP_503_SERVICE_UNAVAILABLE,
                             "contextualization of nodes failed",
                             headers={"Retry-After": "0"},
                         )
-                    # None not in contextualized_ipaddrs
-                    # Workaround: give coverage an anchor to detect that this branch is taken.
-                    pass
+
+                    # Tell backend worker to fill up pools from which nodes were taken, once the
+                    # nodes are committed as deployed.
+                    outbox.enqueue(db_async_session, fill_pools, pool_names=list(pools_to_fill_up))
             except retry.exceptions as exc:
                 retry.process_exception(exc)
 
-    log.debug("Nodes deployed, kick off filling pools and return result via API")
-
-    # Tell backend worker to fill up pools from which nodes were taken.
-    fill_pools.delay(pool_names=list(pools_to_fill_up)).forget()
+    log.debug("Nodes deployed, return result via API")
 
     return {"action": "post", "session": session}
 
@@ -351,9 +651,11 @@ async def update_session(
 
     if data.active is False:
         session.active = data.active
-        deprovision_nodes.delay(
-            node_ids=[session_node.node_id for session_node in session.session_nodes]
-        ).forget()
+        outbox.enqueue(
+            db_async_session,
+            deprovision_nodes,
+            node_ids=[session_node.node_id for session_node in session.session_nodes],
+        )
 
     await db_async_session.flush()
 
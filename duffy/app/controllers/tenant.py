@@ -30,8 +30,8 @@ from ...api_models import (
     TenantUpdateResultModel,
 )
 from ...database.model import Session, Tenant
-from ..auth import req_tenant
-from ..database import req_db_async_session
+from ..auth import req_tenant, req_tenant_read_only
+from ..database import req_db_async_read_only_session, req_db_async_session
 
 router = APIRouter(prefix="/tenants")
 
@@ -39,8 +39,8 @@ router = APIRouter(prefix="/tenants")
 # http get http://localhost:8080/api/v1/tenants
 @router.get("", response_model=TenantResultCollection, tags=["tenants"])
 async def get_all_tenants(
-    db_async_session: AsyncSession = Depends(req_db_async_session),
-    tenant: Tenant = Depends(req_tenant),
+    db_async_session: AsyncSession = Depends(req_db_async_read_only_session),
+    tenant: Tenant = Depends(req_tenant_read_only),
 ):
     """Return all tenants."""
     query = select(Tenant)
@@ -55,8 +55,8 @@ async def get_all_tenants(
 @router.get("/{id}", response_model=TenantResult, tags=["tenants"])
 async def get_tenant(
     id: int,
-    db_async_session: AsyncSession = Depends(req_db_async_session),
-    tenant: Tenant = Depends(req_tenant),
+    db_async_session: AsyncSession = Depends(req_db_async_read_only_session),
+    tenant: Tenant = Depends(req_tenant_read_only),
 ):
     """Return the tenant with the specified **ID**."""
     retrieved_tenant = (
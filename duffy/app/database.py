@@ -1,8 +1,41 @@
-from typing import Iterator
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Iterator
 
+from fastapi import Depends, Request
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import async_session_maker
+from ..configuration import config
+from ..database import async_read_engines, async_session_maker, next_async_read_engine
+from ..misc import ConfigTimeDelta
+
+# Requests which only read don't need the default SERIALIZABLE isolation level, a consistent
+# snapshot is enough. This way, they neither take part in predicate locking nor cause serialization
+# failures in concurrent transactions which write.
+READ_ONLY_EXECUTION_OPTIONS = {
+    "postgresql": {"isolation_level": "REPEATABLE READ", "postgresql_readonly": True},
+}
+
+# Requests which write set this cookie to when they did, so their clients read from the primary
+# for a while afterwards, until replicas have caught up.
+LAST_WRITE_COOKIE = "duffy_last_write"
+DEFAULT_REPLICA_MAX_LAG = 5
+
+
+def replica_max_lag() -> float:
+    """Return for how many seconds clients read from the primary after writing."""
+    value = config["database"].get("replica-max-lag", DEFAULT_REPLICA_MAX_LAG)
+    return TypeAdapter(ConfigTimeDelta).validate_python(value).total_seconds()
+
+
+def wrote_recently(request: Request) -> bool:
+    """Check if the client wrote something too recently to read from replicas."""
+    try:
+        last_write = float(request.cookies[LAST_WRITE_COOKIE])
+    except (KeyError, ValueError):
+        return False
+    return time.time() - last_write < replica_max_lag()
 
 
 async def req_db_async_session() -> Iterator[AsyncSession]:
@@ -15,3 +48,48 @@ async def req_db_async_session() -> Iterator[AsyncSession]:
         raise
     finally:
         await db_async_session.close()
+
+
+@asynccontextmanager
+async def read_only_db_async_session(replica: bool = False) -> AsyncIterator[AsyncSession]:
+    """Create a database session for reading only.
+
+    Set `replica` to read from a replica of the database if any are
+    configured. The transaction is rolled back when done.
+    """
+    read_engine = next_async_read_engine() if replica else None
+    if read_engine:
+        db_async_session = async_session_maker(bind=read_engine)
+    else:
+        db_async_session = async_session_maker()
+
+    async with db_async_session:
+        execution_options = READ_ONLY_EXECUTION_OPTIONS.get(
+            db_async_session.get_bind().dialect.name
+        )
+        if execution_options:
+            await db_async_session.connection(execution_options=execution_options)
+        yield db_async_session
+
+
+async def req_db_async_read_only_session(request: Request) -> Iterator[AsyncSession]:
+    async with read_only_db_async_session(replica=not wrote_recently(request)) as db_async_session:
+        yield db_async_session
+
+
+async def req_db_async_primary_read_only_session(
+    db_async_session: AsyncSession = Depends(req_db_async_read_only_session),
+) -> Iterator[AsyncSession]:
+    """A read-only database session on the primary, for reading what mustn't lag behind.
+
+    E.g. tenants and their API keys are looked up in it, so retired
+    tenants or changed keys don't keep working until replicas caught up.
+    If the request doesn't read from a replica anyway, its read-only
+    session is used.
+    """
+    if db_async_session.bind not in async_read_engines:
+        yield db_async_session
+        return
+
+    async with read_only_db_async_session() as db_async_primary_session:
+        yield db_async_primary_session
@@ -0,0 +1,41 @@
+"""Entity tags, i.e. letting clients find out cheaply if objects changed."""
+
+import hashlib
+from typing import Any
+
+from fastapi import Request, Response
+from starlette.status import HTTP_304_NOT_MODIFIED
+
+
+def make_etag(*parts: Any) -> str:
+    """Compute an entity tag from the parts identifying a version of an object.
+
+    The parts must be cheap to obtain, e.g. counters of modifications,
+    otherwise there's little to gain over building the object anyway.
+    """
+    digest = hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def _opaque_tag(etag: str) -> str:
+    etag = etag.strip()
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check if an entity tag matches the If-None-Match header of a request.
+
+    Entity tags are compared weakly, as for If-None-Match in RFC 9110.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque_tag = _opaque_tag(etag)
+    return any(_opaque_tag(tag) == opaque_tag for tag in if_none_match.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    """Build a response telling the client its version of an object is current."""
+    return Response(status_code=HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
@@ -0,0 +1,83 @@
+"""Publish events about sessions and pools in the background.
+
+Changes of sessions and pools are picked up when they're committed, see
+duffy.tasks.events. Publishing them takes round trips to the database,
+to look up the levels of changed pools, and to Redis, so API handlers
+don't wait for it but hand the changes over to this publisher, which
+publishes them in a worker thread. Changes handed over while it's busy
+are published together afterwards, looking up the levels of each changed
+pool only once.
+"""
+
+import asyncio
+import logging
+from typing import Any, Collection, Dict, List, Optional, Set
+
+from ..tasks import events
+
+log = logging.getLogger(__name__)
+
+
+class EventPublisher:
+    """Publish committed changes in a worker thread."""
+
+    def __init__(self):
+        self._session_events: List[Dict[str, Any]] = []
+        self._pools: Set[str] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._runner: Optional[asyncio.Task] = None
+
+    def submit(self, session_events: List[Dict[str, Any]], pools: Collection[str]):
+        """Hand over committed changes to be published, from any thread."""
+        self._loop.call_soon_threadsafe(self._add, session_events, pools)
+
+    def _add(self, session_events: List[Dict[str, Any]], pools: Collection[str]):
+        self._session_events.extend(session_events)
+        self._pools.update(pools)
+        self._wakeup.set()
+
+    async def publish(self):
+        """Publish the changes handed over until now."""
+        session_events, self._session_events = self._session_events, []
+        pools, self._pools = self._pools, set()
+        if not (session_events or pools):
+            return
+        try:
+            await asyncio.to_thread(events.publish_changes, session_events, pools)
+        except Exception as exc:
+            log.warning("Publishing events failed: %s", exc)
+
+    async def run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            await self.publish()
+
+    def start(self):
+        """Start publishing changes in the background."""
+        if self._runner:
+            return
+
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        events.publisher = self.submit
+        self._runner = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Stop publishing changes in the background, after publishing what's left."""
+        if events.publisher == self.submit:
+            events.publisher = events.publish_changes
+
+        if self._runner:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+
+        await self.publish()
+
+
+event_publisher = EventPublisher()
@@ -0,0 +1,178 @@
+"""Sparse fieldsets, i.e. letting clients select which fields of objects are returned."""
+
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Type, Union, get_args, get_origin
+
+from fastapi import HTTPException, Query
+from pydantic import BaseModel, create_model
+from starlette.status import HTTP_422_UNPROCESSABLE_ENTITY
+
+# A selection of fields maps names either to True (the whole field) or the selection of fields of a
+# nested object.
+FieldTree = Dict[str, Union[bool, "FieldTree"]]
+FrozenFieldTree = Tuple[Tuple[str, Union[bool, "FrozenFieldTree"]], ...]
+
+# Clients choose the selections, including unauthenticated ones, so only so many partial models are
+# kept around.
+PARTIAL_MODEL_CACHE_SIZE = 128
+
+
+def parse_fields(fields: str) -> FieldTree:
+    """Parse a comma-separated list of (dotted) field names into a tree."""
+    tree = {}
+    for path in fields.split(","):
+        path = path.strip()
+        if not path:
+            continue
+        *parents, leaf = path.split(".")
+        subtree = tree
+        for parent in parents:
+            if subtree.get(parent) is True:
+                break
+            subtree = subtree.setdefault(parent, {})
+        else:
+            subtree[leaf] = True
+    return tree
+
+
+def _freeze(tree: FieldTree) -> FrozenFieldTree:
+    return tuple(
+        sorted(
+            (name, True if subtree is True else _freeze(subtree)) for name, subtree in tree.items()
+        )
+    )
+
+
+def _partial_annotation(annotation: Any, frozen_tree: FrozenFieldTree, path: str) -> Any:
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return _partial_model(annotation, frozen_tree, path)
+
+    origin = get_origin(annotation)
+    if origin is list:
+        (item_annotation,) = get_args(annotation)
+        return List[_partial_annotation(item_annotation, frozen_tree, path)]
+    if origin is Union:
+        return Union[
+            tuple(
+                arg if arg is type(None) else _partial_annotation(arg, frozen_tree, path)
+                for arg in get_args(annotation)
+            )
+        ]
+
+    raise ValueError(f"field has no subfields: {path}")
+
+
+@lru_cache(maxsize=PARTIAL_MODEL_CACHE_SIZE)
+def _partial_model(
+    model_cls: Type[BaseModel], frozen_tree: FrozenFieldTree, path: str = ""
+) -> Type[BaseModel]:
+    field_definitions = {}
+    for name, subtree in frozen_tree:
+        field_path = f"{path}.{name}" if path else name
+        field = model_cls.model_fields.get(name)
+        if not field:
+            raise ValueError(f"unknown field: {field_path}")
+        annotation = field.annotation
+        if subtree is not True:
+            annotation = _partial_annotation(annotation, subtree, field_path)
+        default = ... if field.is_required() else field.default
+        field_definitions[name] = (annotation, default)
+
+    return create_model(
+        f"Partial{model_cls.__name__}",
+        __config__=model_cls.model_config.copy(),
+        **field_definitions,
+    )
+
+
+class FieldSelection:
+    """The fields of objects a client wants returned.
+
+    A selection without a tree selects all fields.
+    """
+
+    def __init__(self, tree: Optional[FieldTree] = None):
+        self.tree = tree
+
+    @classmethod
+    def from_fields(cls, fields: Optional[str]) -> "FieldSelection":
+        """Create a selection from a comma-separated list of (dotted) field names."""
+        return cls(parse_fields(fields) if fields else None)
+
+    @property
+    def all(self) -> bool:
+        return self.tree is None
+
+    def includes(self, name: str) -> bool:
+        """Check if a field is selected, wholly or partially."""
+        return self.tree is None or name in self.tree
+
+    def subselection(self, name: str) -> "FieldSelection":
+        """The selection of fields of a nested object."""
+        if self.tree is None or self.tree.get(name) is True:
+            return FieldSelection()
+        return FieldSelection(self.tree.get(name, {}))
+
+    def names(self) -> Optional[List[str]]:
+        """The names of the selected fields, or None if all are selected."""
+        if self.tree is None:
+            return None
+        return list(self.tree)
+
+    def frozen(self) -> Optional[FrozenFieldTree]:
+        """A normalized, hashable form of the selection, or None if all fields are selected.
+
+        Selections of the same fields have the same frozen form, regardless
+        of the order in which the fields were listed, e.g. to be part of
+        entity tags.
+        """
+        if self.tree is None:
+            return None
+        return _freeze(self.tree)
+
+    def model(self, model_cls: Type[BaseModel]) -> Type[BaseModel]:
+        """Create a model containing only the selected fields of `model_cls`.
+
+        Raises HTTPException with status 422 for unknown fields.
+        """
+        if self.tree is None:
+            return model_cls
+        try:
+            return _partial_model(model_cls, self.frozen())
+        except ValueError as exc:
+            raise HTTPException(HTTP_422_UNPROCESSABLE_ENTITY, str(exc)) from exc
+
+    def serialize(self, model_cls: Type[BaseModel], obj: Any) -> Dict[str, Any]:
+        """Validate the selected fields of an object and serialize them into a JSON-able dict."""
+        return self.model(model_cls).model_validate(obj).model_dump(mode="json")
+
+    def prune(self, view: Dict[str, Any]) -> Dict[str, Any]:
+        """Remove fields which aren't selected from a complete view of an object.
+
+        Nested views and lists of them are pruned recursively.
+        """
+        if self.tree is None:
+            return view
+
+        pruned = {}
+        for name in self.tree:
+            value = view[name]
+            subselection = self.subselection(name)
+            if isinstance(value, list):
+                value = [subselection.prune(item) for item in value]
+            elif isinstance(value, dict):
+                value = subselection.prune(value)
+            pruned[name] = value
+        return pruned
+
+
+async def req_field_selection(
+    fields: Optional[str] = Query(
+        None,
+        description=(
+            "Comma-separated list of fields to return, use dots to select fields of nested"
+            + " objects, e.g. `id,nodes.hostname`."
+        ),
+    ),
+) -> FieldSelection:
+    return FieldSelection.from_fields(fields)
@@ -8,8 +8,11 @@ from .. import database, tasks
 from ..exceptions import DuffyConfigurationError
 from ..nodes.pools import NodePool
 from ..version import __version__
-from .controllers import node, pool, session, tenant
-from .middleware import RequestIdMiddleware
+from .controllers import archive, events, metrics, node, pool, session, tenant
+from .event_publisher import event_publisher
+from .middleware import LastWriteCookieMiddleware, RequestIdMiddleware
+from .outbox_relay import outbox_relay
+from .pool_cache import pool_levels_cache
 
 log = logging.getLogger(__name__)
 
@@ -24,6 +27,9 @@ tags_metadata = [
     {"name": "pools", "description": "Operations on node pools"},
     {"name": "nodes", "description": "Operations on physical and virtual nodes"},
     {"name": "tenants", "description": "Operations on tenants"},
+    {"name": "events", "description": "Changes of sessions and pools as they happen"},
+    {"name": "metrics", "description": "Metrics of the API service"},
+    {"name": "archive", "description": "Sessions and nodes which were retired long ago"},
 ]
 
 app = FastAPI(
@@ -32,7 +38,7 @@ app = FastAPI(
     version=__version__,
     contact={"name": "CentOS CI", "email": "ci-sysadmin@centos.org"},
     openapi_tags=tags_metadata,
-    middleware=[Middleware(RequestIdMiddleware)],
+    middleware=[Middleware(RequestIdMiddleware), Middleware(LastWriteCookieMiddleware)],
 )
 
 
@@ -44,6 +50,9 @@ app.include_router(session.router, prefix=PREFIX)
 app.include_router(pool.router, prefix=PREFIX)
 app.include_router(node.router, prefix=PREFIX)
 app.include_router(tenant.router, prefix=PREFIX)
+app.include_router(events.router, prefix=PREFIX)
+app.include_router(metrics.router, prefix=PREFIX)
+app.include_router(archive.router, prefix=PREFIX)
 
 
 # Post-process configuration
@@ -60,7 +69,8 @@ async def post_process_config():
 @app.on_event("startup")
 async def init_model():
     try:
-        database.init_sync_model()
+        # The API hardly uses synchronous sessions, only connect if needed.
+        database.init_sync_model(lazy=True)
         await database.init_async_model()
     except DuffyConfigurationError as exc:
         log.error("Configuration key missing or wrong: %s", exc.args[0])
@@ -73,3 +83,42 @@ async def init_model():
 @app.on_event("startup")
 def init_tasks():
     tasks.init_tasks()
+
+
+# Cache of pool levels
+
+
+@app.on_event("startup")
+async def start_pool_cache():
+    pool_levels_cache.start()
+
+
+@app.on_event("shutdown")
+async def stop_pool_cache():
+    await pool_levels_cache.stop()
+
+
+# Publisher of events in the background
+
+
+@app.on_event("startup")
+async def start_event_publisher():
+    event_publisher.start()
+
+
+@app.on_event("shutdown")
+async def stop_event_publisher():
+    await event_publisher.stop()
+
+
+# Relay of tasks from the outbox to Celery
+
+
+@app.on_event("startup")
+async def start_outbox_relay():
+    outbox_relay.start()
+
+
+@app.on_event("shutdown")
+async def stop_outbox_relay():
+    await outbox_relay.stop()
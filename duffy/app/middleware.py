@@ -1,10 +1,15 @@
+import time
 from contextvars import ContextVar
+from http.cookies import SimpleCookie
 from typing import Optional
 from uuid import uuid4
 
 from starlette.datastructures import MutableHeaders
 from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from ..database import async_read_engines
+from .database import LAST_WRITE_COOKIE, replica_max_lag
+
 request_id_ctxvar: ContextVar[Optional[str]] = ContextVar("request-id", default=None)
 
 
@@ -28,3 +33,33 @@ class RequestIdMiddleware:
             await send(message)
 
         await self.app(scope, receive, send_with_extra_header)
+
+
+class LastWriteCookieMiddleware:
+    """Tell clients when they last wrote something, if reads can go to replicas.
+
+    Successful requests with methods other than GET and HEAD are assumed
+    to have written to the database.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] in ("GET", "HEAD") or not async_read_engines:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                cookie = SimpleCookie()
+                cookie[LAST_WRITE_COOKIE] = str(time.time())
+                cookie[LAST_WRITE_COOKIE]["max-age"] = int(replica_max_lag()) + 1
+                cookie[LAST_WRITE_COOKIE]["path"] = "/"
+                cookie[LAST_WRITE_COOKIE]["httponly"] = True
+                headers = MutableHeaders(scope=message)
+                headers.append("Set-Cookie", cookie[LAST_WRITE_COOKIE].OutputString())
+
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
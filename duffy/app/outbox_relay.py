@@ -0,0 +1,89 @@
+"""Relay tasks from the outbox to Celery in the background.
+
+API handlers don't send tasks to the broker themselves, they add them to
+the outbox in the database, see duffy.tasks.outbox. This way, neither
+do slow or unavailable brokers hold up requests, nor are tasks sent for
+changes which are rolled back. The relay wakes up as soon as tasks are
+committed in this process, and periodically to pick up tasks left over
+by others.
+"""
+
+import asyncio
+import logging
+from typing import Optional
+
+from ..configuration import config
+from ..configuration.validation import OutboxRelayModel
+from ..tasks import outbox
+
+log = logging.getLogger(__name__)
+
+
+class OutboxRelay:
+    """Send tasks from the outbox to Celery, in a worker thread."""
+
+    def __init__(self):
+        self.interval = 0.0
+        self.batch_size = outbox.DEFAULT_BATCH_SIZE
+        self._wakeup: Optional[asyncio.Event] = None
+        self._runner: Optional[asyncio.Task] = None
+
+    def notify(self):
+        """Wake up the relay, e.g. when tasks were committed to the outbox."""
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def relay(self) -> int:
+        """Send tasks from the outbox until it's drained or sending fails.
+
+        Returns the number of tasks sent.
+        """
+        total = 0
+        while True:
+            try:
+                sent = await asyncio.to_thread(outbox.relay_outbox, self.batch_size)
+            except Exception as exc:
+                log.warning("Relaying tasks from the outbox failed: %s", exc)
+                return total
+            total += sent
+            if sent < self.batch_size:
+                return total
+
+    async def run(self):
+        while True:
+            self._wakeup.clear()
+            await self.relay()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Start relaying tasks as configured."""
+        relay_config = OutboxRelayModel(**(config.get("app", {}).get("outbox-relay") or {}))
+        self.interval = relay_config.interval.total_seconds()
+        self.batch_size = relay_config.batch_size
+
+        if self._runner:
+            return
+
+        self._wakeup = asyncio.Event()
+        outbox.local_relays.append(self.notify)
+        self._runner = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Stop relaying tasks."""
+        if self.notify in outbox.local_relays:
+            outbox.local_relays.remove(self.notify)
+
+        if self._runner:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+            self._wakeup = None
+
+
+outbox_relay = OutboxRelay()
@@ -0,0 +1,147 @@
+"""Cache the levels of pools for a short time.
+
+Levels of pools are read much more often than they change. Cached
+levels are dropped when events about their pools arrive, either
+committed in this process or published through Redis by others, e.g.
+other app workers or Celery tasks. Their time-to-live bounds how stale
+they can get if events are missed, e.g. while Redis is unavailable.
+
+Other values derived from the nodes of pools, e.g. the allocation
+counts of autoscaled pools, are cached the same way.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from redis import RedisError
+from redis.asyncio import Redis
+
+from ..configuration import config
+from ..configuration.validation import PoolCacheModel
+from ..tasks import events
+
+log = logging.getLogger(__name__)
+
+# Wait this many seconds before subscribing to events again after losing the connection.
+RESUBSCRIBE_DELAY = 5
+
+# The kind of cached values which are the levels of a pool.
+LEVELS = "levels"
+
+
+class PoolLevelsCache:
+    """A cache of pool levels, disabled unless its time-to-live is set.
+
+    Values of other kinds can be cached per pool, too, they're dropped
+    along with the levels of their pool.
+    """
+
+    def __init__(self):
+        self.ttl = 0.0
+        self._entries: Dict[str, Dict[Hashable, Tuple[float, Any]]] = {}
+        # Bumped whenever entries are dropped, so levels looked up before that aren't cached.
+        self.generation = 0
+        self._listener: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def get(self, name: str, kind: Hashable = LEVELS) -> Optional[Any]:
+        """Return the cached levels of a pool, if they're fresh enough.
+
+        Set `kind` to get a cached value of another kind.
+        """
+        entry = self._entries.get(name, {}).get(kind)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    def set(self, name: str, value: Any, generation: int, kind: Hashable = LEVELS):
+        """Cache the levels of a pool, or a value of another `kind`.
+
+        The value is only cached if nothing was dropped from the cache
+        since `generation` was current, i.e. since it was looked up.
+        """
+        if self.enabled and generation == self.generation:
+            self._entries.setdefault(name, {})[kind] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self, name: Optional[str] = None):
+        """Drop the cached levels of a pool, or of all pools."""
+        self.generation += 1
+        if name is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(name, None)
+
+    def process_events(self, evts: List[Dict[str, Any]]):
+        for evt in evts:
+            if evt["type"] == "pool":
+                self.invalidate(evt["data"]["name"])
+
+    async def listen(self, url: str):
+        """Drop cached levels as events about pools are published."""
+        while True:
+            try:
+                async with Redis.from_url(url) as redis, redis.pubsub(
+                    ignore_subscribe_messages=True
+                ) as pubsub:
+                    await pubsub.subscribe(events.CHANNEL)
+                    # Events could have been missed while not subscribed.
+                    self.invalidate()
+                    async for message in pubsub.listen():
+                        self.process_events([json.loads(message["data"])])
+            except (OSError, RedisError) as exc:
+                log.warning(
+                    "Lost subscription to pool events, resubscribing in %d seconds: %s",
+                    RESUBSCRIBE_DELAY,
+                    exc,
+                )
+                self.invalidate()
+                await asyncio.sleep(RESUBSCRIBE_DELAY)
+
+    def start(self):
+        """Enable the cache as configured, and keep it up to date."""
+        try:
+            cache_config = PoolCacheModel(**config["app"]["pool-cache"])
+        except KeyError:
+            return
+
+        self.ttl = cache_config.ttl.total_seconds()
+        if not self.enabled:
+            return
+
+        if self.process_events not in events.local_subscribers:
+            events.local_subscribers.append(self.process_events)
+
+        if self._listener:
+            return
+
+        try:
+            url = config["tasks"]["locking"]["url"]
+        except KeyError:
+            log.warning("Can't subscribe to pool events, cached levels expire after their TTL.")
+        else:
+            self._listener = asyncio.create_task(self.listen(url))
+
+    async def stop(self):
+        """Disable the cache and stop listening to events."""
+        self.ttl = 0.0
+        self.invalidate()
+
+        if self.process_events in events.local_subscribers:
+            events.local_subscribers.remove(self.process_events)
+
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+
+pool_levels_cache = PoolLevelsCache()
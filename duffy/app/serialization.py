@@ -0,0 +1,76 @@
+"""Fast JSON serialization of API results which don't need to be validated."""
+
+import datetime as dt
+import json
+from typing import Any, AsyncIterable, Iterable
+
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, dt.datetime):
+        # Use the same format as Pydantic.
+        return obj.isoformat().replace("+00:00", "Z")
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _stdlib_json_dumps(content: Any) -> bytes:
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+        default=_json_default,
+    ).encode("utf-8")
+
+
+def _orjson_dumps(content: Any) -> bytes:
+    return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+
+
+# Use orjson if it's installed, it's a lot faster.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+json_dumps = _orjson_dumps if orjson else _stdlib_json_dumps
+
+
+class FastJSONResponse(Response):
+    """A JSON response for content which is serialized as is.
+
+    Content must only consist of JSON-able objects and datetimes.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return json_dumps(content)
+
+
+def accepts_ndjson(request: Request) -> bool:
+    """Check if a client asks for newline-delimited JSON."""
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+async def _ndjson_lines(chunks: AsyncIterable[Iterable[Any]]):
+    async for chunk in chunks:
+        yield b"".join(json_dumps(item) + b"\n" for item in chunk)
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """A response streaming objects as newline-delimited JSON.
+
+    Content is an asynchronous iterable of chunks of objects, each chunk
+    is sent as soon as it's available. The same constraints as for
+    `FastJSONResponse` apply to the objects.
+    """
+
+    media_type = NDJSON_MEDIA_TYPE
+
+    def __init__(self, content: AsyncIterable[Iterable[Any]], **kwargs):
+        super().__init__(_ndjson_lines(content), **kwargs)
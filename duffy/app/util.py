@@ -1,11 +1,14 @@
 import logging
-from typing import Tuple, Union
+from operator import attrgetter
+from typing import Any, Callable, Optional, Sequence, Tuple, Union
 
 try:
     import asyncpg
 except ImportError:  # pragma: no cover
     asyncpg = None
+from fastapi import Query
 from sqlalchemy.exc import DBAPIError
+from sqlalchemy.sql import ColumnElement, Select
 
 from ..configuration import config_get
 from ..util import RetryContext
@@ -40,3 +43,46 @@ class SerializationErrorRetryContext(ConfigRetryContext):
         log.debug("[%r] Match result: %r", self, result)
 
         return result
+
+
+class KeysetPagination:
+    """Page through a collection ordered by id.
+
+    Without `limit`, the whole collection is returned, otherwise up to
+    `limit` items with ids greater than `after`. Clients pass the
+    `next_cursor` of a result as `after` to get the next page.
+    """
+
+    max_limit = 1000
+
+    def __init__(self, after: Optional[int] = None, limit: Optional[int] = None):
+        self.after = after
+        self.limit = limit
+
+    def apply(self, query: Select, id_column: ColumnElement) -> Select:
+        query = query.order_by(id_column)
+        if self.after is not None:
+            query = query.filter(id_column > self.after)
+        if self.limit is not None:
+            query = query.limit(self.limit)
+        return query
+
+    def next_cursor(
+        self, items: Sequence, key: Callable[[Any], int] = attrgetter("id")
+    ) -> Optional[int]:
+        """The cursor to the next page, if a full page was returned.
+
+        Use `key` to get the id from items which aren't ORM objects.
+        """
+        if self.limit is not None and len(items) == self.limit:
+            return key(items[-1])
+        return None
+
+
+async def req_pagination(
+    after: Optional[int] = Query(None, description="Only return items with larger ids."),
+    limit: Optional[int] = Query(
+        None, ge=1, le=KeysetPagination.max_limit, description="Return at most this many items."
+    ),
+) -> KeysetPagination:
+    return KeysetPagination(after=after, limit=limit)
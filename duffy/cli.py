@@ -36,6 +36,10 @@ except ImportError:  # pragma: no cover
     DuffyClient = DuffyFormatter = None
 from .configuration import config, read_configuration
 
+try:
+    from .database.archive import archive_retired
+except ImportError:  # pragma: no cover
+    archive_retired = None
 try:
     from .database.migrations.main import alembic_migration
 except ImportError:  # pragma: no cover
@@ -274,6 +278,40 @@ def migration_downgrade(version):
     alembic_migration.downgrade(version)
 
 
+# Archive retired sessions and nodes
+
+
+@cli.command()
+@click.option(
+    "--retired-for",
+    type=INTERVAL_OR_NONE,
+    default=None,
+    help="Archive sessions and nodes retired for longer than this (default: configured).",
+)
+@click.option(
+    "--batch-size",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Archive this many sessions or nodes per transaction (default: configured).",
+)
+def archive(retired_for: Optional[timedelta], batch_size: Optional[int]):
+    """Move retired sessions and nodes into archive tables."""
+    if not archive_retired:
+        raise click.ClickException(
+            "Please install the duffy[database] extra (and optionally duffy[postgresql] or"
+            " duffy[sqlite]) for this command"
+        )
+
+    try:
+        database.init_sync_model()
+        counts = archive_retired(retired_for=retired_for, batch_size=batch_size)
+    except DuffyConfigurationError as exc:
+        log.error("Configuration key missing or wrong: %s", exc.args[0])
+        sys.exit(1)
+
+    click.echo(f"Archived {counts['sessions']} sessions and {counts['nodes']} nodes.")
+
+
 # Interactive development/debugging shell
 
 
@@ -689,10 +727,28 @@ def client(
 
 
 @client.command("list-sessions")
+@click.option(
+    "--include-retired/--no-include-retired",
+    default=False,
+    help="Whether to include retired sessions.",
+)
+@click.option(
+    "--stream/--no-stream",
+    default=False,
+    help="Whether to stream sessions and print them as they arrive, e.g. for long listings.",
+)
 @click.pass_obj
-def client_list_sessions(obj):
-    """Query active sessions for this tenant on the Duffy API."""
-    result = obj["client"].list_sessions()
+def client_list_sessions(obj, include_retired: bool, stream: bool):
+    """Query active (or all) sessions for this tenant on the Duffy API."""
+    if stream:
+        for formatted_session in obj["formatter"].format_stream(
+            "sessions", obj["client"].iter_sessions(include_retired=include_retired)
+        ):
+            # Only print newline if formatted_session isn't empty.
+            click.echo(formatted_session, nl=formatted_session)
+        return
+
+    result = obj["client"].list_sessions(include_retired=include_retired)
     formatted_result = obj["formatter"].format(result)
     # Only print newline if formatted_result isn't empty.
     click.echo(formatted_result, nl=formatted_result)
@@ -732,10 +788,15 @@ def client_retire_session(obj: dict, session_id: int):
 
 
 @client.command("list-pools")
+@click.option(
+    "--levels/--no-levels",
+    default=False,
+    help="Whether to include the current levels of all pools.",
+)
 @click.pass_obj
-def client_list_pools(obj: dict):
+def client_list_pools(obj: dict, levels: bool):
     """List configured Duffy node pools."""
-    result = obj["client"].list_pools()
+    result = obj["client"].list_pools(levels=levels)
     formatted_result = obj["formatter"].format(result)
     # Only print newline if formatted_result isn't empty.
     click.echo(formatted_result, nl=formatted_result)
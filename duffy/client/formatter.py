@@ -1,6 +1,6 @@
 import json
 import shlex
-from typing import Generator
+from typing import Generator, Iterable, Iterator
 
 import yaml
 
@@ -20,16 +20,38 @@ class DuffyFormatter:
     def format(self, result: JSONValue) -> str:
         raise NotImplementedError()
 
+    def format_item(self, field_name: str, item: JSONValue) -> str:
+        return self.format({field_name: [item]})
+
+    def format_stream(self, field_name: str, items: Iterable[JSONValue]) -> Iterator[str]:
+        """Format the items of a streamed collection one by one.
+
+        Errors yielded by the client are formatted like other results.
+        """
+        for item in items:
+            if "error" in item:
+                yield self.format(item)
+            else:
+                yield self.format_item(field_name, item)
+
 
 class DuffyJSONFormatter(DuffyFormatter, format="json"):
     def format(self, result: JSONValue) -> str:
         return json.dumps(result)
 
+    def format_item(self, field_name: str, item: JSONValue) -> str:
+        # Emit newline-delimited JSON, one item per line.
+        return json.dumps(item)
+
 
 class DuffyYAMLFormatter(DuffyFormatter, format="yaml"):
     def format(self, result: JSONValue) -> str:
         return yaml.dump(result)
 
+    def format_item(self, field_name: str, item: JSONValue) -> str:
+        # Items formatted like this concatenate to a YAML sequence.
+        return yaml.dump([item])
+
 
 class DuffyFlatFormatter(DuffyFormatter, format="flat"):
     field_name_to_flattener = {
@@ -63,6 +85,8 @@ class DuffyFlatFormatter(DuffyFormatter, format="flat"):
             "pool_name": pool["name"],
             "fill_level": pool.get("fill-level", pool.get("fill_level")),
         }
+        if "target-fill-level" in pool:
+            fields["target_fill_level"] = pool["target-fill-level"]
         if "levels" in pool:
             fields.update(
                 {
@@ -1,6 +1,8 @@
+import json
 from enum import Enum
 from http import HTTPStatus
-from typing import Any, Dict, List, Optional, Sequence, Union
+from http.cookiejar import CookieJar
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
 
 import httpx
 from pydantic import BaseModel, ConfigDict
@@ -34,6 +36,11 @@ class DuffyClient:
         auth_name: Optional[str] = None,
         auth_key: Optional[str] = None,
     ):
+        # Maps URLs to their last entity tags and results, for conditional requests.
+        self._etag_cache: Dict[str, Tuple[str, JSONValue]] = {}
+        # Cookies are kept across requests, e.g. so reads see changes made just before.
+        self._cookies = CookieJar()
+
         if url:
             self.url = url
         if auth_name:
@@ -66,7 +73,12 @@ class DuffyClient:
         self._auth_key = value
 
     def client(self):
-        return httpx.Client(auth=(self.auth_name, self.auth_key), base_url=self.url, timeout=None)
+        return httpx.Client(
+            auth=(self.auth_name, self.auth_key),
+            base_url=self.url,
+            cookies=self._cookies,
+            timeout=None,
+        )
 
     def _query_method(
         self,
@@ -76,32 +88,85 @@ class DuffyClient:
         in_dict: Optional[Dict[str, Any]] = None,
         in_model: Optional[BaseModel] = None,
         expected_status: Union[HTTPStatus, Sequence[HTTPStatus]] = HTTPStatus.OK,
+        params: Optional[Dict[str, Any]] = None,
+        conditional: bool = False,
     ) -> JSONValue:
+        """Query an API method.
+
+        With `conditional` set, results are cached and the server only
+        sends them again if they changed in the meantime.
+        """
         add_kwargs = {}
         if in_dict is not None:
             add_kwargs["json"] = in_model(**in_dict).model_dump()
+        if params:
+            add_kwargs["params"] = params
+
+        cached = self._etag_cache.get(url) if conditional else None
+        if cached:
+            add_kwargs["headers"] = {"If-None-Match": cached[0]}
 
         with self.client() as client:
             client_method = getattr(client, method.name)
             response = client_method(url=url, **add_kwargs)
 
+        if cached and response.status_code == HTTPStatus.NOT_MODIFIED:
+            return cached[1]
+
         if isinstance(expected_status, HTTPStatus):
             expected_status = (expected_status,)
 
         if response.status_code not in expected_status:
-            try:
-                return DuffyAPIErrorModel(error=response.json()).model_dump(by_alias=True)
-            except Exception as exc:
-                response.raise_for_status()
-                raise RuntimeError(f"Can't process response: {response}") from exc
-
-        return response.json()
+            return self._error_result(response)
+
+        result = response.json()
+
+        if conditional:
+            etag = response.headers.get("etag")
+            if etag:
+                self._etag_cache[url] = (etag, result)
+            else:
+                self._etag_cache.pop(url, None)
+
+        return result
+
+    @staticmethod
+    def _error_result(response: httpx.Response) -> JSONValue:
+        try:
+            return DuffyAPIErrorModel(error=response.json()).model_dump(by_alias=True)
+        except Exception as exc:
+            response.raise_for_status()
+            raise RuntimeError(f"Can't process response: {response}") from exc
+
+    def _stream_method(
+        self, url: str, *, params: Optional[Dict[str, Any]] = None
+    ) -> Iterator[JSONValue]:
+        """Stream the objects of a collection as they are received.
+
+        If the API returns an error, it is yielded as the only result.
+        """
+        with self.client() as client, client.stream(
+            "GET", url, params=params, headers={"Accept": "application/x-ndjson"}
+        ) as response:
+            if response.status_code != HTTPStatus.OK:
+                response.read()
+                yield self._error_result(response)
+                return
+
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+
+    def list_sessions(self, include_retired: bool = False) -> JSONValue:
+        return self._query_method(
+            _MethodEnum.get, "/sessions", params={"include_retired": include_retired}
+        )
 
-    def list_sessions(self) -> JSONValue:
-        return self._query_method(_MethodEnum.get, "/sessions")
+    def iter_sessions(self, include_retired: bool = False) -> Iterator[JSONValue]:
+        return self._stream_method("/sessions", params={"include_retired": include_retired})
 
     def show_session(self, session_id: int) -> JSONValue:
-        return self._query_method(_MethodEnum.get, f"/sessions/{session_id}")
+        return self._query_method(_MethodEnum.get, f"/sessions/{session_id}", conditional=True)
 
     def request_session(self, nodes_specs: List[Dict[str, str]]) -> JSONValue:
         return self._query_method(
@@ -120,8 +185,8 @@ class DuffyClient:
             in_model=SessionUpdateModel,
         )
 
-    def list_pools(self) -> JSONValue:
-        return self._query_method(_MethodEnum.get, "/pools")
+    def list_pools(self, levels: bool = False) -> JSONValue:
+        return self._query_method(_MethodEnum.get, "/pools", params={"levels": levels})
 
     def show_pool(self, pool_name: str) -> JSONValue:
-        return self._query_method(_MethodEnum.get, f"/pools/{pool_name}")
+        return self._query_method(_MethodEnum.get, f"/pools/{pool_name}", conditional=True)
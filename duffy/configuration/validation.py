@@ -1,3 +1,4 @@
+import datetime as dt
 import re
 from enum import Enum
 from pathlib import Path
@@ -13,6 +14,7 @@ from pydantic import (
     RedisDsn,
     UrlConstraints,
     field_validator,
+    model_validator,
 )
 from typing_extensions import Annotated
 
@@ -34,6 +36,16 @@ class MechanismType(str, Enum):
     ansible = "ansible"
 
 
+class Weekday(str, Enum):
+    mon = "mon"
+    tue = "tue"
+    wed = "wed"
+    thu = "thu"
+    fri = "fri"
+    sat = "sat"
+    sun = "sun"
+
+
 # Pydantic models
 
 
@@ -67,10 +79,28 @@ class SQLAlchemyModel(BaseModel):
     # create_engine()/create_async_engine(), i.e. can contain arbitrarily named fields.
     sync_url: Annotated[AnyUrl, UrlConstraints(host_required=False)]
     async_url: Annotated[AnyUrl, UrlConstraints(host_required=False)]
+    async_read_urls: Optional[List[Annotated[AnyUrl, UrlConstraints(host_required=False)]]] = None
+
+
+class DatabasePoolModel(ConfigBaseModel):
+    size: Optional[Annotated[int, Field(ge=0)]] = None
+    max_overflow: Optional[Annotated[int, Field(ge=-1)]] = Field(alias="max-overflow", default=None)
+    timeout: Optional[ConfigTimeDelta] = None
+    recycle: Optional[ConfigTimeDelta] = None
+    pre_ping: Optional[bool] = Field(alias="pre-ping", default=None)
+
+
+class ArchiveModel(ConfigBaseModel):
+    retired_for: ConfigTimeDelta = Field(alias="retired-for", default=dt.timedelta(days=30))
+    batch_size: Annotated[int, Field(ge=1)] = Field(alias="batch-size", default=1000)
 
 
 class DatabaseModel(ConfigBaseModel):
     sqlalchemy: SQLAlchemyModel
+    replica_max_lag: Optional[ConfigTimeDelta] = Field(alias="replica-max-lag", default=None)
+    pool: Optional[DatabasePoolModel] = None
+    pgbouncer: bool = False
+    archive: Optional[ArchiveModel] = None
 
 
 class RetriesModel(ConfigBaseModel):
@@ -113,13 +143,60 @@ class MechanismModel(ConfigBaseModel):
     ansible: Optional[AnsibleMechanismModel] = None
 
 
+class AutoscaleModel(ConfigBaseModel):
+    min_fill_level: Optional[Annotated[int, Field(ge=0)]] = Field(
+        alias="min-fill-level", default=None
+    )
+    max_fill_level: Optional[Annotated[int, Field(gt=0)]] = Field(
+        alias="max-fill-level", default=None
+    )
+    window: Optional[ConfigTimeDelta] = None
+    interval: Optional[ConfigTimeDelta] = None
+    smoothing: Optional[Annotated[float, Field(gt=0, le=1)]] = None
+    lead_time: Optional[ConfigTimeDelta] = Field(alias="lead-time", default=None)
+
+    @field_validator("window", "interval")
+    @classmethod
+    def check_positive(cls, v: Optional[dt.timedelta]):
+        if v is not None and v <= dt.timedelta(0):
+            raise ValueError("must be positive")
+        return v
+
+    @model_validator(mode="after")
+    def check_fill_level_bounds(self):
+        if (
+            self.min_fill_level is not None
+            and self.max_fill_level is not None
+            and self.min_fill_level > self.max_fill_level
+        ):
+            raise ValueError(
+                f"`min-fill-level` ({self.min_fill_level}) must not exceed"
+                + f" `max-fill-level` ({self.max_fill_level})"
+            )
+        return self
+
+
+class FillLevelProfileModel(ConfigBaseModel):
+    name: Optional[str] = None
+    weekdays: Optional[List[Weekday]] = None
+    start: Optional[dt.time] = None
+    end: Optional[dt.time] = None
+    fill_level: Annotated[int, Field(ge=0)] = Field(alias="fill-level")
+    pre_warm: Optional[ConfigTimeDelta] = Field(alias="pre-warm", default=None)
+
+
 class NodePoolsModel(ConfigBaseModel):
     extends: Optional[str] = None
     mechanism: Optional[MechanismModel] = None
     fill_level: Optional[Annotated[int, Field(gt=0)]] = Field(alias="fill-level", default=None)
+    autoscale: Optional[Union[AutoscaleModel, Literal[False]]] = None
+    fill_level_profiles: Optional[List[FillLevelProfileModel]] = Field(
+        alias="fill-level-profiles", default=None
+    )
     reuse_nodes: Optional[Union[Dict[str, Union[int, str]], Literal[False]]] = Field(
         alias="reuse-nodes", default=None
     )
+    reuse_priority: Optional[int] = Field(alias="reuse-priority", default=None)
     run_parallel: Optional[bool] = Field(alias="run-parallel", default=None)
     model_config = ConfigDict(extra="allow")
 
@@ -144,12 +221,30 @@ class ClientModel(ConfigBaseModel):
     auth: ClientAuthModel
 
 
+class PoolCacheModel(ConfigBaseModel):
+    ttl: ConfigTimeDelta
+
+
+class OutboxRelayModel(ConfigBaseModel):
+    interval: ConfigTimeDelta = dt.timedelta(seconds=5)
+    batch_size: Annotated[int, Field(ge=1)] = Field(alias="batch-size", default=100)
+
+    @field_validator("interval")
+    @classmethod
+    def check_positive(cls, v: dt.timedelta):
+        if v <= dt.timedelta(0):
+            raise ValueError("must be positive")
+        return v
+
+
 class AppModel(ConfigBaseModel):
     loglevel: Optional[LogLevel] = None
     host: Optional[str] = None
     port: Optional[Annotated[int, Field(gt=0, lt=65536)]] = None
     logging: Optional[LoggingModel] = None
     retries: Optional[RetriesModel] = None
+    pool_cache: Optional[PoolCacheModel] = Field(alias="pool-cache", default=None)
+    outbox_relay: Optional[OutboxRelayModel] = Field(alias="outbox-relay", default=None)
 
 
 class LegacyPoolMapModel(ConfigBaseModel):
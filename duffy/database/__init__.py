@@ -1,15 +1,18 @@
 import asyncio
+import threading
 from copy import deepcopy
+from itertools import count
+from typing import List, Optional, Sequence
 
-from sqlalchemy import MetaData, create_engine, event
+from sqlalchemy import MetaData, create_engine, text
 from sqlalchemy.engine import Engine
-from sqlalchemy.engine.interfaces import DBAPIConnection
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import Session as DBSession
 from sqlalchemy.orm import declarative_base, sessionmaker
-from sqlalchemy.pool import ConnectionPoolEntry
 
 from ..configuration import config
 from ..exceptions import DuffyConfigurationError
+from .connection_pool import engine_kwargs
 
 # use custom metadata to specify naming convention
 naming_convention = {
@@ -22,20 +25,67 @@ naming_convention = {
 metadata = MetaData(naming_convention=naming_convention)
 Base = declarative_base(metadata=metadata)
 
+
+class _SyncSessionMaker(sessionmaker):
+    """A session maker which can create its engine when it's first used.
+
+    See init_sync_model().
+    """
+
+    lazy = False
+
+    # Sessions can be first needed in several threads at once, but only one engine may be created.
+    _init_lock = threading.Lock()
+
+    def __call__(self, **local_kw):
+        if self.lazy and "bind" not in self.kw and "bind" not in local_kw:
+            with self._init_lock:
+                if "bind" not in self.kw:
+                    init_sync_model()
+        return super().__call__(**local_kw)
+
+
 async_session_maker = sessionmaker(class_=AsyncSession, expire_on_commit=False, future=True)
-sync_session_maker = sessionmaker(future=True, expire_on_commit=False)
+sync_session_maker = _SyncSessionMaker(future=True, expire_on_commit=False)
+
+# Engines of read replicas of the database, if configured. They're used in turn by requests which
+# only read, see next_async_read_engine().
+async_read_engines: List[AsyncEngine] = []
+_async_read_engine_counter = count()
+
 
+def init_sync_model(sync_engine: Engine = None, lazy: bool = False):
+    """Initialize the synchronous DB model.
 
-def init_sync_model(sync_engine: Engine = None):
+    Set `lazy` to create the engine only when a session is first
+    needed, e.g. in processes which mostly or only use asynchronous
+    sessions, so they don't keep a pool of connections around for
+    nothing.
+    """
     if not sync_engine:
+        if lazy:
+            sync_session_maker.lazy = True
+            return
         sync_engine = get_sync_engine()
     sync_session_maker.configure(bind=sync_engine)
 
 
-async def init_async_model(async_engine: AsyncEngine = None):
+async def init_async_model(
+    async_engine: AsyncEngine = None, read_engines: Optional[Sequence[AsyncEngine]] = None
+):
     if not async_engine:
         async_engine = get_async_engine()
+        if read_engines is None:
+            read_engines = get_async_read_engines()
     async_session_maker.configure(bind=async_engine)
+    async_read_engines[:] = read_engines or ()
+
+
+def next_async_read_engine() -> Optional[AsyncEngine]:
+    """Return the engine of the next read replica, if any are configured."""
+    if not async_read_engines:
+        return None
+    return async_read_engines[next(_async_read_engine_counter) % len(async_read_engines)]
 
 
 def init_model(sync_engine: Engine = None, async_engine: AsyncEngine = None):
@@ -49,23 +99,27 @@ _key_failed_to_config_key = {
     "async_url": "database.sqlalchemy.async_url",
 }
 
+_url_keys = ("sync_url", "async_url", "async_read_urls")
 
-def _pgsql_disable_seqscan(
-    dbapi_connection: DBAPIConnection, connection_record: ConnectionPoolEntry
-) -> None:
-    """Disables the query planner's use of sequential scan plan types.
 
-    As far as this is possible at least.
+def disable_seqscan(db_session: DBSession) -> None:
+    """Disables the query planner's use of sequential scan plan types for a transaction.
+
+    As far as this is possible at least, and only on PostgreSQL.
 
     Sequential scanning in queries can cause conflicts in concurrent transactions even if the
     respective rows accessed in the transactions are different, merely iterating over the rows “of
     the other transaction” can cause them to be locked.
 
     For this to work, it is necessary that the involved columns have an index, i.e. the planner has
-    a usable alternative to sequential scans."""
-    cursor = dbapi_connection.cursor()
-    cursor.execute("SET enable_seqscan=off")
-    cursor.close()
+    a usable alternative to sequential scans.
+
+    This only applies to the current transaction, use it where concurrent transactions allocate
+    nodes. Elsewhere, e.g. for listings or small tables, sequential scans are often the better plan.
+
+    For asynchronous sessions, use `await db_async_session.run_sync(disable_seqscan)`."""
+    if db_session.get_bind().dialect.name == "postgresql":
+        db_session.execute(text("SET LOCAL enable_seqscan = off"))
 
 
 def get_sync_engine():
@@ -77,12 +131,10 @@ def get_sync_engine():
         raise DuffyConfigurationError(
             _key_failed_to_config_key.get(key_not_found, key_not_found)
         ) from exc
-    sync_config.pop("async_url", None)
+    for key in _url_keys:
+        sync_config.pop(key, None)
     sync_config.setdefault("isolation_level", "SERIALIZABLE")
-    engine = create_engine(**sync_config)
-    if engine.name == "postgresql":
-        event.listen(engine, "connect", _pgsql_disable_seqscan)
-    return engine
+    return create_engine(**engine_kwargs(sync_config["url"], sync_config))
 
 
 def get_async_engine():
@@ -94,9 +146,23 @@ def get_async_engine():
         raise DuffyConfigurationError(
             _key_failed_to_config_key.get(key_not_found, key_not_found)
         ) from exc
-    async_config.pop("sync_url", None)
+    for key in _url_keys:
+        async_config.pop(key, None)
     async_config.setdefault("isolation_level", "SERIALIZABLE")
-    engine = create_async_engine(**async_config)
-    if engine.name == "postgresql":
-        event.listen(engine.sync_engine, "connect", _pgsql_disable_seqscan)
-    return engine
+    return create_async_engine(**engine_kwargs(async_config["url"], async_config))
+
+
+def get_async_read_engines() -> List[AsyncEngine]:
+    try:
+        read_config = deepcopy(config["database"]["sqlalchemy"]) or {}
+    except (AttributeError, KeyError) as exc:
+        key_not_found = exc.args[0]
+        raise DuffyConfigurationError(
+            _key_failed_to_config_key.get(key_not_found, key_not_found)
+        ) from exc
+    read_urls = read_config.get("async_read_urls") or []
+    for key in _url_keys:
+        read_config.pop(key, None)
+    # Replicas can't run SERIALIZABLE transactions, read-only sessions use a lower level anyway.
+    read_config.setdefault("isolation_level", "REPEATABLE READ")
+    return [create_async_engine(url=url, **engine_kwargs(url, read_config)) for url in read_urls]
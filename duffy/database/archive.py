@@ -0,0 +1,136 @@
+"""Move retired sessions and nodes out of the tables in daily use.
+
+Retired rows are kept for reference, but they bloat the indexes of the
+hot tables and the sets of rows their queries have to consider. Once
+sessions and nodes have been retired for a while, they're moved into
+archive tables, in batches which each are a transaction of their own,
+so that neither transactions nor locks get too big.
+"""
+
+import datetime as dt
+import logging
+from typing import Dict, Optional
+
+from sqlalchemy import delete, exists, insert, select
+from sqlalchemy.orm import Session as DBSession
+
+from ..configuration import config
+from ..configuration.validation import ArchiveModel
+from . import sync_session_maker
+from .model import ArchivedNode, ArchivedSession, ArchivedSessionNode, Node, Session, SessionNode
+from .types import NodeState
+
+log = logging.getLogger(__name__)
+
+
+def _copy_rows(db_sync_session: DBSession, model, archive_model, whereclause):
+    columns = model.__table__.columns
+    db_sync_session.execute(
+        insert(archive_model.__table__).from_select(
+            [column.name for column in columns], select(*columns).where(whereclause)
+        )
+    )
+
+
+def archive_sessions_batch(
+    db_sync_session: DBSession, retired_before: dt.datetime, batch_size: int
+) -> int:
+    """Archive a batch of sessions retired before a point in time.
+
+    This moves the sessions along with their session nodes and returns
+    how many sessions were archived.
+    """
+    session_ids = (
+        db_sync_session.execute(
+            select(Session.id)
+            .filter(Session.retired_at < retired_before)
+            .order_by(Session.id)
+            .limit(batch_size)
+        )
+        .scalars()
+        .all()
+    )
+
+    if session_ids:
+        _copy_rows(db_sync_session, Session, ArchivedSession, Session.id.in_(session_ids))
+        _copy_rows(
+            db_sync_session,
+            SessionNode,
+            ArchivedSessionNode,
+            SessionNode.session_id.in_(session_ids),
+        )
+        db_sync_session.execute(
+            delete(SessionNode.__table__).where(SessionNode.session_id.in_(session_ids))
+        )
+        db_sync_session.execute(delete(Session.__table__).where(Session.id.in_(session_ids)))
+
+    return len(session_ids)
+
+
+def archive_nodes_batch(
+    db_sync_session: DBSession, retired_before: dt.datetime, batch_size: int
+) -> int:
+    """Archive a batch of done nodes retired before a point in time.
+
+    Nodes which still belong to sessions which aren't archived stay
+    where they are. Returns how many nodes were archived.
+    """
+    node_ids = (
+        db_sync_session.execute(
+            select(Node.id)
+            .filter(
+                Node.retired_at < retired_before,
+                Node.state == NodeState.done,
+                ~exists().where(SessionNode.node_id == Node.id),
+            )
+            .order_by(Node.id)
+            .limit(batch_size)
+        )
+        .scalars()
+        .all()
+    )
+
+    if node_ids:
+        _copy_rows(db_sync_session, Node, ArchivedNode, Node.id.in_(node_ids))
+        db_sync_session.execute(delete(Node.__table__).where(Node.id.in_(node_ids)))
+
+    return len(node_ids)
+
+
+def archive_retired(
+    retired_for: Optional[dt.timedelta] = None, batch_size: Optional[int] = None
+) -> Dict[str, int]:
+    """Archive sessions and nodes which have been retired for a while.
+
+    Sessions are archived first, so the nodes which were used in them
+    can be archived in the same run. Unset arguments are taken from the
+    configuration.
+
+    :param retired_for: how long sessions and nodes have to be retired
+    :param batch_size: how many sessions or nodes to archive per
+        transaction
+    :return: how many sessions and nodes were archived
+    """
+    archive_config = ArchiveModel(**(config["database"].get("archive") or {}))
+    if retired_for is None:
+        retired_for = archive_config.retired_for
+    if batch_size is None:
+        batch_size = archive_config.batch_size
+
+    retired_before = dt.datetime.now(dt.timezone.utc) - retired_for
+
+    counts = {}
+    for name, archive_batch in (
+        ("sessions", archive_sessions_batch),
+        ("nodes", archive_nodes_batch),
+    ):
+        counts[name] = 0
+        while True:
+            with sync_session_maker() as db_sync_session, db_sync_session.begin():
+                archived = archive_batch(db_sync_session, retired_before, batch_size)
+            counts[name] += archived
+            log.debug("Archived batch of %d %s", archived, name)
+            if archived < batch_size:
+                break
+
+    return counts
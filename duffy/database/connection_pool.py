@@ -0,0 +1,122 @@
+"""Configure the connection pools of database engines and measure their use."""
+
+import time
+from functools import lru_cache
+from typing import Any, Dict, Optional, Union
+from uuid import uuid4
+
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import Pool, QueuePool
+
+from ..configuration import config
+from ..configuration.validation import DatabasePoolModel
+
+# Map pool settings in the configuration to arguments of create_engine()/create_async_engine().
+POOL_SETTINGS_KWARGS = {
+    "size": "pool_size",
+    "max_overflow": "max_overflow",
+    "timeout": "pool_timeout",
+    "recycle": "pool_recycle",
+    "pre_ping": "pool_pre_ping",
+}
+
+
+class CheckoutMetrics:
+    """How often connections were checked out of a pool, and how long that took."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, wait: float):
+        self.checkouts += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+
+
+class _CheckoutMetricsMixin:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_metrics = CheckoutMetrics()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.checkout_metrics.record(time.perf_counter() - start)
+
+
+@lru_cache(maxsize=None)
+def with_checkout_metrics(pool_class: type) -> type:
+    """Derive a pool class which records its checkout metrics."""
+    return type(pool_class.__name__, (_CheckoutMetricsMixin, pool_class), {})
+
+
+def _unique_prepared_statement_name() -> str:
+    return f"__asyncpg_{uuid4()}__"
+
+
+def engine_kwargs(url: str, engine_config: Dict[str, Any]) -> Dict[str, Any]:
+    """Add pool and PgBouncer settings to the arguments for creating an engine.
+
+    Pool settings only apply to engines using queue pools, which is the
+    default except for SQLite in-memory databases. Settings passed
+    explicitly to SQLAlchemy take precedence.
+
+    In PgBouncer mode, i.e. behind a pooler in transaction pooling mode,
+    consecutive transactions can use different server connections, so
+    statements can't be prepared once per connection and reused.
+    """
+    db_config = config["database"]
+    engine_config = dict(engine_config)
+    sa_url = make_url(url)
+
+    pool_class = engine_config.get("poolclass") or sa_url.get_dialect().get_pool_class(sa_url)
+    if issubclass(pool_class, QueuePool):
+        pool_settings = DatabasePoolModel(**(db_config.get("pool") or {}))
+        for setting, kwarg in POOL_SETTINGS_KWARGS.items():
+            value = getattr(pool_settings, setting)
+            if value is not None:
+                if setting in ("timeout", "recycle"):
+                    value = value.total_seconds()
+                engine_config.setdefault(kwarg, value)
+        engine_config["poolclass"] = with_checkout_metrics(pool_class)
+
+    if db_config.get("pgbouncer"):
+        connect_args = engine_config["connect_args"] = dict(engine_config.get("connect_args") or {})
+        driver = sa_url.get_driver_name()
+        if driver == "asyncpg":
+            # Disable the statement caches of asyncpg and SQLAlchemy, and name statements which are
+            # prepared nevertheless uniquely.
+            connect_args.setdefault("statement_cache_size", 0)
+            connect_args.setdefault("prepared_statement_cache_size", 0)
+            connect_args.setdefault("prepared_statement_name_func", _unique_prepared_statement_name)
+        elif driver == "psycopg":
+            # Don't prepare frequently executed statements.
+            connect_args.setdefault("prepare_threshold", None)
+
+    return engine_config
+
+
+def pool_metrics(engine: Union[Engine, AsyncEngine]) -> Optional[Dict[str, Any]]:
+    """Return the current state and checkout metrics of the pool of an engine.
+
+    This only works for pools with checkout metrics.
+    """
+    pool: Pool = engine.pool
+    checkout_metrics = getattr(pool, "checkout_metrics", None)
+    if not checkout_metrics:
+        return None
+
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "checkouts": checkout_metrics.checkouts,
+        "checkout_wait_total": checkout_metrics.wait_total,
+        "checkout_wait_max": checkout_metrics.wait_max,
+    }
@@ -0,0 +1,61 @@
+"""Store Node.data as JSONB, index data of reusable nodes
+
+Revision ID: 3f9a1c7d2b4e
+Revises: 6654d536b836
+Create Date: 2026-10-19 11:20:31.418207
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "3f9a1c7d2b4e"
+down_revision = "6654d536b836"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    op.alter_column("nodes", "data", server_default=None)
+    op.alter_column(
+        "nodes",
+        "data",
+        type_=postgresql.JSONB(),
+        existing_nullable=False,
+        postgresql_using="data::jsonb",
+    )
+    op.alter_column("nodes", "data", server_default="{}")
+
+    # Don't lock the table against writes while building the index.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "reusable_nodes_data_index",
+            "nodes",
+            ["data"],
+            unique=False,
+            postgresql_using="gin",
+            postgresql_ops={"data": "jsonb_path_ops"},
+            postgresql_where=sa.text("pool IS NULL AND reusable = true AND state = 'unused'"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    with op.get_context().autocommit_block():
+        op.drop_index("reusable_nodes_data_index", table_name="nodes", postgresql_concurrently=True)
+
+    op.alter_column("nodes", "data", server_default=None)
+    op.alter_column(
+        "nodes",
+        "data",
+        type_=sa.JSON(),
+        existing_nullable=False,
+        postgresql_using="data::json",
+    )
+    op.alter_column("nodes", "data", server_default="{}")
@@ -0,0 +1,26 @@
+"""Add version counters to tenants, sessions and nodes
+
+Revision ID: 5b8e3d1a9c27
+Revises: a41e6c0f95d2
+Create Date: 2026-10-19 13:40:12.418205
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5b8e3d1a9c27"
+down_revision = "a41e6c0f95d2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table_name in ("tenants", "sessions", "nodes"):
+        op.add_column(
+            table_name, sa.Column("version", sa.Integer(), server_default="1", nullable=False)
+        )
+
+
+def downgrade():
+    for table_name in ("nodes", "sessions", "tenants"):
+        op.drop_column(table_name, "version")
@@ -0,0 +1,36 @@
+"""Add outbox table for Celery tasks
+
+Revision ID: 5e1c8b7f3a20
+Revises: 9d4f2a6c1e85
+Create Date: 2026-10-19 18:12:44.620385
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5e1c8b7f3a20"
+down_revision = "9d4f2a6c1e85"
+branch_labels = None
+depends_on = None
+
+
+def _utcnow():
+    # Mirrors duffy.database.util.utcnow
+    if op.get_bind().dialect.name == "postgresql":
+        return sa.text("(NOW() AT TIME ZONE 'utc')")
+    return sa.text("CURRENT_TIMESTAMP")
+
+
+def upgrade():
+    op.create_table(
+        "outbox",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("task", sa.Text(), nullable=False),
+        sa.Column("kwargs", sa.JSON(), server_default="{}", nullable=False),
+        sa.Column("created_at", sa.DateTime(), server_default=_utcnow(), nullable=False),
+        sa.PrimaryKeyConstraint("id", name=op.f("outbox_pkey")),
+    )
+
+
+def downgrade():
+    op.drop_table("outbox")
@@ -0,0 +1,68 @@
+"""Compact session node data to the nodes specs
+
+Revision ID: 9d4f2a6c1e85
+Revises: e3b1d5a07f48
+Create Date: 2026-10-19 17:38:05.271946
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9d4f2a6c1e85"
+down_revision = "e3b1d5a07f48"
+branch_labels = None
+depends_on = None
+
+# Rows of this many sessions are updated per statement. Each statement is committed on its own, so
+# row locks, dead rows and WAL don't pile up for the whole table until the migration is done.
+BATCH_SIZE = 1000
+
+COMPACTED_DATA = {
+    "postgresql": (
+        "CASE WHEN data -> 'nodes_spec' IS NOT NULL"
+        + " THEN json_build_object('nodes_spec', data -> 'nodes_spec')"
+        + " ELSE '{}'::json END"
+    ),
+    "sqlite": (
+        "CASE WHEN json_type(data, '$.nodes_spec') IS NOT NULL"
+        + " THEN json_object('nodes_spec', json_extract(data, '$.nodes_spec'))"
+        + " ELSE '{}' END"
+    ),
+}
+
+EXPANDED_DATA = {
+    "postgresql": (
+        "(SELECT (nodes.data::jsonb || sessions_nodes.data::jsonb)::json"
+        + " FROM nodes WHERE nodes.id = sessions_nodes.node_id)"
+    ),
+    "sqlite": (
+        "(SELECT json_patch(nodes.data, sessions_nodes.data)"
+        + " FROM nodes WHERE nodes.id = sessions_nodes.node_id)"
+    ),
+}
+
+
+def _update_data_in_batches(data_expression: str):
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        min_session_id, max_session_id = connection.execute(
+            sa.text("SELECT MIN(session_id), MAX(session_id) FROM sessions_nodes")
+        ).one()
+        if min_session_id is None:
+            return
+
+        statement = sa.text(
+            f"UPDATE sessions_nodes SET data = {data_expression}"
+            + " WHERE session_id >= :lower AND session_id < :upper"
+        )
+        for lower in range(min_session_id, max_session_id + 1, BATCH_SIZE):
+            connection.execute(statement, {"lower": lower, "upper": lower + BATCH_SIZE})
+
+
+def upgrade():
+    _update_data_in_batches(COMPACTED_DATA[op.get_bind().dialect.name])
+
+
+def downgrade():
+    # The data of nodes could have changed since they were allocated, this restores it as of now.
+    _update_data_in_batches(EXPANDED_DATA[op.get_bind().dialect.name])
@@ -0,0 +1,33 @@
+"""Add index on pool and state of active nodes
+
+Revision ID: a41e6c0f95d2
+Revises: 3f9a1c7d2b4e
+Create Date: 2026-10-19 11:52:07.305114
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "a41e6c0f95d2"
+down_revision = "3f9a1c7d2b4e"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Don't lock the table against writes while building the index.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "active_pool_state_index",
+            "nodes",
+            ["pool", "state"],
+            unique=False,
+            sqlite_where=sa.text("retired_at IS NULL"),
+            postgresql_where=sa.text("retired_at IS NULL"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index("active_pool_state_index", table_name="nodes", postgresql_concurrently=True)
@@ -0,0 +1,53 @@
+"""Add maintained pool level counters
+
+Revision ID: c7e2f04b1d93
+Revises: 5b8e3d1a9c27
+Create Date: 2026-10-19 14:52:31.604117
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "c7e2f04b1d93"
+down_revision = "5b8e3d1a9c27"
+branch_labels = None
+depends_on = None
+
+NODE_STATES = (
+    "unused",
+    "provisioning",
+    "ready",
+    "contextualizing",
+    "deployed",
+    "deprovisioning",
+    "done",
+    "failed",
+)
+
+
+def upgrade():
+    op.create_table(
+        "pool_levels",
+        sa.Column("pool", sa.UnicodeText(), nullable=False),
+        sa.Column(
+            "state",
+            sa.Enum(*NODE_STATES, name="node_state_enum").with_variant(
+                postgresql.ENUM(*NODE_STATES, name="node_state_enum", create_type=False),
+                "postgresql",
+            ),
+            nullable=False,
+        ),
+        sa.Column("quantity", sa.Integer(), server_default="0", nullable=False),
+        sa.PrimaryKeyConstraint("pool", "state", name=op.f("pool_levels_pkey")),
+    )
+    op.execute(
+        "INSERT INTO pool_levels (pool, state, quantity)"
+        + " SELECT pool, state, COUNT(id) FROM nodes"
+        + " WHERE retired_at IS NULL AND pool IS NOT NULL"
+        + " GROUP BY pool, state"
+    )
+
+
+def downgrade():
+    op.drop_table("pool_levels")
@@ -0,0 +1,111 @@
+"""Add archive tables for retired sessions and nodes
+
+Revision ID: e3b1d5a07f48
+Revises: c7e2f04b1d93
+Create Date: 2026-10-19 16:21:47.093518
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "e3b1d5a07f48"
+down_revision = "c7e2f04b1d93"
+branch_labels = None
+depends_on = None
+
+NODE_STATES = (
+    "unused",
+    "provisioning",
+    "ready",
+    "contextualizing",
+    "deployed",
+    "deprovisioning",
+    "done",
+    "failed",
+)
+
+
+def _utcnow():
+    # Mirrors duffy.database.util.utcnow
+    if op.get_bind().dialect.name == "postgresql":
+        return sa.text("(NOW() AT TIME ZONE 'utc')")
+    return sa.text("CURRENT_TIMESTAMP")
+
+
+def upgrade():
+    utcnow = _utcnow()
+
+    op.create_table(
+        "sessions_archive",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("tenant_id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("retired_at", sa.DateTime(), nullable=True),
+        sa.Column("expires_at", sa.DateTime(), nullable=True),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("data", sa.JSON(), nullable=False),
+        sa.Column("archived_at", sa.DateTime(), server_default=utcnow, nullable=False),
+        sa.PrimaryKeyConstraint("id", name=op.f("sessions_archive_pkey")),
+    )
+    op.create_index(
+        op.f("sessions_archive_tenant_id_index"), "sessions_archive", ["tenant_id"], unique=False
+    )
+
+    op.create_table(
+        "sessions_nodes_archive",
+        sa.Column("session_id", sa.Integer(), nullable=False),
+        sa.Column("node_id", sa.Integer(), nullable=False),
+        sa.Column("pool", sa.UnicodeText(), nullable=False),
+        sa.Column("data", sa.JSON(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["session_id"],
+            ["sessions_archive.id"],
+            name=op.f("sessions_nodes_archive_session_id_sessions_archive_fkey"),
+        ),
+        sa.PrimaryKeyConstraint("session_id", "node_id", name=op.f("sessions_nodes_archive_pkey")),
+    )
+    op.create_index(
+        op.f("sessions_nodes_archive_node_id_index"),
+        "sessions_nodes_archive",
+        ["node_id"],
+        unique=False,
+    )
+
+    op.create_table(
+        "nodes_archive",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("hostname", sa.Text(), nullable=True),
+        sa.Column("ipaddr", sa.Text(), nullable=True),
+        sa.Column(
+            "state",
+            sa.Enum(*NODE_STATES, name="node_state_enum").with_variant(
+                postgresql.ENUM(*NODE_STATES, name="node_state_enum", create_type=False),
+                "postgresql",
+            ),
+            nullable=False,
+        ),
+        sa.Column("comment", sa.UnicodeText(), nullable=True),
+        sa.Column("pool", sa.UnicodeText(), nullable=True),
+        sa.Column("reusable", sa.Boolean(), nullable=False),
+        sa.Column("data", sa.JSON().with_variant(postgresql.JSONB(), "postgresql"), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("retired_at", sa.DateTime(), nullable=True),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("archived_at", sa.DateTime(), server_default=utcnow, nullable=False),
+        sa.PrimaryKeyConstraint("id", name=op.f("nodes_archive_pkey")),
+    )
+    op.create_index(
+        op.f("nodes_archive_hostname_index"), "nodes_archive", ["hostname"], unique=False
+    )
+    op.create_index(op.f("nodes_archive_pool_index"), "nodes_archive", ["pool"], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f("nodes_archive_pool_index"), table_name="nodes_archive")
+    op.drop_index(op.f("nodes_archive_hostname_index"), table_name="nodes_archive")
+    op.drop_table("nodes_archive")
+    op.drop_index(op.f("sessions_nodes_archive_node_id_index"), table_name="sessions_nodes_archive")
+    op.drop_table("sessions_nodes_archive")
+    op.drop_index(op.f("sessions_archive_tenant_id_index"), table_name="sessions_archive")
+    op.drop_table("sessions_archive")
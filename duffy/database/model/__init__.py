@@ -1,3 +1,6 @@
+from .archive import ArchivedNode, ArchivedSession, ArchivedSessionNode  # noqa: F401
 from .node import Node, SessionNode  # noqa: F401
+from .outbox import OutboxMessage  # noqa: F401
+from .pool_level import PoolLevel  # noqa: F401
 from .session import Session  # noqa: F401
 from .tenant import Tenant  # noqa: F401
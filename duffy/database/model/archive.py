@@ -0,0 +1,56 @@
+from typing import List
+
+from sqlalchemy import JSON, Boolean, Column, ForeignKey, Integer, Text, UnicodeText
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import relationship
+
+from .. import Base
+from ..types import NodeState
+from ..util import TZDateTime, utcnow
+
+# Retired sessions and nodes are moved into these tables after a while, see duffy.database.archive.
+# Their columns mirror the original tables, without constraints on the rows which stay behind.
+
+
+class ArchivedSession(Base):
+    __tablename__ = "sessions_archive"
+    id = Column(Integer, primary_key=True, autoincrement=False, nullable=False)
+    tenant_id = Column(Integer, nullable=False, index=True)
+    created_at = Column(TZDateTime, nullable=False)
+    retired_at = Column(TZDateTime, nullable=True)
+    expires_at = Column(TZDateTime, nullable=True)
+    version = Column(Integer, nullable=False)
+    data = Column(JSON, nullable=False)
+    archived_at = Column(TZDateTime, nullable=False, server_default=utcnow())
+
+    session_nodes = relationship("ArchivedSessionNode", back_populates="session")
+
+    @property
+    def nodes(self) -> List["ArchivedSessionNode"]:
+        return self.session_nodes
+
+
+class ArchivedSessionNode(Base):
+    __tablename__ = "sessions_nodes_archive"
+    session_id = Column(Integer, ForeignKey(ArchivedSession.id), primary_key=True, nullable=False)
+    session = relationship(ArchivedSession, back_populates="session_nodes")
+    # The node can still be in the nodes table, or be archived itself.
+    node_id = Column(Integer, primary_key=True, nullable=False, index=True)
+    pool = Column(UnicodeText, nullable=False)
+    data = Column(JSON, nullable=False)
+
+
+class ArchivedNode(Base):
+    __tablename__ = "nodes_archive"
+    id = Column(Integer, primary_key=True, autoincrement=False, nullable=False)
+    hostname = Column(Text, nullable=True, index=True)
+    ipaddr = Column(Text, nullable=True)
+    state = Column(NodeState.db_type(), nullable=False)
+    comment = Column(UnicodeText, nullable=True)
+    pool = Column(UnicodeText, nullable=True, index=True)
+    reusable = Column(Boolean, nullable=False)
+    data = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=False)
+    created_at = Column(TZDateTime, nullable=False)
+    retired_at = Column(TZDateTime, nullable=True)
+    version = Column(Integer, nullable=False)
+    archived_at = Column(TZDateTime, nullable=False, server_default=utcnow())
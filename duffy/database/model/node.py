@@ -1,13 +1,30 @@
 import datetime as dt
-
-from sqlalchemy import JSON, Boolean, Column, ForeignKey, Index, Integer, Text, UnicodeText, and_
+from typing import Any, Collection, Dict, Mapping, Optional, Union
+
+from sqlalchemy import (
+    JSON,
+    Boolean,
+    Column,
+    ForeignKey,
+    Index,
+    Integer,
+    Text,
+    UnicodeText,
+    and_,
+    cast,
+    func,
+    literal,
+    type_coerce,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from sqlalchemy.ext.mutable import MutableDict
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql import ColumnElement
 
 from ...api_models import SessionNodeModel
 from .. import Base
 from ..types import NodeState
-from ..util import CreatableMixin, RetirableMixin
+from ..util import CreatableMixin, RetirableMixin, VersionedMixin
 from .session import Session
 
 INDEX_UNIQUENESS_CLAUSE = and_(
@@ -16,8 +33,18 @@ INDEX_UNIQUENESS_CLAUSE = and_(
     Column("state") != "failed",
 )
 
+REUSABLE_CANDIDATE_CLAUSE = and_(
+    Column("pool") == None,  # noqa: E711
+    Column("reusable") == True,  # noqa: E712
+    Column("state") == "unused",
+)
+
+
+def _sqlite_json_path(key: str) -> str:
+    return f'$."{key}"'
 
-class Node(Base, CreatableMixin, RetirableMixin):
+
+class Node(Base, CreatableMixin, RetirableMixin, VersionedMixin):
     __tablename__ = "nodes"
     __table_args__ = (
         Index(
@@ -34,6 +61,24 @@ class Node(Base, CreatableMixin, RetirableMixin):
             sqlite_where=INDEX_UNIQUENESS_CLAUSE,
             postgresql_where=INDEX_UNIQUENESS_CLAUSE,
         ),
+        # Serves the hot queries for nodes by pool and state, e.g. reserving nodes for sessions or
+        # determining fill levels of pools.
+        Index(
+            "active_pool_state_index",
+            "pool",
+            "state",
+            sqlite_where=Column("retired_at") == None,  # noqa: E711
+            postgresql_where=Column("retired_at") == None,  # noqa: E711
+        ),
+        # Lets PostgreSQL look up unused reusable nodes by the contents of their data, see
+        # Node.data_matches().
+        Index(
+            "reusable_nodes_data_index",
+            "data",
+            postgresql_using="gin",
+            postgresql_ops={"data": "jsonb_path_ops"},
+            postgresql_where=REUSABLE_CANDIDATE_CLAUSE,
+        ).ddl_if(dialect="postgresql"),
     )
 
     id = Column(Integer, primary_key=True, nullable=False)
@@ -54,13 +99,80 @@ class Node(Base, CreatableMixin, RetirableMixin):
 
     # Careful, MutableDict only detects changes to the top level of dict key-values!
     data = Column(
-        MutableDict.as_mutable(JSON), nullable=False, default=lambda: {}, server_default="{}"
+        MutableDict.as_mutable(JSON().with_variant(JSONB(), "postgresql")),
+        nullable=False,
+        default=lambda: {},
+        server_default="{}",
     )
 
+    @classmethod
+    def data_matches(
+        cls, spec: Dict[str, Union[int, str]], dialect_name: str = "postgresql"
+    ) -> ColumnElement:
+        """Build a clause matching nodes whose data contains all items of `spec`.
+
+        On PostgreSQL, this is a JSONB containment check which can use
+        the GIN index on the data of reusable nodes. Other databases have
+        to compare individual items.
+        """
+        if dialect_name == "postgresql":
+            return type_coerce(cls.data, JSONB).contains(spec)
+
+        clauses = []
+        for key, value in spec.items():
+            json_item = cls.data[key]
+            if isinstance(value, str):
+                clauses.append(json_item.as_string() == value)
+            else:
+                clauses.append(json_item.as_integer() == value)
+        return and_(*clauses)
+
+    @classmethod
+    def data_patched(
+        cls,
+        set_items: Optional[Mapping[str, Any]] = None,
+        remove_keys: Collection[str] = (),
+        dialect_name: str = "postgresql",
+    ) -> ColumnElement:
+        """Build an expression for the data of nodes with top-level keys changed.
+
+        Keys in `remove_keys` are removed first, then items in
+        `set_items` are set. Using this as the value of `data` in an
+        UPDATE statement lets the database change only these keys, rather
+        than the whole document being read and written back.
+        """
+        if dialect_name == "postgresql":
+            data = type_coerce(cls.data, JSONB)
+            if remove_keys:
+                data = data.op("-", return_type=JSONB)(
+                    cast(literal(list(remove_keys), ARRAY(Text)), ARRAY(Text))
+                )
+            for key, value in (set_items or {}).items():
+                data = func.jsonb_set(
+                    data,
+                    cast(literal([key], ARRAY(Text)), ARRAY(Text)),
+                    cast(literal(value, JSONB), JSONB),
+                    True,
+                    type_=JSONB,
+                )
+            return data
+
+        data = cls.data
+        if remove_keys:
+            data = func.json_remove(data, *(_sqlite_json_path(key) for key in remove_keys))
+        for key, value in (set_items or {}).items():
+            data = func.json_set(data, _sqlite_json_path(key), func.json(literal(value, JSON)))
+        return data
+
+    @staticmethod
+    def error_data(detail: str) -> Dict[str, str]:
+        """Describe why a node failed, to be stored as `error` in its data."""
+        return {"failed_at": dt.datetime.utcnow().isoformat(), "detail": detail}
+
     def fail(self, detail: str):
         """Set the state of a node to failed with details"""
         self.state = NodeState.failed
-        self.data["error"] = {"failed_at": dt.datetime.utcnow().isoformat(), "detail": detail}
+        self.data["error"] = self.error_data(detail)
 
 
 class SessionNode(Base):
@@ -74,23 +186,29 @@ class SessionNode(Base):
 
     pool = Column(UnicodeText, nullable=False, index=True)
 
+    # Only data specific to the allocation of the node for the session, i.e. its `nodes_spec`,
+    # everything else is in the data of the node itself.
     # Careful, MutableDict only detects changes to the top level of dict key-values!
     data = Column(
         MutableDict.as_mutable(JSON), nullable=False, default=lambda: {}, server_default="{}"
     )
 
-    @property
-    def pydantic_view(self) -> SessionNodeModel:
+    def view_attrs(self, fields: Optional[Collection[str]] = None) -> Dict[str, Any]:
+        """Combine the attributes of the node as seen in the session.
+
+        Only attributes listed in `fields` are accessed, if it's set.
+        """
         args = {
-            "id": self.node.id,
-            "hostname": self.node.hostname,
-            "ipaddr": self.node.ipaddr,
-            "pool": self.node.pool,
-            "reusable": self.node.reusable,
-            "data": self.node.data,
+            name: getattr(self.node, name)
+            for name in ("id", "hostname", "ipaddr", "pool", "reusable", "data")
+            if fields is None or name in fields
         }
 
-        if self.session.active:
+        if self.session.active and (fields is None or "state" in fields):
             args["state"] = self.node.state
 
-        return SessionNodeModel(**args)
+        return args
+
+    @property
+    def pydantic_view(self) -> SessionNodeModel:
+        return SessionNodeModel(**self.view_attrs())
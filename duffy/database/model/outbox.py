@@ -0,0 +1,19 @@
+from sqlalchemy import JSON, Column, Integer, Text
+
+from .. import Base
+from ..util import CreatableMixin
+
+
+class OutboxMessage(Base, CreatableMixin):
+    """A Celery task to be sent once the transaction adding it is committed.
+
+    Messages are added in the same transaction as the changes which
+    warrant the task, so neither are tasks lost if a change is
+    committed, nor sent if it's rolled back. They're relayed to Celery
+    and removed in the background, see duffy.tasks.outbox.
+    """
+
+    __tablename__ = "outbox"
+    id = Column(Integer, primary_key=True, nullable=False)
+    task = Column(Text, nullable=False)
+    kwargs = Column(JSON, nullable=False, default=lambda: {}, server_default="{}")
@@ -0,0 +1,186 @@
+import logging
+from collections import Counter
+from typing import Any, Mapping, Optional, Tuple
+
+from sqlalchemy import Column, Integer, UnicodeText, event
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session as DBSession
+from sqlalchemy.orm import SessionTransaction
+from sqlalchemy.orm.attributes import PASSIVE_NO_INITIALIZE, get_history
+
+from .. import Base
+from ..types import NodeState
+from .node import Node
+
+log = logging.getLogger(__name__)
+
+DIALECT_INSERT = {"postgresql": postgresql_insert, "sqlite": sqlite_insert}
+
+# Counters are adjusted once changes of nodes are committed, in short transactions of their own.
+# This way, transactions changing nodes of the same pool don't conflict on the rows of its counters.
+ADJUST_EXECUTION_OPTIONS = {"postgresql": {"isolation_level": "READ COMMITTED"}}
+
+_DELTAS_KEY = "duffy_pool_level_deltas"
+_COMMITTED_DELTAS_KEY = "duffy_committed_pool_level_deltas"
+
+
+class PoolLevel(Base):
+    """The number of active nodes in a pool which are in a specific state.
+
+    These counters are maintained along with changes to nodes made
+    through the ORM, and adjusted once these are committed. This makes
+    them cheap to read, but they can lag behind or drift, so they're only
+    used to report levels, e.g. in the API or in events. Allocating nodes
+    and filling pools count nodes instead.
+
+    Anything bypassing the ORM, e.g. bulk UPDATE statements, has to
+    record its changes with record_pool_level_deltas(). Counters which
+    drifted anyway are set straight by reconciling them with the nodes
+    table, see the reconcile_pool_levels() task.
+    """
+
+    __tablename__ = "pool_levels"
+    pool = Column(UnicodeText, primary_key=True, nullable=False)
+    state = Column(NodeState.db_type(), primary_key=True, nullable=False)
+    quantity = Column(Integer, nullable=False, default=0, server_default="0")
+
+
+# Level keys are (pool, state) tuples, or None if a node doesn't count towards any level.
+LevelKey = Optional[Tuple[str, NodeState]]
+
+
+def _level_key(pool: Optional[str], state: Any, retired_at: Any) -> LevelKey:
+    if not pool or retired_at is not None:
+        return None
+    return pool, NodeState(state)
+
+
+def _old_and_new_value(node: Node, key: str) -> Tuple[Any, Any]:
+    # Use get_history() rather than inspect(obj).attrs[key].history, see duffy.tasks.events.
+    history = get_history(node, key, passive=PASSIVE_NO_INITIALIZE)
+    if history.empty():
+        # The attribute isn't loaded, so it can't have been changed.
+        value = getattr(node, key)
+        return value, value
+    # If an attribute was set without its previous value being loaded, the latter is unknown. Such
+    # counters are corrected when reconciling them.
+    (old_value,) = history.deleted or history.unchanged or (None,)
+    (new_value,) = history.added or history.unchanged or (None,)
+    return old_value, new_value
+
+
+@event.listens_for(DBSession, "after_flush")
+def _update_pool_levels(db_session: DBSession, flush_context):
+    deltas = Counter()
+
+    for node in db_session.new:
+        if isinstance(node, Node):
+            values = node.__dict__
+            key = _level_key(
+                values.get("pool"),
+                values.get("state", NodeState.unused),
+                values.get("retired_at"),
+            )
+            if key:
+                deltas[key] += 1
+
+    for node in db_session.dirty:
+        if isinstance(node, Node):
+            (old_pool, new_pool), (old_state, new_state), (old_retired_at, new_retired_at) = (
+                _old_and_new_value(node, key) for key in ("pool", "state", "retired_at")
+            )
+            old_key = _level_key(old_pool, old_state, old_retired_at)
+            new_key = _level_key(new_pool, new_state, new_retired_at)
+            if old_key != new_key:
+                if old_key:
+                    deltas[old_key] -= 1
+                if new_key:
+                    deltas[new_key] += 1
+
+    for node in db_session.deleted:
+        if isinstance(node, Node):
+            key = _level_key(node.pool, node.state, node.retired_at)
+            if key:
+                deltas[key] -= 1
+
+    if deltas:
+        record_pool_level_deltas(db_session, deltas)
+
+
+def record_pool_level_deltas(db_session: DBSession, deltas: Mapping[Tuple[str, NodeState], int]):
+    """Record changes of pool levels in a transaction.
+
+    This is done implicitly for changes of nodes through the ORM, things
+    bypassing it have to use this to keep the counters right. The
+    counters are adjusted once the transaction is committed, and not at
+    all if it's rolled back.
+    """
+    db_session.info.setdefault(_DELTAS_KEY, Counter()).update(deltas)
+
+
+@event.listens_for(DBSession, "after_commit")
+def _commit_pool_level_deltas(db_session: DBSession):
+    deltas = db_session.info.pop(_DELTAS_KEY, None)
+    if deltas:
+        db_session.info[_COMMITTED_DELTAS_KEY] = deltas
+
+
+# Adjust counters only once the transaction has ended, i.e. its connection is released. This runs
+# before other listeners, so events about pools published then see the adjusted counters.
+@event.listens_for(DBSession, "after_transaction_end", insert=True)
+def _apply_committed_pool_level_deltas(db_session: DBSession, transaction: SessionTransaction):
+    if transaction.parent is None:
+        deltas = db_session.info.pop(_COMMITTED_DELTAS_KEY, None)
+        if deltas:
+            apply_pool_level_deltas(db_session.get_bind(), deltas)
+
+
+@event.listens_for(DBSession, "after_rollback")
+def _discard_pool_level_deltas(db_session: DBSession):
+    db_session.info.pop(_DELTAS_KEY, None)
+
+
+def apply_pool_level_deltas(engine: Engine, deltas: Mapping[Tuple[str, NodeState], int]):
+    """Adjust the counters of pool levels in a transaction of its own.
+
+    If this fails, it's logged and the counters are off until the
+    reconcile_pool_levels() task sets them straight.
+    """
+    try:
+        with engine.connect() as connection:
+            execution_options = ADJUST_EXECUTION_OPTIONS.get(connection.dialect.name)
+            if execution_options:
+                connection.execution_options(**execution_options)
+            with connection.begin():
+                adjust_pool_levels(connection, deltas)
+    except SQLAlchemyError as exc:
+        log.warning("Couldn't adjust the levels of %d pool(s): %s", len(deltas), exc)
+
+
+def adjust_pool_levels(connection: Connection, deltas: Mapping[Tuple[str, NodeState], int]):
+    """Add to or subtract from the counters of pool levels.
+
+    The counters are updated in place, so concurrent transactions which
+    adjust the counters of the same pool and state wait for each other
+    on their rows. This is why it's done in short transactions after
+    changes of nodes are committed, see apply_pool_level_deltas().
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    insert = DIALECT_INSERT[connection.dialect.name]
+    # Update counters in a consistent order so concurrent transactions don't deadlock.
+    for (pool, state), delta in sorted(
+        deltas.items(), key=lambda item: (item[0][0], item[0][1].value)
+    ):
+        statement = insert(PoolLevel).values(pool=pool, state=state, quantity=delta)
+        connection.execute(
+            statement.on_conflict_do_update(
+                index_elements=[PoolLevel.pool, PoolLevel.state],
+                set_={"quantity": PoolLevel.quantity + statement.excluded.quantity},
+            )
+        )
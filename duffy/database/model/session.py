@@ -6,11 +6,11 @@ from sqlalchemy.orm import relationship
 
 from ...api_models import SessionNodeModel
 from .. import Base
-from ..util import CreatableMixin, RetirableMixin, TZDateTime
+from ..util import CreatableMixin, RetirableMixin, TZDateTime, VersionedMixin
 from .tenant import Tenant
 
 
-class Session(Base, CreatableMixin, RetirableMixin):
+class Session(Base, CreatableMixin, RetirableMixin, VersionedMixin):
     __tablename__ = "sessions"
     __mapper_args__ = {"eager_defaults": True}
     id = Column(Integer, primary_key=True, nullable=False)
@@ -9,7 +9,7 @@ from sqlalchemy.sql import case
 from ...configuration import config
 from ...configuration.validation import DefaultsModel
 from .. import Base
-from ..util import CreatableMixin, RetirableMixin
+from ..util import CreatableMixin, RetirableMixin, VersionedMixin
 
 
 @lru_cache
@@ -17,7 +17,7 @@ def _defaults_config():
     return DefaultsModel(**config["defaults"])
 
 
-class Tenant(Base, CreatableMixin, RetirableMixin):
+class Tenant(Base, CreatableMixin, RetirableMixin, VersionedMixin):
     __tablename__ = "tenants"
     __mapper_args__ = {"eager_defaults": True}
     id = Column(Integer, primary_key=True, nullable=False)
@@ -1,7 +1,7 @@
 import datetime as dt
 import enum
 
-from sqlalchemy import Column
+from sqlalchemy import Column, Integer, literal_column
 from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.sql.expression import FunctionElement
@@ -157,3 +157,21 @@ class RetirableMixin:
     @active.expression
     def active(cls):
         return cls.retired_at == None  # noqa: E711
+
+
+class VersionedMixin:
+    """An SQLAlchemy mixin to count modifications of a thing.
+
+    The version is incremented by SQLAlchemy (as an `onupdate` default)
+    for every UPDATE of a row it issues, and lets clients cheaply find
+    out if a thing changed, e.g. for computing entity tags. Rows changed
+    otherwise, e.g. by hand or in migrations, keep their version unless
+    it's incremented explicitly."""
+
+    version = Column(
+        Integer,
+        nullable=False,
+        default=1,
+        server_default="1",
+        onupdate=literal_column("version + 1"),
+    )
@@ -0,0 +1,122 @@
+import datetime as dt
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import func, select
+from sqlalchemy.sql import Select
+
+from ..configuration.validation import AutoscaleModel
+from ..database.model import Session, SessionNode
+
+DEFAULT_WINDOW = dt.timedelta(hours=6)
+DEFAULT_INTERVAL = dt.timedelta(minutes=15)
+DEFAULT_SMOOTHING = 0.3
+
+
+@dataclass(frozen=True)
+class AutoscalePolicy:
+    """Compute the fill level of a pool from its recent demand.
+
+    Recent allocations of nodes from a pool (i.e. rows in the
+    `sessions_nodes` table, timed by the creation of their sessions) are
+    counted in buckets of `interval` length over the last `window`. An
+    exponential moving average over these buckets yields the allocation
+    rate per interval, which is scaled to the demand expected over
+    `lead-time`, the time it takes to replenish a pool. The result is
+    clamped between `min-fill-level` and `max-fill-level`.
+    """
+
+    min_fill_level: int
+    max_fill_level: int
+    window: dt.timedelta = DEFAULT_WINDOW
+    interval: dt.timedelta = DEFAULT_INTERVAL
+    smoothing: float = DEFAULT_SMOOTHING
+    lead_time: Optional[dt.timedelta] = None
+
+    @classmethod
+    def from_configuration(
+        cls, configuration: Dict[str, Any], fill_level: Optional[int] = None
+    ) -> "AutoscalePolicy":
+        model = AutoscaleModel(**configuration)
+
+        max_fill_level = model.max_fill_level
+        if max_fill_level is None:
+            max_fill_level = fill_level
+        if max_fill_level is None:
+            raise ValueError("autoscaling needs either `max-fill-level` or `fill-level` set")
+
+        min_fill_level = model.min_fill_level or 0
+        if min_fill_level > max_fill_level:
+            raise ValueError(
+                f"`min-fill-level` ({min_fill_level}) must not exceed the maximum fill level"
+                f" ({max_fill_level})"
+            )
+
+        kwargs = {
+            key: value
+            for key, value in (
+                ("window", model.window),
+                ("interval", model.interval),
+                ("smoothing", model.smoothing),
+                ("lead_time", model.lead_time),
+            )
+            if value is not None
+        }
+
+        return cls(min_fill_level=min_fill_level, max_fill_level=max_fill_level, **kwargs)
+
+    @property
+    def no_buckets(self) -> int:
+        return max(1, math.ceil(self.window / self.interval))
+
+    def bucket_boundaries(self, now: Optional[dt.datetime] = None) -> List[dt.datetime]:
+        """The start times of the buckets, oldest first."""
+        if not now:
+            now = dt.datetime.utcnow().replace(tzinfo=dt.timezone.utc)
+
+        return [now - (self.no_buckets - idx) * self.interval for idx in range(self.no_buckets)]
+
+    def allocations_query(self, pool_name: str, now: Optional[dt.datetime] = None) -> Select:
+        """Build a query for the allocation history of a pool.
+
+        The query results in one row with the cumulative counts of
+        allocations since each bucket boundary, oldest first.
+        """
+        boundaries = self.bucket_boundaries(now)
+
+        return (
+            select(
+                *(func.count().filter(Session.created_at >= boundary) for boundary in boundaries)
+            )
+            .select_from(SessionNode)
+            .join(Session, Session.id == SessionNode.session_id)
+            .filter(SessionNode.pool == pool_name, Session.created_at >= boundaries[0])
+        )
+
+    def allocation_rate(self, cumulative_counts: Sequence[int]) -> float:
+        """Compute the smoothed number of allocations per interval."""
+        cumulative_counts = list(cumulative_counts)
+        bucket_counts = [
+            count - next_count
+            for count, next_count in zip(cumulative_counts, cumulative_counts[1:] + [0])
+        ]
+
+        ema = None
+        for count in bucket_counts:
+            if ema is None:
+                ema = float(count)
+            else:
+                ema = self.smoothing * count + (1 - self.smoothing) * ema
+
+        return ema or 0.0
+
+    def target_fill_level(self, cumulative_counts: Sequence[int]) -> int:
+        """Compute the fill level a pool should have given its allocation history."""
+        lead_time = self.lead_time or self.interval
+        expected_demand = self.allocation_rate(cumulative_counts) * (lead_time / self.interval)
+
+        # Round first to avoid floating point artifacts bumping the result up by one.
+        target = math.ceil(round(expected_demand, 6))
+
+        return min(self.max_fill_level, max(self.min_fill_level, target))
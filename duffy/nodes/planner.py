@@ -0,0 +1,58 @@
+from typing import Collection, Dict, Hashable, List, Mapping, Optional, TypeVar
+
+NodeKey = TypeVar("NodeKey", bound=Hashable)
+
+
+def plan_reusable_nodes(
+    deficits: Mapping[str, int],
+    eligible_pools: Mapping[NodeKey, Collection[str]],
+    priorities: Optional[Mapping[str, int]] = None,
+) -> Dict[str, List[NodeKey]]:
+    """Plan which unused reusable nodes go into which pools.
+
+    :param deficits: how many nodes each pool lacks
+    :param eligible_pools: the names of the pools each unused node can
+        be used for, keyed by node
+    :param priorities: pools with a higher priority are served first
+        (defaults to 0)
+    :return: the nodes to be used per pool, for pools which get any
+
+    Nodes are handed out one by one, the least flexible first, i.e.
+    nodes which can be used in only one of the pools in need are
+    assigned before nodes usable in many of them. This keeps the latter
+    available for pools which can't use anything else. Each node goes
+    into the eligible pool with the highest priority, then the one which
+    is least filled relative to its deficit, which spreads scarce nodes
+    fairly over pools of the same priority.
+    """
+    if priorities is None:
+        priorities = {}
+
+    remaining = {pool_name: deficit for pool_name, deficit in deficits.items() if deficit > 0}
+
+    candidates_per_node = {
+        node: [pool_name for pool_name in pool_names if pool_name in remaining]
+        for node, pool_names in eligible_pools.items()
+    }
+
+    plan: Dict[str, List[NodeKey]] = {}
+
+    for node, candidates in sorted(
+        candidates_per_node.items(), key=lambda node_candidates: len(node_candidates[1])
+    ):
+        candidates = [pool_name for pool_name in candidates if remaining[pool_name] > 0]
+        if not candidates:
+            continue
+
+        pool_name = min(
+            candidates,
+            key=lambda pool_name: (
+                -priorities.get(pool_name, 0),
+                -remaining[pool_name] / deficits[pool_name],
+                pool_name,
+            ),
+        )
+        plan.setdefault(pool_name, []).append(node)
+        remaining[pool_name] -= 1
+
+    return plan
@@ -1,11 +1,14 @@
-from typing import Any, Dict, Iterator, List, Optional, Union
+import datetime as dt
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
 
 import jinja2
 
 from ..configuration import config
 from ..database.model import Node
 from ..util import merge_dicts
+from .autoscale import AutoscalePolicy
 from .mechanisms import Mechanism
+from .profiles import FillLevelProfile
 
 
 class NodePool(dict):
@@ -106,6 +109,106 @@ class ConcreteNodePool(NodePool, cls_type="concrete"):
             if isinstance(pool, cls):
                 yield pool
 
+    @property
+    def autoscale_policy(self) -> Optional[AutoscalePolicy]:
+        """The autoscaling policy of the pool, if configured."""
+        autoscale_config = self.get("autoscale")
+        if not autoscale_config:
+            return None
+        return AutoscalePolicy.from_configuration(
+            autoscale_config, fill_level=self.get("fill-level")
+        )
+
+    @property
+    def fill_level_profiles(self) -> List[FillLevelProfile]:
+        """The scheduled fill level profiles of the pool."""
+        return [
+            FillLevelProfile.from_configuration(profile_config)
+            for profile_config in self.get("fill-level-profiles") or ()
+        ]
+
+    def effective_fill_level_profile(
+        self, now: Optional[dt.datetime] = None
+    ) -> Optional[FillLevelProfile]:
+        """Find the fill level profile in effect, if any.
+
+        If several profiles are in effect, e.g. because one is being
+        pre-warmed while another one is active, the one with the highest
+        fill level wins.
+        """
+        if not now:
+            now = dt.datetime.utcnow().replace(tzinfo=dt.timezone.utc)
+
+        effective_profiles = [
+            profile for profile in self.fill_level_profiles if profile.is_effective(now)
+        ]
+        if not effective_profiles:
+            return None
+
+        return max(effective_profiles, key=lambda profile: profile.fill_level)
+
+    def target_fill_level(
+        self, allocation_counts: Optional[Sequence[int]] = None, now: Optional[dt.datetime] = None
+    ) -> int:
+        """Determine the level to which the pool should be filled.
+
+        This is the configured fill level, overridden by an effective
+        fill level profile. If the pool is autoscaled, it is computed from
+        `allocation_counts` (see AutoscalePolicy.allocations_query()),
+        and an effective profile sets the lower bound.
+        """
+        profile = self.effective_fill_level_profile(now)
+        autoscale_policy = self.autoscale_policy
+
+        if autoscale_policy:
+            fill_level = autoscale_policy.target_fill_level(allocation_counts or ())
+            if profile:
+                fill_level = max(fill_level, profile.fill_level)
+            return fill_level
+
+        if profile:
+            return profile.fill_level
+
+        return self["fill-level"]
+
+    @property
+    def reuse_nodes_spec(self) -> Optional[Dict[str, Union[int, str]]]:
+        """The `reuse-nodes` specification of the pool with templates rendered.
+
+        Raises ValueError if a value isn't of a supported type.
+        """
+        reuse_nodes = self.get("reuse-nodes")
+        if not reuse_nodes:
+            return None
+
+        spec = {}
+        for key, value in reuse_nodes.items():
+            if isinstance(value, str):
+                value = self.render_template(value)
+            elif not isinstance(value, int):
+                raise ValueError(
+                    f"[{self.name}] Unsupported reuse-nodes value: {key!r} -> {value!r}"
+                )
+            spec[key] = value
+
+        return spec
+
+    def can_reuse_node(self, node: Node, spec: Optional[Dict[str, Union[int, str]]] = None) -> bool:
+        """Check if an unused node matches the `reuse-nodes` specification of the pool.
+
+        Pass in a previously obtained `spec` to avoid rendering it anew.
+        """
+        if spec is None:
+            spec = self.reuse_nodes_spec
+        if not spec:
+            return False
+
+        data = node.data or {}
+        return all(
+            key in data and type(data[key]) is type(value) and data[key] == value
+            for key, value in spec.items()
+        )
+
     def provision(self, nodes: List[Node]) -> Dict[str, Any]:
         return self.mechanism.provision(nodes=nodes)
 
@@ -0,0 +1,79 @@
+import datetime as dt
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Optional
+
+from ..configuration.validation import FillLevelProfileModel, Weekday
+
+WEEKDAYS = tuple(Weekday)
+
+
+@dataclass(frozen=True)
+class FillLevelProfile:
+    """A time window in which a pool should be filled to a different level.
+
+    Windows open on the configured weekdays at `start` and close at
+    `end`, on the next day if `end` isn't later than `start`. A profile
+    takes effect `pre_warm` before its window opens, so nodes are ready
+    when demand picks up. Times are in UTC.
+    """
+
+    fill_level: int
+    weekdays: FrozenSet[int] = frozenset(range(7))
+    start: dt.time = dt.time(0)
+    end: dt.time = dt.time(0)
+    pre_warm: dt.timedelta = dt.timedelta(0)
+    name: Optional[str] = None
+
+    @classmethod
+    def from_configuration(cls, configuration: Dict[str, Any]) -> "FillLevelProfile":
+        model = FillLevelProfileModel(**configuration)
+
+        kwargs = {
+            key: value
+            for key, value in (
+                ("start", model.start),
+                ("end", model.end),
+                ("pre_warm", model.pre_warm),
+                ("name", model.name),
+            )
+            if value is not None
+        }
+        if model.weekdays is not None:
+            kwargs["weekdays"] = frozenset(WEEKDAYS.index(weekday) for weekday in model.weekdays)
+
+        return cls(fill_level=model.fill_level, **kwargs)
+
+    @property
+    def duration(self) -> dt.timedelta:
+        start = dt.datetime.combine(dt.date.min, self.start)
+        end = dt.datetime.combine(dt.date.min, self.end)
+        if end <= start:
+            end += dt.timedelta(days=1)
+        return end - start
+
+    def _window_start_on(self, day: dt.date) -> Optional[dt.datetime]:
+        if day.weekday() not in self.weekdays:
+            return None
+        return dt.datetime.combine(day, self.start, tzinfo=dt.timezone.utc)
+
+    def is_active(self, at: dt.datetime) -> bool:
+        """Check if a window of the profile is open at a point in time."""
+        # A window can't last longer than a day, i.e. it opened either on the same or the previous
+        # day.
+        for days_back in (0, 1):
+            window_start = self._window_start_on(at.date() - dt.timedelta(days=days_back))
+            if window_start and window_start <= at < window_start + self.duration:
+                return True
+        return False
+
+    def is_effective(self, now: dt.datetime) -> bool:
+        """Check if the profile should be applied, considering pre-warming."""
+        return self.is_active(now) or self.is_active(now + self.pre_warm)
+
+    def next_start(self, after: dt.datetime) -> Optional[dt.datetime]:
+        """Determine when the next window of the profile opens."""
+        for days_ahead in range(8):
+            window_start = self._window_start_on(after.date() + dt.timedelta(days=days_ahead))
+            if window_start and window_start > after:
+                return window_start
+        return None
@@ -1,5 +1,8 @@
+from . import events  # noqa: F401
+from .archive import archive_retired  # noqa: F401
 from .base import celery, init_tasks  # noqa: F401
 from .deprovision import deprovision_nodes, deprovision_pool_nodes  # noqa: F401
 from .expire import expire_sessions  # noqa: F401
 from .main import start_worker  # noqa: F401
-from .provision import fill_pools, fill_single_pool  # noqa: F401
+from .pool_levels import reconcile_pool_levels  # noqa: F401
+from .provision import fill_pools, fill_reusable_pools, fill_single_pool  # noqa: F401
@@ -0,0 +1,20 @@
+from celery.utils.log import get_task_logger
+
+from ..database import archive
+from .base import celery
+from .locking import Lock
+
+log = get_task_logger(__name__)
+
+
+@celery.task
+def archive_retired():
+    """Move sessions and nodes retired for a while into archive tables.
+
+    See duffy.database.archive for details.
+    """
+    with Lock(key="duffy:archive-retired"):
+        counts = archive.archive_retired()
+
+    if counts["sessions"] or counts["nodes"]:
+        log.info("Archived %d sessions and %d nodes", counts["sessions"], counts["nodes"])
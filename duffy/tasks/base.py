@@ -4,6 +4,8 @@ from ..configuration import config
 
 celery = Celery("duffy.tasks")
 
+DEFAULT_PERIODIC_INTERVAL = 5 * 60
+
 
 def init_tasks():
     celery.config_from_object(config["tasks"]["celery"])
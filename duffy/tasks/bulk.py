@@ -0,0 +1,111 @@
+"""Change the states of many nodes or sessions in few statements.
+
+Loading ORM objects just to change their state hydrates all of their
+columns, including the data of nodes which can be big, and flushing
+them emits one UPDATE per object. These helpers change them set-wise
+with UPDATE ... RETURNING statements instead, which only touch rows
+still in the expected states. Like changes made through the ORM, they
+keep pool level counters right and publish events.
+"""
+
+import datetime as dt
+from collections import Counter
+from typing import Any, Collection, List, Mapping, Optional, Sequence, Union
+
+from sqlalchemy import Row, select, update
+from sqlalchemy.orm import Session as DBSession
+from sqlalchemy.sql import ColumnElement
+
+from ..database.model import Node, Session
+from ..database.model.pool_level import record_pool_level_deltas
+from ..database.types import NodeState
+from .events import record_bulk_changes
+
+
+def transition_nodes(
+    db_sync_session: DBSession,
+    node_ids: Collection[int],
+    from_states: Union[NodeState, Collection[NodeState]],
+    to_state: NodeState,
+    *,
+    in_pool: Optional[str] = None,
+    values: Optional[Mapping[str, Any]] = None,
+    returning: Sequence[ColumnElement] = (),
+) -> List[Row]:
+    """Change the state of nodes which are in one of the expected states.
+
+    Only active nodes in one of `from_states` are changed, and only
+    those in the pool `in_pool` if it's set. Other columns can be set
+    along with the state in `values`, e.g. `pool` or `retired_at`.
+
+    Returns rows of the changed nodes, with their `id`, `pool` and
+    `retired_at` as well as the columns listed in `returning`.
+    """
+    if isinstance(from_states, NodeState):
+        from_states = (from_states,)
+
+    if not node_ids:
+        return []
+
+    filters = [
+        Node.id.in_(node_ids),
+        Node.active == True,  # noqa: E712
+        Node.state.in_(from_states),
+    ]
+    if in_pool is not None:
+        filters.append(Node.pool == in_pool)
+
+    # Lock the nodes first, to know which pool levels they counted towards before the change.
+    old_levels = {
+        node_id: (pool, state)
+        for node_id, pool, state in db_sync_session.execute(
+            select(Node.id, Node.pool, Node.state).filter(*filters).with_for_update()
+        )
+    }
+    if not old_levels:
+        return []
+
+    rows = db_sync_session.execute(
+        update(Node.__table__)
+        .where(Node.id.in_(old_levels), Node.state.in_(from_states))
+        .values(state=to_state, **(values or {}))
+        .returning(Node.id, Node.pool, Node.retired_at, *returning)
+    ).all()
+
+    deltas = Counter()
+    changed_pools = set()
+    for row in rows:
+        old_pool, old_state = old_levels[row.id]
+        if old_pool:
+            deltas[old_pool, old_state] -= 1
+            changed_pools.add(old_pool)
+        if row.pool and row.retired_at is None:
+            deltas[row.pool, to_state] += 1
+            changed_pools.add(row.pool)
+
+    record_pool_level_deltas(db_sync_session, deltas)
+    record_bulk_changes(db_sync_session, pools=changed_pools)
+
+    return rows
+
+
+def retire_sessions(
+    db_sync_session: DBSession, *whereclauses: ColumnElement, retired_at: dt.datetime
+) -> List[Row]:
+    """Retire the active sessions matching the where clauses.
+
+    Returns rows of the retired sessions, with their `id`, `tenant_id`,
+    `expires_at` and `retired_at`.
+    """
+    rows = db_sync_session.execute(
+        update(Session.__table__)
+        .where(Session.active == True, *whereclauses)  # noqa: E712
+        .values(retired_at=retired_at)
+        .returning(Session.id, Session.tenant_id, Session.expires_at, Session.retired_at)
+    ).all()
+
+    record_bulk_changes(
+        db_sync_session, sessions=[row._mapping for row in rows], session_transition="retired"
+    )
+
+    return rows
@@ -1,9 +1,11 @@
 import asyncio
+import datetime as dt
 from collections import defaultdict
 from typing import List
 
 from celery.utils.log import get_task_logger
 from sqlalchemy import select
+from sqlalchemy.orm import Session as DBSession
 
 from ..database import sync_session_maker
 from ..database.model import Node
@@ -12,6 +14,7 @@ from ..nodes.context import decontextualize
 from ..nodes.mechanisms import MechanismFailure
 from ..nodes.pools import ConcreteNodePool, NodePool
 from .base import celery
+from .bulk import transition_nodes
 from .provision import fill_pools
 
 log = get_task_logger(__name__)
@@ -21,6 +24,29 @@ UNSET = object()
 # These fields should be cleaned out when deprovisioning a reusable node.
 NODE_DATA_EPHEMERAL_FIELDS = ("error", "nodes_spec", "provision")
 
+# Nodes in these states can be deprovisioned.
+DEPROVISIONABLE_STATES = tuple(
+    state
+    for state in NodeState
+    if state not in (NodeState.deprovisioning, NodeState.failed, NodeState.done)
+)
+
+
+def _fail_nodes(db_sync_session: DBSession, node_ids: List[int], detail: str):
+    """Set the state of deprovisioning nodes to failed, storing details in their data."""
+    transition_nodes(
+        db_sync_session,
+        node_ids,
+        NodeState.deprovisioning,
+        NodeState.failed,
+        values={
+            "data": Node.data_patched(
+                set_items={"error": Node.error_data(detail)},
+                dialect_name=db_sync_session.get_bind().dialect.name,
+            )
+        },
+    )
+
 
 @celery.task(bind=True)
 def deprovision_pool_nodes(self, pool_name: str, node_ids: List[int]):
@@ -38,30 +64,21 @@ def deprovision_pool_nodes(self, pool_name: str, node_ids: List[int]):
 
     try:
         with sync_session_maker() as db_sync_session, db_sync_session.begin():
-            nodes = (
-                db_sync_session.execute(
-                    select(Node)
-                    .filter_by(active=True, pool=pool_name)
-                    .filter(
-                        Node.id.in_(node_ids),
-                        Node.state.not_in(
-                            (NodeState.deprovisioning, NodeState.failed, NodeState.done)
-                        ),
-                    ),
-                )
-                .scalars()
-                .all()
+            deprovisioning_nodes = transition_nodes(
+                db_sync_session,
+                node_ids,
+                DEPROVISIONABLE_STATES,
+                NodeState.deprovisioning,
+                in_pool=pool_name,
+                values={"pool": None},
+                returning=(Node.ipaddr,),
             )
 
-            for node in nodes:
-                node.state = NodeState.deprovisioning
-                node.pool = None
-
         log.debug("Decontextualizing nodes.")
         # ignore results, after use anything could be broken on the nodes
-        asyncio.run(decontextualize([node.ipaddr for node in nodes]))
+        asyncio.run(decontextualize([node.ipaddr for node in deprovisioning_nodes]))
 
-        found_node_ids = {node.id for node in nodes}
+        found_node_ids = {node.id for node in deprovisioning_nodes}
         not_found_node_ids = set(node_ids) - found_node_ids
 
         if not_found_node_ids:
@@ -72,7 +89,13 @@ def deprovision_pool_nodes(self, pool_name: str, node_ids: List[int]):
         log.debug("[%s] Attempting to deprovision nodes: %r", pool_name, found_node_ids)
 
         with sync_session_maker() as db_sync_session, db_sync_session.begin():
-            nodes = [db_sync_session.merge(node, load=False) for node in nodes]
+            nodes = (
+                db_sync_session.execute(
+                    select(Node).filter(Node.id.in_(found_node_ids)).order_by(Node.id)
+                )
+                .scalars()
+                .all()
+            )
 
             try:
                 deprov_result = pool.deprovision(nodes)
@@ -80,9 +103,11 @@ def deprovision_pool_nodes(self, pool_name: str, node_ids: List[int]):
                 log.error("[%s] Deprovisioning mechanism failed.", pool.name)
                 log.debug("[%s] Marking nodes as failed in database.", pool.name)
                 with sync_session_maker() as db_sync_session_in_exc, db_sync_session_in_exc.begin():
-                    for node in nodes:
-                        exc_node = db_sync_session_in_exc.merge(node, load=False)
-                        exc_node.fail("deprovisioning mechanism failed")
+                    _fail_nodes(
+                        db_sync_session_in_exc,
+                        [node.id for node in nodes],
+                        "deprovisioning mechanism failed",
+                    )
                 raise
 
             unmatched_nodes = set(nodes)
@@ -111,22 +136,33 @@ def deprovision_pool_nodes(self, pool_name: str, node_ids: List[int]):
 
             if unmatched_nodes:
                 # handle & report nodes which apparently weren't deprovisioned
-                unmatched_ids = []
-                for node in unmatched_nodes:
-                    unmatched_ids.append(node.id)
-                    node.fail("deprovisioning node failed")
-
-                log.warning("[%s] Nodes unmatched in result: %r", pool.name, sorted(unmatched_ids))
+                unmatched_ids = sorted(node.id for node in unmatched_nodes)
+                _fail_nodes(db_sync_session, unmatched_ids, "deprovisioning node failed")
+
+                log.warning("[%s] Nodes unmatched in result: %r", pool.name, unmatched_ids)
+
+            # clean up DB objects of deprovisioned nodes, only removing ephemeral fields from the
+            # data of reusable nodes rather than rewriting all of it
+            transition_nodes(
+                db_sync_session,
+                [node.id for node in matched_nodes if node.reusable],
+                NodeState.deprovisioning,
+                NodeState.unused,
+                values={
+                    "data": Node.data_patched(
+                        remove_keys=NODE_DATA_EPHEMERAL_FIELDS,
+                        dialect_name=db_sync_session.get_bind().dialect.name,
+                    )
+                },
+            )
 
-            # clean up DB objects of deprovisioned nodes
-            for node in matched_nodes:
-                if node.reusable:
-                    node.state = NodeState.unused
-                    for fname in NODE_DATA_EPHEMERAL_FIELDS:
-                        node.data.pop(fname, None)
-                else:
-                    node.state = NodeState.done
-                    node.active = False
+            transition_nodes(
+                db_sync_session,
+                [node.id for node in matched_nodes if not node.reusable],
+                NodeState.deprovisioning,
+                NodeState.done,
+                values={"retired_at": dt.datetime.now(dt.timezone.utc)},
+            )
 
             if any(node.reusable for node in matched_nodes):
                 fill_pools.delay().forget()
@@ -152,18 +188,13 @@ def deprovision_nodes(node_ids: List[int]):
     with sync_session_maker() as db_sync_session, db_sync_session.begin():
         # First, find the active nodes with the supplied ids and sort them by their pools, then kick
         # off sub tasks which deprovision all nodes that belong to the same pool.
-        nodes = (
-            db_sync_session.execute(
-                select(Node)
-                .filter_by(active=True)
-                .filter(
-                    Node.id.in_(node_ids),
-                    Node.state.not_in((NodeState.deprovisioning, NodeState.failed, NodeState.done)),
-                ),
+        nodes = db_sync_session.execute(
+            select(Node.id, Node.pool).filter(
+                Node.id.in_(node_ids),
+                Node.active == True,  # noqa: E712
+                Node.state.in_(DEPROVISIONABLE_STATES),
             )
-            .scalars()
-            .all()
-        )
+        ).all()
 
         found_node_ids = {node.id for node in nodes}
         not_found_node_ids = sorted(set(node_ids) - found_node_ids)
@@ -171,16 +202,21 @@ def deprovision_nodes(node_ids: List[int]):
         if not_found_node_ids:
             log.warning("Didn't find nodes to deprovision with ids: %s", not_found_node_ids)
 
+        orphaned_node_ids = []
         for node in nodes:
-            try:
-                pool = NodePool.known_pools[node.pool]
-            except KeyError:
+            if node.pool not in NodePool.known_pools:
                 log.error("[%s] Pool not found for node with id: %d", node.pool, node.id)
-                node.fail(f"deprovisioning node failed, pool '{node.pool}' not found")
+                orphaned_node_ids.append(node.id)
                 continue
 
             pools_node_ids[node.pool].append(node.id)
 
+        if orphaned_node_ids:
+            for node in db_sync_session.execute(
+                select(Node).filter(Node.id.in_(orphaned_node_ids))
+            ).scalars():
+                node.fail(f"deprovisioning node failed, pool '{node.pool}' not found")
+
     for pool_name, node_ids in pools_node_ids.items():
         pool = NodePool.known_pools[pool_name]
         log.debug("Creating task(s) to deprovision session nodes in pool %s", pool.name)
@@ -0,0 +1,264 @@
+"""Publish changes of sessions and pools, for clients to follow them as they happen.
+
+Changes are picked up when database sessions are flushed, wherever this
+happens, i.e. in the web app and Celery tasks alike. They are published
+to a Redis pub/sub channel once the database transaction is committed
+and discarded if it's rolled back. The levels of changed pools are
+looked up only then, in a transaction of their own, so transactions
+which change pools don't have to read them. The web app hands changes
+to a publisher in the background, see duffy.app.event_publisher.
+
+Events are JSON objects with these keys:
+
+- `type`: either `session` or `pool`
+- `data`: for sessions, their `id`, `tenant_id`, `active` and
+  `expires_at` and what happened in `transition`, i.e. `created`,
+  `deployed` (its nodes are ready to be used), `retired` or `updated`.
+  For pools, their `name` and current `levels`.
+"""
+
+import datetime as dt
+import json
+import logging
+from functools import lru_cache
+from typing import Any, Callable, Collection, Dict, Iterable, List, Mapping, Optional
+
+from redis import Redis, RedisError
+from sqlalchemy import bindparam, event, inspect, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session as DBSession
+from sqlalchemy.orm import SessionTransaction
+from sqlalchemy.orm.attributes import PASSIVE_NO_INITIALIZE, get_history
+
+from ..configuration import config
+from ..database import sync_session_maker
+from ..database.model import Node, PoolLevel, Session, SessionNode
+from ..database.types import NodeState
+
+log = logging.getLogger(__name__)
+
+CHANNEL = "duffy:events"
+
+# The states of nodes counted in the levels of pools, see PoolLevelsModel
+LEVEL_STATES = (
+    NodeState.provisioning,
+    NodeState.ready,
+    NodeState.contextualizing,
+    NodeState.deployed,
+    NodeState.deprovisioning,
+)
+
+# Looks up the levels of the pools passed in as `pools`. This and other hot queries are built once,
+# i.e. SQLAlchemy neither has to build them over again nor compute their cache keys to find their
+# compiled forms.
+LEVELS_QUERY = select(PoolLevel.pool, PoolLevel.state, PoolLevel.quantity).filter(
+    PoolLevel.pool.in_(bindparam("pools", expanding=True)), PoolLevel.state.in_(LEVEL_STATES)
+)
+
+# Levels are looked up after changes were committed, this needs neither predicate locks nor does it
+# cause serialization failures elsewhere.
+LEVELS_EXECUTION_OPTIONS = {
+    "postgresql": {"isolation_level": "READ COMMITTED", "postgresql_readonly": True},
+}
+
+_SESSION_EVENTS_KEY = "duffy_session_events"
+_CHANGED_POOLS_KEY = "duffy_changed_pools"
+_COMMITTED_CHANGES_KEY = "duffy_committed_changes"
+
+# Callables which get passed the events committed in this process right away, e.g. to invalidate
+# caches. Events about pools only contain their names, their levels are looked up when publishing.
+local_subscribers: List[Callable[[List[Dict[str, Any]]], None]] = []
+
+
+@lru_cache(maxsize=None)
+def _redis(url: str) -> Redis:
+    return Redis.from_url(url)
+
+
+def publish(events: List[Dict[str, Any]]):
+    """Publish events on the Redis channel.
+
+    Events are only notifications, failing to publish them is logged but
+    mustn't fail whatever caused them.
+    """
+    try:
+        url = config["tasks"]["locking"]["url"]
+    except KeyError:
+        return
+
+    redis = _redis(url)
+    try:
+        with redis.pipeline(transaction=False) as pipeline:
+            for evt in events:
+                pipeline.publish(CHANNEL, json.dumps(evt))
+            pipeline.execute()
+    except RedisError as exc:
+        log.warning("Couldn't publish %d event(s): %s", len(events), exc)
+
+
+def pool_events(pools: Collection[str]) -> List[Dict[str, Any]]:
+    """Look up the current levels of pools and build events about them."""
+    pools = sorted(pools)
+    levels_per_pool = {pool: {state.name: 0 for state in LEVEL_STATES} for pool in pools}
+
+    with sync_session_maker() as db_sync_session, db_sync_session.begin():
+        execution_options = LEVELS_EXECUTION_OPTIONS.get(db_sync_session.get_bind().dialect.name)
+        if execution_options:
+            db_sync_session.connection(execution_options=execution_options)
+
+        for pool, state, quantity in db_sync_session.execute(LEVELS_QUERY, {"pools": pools}):
+            levels_per_pool[pool][state.name] = quantity
+
+    return [
+        {"type": "pool", "data": {"name": pool, "levels": levels}}
+        for pool, levels in levels_per_pool.items()
+    ]
+
+
+def publish_changes(session_events: List[Dict[str, Any]], pools: Collection[str]):
+    """Publish events about sessions, and about pools with their current levels.
+
+    If the levels of pools can't be looked up, this is logged and only
+    the events about sessions are published.
+    """
+    evts = list(session_events)
+    if pools:
+        try:
+            evts.extend(pool_events(pools))
+        except SQLAlchemyError as exc:
+            log.warning("Couldn't look up levels of %d pool(s) to publish: %s", len(pools), exc)
+    if evts:
+        publish(evts)
+
+
+# Gets passed the changes committed in this process, i.e. events about sessions and the names of
+# changed pools, once their database connection is released. Changes are published right away by
+# default, the web app replaces this to publish them in the background.
+publisher: Callable[[List[Dict[str, Any]], Collection[str]], None] = publish_changes
+
+
+def _isoformat(value: Optional[dt.datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def _session_event(session: Session, transition: str) -> Dict[str, Any]:
+    # Only use loaded values, this mustn't emit SQL.
+    return _session_event_from_values(inspect(session).dict, transition)
+
+
+def _session_event_from_values(values: Mapping[str, Any], transition: str) -> Dict[str, Any]:
+    return {
+        "type": "session",
+        "data": {
+            "id": values.get("id"),
+            "tenant_id": values.get("tenant_id"),
+            "transition": transition,
+            "active": values.get("retired_at") is None,
+            "expires_at": _isoformat(values.get("expires_at")),
+        },
+    }
+
+
+# Use get_history() rather than inspect(obj).attrs[key].history: the latter memoizes attribute
+# states which reference back to the instance state, keeping it alive longer than the object.
+def _changed(obj: Any, key: str) -> bool:
+    return get_history(obj, key, passive=PASSIVE_NO_INITIALIZE).has_changes()
+
+
+def _old_value(obj: Any, key: str) -> Any:
+    deleted = get_history(obj, key, passive=PASSIVE_NO_INITIALIZE).deleted
+    return deleted[0] if deleted else None
+
+
+@event.listens_for(DBSession, "after_flush")
+def _collect_changes(db_session: DBSession, flush_context):
+    session_events = db_session.info.setdefault(_SESSION_EVENTS_KEY, {})
+    changed_pools = db_session.info.setdefault(_CHANGED_POOLS_KEY, set())
+    deployed_node_ids = set()
+
+    for obj in db_session.new:
+        if isinstance(obj, Session):
+            session_events[obj.id] = _session_event(obj, "created")
+        elif isinstance(obj, Node) and obj.pool:
+            changed_pools.add(obj.pool)
+
+    for obj in db_session.dirty:
+        if isinstance(obj, Session) and db_session.is_modified(obj, include_collections=False):
+            if _changed(obj, "retired_at") and obj.retired_at:
+                transition = "retired"
+            else:
+                transition = "updated"
+            session_events[obj.id] = _session_event(obj, transition)
+        elif isinstance(obj, Node) and any(
+            _changed(obj, key) for key in ("state", "pool", "retired_at")
+        ):
+            for pool in (obj.pool, _old_value(obj, "pool")):
+                if pool:
+                    changed_pools.add(pool)
+            if _changed(obj, "state") and obj.state == NodeState.deployed:
+                deployed_node_ids.add(obj.id)
+
+    if deployed_node_ids:
+        # Nodes don't know their sessions, look for sessions loaded along with them.
+        for obj in list(db_session.identity_map.values()):
+            if isinstance(obj, SessionNode) and obj.node_id in deployed_node_ids:
+                session = db_session.identity_map.get(
+                    inspect(Session).identity_key_from_primary_key((obj.session_id,))
+                )
+                if session and obj.session_id not in session_events:
+                    session_events[obj.session_id] = _session_event(session, "deployed")
+
+
+def record_bulk_changes(
+    db_session: DBSession,
+    *,
+    pools: Iterable[str] = (),
+    sessions: Iterable[Mapping[str, Any]] = (),
+    session_transition: str = "updated",
+):
+    """Record changes made without going through the ORM for publishing.
+
+    Pass the names of pools whose nodes changed in `pools`, and the
+    values of changed sessions, i.e. their `id`, `tenant_id`,
+    `retired_at` and `expires_at`, in `sessions`. These are published
+    with other events of the transaction once it's committed.
+    """
+    changed_pools = db_session.info.setdefault(_CHANGED_POOLS_KEY, set())
+    changed_pools.update(pool for pool in pools if pool)
+
+    session_events = db_session.info.setdefault(_SESSION_EVENTS_KEY, {})
+    for values in sessions:
+        session_events[values["id"]] = _session_event_from_values(values, session_transition)
+
+
+@event.listens_for(DBSession, "after_commit")
+def _commit_changes(db_session: DBSession):
+    session_events = list(db_session.info.pop(_SESSION_EVENTS_KEY, {}).values())
+    changed_pools = db_session.info.pop(_CHANGED_POOLS_KEY, set())
+    if not (session_events or changed_pools):
+        return
+
+    if local_subscribers:
+        evts = session_events + [
+            {"type": "pool", "data": {"name": pool}} for pool in sorted(changed_pools)
+        ]
+        for subscriber in local_subscribers:
+            subscriber(evts)
+
+    db_session.info[_COMMITTED_CHANGES_KEY] = (session_events, changed_pools)
+
+
+# Only hand over committed changes once the transaction has ended, i.e. its connection is released,
+# so publishing them doesn't need another one at the same time.
+@event.listens_for(DBSession, "after_transaction_end")
+def _hand_over_changes(db_session: DBSession, transaction: SessionTransaction):
+    if transaction.parent is None:
+        changes = db_session.info.pop(_COMMITTED_CHANGES_KEY, None)
+        if changes:
+            publisher(*changes)
+
+
+@event.listens_for(DBSession, "after_rollback")
+def _discard_changes(db_session: DBSession):
+    for key in (_SESSION_EVENTS_KEY, _CHANGED_POOLS_KEY):
+        db_session.info.pop(key, None)
@@ -1,12 +1,13 @@
 import datetime as dt
+from collections import defaultdict
 
 from celery.utils.log import get_task_logger
 from sqlalchemy import select
-from sqlalchemy.orm import selectinload
 
 from ..database import sync_session_maker
 from ..database.model import Session, SessionNode
 from .base import celery
+from .bulk import retire_sessions
 from .deprovision import deprovision_nodes
 from .locking import Lock
 
@@ -20,19 +21,21 @@ def expire_sessions():
     ), sync_session_maker() as db_sync_session, db_sync_session.begin():
         now = dt.datetime.utcnow().replace(tzinfo=dt.timezone.utc)
 
-        expired_sessions = (
-            db_sync_session.execute(
-                select(Session)
-                .filter(Session.active == True, Session.expires_at < now)  # noqa: E712
-                .options(selectinload(Session.session_nodes).selectinload(SessionNode.node))
-            )
-            .scalars()
-            .all()
+        expired_session_ids = sorted(
+            row.id
+            for row in retire_sessions(db_sync_session, Session.expires_at < now, retired_at=now)
         )
+        if not expired_session_ids:
+            return
+
+        sessions_node_ids = defaultdict(list)
+        for session_id, node_id in db_sync_session.execute(
+            select(SessionNode.session_id, SessionNode.node_id).filter(
+                SessionNode.session_id.in_(expired_session_ids)
+            )
+        ):
+            sessions_node_ids[session_id].append(node_id)
 
-        for session in expired_sessions:
-            log.info("Expiring session (id=%d)", session.id)
-            session.active = False
-            deprovision_nodes.delay(
-                node_ids=[session_node.node_id for session_node in session.session_nodes]
-            ).forget()
+        for session_id in expired_session_ids:
+            log.info("Expiring session (id=%d)", session_id)
+            deprovision_nodes.delay(node_ids=sessions_node_ids[session_id]).forget()
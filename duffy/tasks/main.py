@@ -6,12 +6,12 @@ from .. import database
 from ..configuration import config
 from ..configuration.validation import PeriodicTaskModel
 from ..nodes.pools import NodePool
-from .base import celery, init_tasks
+from .archive import archive_retired
+from .base import DEFAULT_PERIODIC_INTERVAL, celery, init_tasks
 from .expire import expire_sessions
+from .pool_levels import reconcile_pool_levels
 from .provision import fill_pools
 
-DEFAULT_PERIODIC_INTERVAL = 5 * 60
-
 
 @celery.on_after_finalize.connect
 def setup_periodic_tasks(sender: Celery, **kwargs):
@@ -25,8 +25,22 @@ def setup_periodic_tasks(sender: Celery, **kwargs):
         **periodic_config.get("expire-sessions", {"interval": DEFAULT_PERIODIC_INTERVAL})
     ).interval
 
+    reconcile_pool_levels_interval = PeriodicTaskModel(
+        **periodic_config.get("reconcile-pool-levels", {"interval": DEFAULT_PERIODIC_INTERVAL})
+    ).interval
+
     sender.add_periodic_task(fill_pools_interval.total_seconds(), fill_pools.signature())
     sender.add_periodic_task(expire_sessions_interval.total_seconds(), expire_sessions.signature())
+    sender.add_periodic_task(
+        reconcile_pool_levels_interval.total_seconds(), reconcile_pool_levels.signature()
+    )
+
+    # Archiving retired sessions and nodes only runs periodically if configured.
+    if "archive-retired" in periodic_config:
+        archive_retired_interval = PeriodicTaskModel(**periodic_config["archive-retired"]).interval
+        sender.add_periodic_task(
+            archive_retired_interval.total_seconds(), archive_retired.signature()
+        )
 
 
 @celery.on_after_finalize.connect
@@ -0,0 +1,99 @@
+"""Send Celery tasks from a transactional outbox.
+
+Rather than sending tasks to the broker right away, e.g. from API
+handlers which shouldn't wait for it, they're added to the outbox table
+in the same transaction as the changes which warrant them. A relay sends
+them on to Celery in batches and removes them from the outbox.
+
+Messages are sent at least once: if removing them fails after they were
+sent, they're sent again later.
+"""
+
+import logging
+from typing import Callable, List, Union
+
+from celery import Task
+from sqlalchemy import delete, event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session as DBSession
+
+from ..database import sync_session_maker
+from ..database.model import OutboxMessage
+from .base import celery
+
+log = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+
+# Relaying needs neither predicate locks nor does it cause serialization failures elsewhere,
+# concurrent relays skip the messages locked by each other.
+RELAY_EXECUTION_OPTIONS = {
+    "postgresql": {"isolation_level": "READ COMMITTED"},
+}
+
+_OUTBOX_KEY = "duffy_outbox"
+
+# Callables which get called when messages were committed to the outbox in this process, e.g. to
+# wake up a relay right away.
+local_relays: List[Callable[[], None]] = []
+
+
+def enqueue(db_session: Union[DBSession, AsyncSession], task: Task, **kwargs):
+    """Add a task to the outbox, to be sent once the transaction is committed."""
+    db_session.add(OutboxMessage(task=task.name, kwargs=kwargs))
+    db_session.info[_OUTBOX_KEY] = True
+
+
+@event.listens_for(DBSession, "after_commit")
+def _notify_relays(db_session: DBSession):
+    if db_session.info.pop(_OUTBOX_KEY, False):
+        for notify in local_relays:
+            notify()
+
+
+@event.listens_for(DBSession, "after_rollback")
+def _discard_notification(db_session: DBSession):
+    db_session.info.pop(_OUTBOX_KEY, None)
+
+
+def relay_outbox(batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Send a batch of messages from the outbox to Celery.
+
+    The messages are sent over one producer connection and removed from
+    the outbox in one transaction. If sending fails midway, only the
+    messages sent until then are removed.
+
+    Returns the number of messages sent.
+    """
+    with sync_session_maker() as db_sync_session, db_sync_session.begin():
+        execution_options = RELAY_EXECUTION_OPTIONS.get(db_sync_session.get_bind().dialect.name)
+        if execution_options:
+            db_sync_session.connection(execution_options=execution_options)
+
+        messages = db_sync_session.execute(
+            select(OutboxMessage.id, OutboxMessage.task, OutboxMessage.kwargs)
+            .order_by(OutboxMessage.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+
+        sent_ids = []
+        try:
+            with celery.producer_or_acquire() as producer:
+                for message in messages:
+                    celery.send_task(
+                        message.task, kwargs=message.kwargs, producer=producer
+                    ).forget()
+                    sent_ids.append(message.id)
+        except Exception as exc:
+            log.warning(
+                "Sending messages from the outbox failed, %d of %d sent: %s",
+                len(sent_ids),
+                len(messages),
+                exc,
+            )
+
+        if sent_ids:
+            db_sync_session.execute(delete(OutboxMessage).filter(OutboxMessage.id.in_(sent_ids)))
+
+    return len(sent_ids)
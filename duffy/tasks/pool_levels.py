@@ -0,0 +1,54 @@
+from celery.utils.log import get_task_logger
+from sqlalchemy import func, select
+
+from ..database import sync_session_maker
+from ..database.model import Node, PoolLevel
+from .base import celery
+from .locking import Lock
+
+log = get_task_logger(__name__)
+
+
+@celery.task
+def reconcile_pool_levels():
+    """Set the maintained pool level counters straight.
+
+    This recounts active nodes per pool and state and corrects counters
+    which have drifted, e.g. because nodes were changed without going
+    through the ORM.
+    """
+    with Lock(
+        key="duffy:reconcile-pool-levels"
+    ), sync_session_maker() as db_sync_session, db_sync_session.begin():
+        actual_levels = {
+            (pool, state): quantity
+            for pool, state, quantity in db_sync_session.execute(
+                select(Node.pool, Node.state, func.count(Node.id))
+                .filter(Node.active == True, Node.pool != None)  # noqa: E711, E712
+                .group_by(Node.pool, Node.state)
+            )
+        }
+        stored_levels = {
+            (level.pool, level.state): level
+            for level in db_sync_session.execute(select(PoolLevel)).scalars()
+        }
+
+        for pool, state in sorted(
+            actual_levels.keys() | stored_levels.keys(), key=lambda key: (key[0], key[1].value)
+        ):
+            quantity = actual_levels.get((pool, state), 0)
+            level = stored_levels.get((pool, state))
+
+            if level is None:
+                level = PoolLevel(pool=pool, state=state, quantity=0)
+                db_sync_session.add(level)
+
+            if level.quantity != quantity:
+                log.warning(
+                    "[%s] Correcting level of %s nodes: %d -> %d",
+                    pool,
+                    state.name,
+                    level.quantity,
+                    quantity,
+                )
+                level.quantity = quantity
@@ -1,20 +1,47 @@
 import asyncio
-from typing import List, Optional
+import datetime as dt
+from typing import Iterable, List, Optional
 
 import aiodns
 from celery.utils.log import get_task_logger
-from sqlalchemy import func, select
+from redis import Redis, RedisError
+from sqlalchemy import bindparam, func, or_, select
 
-from ..database import sync_session_maker
+from ..configuration import config
+from ..configuration.validation import PeriodicTaskModel
+from ..database import disable_seqscan, sync_session_maker
 from ..database.model import Node
 from ..database.types import NodeState
 from ..nodes.mechanisms import MechanismFailure
+from ..nodes.planner import plan_reusable_nodes
 from ..nodes.pools import ConcreteNodePool, NodePool
-from .base import celery
+from .base import DEFAULT_PERIODIC_INTERVAL, celery
+from .bulk import transition_nodes
 from .locking import Lock
 
 log = get_task_logger(__name__)
 
+# Nodes in these states count towards the fill level of a pool.
+FILL_LEVEL_STATES = (NodeState.ready, NodeState.provisioning)
+
+# The fill level queries are built once, see duffy.tasks.events.LEVELS_QUERY. They count nodes using
+# the partial index on pool and state of active nodes rather than reading the pool level counters,
+# which can lag behind.
+_FILL_LEVEL_QUERY = select(func.count(Node.id)).filter(
+    Node.active == True,  # noqa: E712
+    Node.pool == bindparam("pool"),
+    Node.state.in_(FILL_LEVEL_STATES),
+)
+_FILL_LEVELS_QUERY = (
+    select(Node.pool, func.count(Node.id))
+    .filter(
+        Node.active == True,  # noqa: E712
+        Node.pool.in_(bindparam("pools", expanding=True)),
+        Node.state.in_(FILL_LEVEL_STATES),
+    )
+    .group_by(Node.pool)
+)
+
 
 async def _node_lookup_hostname_from_ipaddr(node: Node):
     """Look up a node hostname from its IP address
@@ -52,6 +79,8 @@ def provision_nodes_into_pool(pool_name: str, node_ids: List[id]):
     reuse_nodes = pool.get("reuse-nodes")
 
     with sync_session_maker() as db_sync_session, db_sync_session.begin():
+        disable_seqscan(db_sync_session)
+
         # Grab the node objects from the database (again).
         nodes = db_sync_session.execute(select(Node).filter(Node.id.in_(node_ids))).scalars().all()
 
@@ -75,9 +104,14 @@ def provision_nodes_into_pool(pool_name: str, node_ids: List[id]):
                 for node in nodes:
                     db_sync_session.delete(node)
             else:
-                for node in nodes:
-                    node.state = NodeState.unused
-                    node.pool = None
+                transition_nodes(
+                    db_sync_session,
+                    [node.id for node in nodes],
+                    NodeState.provisioning,
+                    NodeState.unused,
+                    in_pool=pool.name,
+                    values={"pool": None},
+                )
             return
         log.info("[%s] Backend provisioning finished.", pool.name)
         log.debug("[%s] Result: %s", pool.name, prov_result)
@@ -156,7 +190,7 @@ def fill_single_pool(pool_name: str):
     # Determine how many nodes need to be provisioned and commit them to the database so these nodes
     # are considered in future calculations.
 
-    wanted_fill_level = pool["fill-level"]
+    autoscale_policy = pool.autoscale_policy
 
     # This block uses a lock to prevent concurrently allocating node objects in the database for the
     # same pool. It checks how many 'ready' nodes are allocated to a pool, and how many more are
@@ -165,17 +199,20 @@ def fill_single_pool(pool_name: str):
     with Lock(
         key="duffy:fill-single-pool:allocate-nodes-in-db"
     ), sync_session_maker() as db_sync_session, db_sync_session.begin():
+        disable_seqscan(db_sync_session)
+
+        if autoscale_policy:
+            log.debug("[%s] Computing fill level from allocation history ...", pool.name)
+            allocation_counts = db_sync_session.execute(
+                autoscale_policy.allocations_query(pool.name)
+            ).one()
+        else:
+            allocation_counts = None
+        wanted_fill_level = pool.target_fill_level(allocation_counts)
+
         log.debug("[%s] Determining number of available nodes ...", pool.name)
         current_fill_level = db_sync_session.execute(
-            select(func.count()).select_from(
-                select(Node)
-                .filter(
-                    Node.active == True,  # noqa: E712
-                    Node.pool == pool.name,
-                    Node.state.in_((NodeState.ready, NodeState.provisioning)),
-                )
-                .subquery()
-            )
+            _FILL_LEVEL_QUERY, {"pool": pool.name}
         ).scalar_one()
 
         quantity = wanted_fill_level - current_fill_level
@@ -195,27 +232,21 @@ def fill_single_pool(pool_name: str):
         if reuse_nodes:
             log.debug("[%s] Searching for %d reusable nodes in database", pool.name, quantity)
 
-            usable_nodes_query = select(Node).filter_by(
-                active=True, pool=None, reusable=True, state=NodeState.unused
-            )
-            spec_valid = True
-            for key, value in reuse_nodes.items():
-                json_item = Node.data[key]
-                if isinstance(value, str):
-                    cast_item = json_item.as_string()
-                    value = pool.render_template(value)
-                elif isinstance(value, int):
-                    cast_item = json_item.as_integer()
-                else:
-                    log.error(
-                        "[%s] Can't build query for reuse-nodes: %r -> %r", pool.name, key, value
-                    )
-                    spec_valid = False
-                    continue
-                usable_nodes_query = usable_nodes_query.filter(cast_item == value)
+            try:
+                reuse_nodes_spec = pool.reuse_nodes_spec
+            except ValueError as exc:
+                log.error("Can't build query for reuse-nodes: %s", exc)
+                raise RuntimeError(f"[{pool.name}] Skipping filling up") from exc
 
-            if not spec_valid:
-                raise RuntimeError(f"[{pool.name}] Skipping filling up")
+            usable_nodes_query = (
+                select(Node)
+                .filter_by(active=True, pool=None, reusable=True, state=NodeState.unused)
+                .filter(
+                    Node.data_matches(
+                        reuse_nodes_spec, dialect_name=db_sync_session.get_bind().dialect.name
+                    )
+                )
+            )
 
             # This queries up to `quantity` usable nodes, or fewer.
             usable_nodes_query = usable_nodes_query.limit(quantity)
@@ -237,6 +268,11 @@ def fill_single_pool(pool_name: str):
     # In (a) follow-up (longer running) transaction(s), provision the nodes. Here, `nodes` is a list
     # of node objects which are in state "provisioning" and assigned to the pool. It can be shorter
     # than `quantity`, e.g. if there aren't enough reusable unused nodes.
+    _kick_off_provisioning(pool, nodes)
+
+
+def _kick_off_provisioning(pool: ConcreteNodePool, nodes: List[Node]):
+    """Kick off provisioning nodes allocated to a pool in sub-tasks."""
     if pool.get("run-parallel", True):
         # Run one sub-task per node in parallel.
         for node in nodes:
@@ -248,11 +284,195 @@ def fill_single_pool(pool_name: str):
     log.info("[%s] Filling up nodes: subtasks kicked off", pool.name)
 
 
+@celery.task
+def fill_reusable_pools(*, pool_names: Optional[List[str]] = None):
+    """Fill up pools which reuse nodes, sharing unused nodes between them.
+
+    Instead of each pool grabbing matching unused nodes on its own, this
+    determines how many nodes each pool lacks and which of the unused
+    reusable nodes it can use, then plans which node goes where for all
+    pools in one go, see plan_reusable_nodes().
+
+    If no pool names are supplied, run for all configured pools which
+    reuse nodes.
+    """
+    log.debug("fill_reusable_pools(pool_names=%r) begin", pool_names)
+
+    pools = {
+        pool.name: pool
+        for pool in ConcreteNodePool.iter_pools()
+        if pool.get("reuse-nodes") and (not pool_names or pool.name in pool_names)
+    }
+    if not pools:
+        log.debug("No pools reusing nodes to fill up.")
+        return
+
+    # Don't allocate nodes concurrently with fill_single_pool(), see there.
+    with Lock(
+        key="duffy:fill-single-pool:allocate-nodes-in-db"
+    ), sync_session_maker() as db_sync_session, db_sync_session.begin():
+        disable_seqscan(db_sync_session)
+
+        log.debug("Determining number of available nodes ...")
+        current_fill_levels = dict(
+            db_sync_session.execute(_FILL_LEVELS_QUERY, {"pools": list(pools)}).all()
+        )
+
+        deficits = {}
+        reuse_specs = {}
+        for pool in pools.values():
+            try:
+                reuse_specs[pool.name] = pool.reuse_nodes_spec
+            except ValueError as exc:
+                log.error("%s, skipping filling up", exc)
+                continue
+
+            autoscale_policy = pool.autoscale_policy
+            if autoscale_policy:
+                log.debug("[%s] Computing fill level from allocation history ...", pool.name)
+                allocation_counts = db_sync_session.execute(
+                    autoscale_policy.allocations_query(pool.name)
+                ).one()
+            else:
+                allocation_counts = None
+            wanted_fill_level = pool.target_fill_level(allocation_counts)
+            current_fill_level = current_fill_levels.get(pool.name, 0)
+
+            deficits[pool.name] = wanted_fill_level - current_fill_level
+            log.debug(
+                "[%s] ... %d, we want %d, i.e. need %d",
+                pool.name,
+                current_fill_level,
+                wanted_fill_level,
+                deficits[pool.name],
+            )
+
+        pools_in_need = [pool_name for pool_name, deficit in deficits.items() if deficit > 0]
+        if not pools_in_need:
+            log.debug("Pools are filled to or above spec.")
+            return
+
+        log.debug("Searching for reusable nodes in database")
+        dialect_name = db_sync_session.get_bind().dialect.name
+        unused_nodes = {
+            node.id: node
+            for node in db_sync_session.execute(
+                select(Node)
+                .filter_by(active=True, pool=None, reusable=True, state=NodeState.unused)
+                .filter(
+                    or_(
+                        *(
+                            Node.data_matches(reuse_specs[pool_name], dialect_name=dialect_name)
+                            for pool_name in pools_in_need
+                        )
+                    )
+                )
+                .order_by(Node.id)
+            ).scalars()
+        }
+        eligible_pools = {
+            node_id: [
+                pool_name
+                for pool_name in pools_in_need
+                if pools[pool_name].can_reuse_node(node, spec=reuse_specs[pool_name])
+            ]
+            for node_id, node in unused_nodes.items()
+        }
+
+        plan = plan_reusable_nodes(
+            deficits,
+            eligible_pools,
+            priorities={
+                pool_name: pools[pool_name].get("reuse-priority") or 0
+                for pool_name in pools_in_need
+            },
+        )
+
+        nodes_per_pool = {}
+        for pool_name in pools_in_need:
+            nodes = nodes_per_pool[pool_name] = [
+                unused_nodes[node_id] for node_id in plan.get(pool_name, ())
+            ]
+            log.info(
+                "[%s] Allocating %d of %d wanted reusable node(s).",
+                pool_name,
+                len(nodes),
+                deficits[pool_name],
+            )
+            for node in nodes:
+                node.state = NodeState.provisioning
+                node.pool = pool_name
+
+    for pool_name, nodes in nodes_per_pool.items():
+        if nodes:
+            _kick_off_provisioning(pools[pool_name], nodes)
+
+    log.debug("fill_reusable_pools(%s) end", ", ".join(pools))
+
+
+# Marks pre-warming a pool at a time as scheduled until then, so it's scheduled only once if
+# fill_pools() runs more than once before, in whichever worker process.
+PRE_WARM_KEY = "duffy:pre-warm:{pool}:{at}"
+
+
+def _claim_pre_warming(redis: Redis, pool_name: str, pre_warm_at: dt.datetime, now: dt.datetime):
+    """Mark pre-warming a pool at a time as scheduled, unless it is already.
+
+    Returns whether the caller should schedule it.
+    """
+    key = PRE_WARM_KEY.format(pool=pool_name, at=pre_warm_at.isoformat())
+    expire_ms = max(1, int((pre_warm_at - now) / dt.timedelta(milliseconds=1)))
+    try:
+        return bool(redis.set(key, "1", nx=True, px=expire_ms))
+    except RedisError as exc:
+        log.warning("[%s] Couldn't schedule pre-warming pool: %s", pool_name, exc)
+        return False
+
+
+def _schedule_pre_warming(pools: Iterable[ConcreteNodePool]):
+    """Schedule filling up pools ahead of their fill level profile windows.
+
+    This covers windows which need to be pre-warmed before fill_pools()
+    is run periodically the next time.
+    """
+    now = dt.datetime.utcnow().replace(tzinfo=dt.timezone.utc)
+    periodic_config = (config.get("tasks") or {}).get("periodic") or {}
+    fill_pools_interval = PeriodicTaskModel(
+        **periodic_config.get("fill-pools", {"interval": DEFAULT_PERIODIC_INTERVAL})
+    ).interval
+    horizon = now + fill_pools_interval
+    redis = None
+
+    for pool in pools:
+        for profile in pool.fill_level_profiles:
+            window_start = profile.next_start(now)
+            if not window_start:
+                continue
+
+            pre_warm_at = window_start - profile.pre_warm
+            if not now < pre_warm_at <= horizon:
+                continue
+
+            if not redis:
+                redis = Redis.from_url(config["tasks"]["locking"]["url"])
+            if not _claim_pre_warming(redis, pool.name, pre_warm_at, now):
+                continue
+
+            log.info(
+                "[%s] Pre-warming pool for fill level profile %s at %s",
+                pool.name,
+                profile.name or "(unnamed)",
+                pre_warm_at.isoformat(),
+            )
+            fill_pools.apply_async(kwargs={"pool_names": [pool.name]}, eta=pre_warm_at).forget()
+
+
 @celery.task
 def fill_pools(*, pool_names: Optional[List[str]] = None):
     """Ensure that pools are filled to their configured levels.
 
-    If no pool names are supplied, run for all configured pools.
+    If no pool names are supplied, run for all configured pools and
+    schedule pre-warming pools for upcoming fill level profile windows.
     """
     log.debug("fill_pools(pool_names=%r) begin", pool_names)
 
@@ -260,6 +480,7 @@ def fill_pools(*, pool_names: Optional[List[str]] = None):
 
     if not pool_names:
         pool_names = [pool.name for pool in pools_to_process]
+        _schedule_pre_warming(pools_to_process)
     else:
         unknown_pool_names = set(pool_names).difference(pool.name for pool in pools_to_process)
         if unknown_pool_names:
@@ -268,7 +489,13 @@ def fill_pools(*, pool_names: Optional[List[str]] = None):
             )
         pools_to_process = [pool for pool in pools_to_process if pool.name in pool_names]
 
+    # Pools reusing nodes compete for the same unused nodes, let one task share these between them.
+    reusing_pool_names = [pool.name for pool in pools_to_process if pool.get("reuse-nodes")]
+    if reusing_pool_names:
+        fill_reusable_pools.delay(pool_names=reusing_pool_names).forget()
+
     for pool in pools_to_process:
-        fill_single_pool.delay(pool.name).forget()
+        if not pool.get("reuse-nodes"):
+            fill_single_pool.delay(pool.name).forget()
 
     log.debug("fill_pools(%s) end", ", ".join(pool_names))
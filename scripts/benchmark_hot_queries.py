@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+
+"""Compare the overhead of hot queries rebuilt for every request vs. built once.
+
+This populates a scratch PostgreSQL database with tenants, sessions and
+nodes, then runs the queries which authenticating tenants and creating
+sessions run for every request, in two variants:
+
+- rebuilt: the query is built from scratch every time, like Duffy used
+  to do, i.e. SQLAlchemy has to compute its cache key to find its
+  compiled form
+- cached: the query is built once with bind parameters, like in
+  duffy.app.auth and duffy.app.controllers.session
+
+For each, it reports the time spent in Python building and looking up
+the query, the time per execution, and how often asyncpg prepared a
+statement, i.e. missed its prepared statement cache.
+"""
+
+import asyncio
+import random
+import time
+from pathlib import Path
+
+import asyncpg
+import click
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from duffy.app.auth import TENANT_BY_NAME_QUERY
+from duffy.app.controllers import session as session_controller
+from duffy.configuration import read_configuration
+from duffy.database import Base, async_session_maker
+from duffy.database.model import Node, PoolLevel, Session, SessionNode, Tenant
+from duffy.database.types import NodeState
+from duffy.tasks.events import LEVEL_STATES, LEVELS_QUERY
+
+EXAMPLE_CONFIG = Path(__file__).parent.parent / "etc" / "duffy-example-config.yaml"
+
+POOLS = [f"pool-{idx}" for idx in range(20)]
+
+
+async def populate(db_async_session, no_nodes: int, no_tenants: int):
+    rnd = random.Random(0)
+
+    await db_async_session.execute(
+        insert(Tenant),
+        [
+            {"name": f"tenant-{idx}", "ssh_key": "<ssh key>", "_api_key": "<api key hash>"}
+            for idx in range(no_tenants)
+        ],
+    )
+    tenant_ids = (await db_async_session.execute(select(Tenant.id))).scalars().all()
+
+    await db_async_session.execute(
+        insert(Node),
+        [
+            {
+                "hostname": f"node-{idx}.example.net",
+                "ipaddr": f"10.{idx >> 16 & 255}.{idx >> 8 & 255}.{idx & 255}",
+                "pool": rnd.choice(POOLS),
+                "state": rnd.choice((NodeState.ready, NodeState.deployed)),
+                "data": {"provision": {"id": idx}},
+            }
+            for idx in range(no_nodes)
+        ],
+    )
+    deployed_nodes = (
+        await db_async_session.execute(
+            select(Node.id, Node.pool).filter_by(state=NodeState.deployed)
+        )
+    ).all()
+
+    await db_async_session.execute(
+        insert(Session),
+        [
+            {"tenant_id": rnd.choice(tenant_ids), "data": {"nodes_specs": []}}
+            for _ in deployed_nodes
+        ],
+    )
+    session_ids = (await db_async_session.execute(select(Session.id))).scalars().all()
+    await db_async_session.execute(
+        insert(SessionNode),
+        [
+            {"session_id": session_id, "node_id": node.id, "pool": node.pool, "data": {}}
+            for session_id, node in zip(session_ids, deployed_nodes)
+        ],
+    )
+    await db_async_session.execute(
+        text(
+            "INSERT INTO pool_levels (pool, state, quantity)"
+            + " SELECT pool, state, COUNT(id) FROM nodes GROUP BY pool, state"
+        )
+    )
+    await db_async_session.commit()
+
+
+# Each hot query as it used to be rebuilt for every request, and built once with its parameters.
+HOT_QUERIES = {
+    # see duffy.app.auth._req_tenant_factory()
+    "req-tenant": (
+        lambda params: (select(Tenant).filter_by(name=params["name"]), {}),
+        lambda params: (TENANT_BY_NAME_QUERY, params),
+        lambda rnd, no_tenants: {"name": f"tenant-{rnd.randrange(no_tenants)}"},
+    ),
+    # see duffy.app.controllers.session.create_session()
+    "quota": (
+        lambda params: (
+            select(func.count())
+            .select_from(SessionNode)
+            .join(Session, Session.id == SessionNode.session_id)
+            .join(Node, Node.id == SessionNode.node_id)
+            .filter(Session.active == True, Session.tenant_id == params["tenant_id"]),  # noqa: E712
+            {},
+        ),
+        lambda params: (session_controller._TENANT_ALLOCATION_QUERY, params),
+        lambda rnd, no_tenants: {"tenant_id": rnd.randrange(no_tenants) + 1},
+    ),
+    "reserve-nodes": (
+        lambda params: (
+            select(Node)
+            .filter_by(active=True, state=NodeState.ready, pool=params["pool"])
+            .limit(params["quantity"])
+            .with_for_update(),
+            {},
+        ),
+        lambda params: (session_controller._RESERVE_NODES_QUERY, params),
+        lambda rnd, no_tenants: {"pool": rnd.choice(POOLS), "quantity": rnd.randint(1, 3)},
+    ),
+    # see duffy.app.controllers.pool._pools_levels()
+    "pool-levels": (
+        lambda params: (
+            select(PoolLevel.pool, PoolLevel.state, PoolLevel.quantity).filter(
+                PoolLevel.pool.in_(params["pools"]), PoolLevel.state.in_(LEVEL_STATES)
+            ),
+            {},
+        ),
+        lambda params: (LEVELS_QUERY, params),
+        lambda rnd, no_tenants: {"pools": [rnd.choice(POOLS)]},
+    ),
+}
+
+
+class PrepareCounter:
+    """Count how often asyncpg prepares statements."""
+
+    def __init__(self):
+        self.count = 0
+        self._prepare = asyncpg.Connection.prepare
+
+    def __enter__(self):
+        counter = self
+
+        async def prepare(self, *args, **kwargs):
+            counter.count += 1
+            return await counter._prepare(self, *args, **kwargs)
+
+        asyncpg.Connection.prepare = prepare
+        return self
+
+    def __exit__(self, *exc_info):
+        asyncpg.Connection.prepare = self._prepare
+
+
+async def time_query(make_query, make_params, no_tenants: int, rounds: int):
+    rnd = random.Random(0)
+    build_time = execute_time = 0.0
+
+    with PrepareCounter() as prepare_counter:
+        async with async_session_maker() as db_async_session:
+            for _ in range(rounds):
+                params = make_params(rnd, no_tenants)
+
+                start = time.perf_counter()
+                query, query_params = make_query(params)
+                # This is what SQLAlchemy does to look up the compiled form of a query.
+                query._generate_cache_key()
+                build_time += time.perf_counter() - start
+
+                start = time.perf_counter()
+                (await db_async_session.execute(query, query_params)).all()
+                execute_time += time.perf_counter() - start
+
+            # Don't actually reserve nodes.
+            await db_async_session.rollback()
+
+    return build_time / rounds, execute_time / rounds, prepare_counter.count
+
+
+async def benchmark(database_url: str, no_nodes: int, no_tenants: int, rounds: int):
+    engine = create_async_engine(database_url, poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async_session_maker.configure(bind=engine)
+
+    async with async_session_maker() as db_async_session:
+        await populate(db_async_session, no_nodes, no_tenants)
+
+    click.echo(
+        f"{'query':>14}  {'variant':>8}  {'build':>10}  {'execute':>10}  {'prepared':>8}"
+        + f"  (of {rounds})"
+    )
+    for name, (make_rebuilt, make_cached, make_params) in HOT_QUERIES.items():
+        for variant, make_query in (("rebuilt", make_rebuilt), ("cached", make_cached)):
+            build_time, execute_time, prepared = await time_query(
+                make_query, make_params, no_tenants, rounds
+            )
+            click.echo(
+                f"{name:>14}  {variant:>8}  {build_time * 1e6:7.1f} µs"
+                + f"  {execute_time * 1e6:7.1f} µs  {prepared:>8}"
+            )
+
+    await engine.dispose()
+
+
+@click.command()
+@click.option(
+    "--database-url",
+    required=True,
+    help="Async URL of a scratch PostgreSQL database, its tables will be dropped and recreated.",
+)
+@click.option("--nodes", "no_nodes", type=int, default=10_000, show_default=True)
+@click.option("--tenants", "no_tenants", type=int, default=100, show_default=True)
+@click.option("--rounds", type=int, default=2000, show_default=True)
+def cli(database_url, no_nodes, no_tenants, rounds):
+    """Benchmark the overhead of hot queries rebuilt for every request vs. built once."""
+    if not database_url.startswith("postgresql+asyncpg"):
+        raise click.BadParameter(
+            "must point to a PostgreSQL database using asyncpg", param_hint="--database-url"
+        )
+    read_configuration(EXAMPLE_CONFIG, clear=True, validate=True)
+    asyncio.run(benchmark(database_url, no_nodes, no_tenants, rounds))
+
+
+if __name__ == "__main__":
+    cli()
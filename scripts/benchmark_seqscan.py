@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+
+"""Compare query timings with sequential scans disabled globally or per transaction.
+
+This populates a scratch PostgreSQL database with tenants, sessions and
+nodes, most of them retired like in a long-running deployment, then
+times typical queries in two modes:
+
+- global: sequential scans are disabled for every connection, like Duffy
+  used to do
+- scoped: sequential scans are only disabled in transactions allocating
+  nodes, see duffy.database.disable_seqscan(), listings use the default
+  planner
+"""
+
+import asyncio
+import random
+import time
+from pathlib import Path
+
+import click
+from sqlalchemy import event, func, insert, select, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from duffy.configuration import read_configuration
+from duffy.database import Base, async_session_maker, disable_seqscan
+from duffy.database.model import Node, PoolLevel, Session, SessionNode, Tenant
+from duffy.database.types import NodeState
+
+EXAMPLE_CONFIG = Path(__file__).parent.parent / "etc" / "duffy-example-config.yaml"
+
+POOLS = [f"pool-{idx}" for idx in range(50)]
+
+
+async def populate(db_async_session, no_nodes: int, no_tenants: int, retired_ratio: float):
+    rnd = random.Random(0)
+
+    await db_async_session.execute(
+        insert(Tenant),
+        [
+            {"name": f"tenant-{idx}", "ssh_key": "<ssh key>", "_api_key": "<api key hash>"}
+            for idx in range(no_tenants)
+        ],
+    )
+    tenant_ids = (await db_async_session.execute(select(Tenant.id))).scalars().all()
+
+    await db_async_session.execute(
+        insert(Node),
+        [
+            {
+                "hostname": f"node-{idx}.example.net",
+                "ipaddr": f"10.{idx >> 16 & 255}.{idx >> 8 & 255}.{idx & 255}",
+                "pool": rnd.choice(POOLS),
+                "state": rnd.choice((NodeState.ready, NodeState.deployed)),
+                "data": {"provision": {"id": idx}},
+            }
+            for idx in range(no_nodes)
+        ],
+    )
+    nodes = (await db_async_session.execute(select(Node.id, Node.pool, Node.state))).all()
+
+    deployed_nodes = [node for node in nodes if node.state == NodeState.deployed]
+    await db_async_session.execute(
+        insert(Session),
+        [
+            {"tenant_id": rnd.choice(tenant_ids), "data": {"nodes_specs": []}}
+            for _ in deployed_nodes
+        ],
+    )
+    session_ids = (await db_async_session.execute(select(Session.id))).scalars().all()
+    await db_async_session.execute(
+        insert(SessionNode),
+        [
+            {"session_id": session_id, "node_id": node.id, "pool": node.pool, "data": {}}
+            for session_id, node in zip(session_ids, deployed_nodes)
+        ],
+    )
+
+    # Most nodes and sessions in the database are retired.
+    await db_async_session.execute(
+        text(
+            "UPDATE nodes SET retired_at = NOW(), state = 'done'"
+            + " WHERE state = 'deployed' AND random() < :ratio"
+        ),
+        {"ratio": retired_ratio},
+    )
+    await db_async_session.execute(
+        text(
+            "UPDATE sessions SET retired_at = NOW() WHERE id IN"
+            + " (SELECT session_id FROM sessions_nodes JOIN nodes ON nodes.id = node_id"
+            + " WHERE nodes.retired_at IS NOT NULL)"
+        )
+    )
+    await db_async_session.execute(
+        text(
+            "INSERT INTO pool_levels (pool, state, quantity)"
+            + " SELECT pool, state, COUNT(id) FROM nodes WHERE retired_at IS NULL"
+            + " GROUP BY pool, state"
+        )
+    )
+    await db_async_session.commit()
+
+    async with db_async_session.bind.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("ANALYZE"))
+
+
+# Queries which allocate nodes, i.e. are run with sequential scans disabled in the scoped mode.
+ALLOCATING_QUERIES = {
+    # see duffy.app.controllers.session.create_session()
+    "reserve-nodes": lambda: (
+        select(Node)
+        .filter_by(active=True, state=NodeState.ready, pool=POOLS[3])
+        .limit(2)
+        .with_for_update()
+    ),
+    # see duffy.tasks.provision.fill_single_pool()
+    "fill-level": lambda: select(func.coalesce(func.sum(PoolLevel.quantity), 0)).filter(
+        PoolLevel.pool == POOLS[3],
+        PoolLevel.state.in_((NodeState.ready, NodeState.provisioning)),
+    ),
+}
+
+OTHER_QUERIES = {
+    # see duffy.app.controllers.tenant.get_all_tenants()
+    "list-tenants": lambda: select(Tenant),
+    # see duffy.app.controllers.session.get_all_sessions()
+    "list-sessions": lambda: select(Session).filter_by(active=True).order_by(Session.id),
+    # see duffy.app.controllers.node.get_all_nodes(), with include_retired
+    "export-nodes": lambda: select(Node).order_by(Node.id),
+}
+
+
+async def time_query(name: str, make_query, scoped: bool, rounds: int) -> float:
+    timings = []
+    for _ in range(rounds):
+        async with async_session_maker() as db_async_session, db_async_session.begin():
+            if scoped and name in ALLOCATING_QUERIES:
+                await db_async_session.run_sync(disable_seqscan)
+            start = time.perf_counter()
+            (await db_async_session.execute(make_query())).all()
+            timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def _disable_seqscan_on_connect(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("SET enable_seqscan=off")
+    cursor.close()
+
+
+async def benchmark(
+    database_url: str, no_nodes: int, no_tenants: int, retired_ratio: float, rounds: int
+):
+    engine = create_async_engine(database_url, poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async_session_maker.configure(bind=engine)
+
+    async with async_session_maker() as db_async_session:
+        await populate(db_async_session, no_nodes, no_tenants, retired_ratio)
+    await engine.dispose()
+
+    timings = {}
+    for mode in ("global", "scoped"):
+        engine = create_async_engine(database_url, poolclass=StaticPool)
+        if mode == "global":
+            event.listen(engine.sync_engine, "connect", _disable_seqscan_on_connect)
+        async_session_maker.configure(bind=engine)
+
+        for name, make_query in {**ALLOCATING_QUERIES, **OTHER_QUERIES}.items():
+            timings[name, mode] = await time_query(
+                name, make_query, scoped=mode == "scoped", rounds=rounds
+            )
+
+        await engine.dispose()
+
+    click.echo(f"{'query':>14}  {'global':>10}  {'scoped':>10}")
+    for name in {**ALLOCATING_QUERIES, **OTHER_QUERIES}:
+        click.echo(
+            f"{name:>14}  {timings[name, 'global'] * 1000:7.2f} ms"
+            + f"  {timings[name, 'scoped'] * 1000:7.2f} ms"
+        )
+
+
+@click.command()
+@click.option(
+    "--database-url",
+    required=True,
+    help="Async URL of a scratch PostgreSQL database, its tables will be dropped and recreated.",
+)
+@click.option("--nodes", "no_nodes", type=int, default=100_000, show_default=True)
+@click.option("--tenants", "no_tenants", type=int, default=100, show_default=True)
+@click.option(
+    "--retired-ratio",
+    type=click.FloatRange(0, 1),
+    default=0.9,
+    show_default=True,
+    help="Share of deployed nodes which are retired, along with their sessions.",
+)
+@click.option("--rounds", type=int, default=5, show_default=True)
+def cli(database_url, no_nodes, no_tenants, retired_ratio, rounds):
+    """Benchmark disabling sequential scans globally vs. per transaction."""
+    if not database_url.startswith("postgresql"):
+        raise click.BadParameter("must point to a PostgreSQL database", param_hint="--database-url")
+    read_configuration(EXAMPLE_CONFIG, clear=True, validate=True)
+    asyncio.run(benchmark(database_url, no_nodes, no_tenants, retired_ratio, rounds))
+
+
+if __name__ == "__main__":
+    cli()
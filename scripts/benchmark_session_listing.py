@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+"""Compare the throughput of ways to list sessions.
+
+This populates a scratch database with sessions and nodes, then builds
+the JSON of the session listing repeatedly:
+
+- orm: load ORM objects, validate and serialize them through the API
+  models, like FastAPI does for `response_model`
+- fast: build views straight from column values and serialize them as
+  is, like `GET /api/v1/sessions` does
+"""
+
+import asyncio
+import time
+from pathlib import Path
+
+import click
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from duffy.api_models import SessionResultCollection
+from duffy.app.controllers.session import _session_load_options, _session_views
+from duffy.app.fields import FieldSelection
+from duffy.app.serialization import json_dumps
+from duffy.configuration import read_configuration
+from duffy.database import Base, async_session_maker
+from duffy.database.model import Node, Session, SessionNode, Tenant
+
+EXAMPLE_CONFIG = Path(__file__).parent.parent / "etc" / "duffy-example-config.yaml"
+
+
+async def populate(db_async_session, no_nodes: int, nodes_per_session: int):
+    tenant = Tenant(name="benchmark", ssh_key="<ssh key>", api_key="benchmark")
+    db_async_session.add(tenant)
+    await db_async_session.flush()
+
+    no_sessions = no_nodes // nodes_per_session
+    await db_async_session.execute(
+        insert(Session),
+        [
+            {
+                "tenant_id": tenant.id,
+                "data": {"nodes_specs": [{"pool": "benchmark", "quantity": 1}]},
+            }
+            for _ in range(no_sessions)
+        ],
+    )
+    await db_async_session.execute(
+        insert(Node),
+        [
+            {
+                "hostname": f"node-{idx}.example.net",
+                "ipaddr": f"10.{idx >> 16 & 255}.{idx >> 8 & 255}.{idx & 255}",
+                "pool": "benchmark",
+                "state": "deployed",
+                "data": {"provision": {"id": idx, "flavor": "benchmark"}},
+            }
+            for idx in range(no_sessions * nodes_per_session)
+        ],
+    )
+    session_ids = (await db_async_session.execute(select(Session.id))).scalars().all()
+    node_ids = (await db_async_session.execute(select(Node.id))).scalars().all()
+    await db_async_session.execute(
+        insert(SessionNode),
+        [
+            {
+                "session_id": session_ids[idx // nodes_per_session],
+                "node_id": node_id,
+                "pool": "benchmark",
+                "data": {},
+            }
+            for idx, node_id in enumerate(node_ids)
+        ],
+    )
+    await db_async_session.commit()
+
+
+async def list_orm(db_async_session) -> str:
+    query = select(Session).options(*_session_load_options(FieldSelection()))
+    sessions = (await db_async_session.execute(query)).scalars().all()
+    return SessionResultCollection.model_validate(
+        {"action": "get", "sessions": sessions}
+    ).model_dump_json()
+
+
+async def list_fast(db_async_session) -> bytes:
+    session_views = await _session_views(db_async_session, select(Session).order_by(Session.id))
+    return json_dumps({"action": "get", "sessions": session_views, "next_cursor": None})
+
+
+async def benchmark(database_url: str, no_nodes: int, nodes_per_session: int, rounds: int):
+    engine = create_async_engine(database_url, poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async_session_maker.configure(bind=engine)
+
+    async with async_session_maker() as db_async_session:
+        await populate(db_async_session, no_nodes, nodes_per_session)
+
+    for name, list_sessions in (("orm", list_orm), ("fast", list_fast)):
+        timings = []
+        for _ in range(rounds):
+            # Start afresh each round so no ORM objects are reused.
+            async with async_session_maker() as db_async_session:
+                start = time.perf_counter()
+                body = await list_sessions(db_async_session)
+                timings.append(time.perf_counter() - start)
+        best = min(timings)
+        click.echo(
+            f"{name:>4}: best of {rounds}: {best * 1000:8.1f} ms, {no_nodes / best:9.0f} nodes/s,"
+            + f" {len(body) / 1024:.0f} KiB"
+        )
+
+    await engine.dispose()
+
+
+@click.command()
+@click.option(
+    "--database-url",
+    default="sqlite+aiosqlite://",
+    show_default=True,
+    help="Async URL of a scratch database, its tables will be dropped and recreated.",
+)
+@click.option("--nodes", "no_nodes", type=int, default=10_000, show_default=True)
+@click.option("--nodes-per-session", type=int, default=2, show_default=True)
+@click.option("--rounds", type=int, default=5, show_default=True)
+def cli(database_url, no_nodes, nodes_per_session, rounds):
+    """Benchmark listing sessions."""
+    read_configuration(EXAMPLE_CONFIG, clear=True, validate=True)
+    asyncio.run(benchmark(database_url, no_nodes, nodes_per_session, rounds))
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,124 @@
+import datetime as dt
+
+import pytest
+from starlette.status import HTTP_200_OK, HTTP_403_FORBIDDEN, HTTP_404_NOT_FOUND
+
+from duffy.database.model import ArchivedNode, ArchivedSession, ArchivedSessionNode
+
+RETIRED_AT = dt.datetime(2026, 1, 1, tzinfo=dt.timezone.utc)
+
+
+@pytest.fixture
+async def archived_objects(db_async_session):
+    async with db_async_session.begin():
+        for idx, (tenant_id, pool) in enumerate(((1, "pool-a"), (2, "pool-a"), (1, "pool-b")), 1):
+            db_async_session.add(
+                ArchivedSession(
+                    id=idx,
+                    tenant_id=tenant_id,
+                    created_at=RETIRED_AT - dt.timedelta(hours=1),
+                    retired_at=RETIRED_AT,
+                    version=3,
+                    data={"nodes_specs": [{"quantity": 1, "pool": pool}]},
+                    session_nodes=[ArchivedSessionNode(node_id=idx, pool=pool, data={})],
+                )
+            )
+            db_async_session.add(
+                ArchivedNode(
+                    id=idx,
+                    hostname=f"node-{idx}",
+                    ipaddr=f"192.0.2.{idx}",
+                    state="done",
+                    pool=pool,
+                    reusable=False,
+                    data={"provision": {"id": idx}},
+                    created_at=RETIRED_AT - dt.timedelta(days=1),
+                    retired_at=RETIRED_AT,
+                    version=5,
+                )
+            )
+
+
+@pytest.mark.usefixtures(
+    "db_sync_schema",
+    "db_sync_model_initialized",
+    "db_async_schema",
+    "db_async_model_initialized",
+    "archived_objects",
+)
+@pytest.mark.client_auth_as("admin")
+class TestArchive:
+    path = "/api/v1/archive"
+
+    @pytest.mark.parametrize(
+        "params, expected_ids, expected_next_cursor",
+        (
+            ({}, [1, 2, 3], None),
+            ({"tenant_id": 1}, [1, 3], None),
+            ({"limit": 2}, [1, 2], 2),
+            ({"limit": 2, "after": 2}, [3], None),
+        ),
+    )
+    async def test_get_all_archived_sessions(
+        self, params, expected_ids, expected_next_cursor, client
+    ):
+        response = await client.get(f"{self.path}/sessions", params=params)
+
+        assert response.status_code == HTTP_200_OK
+        result = response.json()
+        assert [session["id"] for session in result["sessions"]] == expected_ids
+        assert result["next_cursor"] == expected_next_cursor
+
+    async def test_get_archived_session(self, client):
+        response = await client.get(f"{self.path}/sessions/2")
+
+        assert response.status_code == HTTP_200_OK
+        session = response.json()["session"]
+        assert session["id"] == 2
+        assert session["tenant_id"] == 2
+        assert dt.datetime.fromisoformat(session["retired_at"]) == RETIRED_AT
+        assert session["archived_at"]
+        assert session["data"] == {"nodes_specs": [{"quantity": 1, "pool": "pool-a"}]}
+        assert session["nodes"] == [{"node_id": 2, "pool": "pool-a", "data": {}}]
+
+    @pytest.mark.parametrize(
+        "params, expected_ids, expected_next_cursor",
+        (
+            ({}, [1, 2, 3], None),
+            ({"pool": "pool-a"}, [1, 2], None),
+            ({"hostname": "node-3"}, [3], None),
+            ({"limit": 1, "after": 1}, [2], 2),
+        ),
+    )
+    async def test_get_all_archived_nodes(self, params, expected_ids, expected_next_cursor, client):
+        response = await client.get(f"{self.path}/nodes", params=params)
+
+        assert response.status_code == HTTP_200_OK
+        result = response.json()
+        assert [node["id"] for node in result["nodes"]] == expected_ids
+        assert result["next_cursor"] == expected_next_cursor
+
+    async def test_get_archived_node(self, client):
+        response = await client.get(f"{self.path}/nodes/3")
+
+        assert response.status_code == HTTP_200_OK
+        node = response.json()["node"]
+        assert node["id"] == 3
+        assert node["hostname"] == "node-3"
+        assert node["state"] == "done"
+        assert node["pool"] == "pool-b"
+        assert node["data"] == {"provision": {"id": 3}}
+        assert node["archived_at"]
+
+    @pytest.mark.parametrize("obj_type", ("sessions", "nodes"))
+    async def test_get_archived_obj_not_found(self, obj_type, client):
+        response = await client.get(f"{self.path}/{obj_type}/4")
+        assert response.status_code == HTTP_404_NOT_FOUND
+
+    @pytest.mark.client_auth_as("tenant")
+    @pytest.mark.parametrize(
+        "subpath", ("/sessions", "/sessions/1", "/nodes", "/nodes/1"), ids=lambda x: x
+    )
+    async def test_unprivileged(self, subpath, client):
+        response = await client.get(self.path + subpath)
+        assert response.status_code == HTTP_403_FORBIDDEN
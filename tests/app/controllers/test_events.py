@@ -0,0 +1,83 @@
+import json
+from unittest import mock
+
+import pytest
+from starlette.status import HTTP_200_OK, HTTP_401_UNAUTHORIZED
+
+from duffy.app.controllers import events as events_module
+from duffy.tasks.events import CHANNEL
+
+
+def redis_message(event_type, data):
+    return {"type": "message", "data": json.dumps({"type": event_type, "data": data}).encode()}
+
+
+@pytest.mark.duffy_config(example_config=True)
+class TestEvents:
+    path = "/api/v1/events"
+
+    @pytest.mark.parametrize("tenant_id", (None, 5))
+    @mock.patch("duffy.app.controllers.events.Redis")
+    async def test__stream_events(self, Redis, tenant_id):
+        redis = Redis.from_url.return_value.__aenter__.return_value = mock.MagicMock()
+        pubsub = redis.pubsub.return_value.__aenter__.return_value = mock.MagicMock()
+        pubsub.subscribe = mock.AsyncMock()
+        pubsub.get_message = mock.AsyncMock(
+            side_effect=[
+                None,
+                redis_message("session", {"id": 1, "tenant_id": 5}),
+                redis_message("session", {"id": 2, "tenant_id": 6}),
+                redis_message("pool", {"name": "pool-a"}),
+            ]
+        )
+
+        stream = events_module._stream_events(tenant_id)
+        chunks = [await stream.__anext__() for _ in range(4 if tenant_id else 5)]
+        await stream.aclose()
+
+        expected_chunks = [
+            b": connected\n\n",
+            b": keepalive\n\n",
+            b'event: session\ndata: {"id": 1, "tenant_id": 5}\n\n',
+            b'event: session\ndata: {"id": 2, "tenant_id": 6}\n\n',
+            b'event: pool\ndata: {"name": "pool-a"}\n\n',
+        ]
+        if tenant_id:
+            # Tenants only get events about their own sessions.
+            del expected_chunks[3]
+        assert chunks == expected_chunks
+
+        Redis.from_url.assert_called_once_with("redis://localhost:6379")
+        redis.pubsub.assert_called_once_with(ignore_subscribe_messages=True)
+        pubsub.subscribe.assert_awaited_once_with(CHANNEL)
+        pubsub.get_message.assert_awaited_with(timeout=events_module.KEEPALIVE_INTERVAL)
+        # The connection is cleaned up when the client goes away.
+        Redis.from_url.return_value.__aexit__.assert_awaited_once()
+
+    @pytest.mark.parametrize(
+        "auth_as",
+        (
+            pytest.param(name, marks=pytest.mark.client_auth_as(name), id=str(name))
+            for name in ("admin", "tenant", None)
+        ),
+    )
+    @mock.patch("duffy.app.controllers.events._stream_events")
+    async def test_get_events(self, _stream_events, auth_as, client, auth_tenant):
+        async def stream(tenant_id):
+            yield b": connected\n\n"
+            yield b'event: pool\ndata: {"name": "pool-a"}\n\n'
+
+        _stream_events.side_effect = stream
+
+        response = await client.get(self.path)
+
+        if not auth_as:
+            assert response.status_code == HTTP_401_UNAUTHORIZED
+            _stream_events.assert_not_called()
+            return
+
+        assert response.status_code == HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert response.headers["cache-control"] == "no-cache"
+        assert response.text == ': connected\n\nevent: pool\ndata: {"name": "pool-a"}\n\n'
+        _stream_events.assert_called_once_with(None if auth_as == "admin" else auth_tenant.id)
@@ -0,0 +1,66 @@
+from unittest import mock
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.status import HTTP_200_OK, HTTP_403_FORBIDDEN
+
+from duffy import database
+from duffy.database.connection_pool import with_checkout_metrics
+
+
+@pytest.mark.usefixtures(
+    "db_sync_schema",
+    "db_sync_model_initialized",
+    "db_async_schema",
+    "db_async_model_initialized",
+)
+@pytest.mark.client_auth_as("admin")
+class TestMetrics:
+    path = "/api/v1/metrics/connection-pools"
+
+    async def test_get_connection_pools_metrics(self, client, postgresql_async_url):
+        read_engine = create_async_engine(
+            url=postgresql_async_url, poolclass=with_checkout_metrics(AsyncAdaptedQueuePool)
+        )
+        async with read_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+        try:
+            with mock.patch.object(database, "async_read_engines", [read_engine]):
+                response = await client.get(self.path)
+        finally:
+            await read_engine.dispose()
+
+        assert response.status_code == HTTP_200_OK
+        result = response.json()
+        assert result["action"] == "get"
+        # The test engines of the primary don't record metrics. The request itself reads from the
+        # replica, i.e. has a connection checked out while collecting the metrics.
+        assert result["connection_pools"] == [
+            {
+                "engine": "async-read-0",
+                "size": 5,
+                "checked_in": 0,
+                "checked_out": 1,
+                "overflow": -4,
+                "checkouts": 2,
+                "checkout_wait_total": mock.ANY,
+                "checkout_wait_max": mock.ANY,
+            }
+        ]
+        pool_metrics = result["connection_pools"][0]
+        assert pool_metrics["checkout_wait_total"] >= pool_metrics["checkout_wait_max"] > 0
+
+    async def test_get_connection_pools_metrics_sync_unbound(self, client):
+        with mock.patch.dict(database.sync_session_maker.kw, clear=True):
+            response = await client.get(self.path)
+
+        assert response.status_code == HTTP_200_OK
+        assert response.json()["connection_pools"] == []
+
+    @pytest.mark.client_auth_as("tenant")
+    async def test_get_connection_pools_metrics_unprivileged(self, client):
+        response = await client.get(self.path)
+        assert response.status_code == HTTP_403_FORBIDDEN
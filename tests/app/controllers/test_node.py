@@ -1,5 +1,12 @@
+import datetime as dt
+import json
+from unittest import mock
+
 import pytest
-from starlette.status import HTTP_201_CREATED
+from starlette.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_422_UNPROCESSABLE_ENTITY
+
+from duffy.app.controllers import node as node_module
+from duffy.database.model import Node
 
 from . import BaseTestController
 
@@ -20,3 +27,158 @@ class TestNode(BaseTestController):
 
         assert response.status_code == HTTP_201_CREATED
         assert response.json()["node"]["reusable"] == reusable
+
+    @pytest.mark.parametrize(
+        "filters, expected_hostnames",
+        (
+            ({}, ["node-1", "node-2", "node-3", "other-4"]),
+            ({"pool": "pool-a"}, ["node-1", "node-2"]),
+            ({"state": "ready"}, ["node-1", "node-3"]),
+            ({"reusable": False}, ["node-2"]),
+            ({"hostname_prefix": "node-"}, ["node-1", "node-2", "node-3"]),
+            ({"hostname_prefix": "node_"}, []),
+            ({"pool": "pool-a", "state": "ready"}, ["node-1"]),
+        ),
+    )
+    async def test_retrieve_collection_filtered(
+        self, filters, expected_hostnames, client, db_async_session
+    ):
+        async with db_async_session.begin():
+            for idx, (hostname, pool, state, reusable) in enumerate(
+                (
+                    ("node-1", "pool-a", "ready", True),
+                    ("node-2", "pool-a", "deployed", False),
+                    ("node-3", "pool-b", "ready", True),
+                    ("other-4", "pool-b", "unused", True),
+                ),
+                1,
+            ):
+                db_async_session.add(
+                    Node(
+                        hostname=hostname,
+                        ipaddr=f"192.0.2.{idx}",
+                        pool=pool,
+                        state=state,
+                        reusable=reusable,
+                    )
+                )
+
+        response = await client.get(self.path, params=filters)
+        assert response.status_code == HTTP_200_OK
+        result = response.json()
+        assert [node["hostname"] for node in result["nodes"]] == expected_hostnames
+
+    @pytest.mark.parametrize("with_data", (True, False))
+    async def test_retrieve_collection_paginated(self, with_data, client, db_async_session):
+        async with db_async_session.begin():
+            for idx in range(1, 6):
+                db_async_session.add(
+                    Node(
+                        hostname=f"node-{idx}",
+                        ipaddr=f"192.0.2.{idx}",
+                        pool="pool-a",
+                        data={"index": idx},
+                    )
+                )
+
+        nodes = []
+        params = {"limit": 2, "with_data": with_data}
+        while True:
+            response = await client.get(self.path, params=params)
+            assert response.status_code == HTTP_200_OK
+            result = response.json()
+            nodes.extend(result["nodes"])
+            if not result["next_cursor"]:
+                break
+            params["after"] = result["next_cursor"]
+
+        assert [node["hostname"] for node in nodes] == [f"node-{idx}" for idx in range(1, 6)]
+        if with_data:
+            assert [node["data"] for node in nodes] == [{"index": idx} for idx in range(1, 6)]
+        else:
+            assert all("data" not in node for node in nodes)
+
+    @pytest.mark.parametrize(
+        "params", ({}, {"with_data": False}, {"include_retired": True}, {"fields": "id,data"})
+    )
+    @mock.patch.object(node_module, "STREAM_CHUNK_SIZE", 2)
+    async def test_retrieve_collection_streamed(self, params, client, db_async_session):
+        async with db_async_session.begin():
+            for idx in range(1, 6):
+                node = Node(
+                    hostname=f"node-{idx}",
+                    ipaddr=f"192.0.2.{idx}",
+                    pool="pool-a",
+                    data={"index": idx},
+                )
+                if idx == 2:
+                    node.retired_at = dt.datetime.now(dt.timezone.utc)
+                db_async_session.add(node)
+
+        response = await client.get(
+            self.path, params=params, headers={"Accept": "application/x-ndjson"}
+        )
+
+        assert response.status_code == HTTP_200_OK
+        assert response.headers["content-type"] == "application/x-ndjson"
+        streamed_nodes = [json.loads(line) for line in response.text.splitlines()]
+
+        # The streamed nodes are the same as the ones in the JSON listing.
+        expected_nodes = (await client.get(self.path, params=params)).json()["nodes"]
+        assert streamed_nodes == expected_nodes
+
+        if params.get("include_retired"):
+            assert [node["id"] for node in streamed_nodes] == [1, 2, 3, 4, 5]
+            assert [node["active"] for node in streamed_nodes] == [True, False, True, True, True]
+        else:
+            assert [node["id"] for node in streamed_nodes] == [1, 3, 4, 5]
+
+    @pytest.mark.parametrize("fields", ("id,hostname,ipaddr", "id,data"))
+    @pytest.mark.parametrize("endpoint", ("collection", "obj"))
+    async def test_retrieve_fields(self, endpoint, fields, client, db_async_session):
+        async with db_async_session.begin():
+            node = Node(hostname="node-1", ipaddr="192.0.2.1", pool="pool-a", data={"foo": "bar"})
+            db_async_session.add(node)
+
+        if endpoint == "collection":
+            response = await client.get(self.path, params={"fields": fields})
+        else:
+            response = await client.get(f"{self.path}/{node.id}", params={"fields": fields})
+
+        assert response.status_code == HTTP_200_OK
+        result = response.json()
+        if endpoint == "collection":
+            (result_node,) = result["nodes"]
+            assert result["next_cursor"] is None
+        else:
+            result_node = result["node"]
+
+        if fields == "id,hostname,ipaddr":
+            assert result_node == {"id": node.id, "hostname": "node-1", "ipaddr": "192.0.2.1"}
+        else:
+            assert result_node == {"id": node.id, "data": {"foo": "bar"}}
+
+    @pytest.mark.parametrize("streamed", (False, True))
+    async def test_retrieve_fields_override_with_data(self, streamed, client, db_async_session):
+        async with db_async_session.begin():
+            node = Node(hostname="node-1", ipaddr="192.0.2.1", pool="pool-a", data={"foo": "bar"})
+            db_async_session.add(node)
+
+        headers = {"Accept": "application/x-ndjson"} if streamed else {}
+        response = await client.get(
+            self.path, params={"with_data": False, "fields": "id,data"}, headers=headers
+        )
+
+        assert response.status_code == HTTP_200_OK
+        if streamed:
+            result_nodes = [json.loads(line) for line in response.text.splitlines()]
+        else:
+            result_nodes = response.json()["nodes"]
+        assert result_nodes == [{"id": node.id, "data": {"foo": "bar"}}]
+
+    @pytest.mark.parametrize("endpoint", ("collection", "obj"))
+    async def test_retrieve_fields_unknown(self, endpoint, client):
+        path = self.path if endpoint == "collection" else f"{self.path}/1"
+        response = await client.get(path, params={"fields": "id,boo"})
+        assert response.status_code == HTTP_422_UNPROCESSABLE_ENTITY
+        assert response.json()["detail"] == "unknown field: boo"
@@ -1,16 +1,43 @@
 from unittest import mock
 
 import pytest
-from starlette.status import HTTP_200_OK, HTTP_404_NOT_FOUND, HTTP_422_UNPROCESSABLE_ENTITY
+from sqlalchemy import literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.status import (
+    HTTP_200_OK,
+    HTTP_304_NOT_MODIFIED,
+    HTTP_404_NOT_FOUND,
+    HTTP_422_UNPROCESSABLE_ENTITY,
+)
 
+from duffy.app.pool_cache import pool_levels_cache
 from duffy.database.model import Node
+from duffy.tasks import events
 
 
 class MockPool(dict):
-    def __init__(self, name, **kwargs):
+    def __init__(self, name, autoscale_policy=None, **kwargs):
         self.name = name
+        self.autoscale_policy = autoscale_policy
         super().__init__(**kwargs)
 
+    def target_fill_level(self, allocation_counts=None):
+        if self.autoscale_policy:
+            return self.autoscale_policy.target_fill_level(allocation_counts)
+        return self["fill-level"]
+
+
+@pytest.fixture
+def enabled_pool_levels_cache():
+    pool_levels_cache.ttl = 60.0
+    events.local_subscribers.append(pool_levels_cache.process_events)
+    try:
+        yield pool_levels_cache
+    finally:
+        events.local_subscribers.remove(pool_levels_cache.process_events)
+        pool_levels_cache.ttl = 0.0
+        pool_levels_cache.invalidate()
+
 
 @pytest.mark.duffy_config(example_config=True, clear=True)
 class TestPool:
@@ -28,14 +55,101 @@ class TestPool:
 
         assert result["pools"] == [{"name": "bar", "fill-level": 64}]
 
+    @mock.patch("duffy.app.controllers.pool.ConcreteNodePool")
+    async def test_get_all_pools_with_levels(
+        self, ConcreteNodePool, client, db_async_session, db_async_model_initialized
+    ):
+        ConcreteNodePool.iter_pools.return_value = [
+            MockPool(name="foo"),  # missing fill-level, shouldn't be listed
+            MockPool(name="bar", **{"fill-level": 64}),
+            MockPool(name="baz", **{"fill-level": 2}),
+        ]
+
+        async with db_async_session.begin():
+            ipaddr_octet = 1
+            for pool, state, quantity in (
+                ("bar", "ready", 3),
+                ("bar", "deployed", 2),
+                ("bar", "done", 4),  # not counted
+                ("foo", "ready", 1),
+            ):
+                for idx in range(quantity):
+                    ipaddr_octet += 1
+                    db_async_session.add(
+                        Node(
+                            hostname=f"node-{ipaddr_octet}",
+                            ipaddr=f"192.168.1.{ipaddr_octet}",
+                            pool=pool,
+                            state=state,
+                        )
+                    )
+
+        with mock.patch.object(
+            AsyncSession, "execute", autospec=True, side_effect=AsyncSession.execute
+        ) as execute:
+            response = await client.get("/api/v1/pools", params={"levels": True})
+
+        assert response.status_code == HTTP_200_OK
+        assert response.json()["pools"] == [
+            {
+                "name": "bar",
+                "fill-level": 64,
+                "levels": {
+                    "provisioning": 0,
+                    "ready": 3,
+                    "contextualizing": 0,
+                    "deployed": 2,
+                    "deprovisioning": 0,
+                },
+            },
+            {
+                "name": "baz",
+                "fill-level": 2,
+                "levels": {
+                    "provisioning": 0,
+                    "ready": 0,
+                    "contextualizing": 0,
+                    "deployed": 0,
+                    "deprovisioning": 0,
+                },
+            },
+        ]
+        # The levels of all pools are looked up in one query, without counting nodes.
+        queries = [str(call.args[1]) for call in execute.call_args_list]
+        assert len([query for query in queries if "FROM pool_levels" in query]) == 1
+        assert not any("FROM nodes" in query for query in queries)
+
+    @mock.patch("duffy.app.controllers.pool.ConcreteNodePool")
+    async def test_get_all_pools_with_levels_no_pools(self, ConcreteNodePool, client):
+        ConcreteNodePool.iter_pools.return_value = []
+
+        response = await client.get("/api/v1/pools", params={"levels": True})
+
+        assert response.status_code == HTTP_200_OK
+        assert response.json()["pools"] == []
+
+    @pytest.mark.parametrize("autoscale", (False, True))
     @pytest.mark.parametrize("pool", ("foo", "bar", "baz"))
     @mock.patch("duffy.app.controllers.pool.ConcreteNodePool")
     async def test_get_pools(
-        self, ConcreteNodePool, pool, client, db_async_session, db_async_model_initialized
+        self,
+        ConcreteNodePool,
+        pool,
+        autoscale,
+        client,
+        db_async_session,
+        db_async_model_initialized,
     ):
+        if autoscale:
+            autoscale_policy = mock.Mock()
+            autoscale_policy.allocations_query.return_value = select(literal(3), literal(1))
+            autoscale_policy.target_fill_level.return_value = 7
+        else:
+            autoscale_policy = None
+
         ConcreteNodePool.known_pools = {
             "foo": MockPool(name="foo"),  # missing fill-level, shouldn't be listed
-            "bar": MockPool(name="bar", **{"fill-level": 64}),
+            "bar": MockPool(name="bar", autoscale_policy=autoscale_policy, **{"fill-level": 64}),
         }
 
         async with db_async_session.begin():
@@ -59,6 +173,7 @@ class TestPool:
                 "pool": {
                     "name": "bar",
                     "fill-level": 64,
+                    "target-fill-level": 7 if autoscale else 64,
                     "levels": {
                         "provisioning": 0,
                         "ready": 3,
@@ -82,5 +197,114 @@ class TestPool:
 
         if expected_result:
             assert result == expected_result
+
+            if autoscale:
+                autoscale_policy.allocations_query.assert_called_once_with("bar")
+                autoscale_policy.target_fill_level.assert_called_once_with((3, 1))
         else:
             assert "detail" in result
+
+    @mock.patch("duffy.app.controllers.pool.ConcreteNodePool")
+    async def test_get_pool_conditional(
+        self, ConcreteNodePool, client, db_async_session, db_async_model_initialized
+    ):
+        ConcreteNodePool.known_pools = {"bar": MockPool(name="bar", **{"fill-level": 64})}
+
+        async with db_async_session.begin():
+            node = Node(hostname="node-1", ipaddr="192.168.1.1", pool="bar", state="ready")
+            db_async_session.add(node)
+
+        response = await client.get("/api/v1/pools/bar")
+        assert response.status_code == HTTP_200_OK
+        etag = response.headers["etag"]
+
+        response = await client.get("/api/v1/pools/bar", headers={"If-None-Match": etag})
+        assert response.status_code == HTTP_304_NOT_MODIFIED
+        assert response.headers["etag"] == etag
+        assert not response.content
+
+        async with db_async_session.begin():
+            node.state = "deployed"
+
+        response = await client.get("/api/v1/pools/bar", headers={"If-None-Match": etag})
+        assert response.status_code == HTTP_200_OK
+        assert response.headers["etag"] != etag
+        assert response.json()["pool"]["levels"]["deployed"] == 1
+
+    @mock.patch("duffy.app.controllers.pool.ConcreteNodePool")
+    async def test_get_pool_cached(
+        self,
+        ConcreteNodePool,
+        client,
+        db_async_session,
+        db_async_model_initialized,
+        enabled_pool_levels_cache,
+    ):
+        ConcreteNodePool.known_pools = {"bar": MockPool(name="bar", **{"fill-level": 64})}
+        ConcreteNodePool.iter_pools.return_value = ConcreteNodePool.known_pools.values()
+
+        async with db_async_session.begin():
+            node = Node(hostname="node-1", ipaddr="192.168.1.1", pool="bar", state="ready")
+            db_async_session.add(node)
+
+        with mock.patch.object(
+            AsyncSession, "execute", autospec=True, side_effect=AsyncSession.execute
+        ) as execute:
+            response = await client.get("/api/v1/pools/bar")
+            assert response.json()["pool"]["levels"]["ready"] == 1
+
+            response = await client.get("/api/v1/pools", params={"levels": True})
+            assert response.json()["pools"][0]["levels"]["ready"] == 1
+
+            # The levels were looked up only once.
+            queries = [str(call.args[1]) for call in execute.call_args_list]
+            assert len([query for query in queries if "FROM pool_levels" in query]) == 1
+
+            # Changing the pool drops its cached levels.
+            async with db_async_session.begin():
+                node.state = "deployed"
+
+            response = await client.get("/api/v1/pools/bar")
+            assert response.json()["pool"]["levels"]["ready"] == 0
+            assert response.json()["pool"]["levels"]["deployed"] == 1
+
+    @mock.patch("duffy.app.controllers.pool.ConcreteNodePool")
+    async def test_get_pool_cached_allocation_counts(
+        self,
+        ConcreteNodePool,
+        client,
+        db_async_session,
+        db_async_model_initialized,
+        enabled_pool_levels_cache,
+    ):
+        autoscale_policy = mock.Mock()
+        autoscale_policy.allocations_query.return_value = select(literal(3), literal(1))
+        autoscale_policy.target_fill_level.return_value = 7
+        ConcreteNodePool.known_pools = {
+            "bar": MockPool(name="bar", autoscale_policy=autoscale_policy, **{"fill-level": 64})
+        }
+
+        async with db_async_session.begin():
+            node = Node(hostname="node-1", ipaddr="192.168.1.1", pool="bar", state="ready")
+            db_async_session.add(node)
+
+        response = await client.get("/api/v1/pools/bar")
+        assert response.status_code == HTTP_200_OK
+        etag = response.headers["etag"]
+
+        # Neither a conditional request nor a repeated one counts allocations again.
+        response = await client.get("/api/v1/pools/bar", headers={"If-None-Match": etag})
+        assert response.status_code == HTTP_304_NOT_MODIFIED
+        response = await client.get("/api/v1/pools/bar")
+        assert response.json()["pool"]["target-fill-level"] == 7
+
+        autoscale_policy.allocations_query.assert_called_once_with("bar")
+        assert autoscale_policy.target_fill_level.call_args_list == 3 * [mock.call((3, 1))]
+
+        # Changing the pool drops its cached allocation counts.
+        async with db_async_session.begin():
+            node.state = "deployed"
+
+        response = await client.get("/api/v1/pools/bar")
+        assert response.status_code == HTTP_200_OK
+        assert autoscale_policy.allocations_query.call_count == 2
@@ -1,9 +1,11 @@
 import asyncio
 import datetime as dt
+import json
 import re
 import uuid
 from collections import defaultdict
 from contextlib import nullcontext
+from operator import itemgetter
 from unittest import mock
 
 import pytest
@@ -12,23 +14,40 @@ from sqlalchemy import func, select
 from starlette.status import (
     HTTP_200_OK,
     HTTP_201_CREATED,
+    HTTP_304_NOT_MODIFIED,
     HTTP_403_FORBIDDEN,
     HTTP_404_NOT_FOUND,
     HTTP_422_UNPROCESSABLE_ENTITY,
     HTTP_503_SERVICE_UNAVAILABLE,
 )
 
+from duffy.api_models import SessionModel
 from duffy.app.controllers import session as session_module
-from duffy.database.model import Node, Session, Tenant
+from duffy.app.fields import FieldSelection
+from duffy.app.serialization import json_dumps
+from duffy.database.model import Node, OutboxMessage, Session, SessionNode, Tenant
 from duffy.database.setup import _gen_test_api_key
+from duffy.tasks import deprovision_nodes, fill_pools
 
 from . import BaseTestController
 
 datetime_adapter = TypeAdapter(dt.datetime)
 
 
+async def _outbox_kwargs(db_async_session, task):
+    """Look up the keyword arguments of messages in the outbox for a task."""
+    return (
+        (
+            await db_async_session.execute(
+                select(OutboxMessage.kwargs).filter_by(task=task.name).order_by(OutboxMessage.id)
+            )
+        )
+        .scalars()
+        .all()
+    )
+
+
 @pytest.mark.duffy_config(example_config=True)
-@mock.patch("duffy.app.controllers.session.fill_pools", new=mock.MagicMock())
 class TestSession(BaseTestController):
     name = "session"
     path = "/api/v1/sessions"
@@ -55,10 +74,8 @@ class TestSession(BaseTestController):
     @pytest.mark.usefixtures("db_async_test_data")
     @mock.patch("duffy.app.controllers.session.decontextualize")
     @mock.patch("duffy.app.controllers.session.contextualize")
-    @mock.patch("duffy.app.controllers.session.fill_pools")
     async def test_create_with_retries(
         self,
-        fill_pools,
         contextualize,
         decontextualize,
         client,
@@ -173,6 +190,330 @@ class TestSession(BaseTestController):
         result = response.json()
         assert all(session["tenant"]["id"] == auth_tenant.id for session in result["sessions"])
 
+    async def test_retrieve_collection_paginated(self, client, db_async_session, auth_tenant):
+        async with db_async_session.begin():
+            for i in range(5):
+                db_async_session.add(Session(tenant_id=auth_tenant.id))
+
+        session_ids = []
+        params = {"limit": 2}
+        while True:
+            response = await client.get(self.path, params=params)
+            assert response.status_code == HTTP_200_OK
+            result = response.json()
+            session_ids.extend(session["id"] for session in result["sessions"])
+            assert len(result["sessions"]) <= 2
+            if not result["next_cursor"]:
+                break
+            params["after"] = result["next_cursor"]
+
+        assert session_ids == [1, 2, 3, 4, 5]
+
+    async def test_retrieve_collection_unpaginated(self, client, db_async_session, auth_tenant):
+        async with db_async_session.begin():
+            for i in range(3):
+                db_async_session.add(Session(tenant_id=auth_tenant.id))
+
+        response = await client.get(self.path)
+        result = response.json()
+        assert [session["id"] for session in result["sessions"]] == [1, 2, 3]
+        assert result["next_cursor"] is None
+
+    @pytest.mark.parametrize("limit", (None, 2))
+    async def test_session_views(self, limit, db_async_session, auth_tenant):
+        other_tenant = await self._create_tenant(db_async_session)
+        now = dt.datetime.now(dt.timezone.utc)
+
+        async with db_async_session.begin():
+            for idx in range(4):
+                session = Session(
+                    tenant_id=other_tenant.id if idx % 2 else auth_tenant.id,
+                    expires_at=now + dt.timedelta(hours=idx),
+                    data={"nodes_specs": [{"pool": "pool-a", "quantity": idx}]},
+                )
+                if idx == 3:
+                    session.retired_at = now
+                db_async_session.add(session)
+                for node_idx in range(idx):
+                    node = Node(
+                        hostname=f"node-{idx}-{node_idx}",
+                        ipaddr=f"192.0.2.{10 * idx + node_idx}",
+                        pool="pool-a",
+                        state="deployed",
+                        data={"index": node_idx},
+                    )
+                    db_async_session.add(
+                        SessionNode(session=session, node=node, pool="pool-a", data={})
+                    )
+            await db_async_session.flush()
+
+        query = session_module.KeysetPagination(limit=limit).apply(select(Session), Session.id)
+
+        views = await session_module._session_views(db_async_session, query)
+
+        orm_query = query.options(*session_module._session_load_options(FieldSelection()))
+        db_async_session.expunge_all()
+        expected = [
+            SessionModel.model_validate(session).model_dump(mode="json")
+            for session in (await db_async_session.execute(orm_query)).scalars()
+        ]
+        for expected_session in expected:
+            expected_session["nodes"].sort(key=itemgetter("id"))
+
+        assert json.loads(json_dumps(views)) == expected
+        assert len(views) == (limit or 4)
+
+    async def test_session_views_empty(self, db_async_session):
+        assert await session_module._session_views(db_async_session, select(Session)) == []
+
+    @pytest.mark.parametrize("fields", (None, "id,nodes.hostname,tenant.name"))
+    @pytest.mark.parametrize("include_retired", (False, True))
+    @mock.patch.object(session_module, "STREAM_CHUNK_SIZE", 2)
+    async def test_retrieve_collection_streamed(
+        self, include_retired, fields, client, db_async_session, auth_tenant
+    ):
+        other_tenant = await self._create_tenant(db_async_session)
+        now = dt.datetime.now(dt.timezone.utc)
+
+        async with db_async_session.begin():
+            for idx in range(5):
+                session = Session(
+                    tenant_id=other_tenant.id if idx == 4 else auth_tenant.id,
+                    data={"nodes_specs": []},
+                )
+                if idx == 1:
+                    session.retired_at = now
+                node = Node(
+                    hostname=f"node-{idx}",
+                    ipaddr=f"192.0.2.{idx}",
+                    pool="pool-a",
+                    state="deployed",
+                    data={},
+                )
+                db_async_session.add(
+                    SessionNode(session=session, node=node, pool="pool-a", data={})
+                )
+
+        params = {"include_retired": include_retired}
+        if fields:
+            params["fields"] = fields
+
+        response = await client.get(
+            self.path, params=params, headers={"Accept": "application/x-ndjson"}
+        )
+
+        assert response.status_code == HTTP_200_OK
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = response.text.splitlines()
+        streamed_sessions = [json.loads(line) for line in lines]
+
+        # The streamed sessions are the same as the ones in the JSON listing.
+        expected_sessions = (await client.get(self.path, params=params)).json()["sessions"]
+        assert streamed_sessions == expected_sessions
+
+        if include_retired:
+            assert [session["id"] for session in streamed_sessions] == [1, 2, 3, 4, 5]
+        else:
+            assert [session["id"] for session in streamed_sessions] == [1, 3, 4, 5]
+
+        if fields:
+            assert streamed_sessions[0] == {
+                "id": 1,
+                "nodes": [{"hostname": "node-0"}],
+                "tenant": {"name": auth_tenant.name},
+            }
+
+    @pytest.mark.parametrize(
+        "fields",
+        ("id,nodes.hostname,nodes.ipaddr", "id,tenant.name,data", "nodes", "nodes.state"),
+    )
+    @pytest.mark.parametrize("endpoint", ("collection", "obj"))
+    async def test_retrieve_fields(self, endpoint, fields, client, db_async_session, auth_tenant):
+        async with db_async_session.begin():
+            session = Session(tenant_id=auth_tenant.id, data={"nodes_specs": []})
+            node = Node(
+                hostname="node-1",
+                ipaddr="192.0.2.1",
+                pool="pool-a",
+                state="deployed",
+                data={"foo": "bar"},
+            )
+            db_async_session.add(SessionNode(session=session, node=node, pool="pool-a", data={}))
+
+        if endpoint == "collection":
+            response = await client.get(self.path, params={"fields": fields})
+        else:
+            response = await client.get(f"{self.path}/{session.id}", params={"fields": fields})
+
+        assert response.status_code == HTTP_200_OK
+        result = response.json()
+        if endpoint == "collection":
+            (result_session,) = result["sessions"]
+        else:
+            result_session = result["session"]
+
+        if fields == "id,nodes.hostname,nodes.ipaddr":
+            assert result_session == {
+                "id": session.id,
+                "nodes": [{"hostname": "node-1", "ipaddr": "192.0.2.1"}],
+            }
+        elif fields == "id,tenant.name,data":
+            assert result_session == {
+                "id": session.id,
+                "tenant": {"name": auth_tenant.name},
+                "data": {"nodes_specs": []},
+            }
+        elif fields == "nodes":
+            assert result_session == {
+                "nodes": [
+                    {
+                        "id": node.id,
+                        "hostname": "node-1",
+                        "ipaddr": "192.0.2.1",
+                        "comment": None,
+                        "pool": "pool-a",
+                        "reusable": False,
+                        "data": {"foo": "bar"},
+                        "state": "deployed",
+                    }
+                ]
+            }
+        else:  # fields == "nodes.state"
+            assert result_session == {"nodes": [{"state": "deployed"}]}
+
+    @pytest.mark.parametrize("fields", (None, "id,nodes.state"))
+    async def test_retrieve_obj_conditional(self, fields, client, db_async_session, auth_tenant):
+        async with db_async_session.begin():
+            session = Session(tenant_id=auth_tenant.id, data={"nodes_specs": []})
+            node = Node(hostname="node-1", ipaddr="192.0.2.1", pool="pool-a", state="deployed")
+            db_async_session.add(SessionNode(session=session, node=node, pool="pool-a", data={}))
+
+        path = f"{self.path}/{session.id}"
+        params = {"fields": fields} if fields else {}
+
+        response = await client.get(path, params=params)
+        assert response.status_code == HTTP_200_OK
+        etag = response.headers["etag"]
+
+        response = await client.get(path, params=params, headers={"If-None-Match": etag})
+        assert response.status_code == HTTP_304_NOT_MODIFIED
+        assert response.headers["etag"] == etag
+        assert not response.content
+
+        # Other selections of fields are other representations of the session.
+        other_fields = "id" if fields else "nodes.state,id"
+        response = await client.get(
+            path, params={"fields": other_fields}, headers={"If-None-Match": etag}
+        )
+        assert response.status_code == HTTP_200_OK
+        assert response.headers["etag"] != etag
+
+        # The order in which fields are listed doesn't matter.
+        if fields:
+            response = await client.get(
+                path, params={"fields": "nodes.state,id"}, headers={"If-None-Match": etag}
+            )
+            assert response.status_code == HTTP_304_NOT_MODIFIED
+
+        # Changes of nodes change the session as well.
+        async with db_async_session.begin():
+            node.state = "done"
+
+        response = await client.get(path, params=params, headers={"If-None-Match": etag})
+        assert response.status_code == HTTP_200_OK
+        assert response.headers["etag"] != etag
+        etag = response.headers["etag"]
+        assert response.json()["session"]["nodes"][0]["state"] == "done"
+
+        async with db_async_session.begin():
+            session.active = False
+
+        response = await client.get(path, params=params, headers={"If-None-Match": etag})
+        assert response.status_code == HTTP_200_OK
+        assert response.headers["etag"] != etag
+
+    @pytest.mark.client_auth_as("tenant")
+    async def test_retrieve_obj_conditional_other_tenant(self, client, db_async_session):
+        other_tenant = await self._create_tenant(db_async_session)
+        async with db_async_session.begin():
+            session = Session(tenant=other_tenant)
+            db_async_session.add(session)
+
+        response = await client.get(f"{self.path}/{session.id}", headers={"If-None-Match": "*"})
+        assert response.status_code == HTTP_403_FORBIDDEN
+
+    @pytest.mark.parametrize("endpoint", ("collection", "obj"))
+    async def test_retrieve_fields_unknown(self, endpoint, client):
+        path = self.path if endpoint == "collection" else f"{self.path}/1"
+        response = await client.get(path, params={"fields": "id,nodes.boo"})
+        assert response.status_code == HTTP_422_UNPROCESSABLE_ENTITY
+        assert response.json()["detail"] == "unknown field: nodes.boo"
+
+    @pytest.mark.parametrize("limit", (0, session_module.KeysetPagination.max_limit + 1))
+    async def test_retrieve_collection_invalid_limit(self, client, limit):
+        response = await client.get(self.path, params={"limit": limit})
+        assert response.status_code == HTTP_422_UNPROCESSABLE_ENTITY
+
+    @pytest.mark.parametrize(
+        "filter_name",
+        (
+            "tenant_id",
+            "pool",
+            "node_state",
+            "created_after",
+            "created_before",
+            "expires_after",
+            "expires_before",
+        ),
+    )
+    async def test_retrieve_collection_filters(
+        self, filter_name, client, db_async_session, auth_tenant
+    ):
+        other_tenant = await self._create_tenant(db_async_session)
+        now = dt.datetime.now(dt.timezone.utc)
+
+        async with db_async_session.begin():
+            matching = Session(
+                tenant_id=auth_tenant.id,
+                created_at=now - dt.timedelta(hours=1),
+                expires_at=now + dt.timedelta(hours=1),
+            )
+            nonmatching = Session(
+                tenant_id=other_tenant.id,
+                created_at=now - dt.timedelta(days=1),
+                expires_at=now + dt.timedelta(days=1),
+            )
+            db_async_session.add_all((matching, nonmatching))
+            for idx, (session, pool, state) in enumerate(
+                ((matching, "pool-a", "deployed"), (nonmatching, "pool-b", "done")), 1
+            ):
+                node = Node(
+                    hostname=f"{pool}.example.net",
+                    ipaddr=f"192.0.2.{idx}",
+                    pool=pool,
+                    state=state,
+                )
+                db_async_session.add(SessionNode(session=session, node=node, pool=pool, data={}))
+
+        params = {
+            "tenant_id": auth_tenant.id,
+            "pool": "pool-a",
+            "node_state": "deployed",
+            "created_after": (now - dt.timedelta(hours=2)).isoformat(),
+            "created_before": (now - dt.timedelta(hours=2)).isoformat(),
+            "expires_after": (now + dt.timedelta(hours=2)).isoformat(),
+            "expires_before": (now + dt.timedelta(hours=2)).isoformat(),
+        }
+        expected_id = {
+            "created_before": nonmatching.id,
+            "expires_after": nonmatching.id,
+        }.get(filter_name, matching.id)
+
+        response = await client.get(self.path, params={filter_name: params[filter_name]})
+        assert response.status_code == HTTP_200_OK
+        result = response.json()
+        assert [session["id"] for session in result["sessions"]] == [expected_id]
+
 
 @pytest.mark.duffy_config(example_config=True)
 @pytest.mark.usefixtures("db_async_test_data", "db_async_model_initialized")
@@ -201,10 +542,8 @@ class TestSessionWorkflow:
     )
     @mock.patch("duffy.app.controllers.session.decontextualize")
     @mock.patch("duffy.app.controllers.session.contextualize")
-    @mock.patch("duffy.app.controllers.session.fill_pools")
     async def test_request_session(
         self,
-        fill_pools,
         contextualize,
         decontextualize,
         testcase,
@@ -239,23 +578,27 @@ class TestSessionWorkflow:
             auth_tenant.node_quota = 0
             await db_async_session.commit()
 
-        response = await client.post(self.path, json=request_payload)
+        with mock.patch.object(
+            session_module, "disable_seqscan", wraps=session_module.disable_seqscan
+        ) as disable_seqscan:
+            response = await client.post(self.path, json=request_payload)
         result = response.json()
 
-        # fill_pools should never be called directly, just through .delay()
-        fill_pools.assert_not_called()
+        # Filling pools is left to the outbox relay.
+        outbox_kwargs = await _outbox_kwargs(db_async_session, fill_pools)
         if testcase == "normal" or "failure" in testcase:
-            fill_pools.delay.assert_called_once()
-            args, kwargs = fill_pools.delay.call_args
-            assert args == ()
-            assert kwargs.keys() == {"pool_names"}
-            assert set(kwargs["pool_names"]) == set(self.pool_names)
+            assert len(outbox_kwargs) == 1
+            assert outbox_kwargs[0].keys() == {"pool_names"}
+            assert set(outbox_kwargs[0]["pool_names"]) == set(self.pool_names)
         else:
-            fill_pools.delay.assert_not_called()
+            assert outbox_kwargs == []
 
         if testcase == "normal":
             assert response.status_code == HTTP_201_CREATED
 
+            # Both transactions allocating nodes disable sequential scans.
+            assert disable_seqscan.call_count == 2
+
             # validate nodes have been allocated in the database
             for nodes_spec in self.nodes_specs:
                 nodes_spec = nodes_spec.copy()
@@ -267,6 +610,15 @@ class TestSessionWorkflow:
                 )
                 assert count_result.scalar_one() == quantity
 
+            # validate that only the nodes specs are stored with the session nodes
+            session_nodes_data = (
+                (await db_async_session.execute(select(SessionNode.data))).scalars().all()
+            )
+            assert sorted(data["nodes_spec"]["pool"] for data in session_nodes_data) == sorted(
+                spec["pool"] for spec in self.nodes_specs for _ in range(spec["quantity"])
+            )
+            assert all(data.keys() == {"nodes_spec"} for data in session_nodes_data)
+
             # validate that the result lists the nodes
             session = result["session"]
             nodes = session["nodes"]
@@ -331,10 +683,8 @@ class TestSessionWorkflow:
     )
     @mock.patch("duffy.app.controllers.session.decontextualize")
     @mock.patch("duffy.app.controllers.session.contextualize")
-    @mock.patch("duffy.app.controllers.session.fill_pools")
     async def test_request_session_concurrently(
         self,
-        fill_pools,
         contextualize,
         decontextualize,
         testcase,
@@ -404,8 +754,17 @@ class TestSessionWorkflow:
             responses_per_code = defaultdict(set)
             for response in responses:
                 responses_per_code[response.status_code].add(response)
-            assert len(responses_per_code[HTTP_201_CREATED]) == 1
-            assert len(responses_per_code[HTTP_422_UNPROCESSABLE_ENTITY]) == len(responses) - 1
+            # How many requests conflict depends on the granularity of the predicate locks taken
+            # when reading through indexes, but at least one has to succeed and one has to fail.
+            assert 1 <= len(responses_per_code[HTTP_201_CREATED]) < len(responses)
+            assert len(responses_per_code[HTTP_422_UNPROCESSABLE_ENTITY]) == len(responses) - len(
+                responses_per_code[HTTP_201_CREATED]
+            )
+            allocated_node_ids = [
+                response.json()["session"]["nodes"][0]["id"]
+                for response in responses_per_code[HTTP_201_CREATED]
+            ]
+            assert len(set(allocated_node_ids)) == len(allocated_node_ids)
 
         if "exceed-attempts" in testcase or "exact-attempts" in testcase:
             assert f"Attempt 2 of {no_attempts}" not in caplog.text
@@ -413,7 +772,6 @@ class TestSessionWorkflow:
             assert f"Attempt 2 of {no_attempts}" in caplog.text
 
     @mock.patch("duffy.nodes.context.run_remote_cmd", new=mock.AsyncMock())
-    @mock.patch("duffy.app.controllers.session.fill_pools", new=mock.MagicMock())
     @pytest.mark.parametrize(
         "testcase",
         (
@@ -428,9 +786,8 @@ class TestSessionWorkflow:
             "unauthorized",
         ),
     )
-    @mock.patch("duffy.app.controllers.session.deprovision_nodes")
     async def test_update_session(
-        self, deprovision_nodes, testcase, client, db_async_session, auth_tenant, auth_admin
+        self, testcase, client, db_async_session, auth_tenant, auth_admin
     ):
         if "auth-admin" in testcase:
             client.auth = (auth_admin.name, str(_gen_test_api_key(auth_admin.name)))
@@ -490,8 +847,8 @@ class TestSessionWorkflow:
         update_response = await client.put(f"{self.path}/{session_id}", json=request_payload)
         update_result = update_response.json()
 
-        # The task function should never be called directly.
-        deprovision_nodes.assert_not_called()
+        # Deprovisioning nodes is left to the outbox relay.
+        outbox_kwargs = await _outbox_kwargs(db_async_session, deprovision_nodes)
 
         if "normal" in testcase:
             assert update_response.status_code == HTTP_200_OK
@@ -500,15 +857,13 @@ class TestSessionWorkflow:
 
             if "active" in testcase:
                 if session_active:
-                    deprovision_nodes.delay.assert_not_called()
+                    assert outbox_kwargs == []
                     assert updated_session["active"] is True
                     assert updated_session["retired_at"] is None
                 else:
-                    deprovision_nodes.delay.assert_called_once()
-                    args, kwargs = deprovision_nodes.delay.call_args
-                    assert args == ()
-                    assert kwargs.keys() == {"node_ids"}
-                    assert set(kwargs["node_ids"]) == {
+                    assert len(outbox_kwargs) == 1
+                    assert outbox_kwargs[0].keys() == {"node_ids"}
+                    assert set(outbox_kwargs[0]["node_ids"]) == {
                         node["id"] for node in created_session["nodes"]
                     }
                     assert updated_session["active"] is False
@@ -520,7 +875,7 @@ class TestSessionWorkflow:
                     == new_expires_at
                 )
         else:
-            deprovision_nodes.delay.assert_not_called()
+            assert outbox_kwargs == []
             if testcase == "unknown-session":
                 assert update_response.status_code == HTTP_404_NOT_FOUND
             elif testcase == "unauthorized":
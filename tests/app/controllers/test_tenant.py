@@ -1,8 +1,10 @@
 import datetime as dt
 import uuid
+from unittest import mock
 
 import pytest
-from sqlalchemy import select
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import create_async_engine
 from starlette.status import (
     HTTP_200_OK,
     HTTP_201_CREATED,
@@ -11,6 +13,7 @@ from starlette.status import (
     HTTP_422_UNPROCESSABLE_ENTITY,
 )
 
+from duffy.app.database import LAST_WRITE_COOKIE
 from duffy.database.model import Session, Tenant
 from duffy.database.setup import _gen_test_api_key
 
@@ -37,6 +40,38 @@ class TestTenant(BaseTestController):
         result = response.json()
         self._verify_item(result[self.name])
 
+    @pytest.mark.client_auth_as("admin")
+    async def test_read_replica(self, client, db_async_model_initialized, postgresql_async_url):
+        # Pretend a second engine connected to the same database is a replica.
+        replica_engine = create_async_engine(postgresql_async_url)
+        replica_statements = []
+
+        @event.listens_for(replica_engine.sync_engine, "before_cursor_execute")
+        def record_statement(conn, cursor, statement, *args):
+            replica_statements.append(statement)
+
+        try:
+            with mock.patch("duffy.database.async_read_engines", [replica_engine]), mock.patch(
+                "duffy.app.database.async_read_engines", [replica_engine]
+            ), mock.patch("duffy.app.middleware.async_read_engines", [replica_engine]):
+                # Reads go to the replica, but tenants are authenticated on the primary.
+                response = await client.get(self.path)
+                assert response.status_code == HTTP_200_OK
+                assert any("FROM tenants" in statement for statement in replica_statements)
+                assert not any("tenants.name =" in statement for statement in replica_statements)
+
+                # After writing, the client reads from the primary for a while.
+                response = await self._create_obj(client)
+                assert response.status_code == HTTP_201_CREATED
+                assert LAST_WRITE_COOKIE in response.cookies
+
+                replica_statements.clear()
+                response = await client.get(f"{self.path}/{response.json()['tenant']['id']}")
+                assert response.status_code == HTTP_200_OK
+                assert not replica_statements
+        finally:
+            await replica_engine.dispose()
+
     async def test_create_obj_verify_api_key(self, client, db_async_session):
         response = await self._create_obj(client)
         assert response.status_code == HTTP_201_CREATED
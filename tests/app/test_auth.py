@@ -1,3 +1,4 @@
+import inspect
 from contextlib import nullcontext
 from unittest import mock
 
@@ -7,6 +8,7 @@ from sqlalchemy import select
 from starlette.status import HTTP_401_UNAUTHORIZED, HTTP_403_FORBIDDEN
 
 from duffy.app.auth import _req_tenant_factory
+from duffy.app.database import req_db_async_primary_read_only_session, req_db_async_session
 from duffy.database.model import Tenant
 from duffy.database.setup import _gen_test_api_key
 
@@ -71,3 +73,15 @@ async def test__req_tenant_factory(testcase, db_async_session, db_async_test_dat
             # ensure not testcase is overlooked
             assert "optional" in testcase
             assert tenant is None
+
+
+@pytest.mark.parametrize("read_only", (False, True))
+def test__req_tenant_factory_db_session(read_only):
+    get_req_tenant = _req_tenant_factory(read_only=read_only)
+
+    db_session_dependency = inspect.signature(get_req_tenant).parameters["db_async_session"].default
+
+    if read_only:
+        assert db_session_dependency.dependency is req_db_async_primary_read_only_session
+    else:
+        assert db_session_dependency.dependency is req_db_async_session
@@ -1,6 +1,27 @@
+import time
 from unittest import mock
 
-from duffy.app.database import req_db_async_session
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from duffy.app.database import (
+    LAST_WRITE_COOKIE,
+    read_only_db_async_session,
+    replica_max_lag,
+    req_db_async_primary_read_only_session,
+    req_db_async_read_only_session,
+    req_db_async_session,
+    wrote_recently,
+)
+from duffy.configuration import config
+from duffy.database.model import Tenant
+
+DB_CONFIG = {
+    "database": {
+        "sqlalchemy": {"sync_url": "sqlite:///", "async_url": "sqlite+aiosqlite:///"},
+    }
+}
 
 
 @mock.patch("duffy.app.database.async_session_maker")
@@ -14,3 +35,132 @@ async def test_req_db_async_session(async_session_maker):
         assert db_async_session is mock_session
     mock_session.close.assert_awaited_with()
     assert n_iter == 1
+
+
+async def test_req_db_async_read_only_session(db_async_model_initialized):
+    request = mock.Mock(cookies={})
+
+    n_iter = 0
+    async for db_async_session in req_db_async_read_only_session(request):
+        n_iter += 1
+        isolation_level = (
+            await db_async_session.execute(text("SHOW transaction_isolation"))
+        ).scalar()
+        read_only = (await db_async_session.execute(text("SHOW transaction_read_only"))).scalar()
+        assert isolation_level == "repeatable read"
+        assert read_only == "on"
+
+        with pytest.raises(DBAPIError, match="read-only transaction"):
+            db_async_session.add(Tenant(name="tenant", ssh_key="BOOP", api_key="BEEP"))
+            await db_async_session.flush()
+    assert n_iter == 1
+
+
+@mock.patch("duffy.app.database.async_session_maker")
+async def test_read_only_db_async_session_other_dialect(async_session_maker):
+    mock_session = mock.AsyncMock()
+    mock_session.get_bind = mock.Mock()
+    mock_session.get_bind.return_value.dialect.name = "sqlite"
+    mock_session.__aenter__.return_value = mock_session
+    async_session_maker.return_value = mock_session
+
+    async with read_only_db_async_session() as db_async_session:
+        assert db_async_session is mock_session
+
+    # Nothing to set up for databases without predicate locking.
+    mock_session.connection.assert_not_awaited()
+
+
+@pytest.mark.parametrize("replica", (False, True))
+@mock.patch("duffy.app.database.next_async_read_engine")
+@mock.patch("duffy.app.database.async_session_maker")
+async def test_read_only_db_async_session_replica(
+    async_session_maker, next_async_read_engine, replica
+):
+    async_session_maker.return_value = mock_session = mock.AsyncMock()
+    mock_session.get_bind = mock.Mock()
+    mock_session.get_bind.return_value.dialect.name = "postgresql"
+    mock_session.__aenter__.return_value = mock_session
+
+    async with read_only_db_async_session(replica=replica) as db_async_session:
+        assert db_async_session is mock_session
+
+    if replica:
+        async_session_maker.assert_called_once_with(bind=next_async_read_engine.return_value)
+    else:
+        next_async_read_engine.assert_not_called()
+        async_session_maker.assert_called_once_with()
+    mock_session.connection.assert_awaited_once_with(
+        execution_options={"isolation_level": "REPEATABLE READ", "postgresql_readonly": True}
+    )
+
+
+@mock.patch("duffy.app.database.next_async_read_engine")
+async def test_read_only_db_async_session_no_replicas(
+    next_async_read_engine, db_async_model_initialized
+):
+    next_async_read_engine.return_value = None
+
+    async with read_only_db_async_session(replica=True) as db_async_session:
+        assert (await db_async_session.execute(text("SELECT 1"))).scalar() == 1
+
+
+@pytest.mark.parametrize("wrote", (False, True))
+@mock.patch("duffy.app.database.read_only_db_async_session")
+async def test_req_db_async_read_only_session_routing(read_only_db_async_session, wrote):
+    request = mock.Mock()
+
+    with mock.patch("duffy.app.database.wrote_recently", return_value=wrote) as wrote_recently:
+        async for db_async_session in req_db_async_read_only_session(request):
+            pass
+
+    wrote_recently.assert_called_once_with(request)
+    read_only_db_async_session.assert_called_once_with(replica=not wrote)
+
+
+@pytest.mark.parametrize("replica", (False, True))
+@mock.patch("duffy.app.database.read_only_db_async_session")
+async def test_req_db_async_primary_read_only_session(read_only_db_async_session, replica):
+    read_engine = mock.Mock()
+    db_async_session = mock.Mock(bind=read_engine if replica else mock.Mock())
+
+    with mock.patch("duffy.app.database.async_read_engines", [read_engine]):
+        async for db_async_primary_session in req_db_async_primary_read_only_session(
+            db_async_session
+        ):
+            pass
+
+    if replica:
+        read_only_db_async_session.assert_called_once_with()
+        assert (
+            db_async_primary_session
+            is read_only_db_async_session.return_value.__aenter__.return_value
+        )
+    else:
+        read_only_db_async_session.assert_not_called()
+        assert db_async_primary_session is db_async_session
+
+
+@pytest.mark.duffy_config(DB_CONFIG)
+@pytest.mark.parametrize("configured", (False, True))
+def test_replica_max_lag(configured):
+    if configured:
+        config["database"]["replica-max-lag"] = "1m"
+        assert replica_max_lag() == 60
+    else:
+        assert replica_max_lag() == 5
+
+
+@pytest.mark.duffy_config({"database": {**DB_CONFIG["database"], "replica-max-lag": 10}})
+@pytest.mark.parametrize("testcase", ("no-cookie", "invalid-cookie", "recent", "long-ago"))
+def test_wrote_recently(testcase):
+    if testcase == "no-cookie":
+        cookies = {}
+    elif testcase == "invalid-cookie":
+        cookies = {LAST_WRITE_COOKIE: "BOOP"}
+    elif testcase == "recent":
+        cookies = {LAST_WRITE_COOKIE: str(time.time() - 5)}
+    else:
+        cookies = {LAST_WRITE_COOKIE: str(time.time() - 15)}
+
+    assert wrote_recently(mock.Mock(cookies=cookies)) == (testcase == "recent")
@@ -0,0 +1,41 @@
+import pytest
+from starlette.requests import Request
+from starlette.status import HTTP_304_NOT_MODIFIED
+
+from duffy.app import etags
+
+
+def test_make_etag():
+    etag = etags.make_etag("session", 1, 2)
+
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etags.make_etag("session", 1, 2) == etag
+    assert etags.make_etag("session", 1, 3) != etag
+
+
+@pytest.mark.parametrize(
+    "if_none_match, expected",
+    (
+        (None, False),
+        ("", False),
+        ("*", True),
+        ('"abc"', True),
+        ('W/"abc"', True),
+        ('"def", W/"abc"', True),
+        ('"def"', False),
+        ("abc", False),
+    ),
+)
+def test_etag_matches(if_none_match, expected):
+    headers = [(b"if-none-match", if_none_match.encode("ascii"))] if if_none_match else []
+    request = Request({"type": "http", "headers": headers})
+
+    assert etags.etag_matches(request, '"abc"') is expected
+
+
+def test_not_modified():
+    response = etags.not_modified('"abc"')
+
+    assert response.status_code == HTTP_304_NOT_MODIFIED
+    assert response.headers["etag"] == '"abc"'
+    assert not response.body
@@ -0,0 +1,64 @@
+import asyncio
+from unittest import mock
+
+import pytest
+
+from duffy.app import event_publisher
+from duffy.tasks import events
+
+SESSION_EVENT = {"type": "session", "data": {"id": 1, "transition": "created"}}
+OTHER_SESSION_EVENT = {"type": "session", "data": {"id": 2, "transition": "created"}}
+
+
+@pytest.fixture
+def publisher():
+    publisher = event_publisher.EventPublisher()
+    yield publisher
+    events.publisher = events.publish_changes
+
+
+@mock.patch("duffy.app.event_publisher.events.publish_changes")
+class TestEventPublisher:
+    async def test_start_stop(self, publish_changes, publisher):
+        published = asyncio.Queue()
+        publish_changes.side_effect = lambda *args: published.put_nowait(args)
+
+        publisher.start()
+        runner = publisher._runner
+        assert events.publisher == publisher.submit
+
+        # Starting again doesn't start another runner.
+        publisher.start()
+        assert publisher._runner is runner
+
+        # Changes handed over together are published together.
+        events.publisher([SESSION_EVENT], {"pool-a"})
+        events.publisher([OTHER_SESSION_EVENT], {"pool-a", "pool-b"})
+        assert await asyncio.wait_for(published.get(), 1) == (
+            [SESSION_EVENT, OTHER_SESSION_EVENT],
+            {"pool-a", "pool-b"},
+        )
+
+        # Changes handed over until stopping are still published.
+        events.publisher([], {"pool-c"})
+        await publisher.stop()
+
+        assert publisher._runner is None
+        assert runner.cancelled()
+        assert events.publisher == events.publish_changes
+        assert publish_changes.call_args_list[-1] == mock.call([], {"pool-c"})
+
+        # Stopping again does nothing.
+        await publisher.stop()
+        assert publish_changes.call_count == 2
+
+    async def test_publish_failure(self, publish_changes, publisher, caplog):
+        publish_changes.side_effect = RuntimeError("BOOP")
+        publisher._session_events.append(SESSION_EVENT)
+
+        with caplog.at_level("DEBUG", "duffy"):
+            await publisher.publish()
+
+        publish_changes.assert_called_once_with([SESSION_EVENT], set())
+        assert "Publishing events failed: BOOP" in caplog.messages
+        assert publisher._session_events == []
@@ -0,0 +1,136 @@
+from typing import List, Optional
+
+import pytest
+from fastapi import HTTPException
+from pydantic import BaseModel, ConfigDict
+
+from duffy.app.fields import (
+    PARTIAL_MODEL_CACHE_SIZE,
+    FieldSelection,
+    _partial_model,
+    parse_fields,
+)
+
+
+class Inner(BaseModel):
+    name: str
+    value: int = 5
+    model_config = ConfigDict(from_attributes=True)
+
+
+class Outer(BaseModel):
+    id: int
+    inner: Inner
+    maybe_inner: Optional[Inner] = None
+    inners: List[Inner] = []
+    scalar: str = "foo"
+    model_config = ConfigDict(from_attributes=True)
+
+
+@pytest.mark.parametrize(
+    "fields, expected",
+    (
+        ("id", {"id": True}),
+        ("id, inner.name,,", {"id": True, "inner": {"name": True}}),
+        ("inner.name,inner", {"inner": True}),
+        ("inner,inner.name", {"inner": True}),
+        ("inners.name,inners.value", {"inners": {"name": True, "value": True}}),
+    ),
+)
+def test_parse_fields(fields, expected):
+    assert parse_fields(fields) == expected
+
+
+class TestFieldSelection:
+    def test_all(self):
+        selection = FieldSelection()
+
+        assert selection.all
+        assert selection.includes("anything")
+        assert selection.subselection("anything").all
+        assert selection.names() is None
+        assert selection.frozen() is None
+        assert selection.model(Outer) is Outer
+
+    def test_partial(self):
+        selection = FieldSelection.from_fields("id,inner.name,inners")
+
+        assert not selection.all
+        assert selection.includes("id")
+        assert selection.includes("inner")
+        assert not selection.includes("scalar")
+        assert selection.names() == ["id", "inner", "inners"]
+        assert selection.subselection("inner").names() == ["name"]
+        assert selection.subselection("inners").all
+        assert selection.subselection("scalar").names() == []
+
+    def test_serialize(self):
+        selection = FieldSelection.from_fields("id,inner.name,maybe_inner.value,inners.name")
+        obj = Outer(
+            id=1,
+            inner=Inner(name="inner"),
+            maybe_inner=Inner(name="maybe", value=3),
+            inners=[Inner(name="one"), Inner(name="two")],
+        )
+
+        assert selection.serialize(Outer, obj) == {
+            "id": 1,
+            "inner": {"name": "inner"},
+            "maybe_inner": {"value": 3},
+            "inners": [{"name": "one"}, {"name": "two"}],
+        }
+
+    @pytest.mark.parametrize("maybe_inner", (None, {"name": "maybe", "value": 3}))
+    def test_prune(self, maybe_inner):
+        view = {
+            "id": 1,
+            "inner": {"name": "inner", "value": 5},
+            "maybe_inner": maybe_inner,
+            "inners": [{"name": "one", "value": 5}, {"name": "two", "value": 5}],
+            "scalar": "foo",
+        }
+
+        assert FieldSelection().prune(view) is view
+        assert FieldSelection.from_fields("id,inner,maybe_inner.value,inners.name").prune(view) == {
+            "id": 1,
+            "inner": {"name": "inner", "value": 5},
+            "maybe_inner": maybe_inner and {"value": 3},
+            "inners": [{"name": "one"}, {"name": "two"}],
+        }
+
+    def test_frozen(self):
+        frozen = FieldSelection.from_fields("inners,id,inner.value,inner.name").frozen()
+
+        assert frozen == (
+            ("id", True),
+            ("inner", (("name", True), ("value", True))),
+            ("inners", True),
+        )
+        assert FieldSelection.from_fields("inner.name,id,inners,inner.value").frozen() == frozen
+        assert FieldSelection.from_fields("id,inner").frozen() != frozen
+
+    def test_model_is_cached(self):
+        model = FieldSelection.from_fields("id,inner.name").model(Outer)
+        assert FieldSelection.from_fields("inner.name,id").model(Outer) is model
+
+    def test_model_cache_is_bounded(self):
+        frozen = FieldSelection.from_fields("id").frozen()
+        for idx in range(PARTIAL_MODEL_CACHE_SIZE + 10):
+            _partial_model(Outer, frozen, f"path{idx}")
+
+        assert _partial_model.cache_info().currsize == PARTIAL_MODEL_CACHE_SIZE
+
+    @pytest.mark.parametrize(
+        "fields, detail",
+        (
+            ("id,boo", "unknown field: boo"),
+            ("inner.boo", "unknown field: inner.boo"),
+            ("scalar.boo", "field has no subfields: scalar"),
+        ),
+    )
+    def test_model_invalid(self, fields, detail):
+        with pytest.raises(HTTPException) as excinfo:
+            FieldSelection.from_fields(fields).model(Outer)
+
+        assert excinfo.value.status_code == 422
+        assert excinfo.value.detail == detail
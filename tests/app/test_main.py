@@ -4,7 +4,18 @@ from unittest import mock
 
 import pytest
 
-from duffy.app.main import app, init_model, init_tasks, post_process_config
+from duffy.app.main import (
+    app,
+    init_model,
+    init_tasks,
+    post_process_config,
+    start_event_publisher,
+    start_outbox_relay,
+    start_pool_cache,
+    stop_event_publisher,
+    stop_outbox_relay,
+    stop_pool_cache,
+)
 from duffy.exceptions import DuffyConfigurationError
 
 
@@ -57,7 +68,7 @@ class TestMain:
         with expectation as excinfo:
             await init_model()
 
-        init_sync_model.assert_called_once_with()
+        init_sync_model.assert_called_once_with(lazy=True)
         if config_error:
             init_async_model.assert_not_awaited()
             assert excinfo.value.code != 0
@@ -68,3 +79,33 @@ class TestMain:
     def test_init_tasks(self, tasks):
         init_tasks()
         tasks.init_tasks.assert_called_once_with()
+
+    @mock.patch("duffy.app.main.pool_levels_cache")
+    async def test_start_stop_pool_cache(self, pool_levels_cache):
+        pool_levels_cache.stop = mock.AsyncMock()
+
+        await start_pool_cache()
+        pool_levels_cache.start.assert_called_once_with()
+
+        await stop_pool_cache()
+        pool_levels_cache.stop.assert_awaited_once_with()
+
+    @mock.patch("duffy.app.main.event_publisher")
+    async def test_start_stop_event_publisher(self, event_publisher):
+        event_publisher.stop = mock.AsyncMock()
+
+        await start_event_publisher()
+        event_publisher.start.assert_called_once_with()
+
+        await stop_event_publisher()
+        event_publisher.stop.assert_awaited_once_with()
+
+    @mock.patch("duffy.app.main.outbox_relay")
+    async def test_start_stop_outbox_relay(self, outbox_relay):
+        outbox_relay.stop = mock.AsyncMock()
+
+        await start_outbox_relay()
+        outbox_relay.start.assert_called_once_with()
+
+        await stop_outbox_relay()
+        outbox_relay.stop.assert_awaited_once_with()
@@ -1,4 +1,5 @@
 import logging
+import time
 import uuid
 from contextlib import nullcontext
 from unittest import mock
@@ -11,9 +12,16 @@ from starlette.responses import PlainTextResponse
 from starlette.routing import Route
 
 from duffy.app import middleware
+from duffy.app.database import LAST_WRITE_COOKIE
 from duffy.app.logging import RequestIdFilter
 from duffy.cli import LOGGING_FORMAT
 
+DB_CONFIG = {
+    "database": {
+        "sqlalchemy": {"sync_url": "sqlite:///", "async_url": "sqlite+aiosqlite:///"},
+    }
+}
+
 
 @pytest.fixture(params=["real-uuid", "fake-uuid"])
 def uuid_kind(request):
@@ -72,3 +80,39 @@ class TestRequestIDMiddleware:
 
     async def test_in_duffy_app(self, uuid_kind, client, caplog):
         await self.run_basic_test(uuid_kind, client, caplog)
+
+
+@pytest.mark.duffy_config({"database": {**DB_CONFIG["database"], "replica-max-lag": 10}})
+class TestLastWriteCookieMiddleware:
+    @pytest.fixture
+    def app(self):
+        def endpoint(request):
+            return PlainTextResponse(
+                "Endpoint", status_code=int(request.query_params.get("status", 200))
+            )
+
+        return Starlette(
+            routes=[Route("/", endpoint=endpoint, methods=["GET", "HEAD", "POST", "PUT"])],
+            middleware=[Middleware(middleware.LastWriteCookieMiddleware)],
+        )
+
+    @pytest.mark.parametrize(
+        "testcase", ("get", "head", "post", "put", "post-failed", "post-no-replicas")
+    )
+    async def test_cookie(self, testcase, app):
+        method = testcase.split("-")[0].upper()
+        params = {"status": 422} if "failed" in testcase else {}
+        read_engines = [] if "no-replicas" in testcase else [mock.Mock()]
+
+        with mock.patch.object(middleware, "async_read_engines", read_engines):
+            async with AsyncClient(app=app, base_url="http://example.test/") as client:
+                before = time.time()
+                response = await client.request(method, "/", params=params)
+
+        if testcase in ("post", "put"):
+            cookie = response.headers["Set-Cookie"]
+            assert "Max-Age=11" in cookie
+            assert "HttpOnly" in cookie
+            assert before <= float(response.cookies[LAST_WRITE_COOKIE]) <= time.time()
+        else:
+            assert "Set-Cookie" not in response.headers
@@ -0,0 +1,104 @@
+import asyncio
+from unittest import mock
+
+import pytest
+
+from duffy.app import outbox_relay
+from duffy.configuration import config
+from duffy.tasks import outbox
+
+
+@pytest.fixture
+def relay():
+    relay = outbox_relay.OutboxRelay()
+    relay.batch_size = 2
+    yield relay
+    if relay.notify in outbox.local_relays:
+        outbox.local_relays.remove(relay.notify)
+
+
+@mock.patch("duffy.app.outbox_relay.outbox.relay_outbox")
+class TestOutboxRelay:
+    async def test_relay(self, relay_outbox, relay):
+        relay_outbox.side_effect = [2, 2, 1]
+
+        assert await relay.relay() == 5
+
+        assert relay_outbox.call_args_list == 3 * [mock.call(2)]
+
+    async def test_relay_failure(self, relay_outbox, relay, caplog):
+        relay_outbox.side_effect = [2, OSError("database unavailable")]
+
+        with caplog.at_level("DEBUG", "duffy"):
+            assert await relay.relay() == 2
+
+        assert "Relaying tasks from the outbox failed: database unavailable" in caplog.messages
+
+    def test_notify_not_started(self, relay_outbox, relay):
+        # Nothing to wake up yet.
+        relay.notify()
+
+    @pytest.mark.duffy_config({"app": {"outbox-relay": {"interval": "1h", "batch-size": 10}}})
+    @pytest.mark.parametrize("configured", (True, False))
+    async def test_start_stop(self, relay_outbox, configured, relay):
+        if not configured:
+            del config["app"]["outbox-relay"]
+
+        relayed = asyncio.Queue()
+
+        def relay_outbox_side_effect(batch_size):
+            relayed.put_nowait(batch_size)
+            return 0
+
+        relay_outbox.side_effect = relay_outbox_side_effect
+
+        relay.start()
+        runner = relay._runner
+
+        if configured:
+            assert relay.interval == 3600
+            assert relay.batch_size == 10
+        else:
+            assert relay.interval == 5
+            assert relay.batch_size == outbox.DEFAULT_BATCH_SIZE
+
+        # Starting again doesn't start another runner.
+        relay.start()
+        assert relay._runner is runner
+        assert outbox.local_relays.count(relay.notify) == 1
+
+        # The outbox is drained right away, and again when notified.
+        await asyncio.wait_for(relayed.get(), 1)
+        for notify in outbox.local_relays:
+            notify()
+        await asyncio.wait_for(relayed.get(), 1)
+
+        await relay.stop()
+
+        assert relay._runner is None
+        assert runner.cancelled()
+        assert relay.notify not in outbox.local_relays
+
+        # Stopping again does nothing.
+        await relay.stop()
+
+    @mock.patch("duffy.app.outbox_relay.asyncio.wait_for")
+    async def test_run_interval(self, wait_for, relay_outbox, relay):
+        relay_outbox.return_value = 0
+        relay.interval = 5.0
+        relay._wakeup = asyncio.Event()
+
+        async def wait_for_side_effect(awaitable, timeout, __aux__=[0]):
+            awaitable.close()
+            __aux__[0] += 1
+            if __aux__[0] > 1:
+                raise asyncio.CancelledError()
+            raise asyncio.TimeoutError()
+
+        wait_for.side_effect = wait_for_side_effect
+
+        with pytest.raises(asyncio.CancelledError):
+            await relay.run()
+
+        assert relay_outbox.call_count == 2
+        assert all(call.args[1] == 5.0 for call in wait_for.call_args_list)
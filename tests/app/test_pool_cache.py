@@ -0,0 +1,181 @@
+import asyncio
+import json
+from unittest import mock
+
+import pytest
+from redis import RedisError
+
+from duffy.app import pool_cache
+from duffy.configuration import config
+from duffy.tasks import events
+
+
+@pytest.fixture
+def cache():
+    cache = pool_cache.PoolLevelsCache()
+    cache.ttl = 5.0
+    yield cache
+    if cache.process_events in events.local_subscribers:
+        events.local_subscribers.remove(cache.process_events)
+
+
+def pool_message(name):
+    return {"type": "message", "data": json.dumps({"type": "pool", "data": {"name": name}})}
+
+
+class TestPoolLevelsCache:
+    def test_disabled(self, cache):
+        cache.ttl = 0.0
+
+        assert not cache.enabled
+
+        cache.set("pool", {"ready": 1}, cache.generation)
+
+        assert cache.get("pool") is None
+
+    @mock.patch("duffy.app.pool_cache.time.monotonic")
+    def test_get_set(self, monotonic, cache):
+        monotonic.return_value = 100.0
+
+        assert cache.enabled
+        assert cache.get("pool") is None
+
+        cache.set("pool", {"ready": 1}, cache.generation)
+
+        assert cache.get("pool") == {"ready": 1}
+
+        monotonic.return_value = 105.0
+
+        assert cache.get("pool") is None
+
+    def test_set_after_invalidation(self, cache):
+        generation = cache.generation
+        cache.invalidate("pool")
+
+        # The levels could have been looked up before they changed.
+        cache.set("pool", {"ready": 1}, generation)
+
+        assert cache.get("pool") is None
+
+    def test_invalidate(self, cache):
+        for name in ("pool-a", "pool-b", "pool-c"):
+            cache.set(name, {"ready": 1}, cache.generation)
+
+        cache.invalidate("pool-a")
+        cache.invalidate("pool-z")
+
+        assert cache.get("pool-a") is None
+        assert cache.get("pool-b") == {"ready": 1}
+
+        cache.invalidate()
+
+        assert cache.get("pool-b") is None
+        assert cache.get("pool-c") is None
+
+    def test_kinds(self, cache):
+        cache.set("pool", {"ready": 1}, cache.generation)
+        cache.set("pool", (3, 1), cache.generation, "allocation-counts")
+
+        assert cache.get("pool") == {"ready": 1}
+        assert cache.get("pool", "allocation-counts") == (3, 1)
+        assert cache.get("pool", "boo") is None
+
+        # Values of all kinds are dropped along with the levels of their pool.
+        cache.invalidate("pool")
+
+        assert cache.get("pool") is None
+        assert cache.get("pool", "allocation-counts") is None
+
+    def test_process_events(self, cache):
+        for name in ("pool-a", "pool-b"):
+            cache.set(name, {"ready": 1}, cache.generation)
+
+        cache.process_events(
+            [
+                {"type": "session", "data": {"id": 1}},
+                {"type": "pool", "data": {"name": "pool-a", "levels": {}}},
+            ]
+        )
+
+        assert cache.get("pool-a") is None
+        assert cache.get("pool-b") == {"ready": 1}
+
+    @mock.patch("duffy.app.pool_cache.asyncio.sleep")
+    @mock.patch("duffy.app.pool_cache.Redis")
+    async def test_listen(self, Redis, sleep, cache, caplog):
+        redis = mock.MagicMock()
+        pubsub = mock.MagicMock()
+        pubsub.subscribe = mock.AsyncMock()
+
+        async def listen():
+            yield pool_message("pool-a")
+            raise RedisError("BOOP")
+
+        pubsub.listen.side_effect = listen
+        redis.pubsub.return_value.__aenter__.return_value = pubsub
+        Redis.from_url.return_value.__aenter__.return_value = redis
+
+        # Stop listening when trying to resubscribe for the second time.
+        sleep.side_effect = [None, asyncio.CancelledError()]
+
+        for name in ("pool-a", "pool-b"):
+            cache.set(name, {"ready": 1}, cache.generation)
+
+        with mock.patch.object(cache, "invalidate", wraps=cache.invalidate) as invalidate:
+            with caplog.at_level("DEBUG", "duffy"), pytest.raises(asyncio.CancelledError):
+                await cache.listen("redis://localhost")
+
+        Redis.from_url.assert_called_with("redis://localhost")
+        redis.pubsub.assert_called_with(ignore_subscribe_messages=True)
+        pubsub.subscribe.assert_awaited_with(events.CHANNEL)
+        sleep.assert_awaited_with(pool_cache.RESUBSCRIBE_DELAY)
+        # Invalidated when subscribing, for the event, and when losing the subscription.
+        assert invalidate.call_args_list == 2 * [mock.call(), mock.call("pool-a"), mock.call()]
+        assert any("Lost subscription to pool events" in msg for msg in caplog.messages)
+
+    @pytest.mark.duffy_config({"app": {"pool-cache": {"ttl": "5s"}}})
+    @pytest.mark.parametrize("testcase", ("unconfigured", "disabled", "no-locking", "normal"))
+    async def test_start_stop(self, testcase, caplog):
+        if testcase == "unconfigured":
+            del config["app"]["pool-cache"]
+        elif testcase == "disabled":
+            config["app"]["pool-cache"]["ttl"] = 0
+        elif testcase == "normal":
+            config["tasks"] = {"locking": {"url": "redis://localhost"}}
+
+        cache = pool_cache.PoolLevelsCache()
+        listened = asyncio.Event()
+
+        async def listen(url):
+            assert url == "redis://localhost"
+            listened.set()
+            await asyncio.sleep(3600)
+
+        with mock.patch.object(cache, "listen", side_effect=listen), caplog.at_level(
+            "DEBUG", "duffy"
+        ):
+            cache.start()
+            # Starting twice doesn't subscribe twice.
+            cache.start()
+
+            try:
+                if testcase in ("unconfigured", "disabled"):
+                    assert not cache.enabled
+                    assert cache.process_events not in events.local_subscribers
+                else:
+                    assert cache.ttl == 5.0
+                    assert events.local_subscribers.count(cache.process_events) == 1
+
+                if testcase == "normal":
+                    await asyncio.wait_for(listened.wait(), timeout=5)
+                else:
+                    assert cache._listener is None
+
+                if testcase == "no-locking":
+                    assert any("Can't subscribe to pool events" in msg for msg in caplog.messages)
+            finally:
+                await cache.stop()
+
+        assert not cache.enabled
+        assert cache.process_events not in events.local_subscribers
+        assert cache._listener is None
@@ -0,0 +1,108 @@
+import datetime as dt
+import importlib
+import json
+import sys
+from unittest import mock
+
+import pytest
+from pydantic import BaseModel
+from starlette.requests import Request
+
+from duffy.app import serialization
+from duffy.database.types import NodeState
+
+
+class Model(BaseModel):
+    at: dt.datetime
+    state: NodeState
+    data: dict
+
+
+@pytest.mark.parametrize("orjson_installed", (True, False))
+def test_json_dumps_uses_orjson_if_installed(orjson_installed):
+    if orjson_installed:
+        pytest.importorskip("orjson")
+
+    try:
+        with mock.patch.dict(sys.modules, {} if orjson_installed else {"orjson": None}):
+            importlib.reload(serialization)
+
+            if orjson_installed:
+                assert serialization.json_dumps is serialization._orjson_dumps
+            else:
+                assert serialization.orjson is None
+                assert serialization.json_dumps is serialization._stdlib_json_dumps
+    finally:
+        importlib.reload(serialization)
+
+
+@pytest.mark.parametrize("dumps", ("_orjson_dumps", "_stdlib_json_dumps"))
+@pytest.mark.parametrize("microsecond", (0, 123456))
+def test_json_dumps_like_pydantic(dumps, microsecond):
+    if dumps == "_orjson_dumps":
+        pytest.importorskip("orjson")
+    dumps = getattr(serialization, dumps)
+    obj = Model(
+        at=dt.datetime(2024, 1, 1, 12, 0, 0, microsecond, tzinfo=dt.timezone.utc),
+        state=NodeState.ready,
+        data={"foo": ["bär", 1, 2.5, None, True]},
+    )
+
+    assert json.loads(dumps(obj.model_dump())) == json.loads(obj.model_dump_json())
+    assert dumps(obj.model_dump()) == dumps(json.loads(obj.model_dump_json()))
+
+
+@mock.patch.object(serialization, "orjson")
+def test_orjson_dumps(orjson):
+    content = {"foo": "bar"}
+
+    assert serialization._orjson_dumps(content) is orjson.dumps.return_value
+
+    orjson.dumps.assert_called_once_with(content, option=orjson.OPT_UTC_Z)
+
+
+def test_stdlib_json_dumps_unserializable():
+    with pytest.raises(TypeError, match="Object of type object is not JSON serializable"):
+        serialization._stdlib_json_dumps({"foo": object()})
+
+
+def test_fast_json_response():
+    response = serialization.FastJSONResponse(
+        {"at": dt.datetime(2024, 1, 1, tzinfo=dt.timezone.utc)}
+    )
+
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == {"at": "2024-01-01T00:00:00Z"}
+
+
+@pytest.mark.parametrize(
+    "accept, expected",
+    (
+        (None, False),
+        ("application/json", False),
+        ("application/x-ndjson", True),
+        ("application/x-ndjson, application/json;q=0.5", True),
+    ),
+)
+def test_accepts_ndjson(accept, expected):
+    headers = [(b"accept", accept.encode("ascii"))] if accept else []
+    request = Request({"type": "http", "headers": headers})
+
+    assert serialization.accepts_ndjson(request) is expected
+
+
+async def test_ndjson_streaming_response():
+    async def chunks():
+        yield [{"id": 1}, {"id": 2, "at": dt.datetime(2024, 1, 1, tzinfo=dt.timezone.utc)}]
+        yield []
+        yield [{"id": 3}]
+
+    response = serialization.NDJSONStreamingResponse(chunks())
+
+    assert response.media_type == "application/x-ndjson"
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    assert [json.loads(line) for line in body.splitlines()] == [
+        {"id": 1},
+        {"id": 2, "at": "2024-01-01T00:00:00Z"},
+        {"id": 3},
+    ]
@@ -6,6 +6,7 @@ import pytest
 
 from duffy.api_models import (
     PoolConciseModel,
+    PoolLevelsConciseModel,
     PoolLevelsModel,
     PoolResult,
     PoolResultCollection,
@@ -50,12 +51,23 @@ class TestDuffyJSONFormatter:
         formatted = DuffyJSONFormatter().format(TEST_JSON_DICT)
         assert json.loads(formatted) == TEST_JSON_DICT
 
+    def test_format_stream(self):
+        error = {"error": {"detail": "Boo."}}
+        formatted = list(
+            DuffyJSONFormatter().format_stream("items", [TEST_JSON_DICT, TEST_JSON_DICT, error])
+        )
+        assert [json.loads(line) for line in formatted] == [TEST_JSON_DICT, TEST_JSON_DICT, error]
+
 
 class TestDuffyYAMLFormatter:
     def test_format(self):
         formatted = DuffyYAMLFormatter().format(TEST_JSON_DICT)
         assert formatted == "test_key: test_value\n"
 
+    def test_format_stream(self):
+        formatted = DuffyYAMLFormatter().format_stream("items", [TEST_JSON_DICT, TEST_JSON_DICT])
+        assert "".join(formatted) == "- test_key: test_value\n- test_key: test_value\n"
+
 
 class TestDuffyFlatFormatter:
     CREATED_AT = dt.datetime(year=2022, month=5, day=31, hour=12, minute=0, second=0)
@@ -87,12 +99,19 @@ class TestDuffyFlatFormatter:
         ],
     )
     TEST_POOL_CONCISE = PoolConciseModel(name="pool", **{"fill-level": 15})
+    TEST_POOL_LEVELS = PoolLevelsConciseModel(
+        name="pool",
+        levels=PoolLevelsModel(
+            provisioning=1, ready=15, contextualizing=0, deployed=5, deprovisioning=2
+        ),
+        **{"fill-level": 15},
+    )
     TEST_POOL_VERBOSE = PoolVerboseModel(
         name="pool",
         levels=PoolLevelsModel(
             provisioning=0, ready=15, contextualizing=0, deployed=5, deprovisioning=0
         ),
-        **{"fill-level": 15},
+        **{"fill-level": 15, "target-fill-level": 12},
     )
 
     @pytest.mark.parametrize(
@@ -121,8 +140,8 @@ class TestDuffyFlatFormatter:
         )
 
         assert pool_line == (
-            "pool_name='pool' fill_level=15 levels_provisioning=0 levels_ready=15"
-            " levels_contextualizing=0 levels_deployed=5 levels_deprovisioning=0"
+            "pool_name='pool' fill_level=15 target_fill_level=12 levels_provisioning=0"
+            " levels_ready=15 levels_contextualizing=0 levels_deployed=5 levels_deprovisioning=0"
         )
 
     def test_flatten_pool_result(self):
@@ -133,8 +152,8 @@ class TestDuffyFlatFormatter:
         )
 
         assert pool_line == (
-            "pool_name='pool' fill_level=15 levels_provisioning=0 levels_ready=15"
-            " levels_contextualizing=0 levels_deployed=5 levels_deprovisioning=0"
+            "pool_name='pool' fill_level=15 target_fill_level=12 levels_provisioning=0"
+            " levels_ready=15 levels_contextualizing=0 levels_deployed=5 levels_deprovisioning=0"
         )
 
     def test_flatten_pools_result(self):
@@ -148,6 +167,21 @@ class TestDuffyFlatFormatter:
 
         assert pool_line == "pool_name='pool' fill_level=15"
 
+    def test_flatten_pools_result_with_levels(self):
+        pool_lines = list(
+            DuffyFlatFormatter().flatten_pools_result(
+                PoolResultCollection(
+                    action="get", pools=[self.TEST_POOL_LEVELS, self.TEST_POOL_CONCISE]
+                ).model_dump(by_alias=True)
+            )
+        )
+
+        assert pool_lines == [
+            "pool_name='pool' fill_level=15 levels_provisioning=1 levels_ready=15"
+            " levels_contextualizing=0 levels_deployed=5 levels_deprovisioning=2",
+            "pool_name='pool' fill_level=15",
+        ]
+
     def test_flatten_session(self):
         node_line = next(
             DuffyFlatFormatter().flatten_session(
@@ -186,6 +220,15 @@ class TestDuffyFlatFormatter:
             " hostname='hostname' ipaddr='127.0.0.1'"
         )
 
+    def test_format_stream(self):
+        session = self.TEST_SESSION.model_dump(by_alias=True)
+        formatted = list(DuffyFlatFormatter().format_stream("sessions", [session, session]))
+
+        assert formatted == 2 * [
+            "session_id=17 active=TRUE created_at='2022-05-31 12:00:00' retired_at= pool='pool'"
+            " hostname='hostname' ipaddr='127.0.0.1'"
+        ]
+
     @pytest.mark.parametrize(
         "result_cls",
         (PoolResult, PoolResultCollection, SessionResult, SessionResultCollection, dict),
@@ -214,8 +257,9 @@ class TestDuffyFlatFormatter:
 
         if result_cls is PoolResult:
             assert formatted == (
-                "pool_name='pool' fill_level=15 levels_provisioning=0 levels_ready=15"
-                " levels_contextualizing=0 levels_deployed=5 levels_deprovisioning=0"
+                "pool_name='pool' fill_level=15 target_fill_level=12 levels_provisioning=0"
+                " levels_ready=15 levels_contextualizing=0 levels_deployed=5"
+                " levels_deprovisioning=0"
             )
         elif result_cls is PoolResultCollection:
             assert formatted == "pool_name='pool' fill_level=15"
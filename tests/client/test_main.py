@@ -20,8 +20,14 @@ class InModel(BaseModel):
 @pytest.mark.duffy_config(example_config=True)
 class TestDuffyClient:
     wrapper_method_test_details = {
-        "list_sessions": (mock.call(), mock.call(_MethodEnum.get, "/sessions")),
-        "show_session": (mock.call(15), mock.call(_MethodEnum.get, "/sessions/15")),
+        "list_sessions": (
+            mock.call(),
+            mock.call(_MethodEnum.get, "/sessions", params={"include_retired": False}),
+        ),
+        "show_session": (
+            mock.call(15),
+            mock.call(_MethodEnum.get, "/sessions/15", conditional=True),
+        ),
         "request_session": (
             mock.call([{"pool": "pool", "quantity": "31"}]),
             mock.call(
@@ -41,8 +47,14 @@ class TestDuffyClient:
                 in_model=SessionUpdateModel,
             ),
         ),
-        "list_pools": (mock.call(), mock.call(_MethodEnum.get, "/pools")),
-        "show_pool": (mock.call("lagoon"), mock.call(_MethodEnum.get, "/pools/lagoon")),
+        "list_pools": (
+            mock.call(levels=True),
+            mock.call(_MethodEnum.get, "/pools", params={"levels": True}),
+        ),
+        "show_pool": (
+            mock.call("lagoon"),
+            mock.call(_MethodEnum.get, "/pools/lagoon", conditional=True),
+        ),
     }
 
     @pytest.mark.parametrize("testcase", ("params-set", "params-unset"))
@@ -76,6 +88,16 @@ class TestDuffyClient:
             url += "/"
         assert client.base_url == httpx.URL(url)
 
+    def test_client_property_cookies(self):
+        dclient = DuffyClient()
+
+        with dclient.client() as client:
+            client.cookies.set("cookie", "value")
+
+        # Cookies are kept across clients.
+        with dclient.client() as client:
+            assert client.cookies["cookie"] == "value"
+
     @pytest.mark.parametrize(
         "actual_status, with_detail",
         (
@@ -138,6 +160,48 @@ class TestDuffyClient:
         else:
             assert result["out_field"] == 7
 
+    @mock.patch("duffy.client.main.httpx.Client")
+    def test__query_method_params(self, Client):
+        Client.return_value = ctxmgr = mock.MagicMock()
+        ctxmgr.__enter__.return_value = apiv1_client = mock.MagicMock()
+        apiv1_client.get.return_value.status_code = HTTPStatus.OK
+
+        DuffyClient()._query_method(_MethodEnum.get, "url", params={"foo": "bar"})
+
+        apiv1_client.get.assert_called_once_with(url="url", params={"foo": "bar"})
+
+    @mock.patch("duffy.client.main.httpx.Client")
+    def test__query_method_conditional(self, Client):
+        Client.return_value = ctxmgr = mock.MagicMock()
+        ctxmgr.__enter__.return_value = apiv1_client = mock.MagicMock()
+        apiv1_client.get.return_value = response = mock.MagicMock()
+
+        dclient = DuffyClient()
+
+        # The first request isn't conditional, the result is cached.
+        response.status_code = HTTPStatus.OK
+        response.headers = {"etag": '"v1"'}
+        response.json.return_value = {"out_field": 1}
+        assert dclient._query_method(_MethodEnum.get, "url", conditional=True) == {"out_field": 1}
+        apiv1_client.get.assert_called_once_with(url="url")
+
+        # Unchanged results are served from the cache.
+        apiv1_client.get.reset_mock()
+        response.status_code = HTTPStatus.NOT_MODIFIED
+        assert dclient._query_method(_MethodEnum.get, "url", conditional=True) == {"out_field": 1}
+        apiv1_client.get.assert_called_once_with(url="url", headers={"If-None-Match": '"v1"'})
+
+        # Changed results replace cached ones, results without entity tags evict them.
+        response.status_code = HTTPStatus.OK
+        response.json.return_value = {"out_field": 2}
+        response.headers = {"etag": '"v2"'}
+        assert dclient._query_method(_MethodEnum.get, "url", conditional=True) == {"out_field": 2}
+        assert dclient._etag_cache["url"] == ('"v2"', {"out_field": 2})
+
+        response.headers = {}
+        dclient._query_method(_MethodEnum.get, "url", conditional=True)
+        assert "url" not in dclient._etag_cache
+
     @pytest.mark.parametrize("method_name", list(wrapper_method_test_details))
     def test_wrapper_methods(self, method_name):
         method_call_args, expected_wrapped_call_args = self.wrapper_method_test_details[method_name]
@@ -148,3 +212,37 @@ class TestDuffyClient:
         query_method.assert_called_once_with(
             *expected_wrapped_call_args.args, **expected_wrapped_call_args.kwargs
         )
+
+    @pytest.mark.parametrize("testcase", ("success", "error"))
+    @mock.patch("duffy.client.main.httpx.Client")
+    def test__stream_method(self, Client, testcase):
+        Client.return_value = ctxmgr = mock.MagicMock()
+        ctxmgr.__enter__.return_value = apiv1_client = mock.MagicMock()
+        apiv1_client.stream.return_value.__enter__.return_value = response = mock.MagicMock()
+
+        if testcase == "success":
+            response.status_code = HTTPStatus.OK
+            response.iter_lines.return_value = iter(['{"id": 1}', "", '{"id": 2}'])
+        else:
+            response.status_code = HTTPStatus.BAD_REQUEST
+            response.json.return_value = {"detail": "a detail"}
+
+        result = list(DuffyClient()._stream_method("url", params={"foo": "bar"}))
+
+        apiv1_client.stream.assert_called_once_with(
+            "GET", "url", params={"foo": "bar"}, headers={"Accept": "application/x-ndjson"}
+        )
+        if testcase == "success":
+            assert result == [{"id": 1}, {"id": 2}]
+        else:
+            response.read.assert_called_once_with()
+            assert result == [{"error": {"detail": "a detail"}}]
+
+    @pytest.mark.parametrize("include_retired", (False, True))
+    def test_iter_sessions(self, include_retired):
+        dclient = DuffyClient()
+        with mock.patch.object(dclient, "_stream_method") as stream_method:
+            dclient.iter_sessions(include_retired=include_retired)
+        stream_method.assert_called_once_with(
+            "/sessions", params={"include_retired": include_retired}
+        )
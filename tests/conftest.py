@@ -1,6 +1,7 @@
 from pathlib import Path
 from tempfile import NamedTemporaryFile
 from typing import Iterator, List, Union
+from unittest import mock
 
 # This is version 3 (what pytest-postgresql uses). SQLAlchemy uses psycopg2 but we use this to
 # create the DB in the temporary PostgreSQL instance.
@@ -8,15 +9,15 @@ import psycopg
 import pytest
 import pytest_postgresql
 import yaml
-from sqlalchemy import create_engine, event
+from sqlalchemy import bindparam, create_engine, text
 from sqlalchemy.engine.url import URL
 from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.sql import Executable
 
 from duffy.app.logging import RequestIdFilter
 from duffy.configuration import read_configuration
 from duffy.database import (
     Base,
-    _pgsql_disable_seqscan,
     async_session_maker,
     init_async_model,
     init_sync_model,
@@ -160,7 +161,6 @@ def db_sync_engine(postgresql_sync_url):
         echo=True,
         isolation_level="SERIALIZABLE",
     )
-    event.listen(db_engine, "connect", _pgsql_disable_seqscan)
     return db_engine
 
 
@@ -173,7 +173,6 @@ def db_async_engine(postgresql_async_url):
         echo=True,
         isolation_level="SERIALIZABLE",
     )
-    event.listen(async_db_engine.sync_engine, "connect", _pgsql_disable_seqscan)
     return async_db_engine
 
 
@@ -219,6 +218,40 @@ def db_sync_session(db_sync_model_initialized):
         db_session.close()
 
 
+@pytest.fixture
+def db_sync_explain(db_sync_session):
+    """Fixture returning a function which gets the query plan of a statement.
+
+    The statement is explained in its own transaction, the resulting
+    plan is returned as one string.
+    """
+
+    def explain(statement: Executable) -> str:
+        dialect = db_sync_session.get_bind().dialect
+        # Compile with named parameters, so the statement can be wrapped in text() with the bound
+        # values keeping their types.
+        compiled = statement.compile(
+            dialect=type(dialect)(paramstyle="named"), compile_kwargs={"render_postcompile": True}
+        )
+        explain_stmt = text(f"EXPLAIN {compiled}").bindparams(
+            *(
+                bindparam(
+                    key,
+                    value,
+                    # Expanded parameters, e.g. for IN (...), are suffixed with their index.
+                    type_=compiled.binds[
+                        key if key in compiled.binds else key.rsplit("_", 1)[0]
+                    ].type,
+                )
+                for key, value in compiled.params.items()
+            )
+        )
+        with db_sync_session.begin():
+            return "\n".join(db_sync_session.execute(explain_stmt).scalars())
+
+    return explain
+
+
 @pytest.fixture
 async def db_async_session(db_async_model_initialized):
     """Fixture setting up an asynchronous DB session."""
@@ -299,6 +332,17 @@ def test_mechanism():
     return TestMechanism
 
 
+@pytest.fixture(autouse=True)
+def events_redis():
+    """Fixture to keep events from being published to a real Redis server.
+
+    Tests can inspect what would have been published using the returned
+    mock object.
+    """
+    with mock.patch("duffy.tasks.events._redis") as _redis:
+        yield _redis.return_value
+
+
 @pytest.fixture(autouse=True)
 def install_logging_request_id_filter(caplog):
     caplog.handler.addFilter(RequestIdFilter())
@@ -0,0 +1,131 @@
+import datetime as dt
+import uuid
+
+import pytest
+from sqlalchemy import func, select
+
+from duffy.database import archive
+from duffy.database.model import (
+    ArchivedNode,
+    ArchivedSession,
+    ArchivedSessionNode,
+    Node,
+    Session,
+    SessionNode,
+    Tenant,
+)
+from duffy.database.types import NodeState
+
+NOW = dt.datetime.now(dt.timezone.utc)
+LONG_AGO = NOW - dt.timedelta(days=60)
+RECENTLY = NOW - dt.timedelta(days=1)
+
+DB_CONFIG = {"sqlalchemy": {"sync_url": "sqlite:///", "async_url": "sqlite+aiosqlite:///"}}
+
+
+@pytest.fixture
+def archive_test_data(db_sync_session):
+    """Create sessions and nodes retired long ago or recently, and active ones."""
+    with db_sync_session.begin():
+        tenant = Tenant(
+            name="tenant", ssh_key="BOOP", api_key=uuid.uuid5(uuid.NAMESPACE_OID, "tenant")
+        )
+
+        for idx, (session_retired_at, node_retired_at, node_state) in enumerate(
+            (
+                # archived along with its node
+                (LONG_AGO, LONG_AGO, NodeState.done),
+                (LONG_AGO, LONG_AGO, NodeState.done),
+                (LONG_AGO, LONG_AGO, NodeState.done),
+                # archived, its failed node isn't
+                (LONG_AGO, LONG_AGO, NodeState.failed),
+                # not archived, neither is its node
+                (RECENTLY, LONG_AGO, NodeState.done),
+                (None, None, NodeState.deployed),
+            ),
+            1,
+        ):
+            session = Session(tenant=tenant, retired_at=session_retired_at, data={"idx": idx})
+            node = Node(
+                hostname=f"node-{idx}",
+                ipaddr=f"192.0.2.{idx}",
+                pool="pool",
+                state=node_state,
+                retired_at=node_retired_at,
+                data={"provision": {"idx": idx}},
+            )
+            session.session_nodes = [
+                SessionNode(session=session, node=node, pool="pool", data={"idx": idx})
+            ]
+            db_sync_session.add(session)
+
+        # a node which was never used in a session
+        db_sync_session.add(
+            Node(
+                hostname="node-7",
+                ipaddr="192.0.2.7",
+                pool="pool",
+                state=NodeState.done,
+                retired_at=LONG_AGO,
+            )
+        )
+
+
+def _ids(db_sync_session, id_column):
+    return sorted(db_sync_session.execute(select(id_column)).scalars())
+
+
+@pytest.mark.usefixtures("archive_test_data")
+@pytest.mark.duffy_config({"database": DB_CONFIG})
+@pytest.mark.parametrize("batch_size", (1, 2, 1000))
+def test_archive_retired(batch_size, db_sync_session):
+    counts = archive.archive_retired(retired_for=dt.timedelta(days=30), batch_size=batch_size)
+
+    assert counts == {"sessions": 4, "nodes": 4}
+
+    with db_sync_session.begin():
+        assert _ids(db_sync_session, Session.id) == [5, 6]
+        assert _ids(db_sync_session, SessionNode.session_id) == [5, 6]
+        assert _ids(db_sync_session, Node.id) == [4, 5, 6]
+
+        assert _ids(db_sync_session, ArchivedSession.id) == [1, 2, 3, 4]
+        assert _ids(db_sync_session, ArchivedSessionNode.session_id) == [1, 2, 3, 4]
+        assert _ids(db_sync_session, ArchivedNode.id) == [1, 2, 3, 7]
+
+        archived_session = db_sync_session.get(ArchivedSession, 1)
+        assert archived_session.data == {"idx": 1}
+        assert archived_session.retired_at == LONG_AGO
+        assert archived_session.archived_at is not None
+        assert [(sn.node_id, sn.pool, sn.data) for sn in archived_session.nodes] == [
+            (1, "pool", {"idx": 1})
+        ]
+
+        archived_node = db_sync_session.get(ArchivedNode, 1)
+        assert archived_node.hostname == "node-1"
+        assert archived_node.state == NodeState.done
+        assert archived_node.data == {"provision": {"idx": 1}}
+
+
+@pytest.mark.usefixtures("archive_test_data")
+@pytest.mark.duffy_config(
+    {
+        "database": {**DB_CONFIG, "archive": {"retired-for": "90d", "batch-size": 2}},
+    }
+)
+def test_archive_retired_configured(db_sync_session):
+    assert archive.archive_retired() == {"sessions": 0, "nodes": 0}
+
+    assert archive.archive_retired(retired_for=dt.timedelta(days=30)) == {
+        "sessions": 4,
+        "nodes": 4,
+    }
+
+
+@pytest.mark.usefixtures("archive_test_data")
+@pytest.mark.duffy_config({"database": DB_CONFIG})
+def test_archive_retired_defaults(db_sync_session):
+    # By default, sessions and nodes retired for 30 days are archived.
+    assert archive.archive_retired() == {"sessions": 4, "nodes": 4}
+
+    with db_sync_session.begin():
+        assert db_sync_session.execute(select(func.count(Session.id))).scalar_one() == 2
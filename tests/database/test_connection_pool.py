@@ -0,0 +1,153 @@
+from unittest import mock
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool, SingletonThreadPool
+
+from duffy.database import connection_pool
+
+DB_CONFIG = {
+    "sqlalchemy": {
+        "sync_url": "postgresql://localhost/duffy",
+        "async_url": "postgresql+asyncpg://localhost/duffy",
+    },
+}
+
+
+@pytest.mark.duffy_config({"database": DB_CONFIG})
+@pytest.mark.parametrize(
+    "url, expected_pool_class",
+    (
+        ("postgresql://localhost/duffy", QueuePool),
+        ("postgresql+asyncpg://localhost/duffy", AsyncAdaptedQueuePool),
+        ("sqlite:///", SingletonThreadPool),
+    ),
+)
+def test_engine_kwargs_default(url, expected_pool_class):
+    kwargs = connection_pool.engine_kwargs(url, {"url": url})
+
+    if issubclass(expected_pool_class, QueuePool):
+        assert kwargs == {
+            "url": url,
+            "poolclass": connection_pool.with_checkout_metrics(expected_pool_class),
+        }
+        assert issubclass(kwargs["poolclass"], expected_pool_class)
+    else:
+        assert kwargs == {"url": url}
+
+
+@pytest.mark.duffy_config(
+    {
+        "database": {
+            **DB_CONFIG,
+            "pool": {
+                "size": 20,
+                "max-overflow": 0,
+                "timeout": "5s",
+                "recycle": "1h",
+                "pre-ping": True,
+            },
+        }
+    }
+)
+@pytest.mark.parametrize("explicit_pool_class", (None, QueuePool, NullPool))
+def test_engine_kwargs_pool_settings(explicit_pool_class):
+    url = "postgresql://localhost/duffy"
+    engine_config = {"url": url, "pool_size": 10}
+    if explicit_pool_class:
+        engine_config["poolclass"] = explicit_pool_class
+
+    kwargs = connection_pool.engine_kwargs(url, engine_config)
+
+    if explicit_pool_class is NullPool:
+        assert kwargs == engine_config
+    else:
+        assert kwargs == {
+            "url": url,
+            # Explicit settings take precedence.
+            "pool_size": 10,
+            "max_overflow": 0,
+            "pool_timeout": 5.0,
+            "pool_recycle": 3600.0,
+            "pool_pre_ping": True,
+            "poolclass": connection_pool.with_checkout_metrics(QueuePool),
+        }
+
+
+@pytest.mark.duffy_config({"database": {**DB_CONFIG, "pgbouncer": True}})
+@pytest.mark.parametrize(
+    "url",
+    (
+        "postgresql+asyncpg://localhost/duffy",
+        "postgresql+psycopg://localhost/duffy",
+        "postgresql+psycopg2://localhost/duffy",
+    ),
+)
+def test_engine_kwargs_pgbouncer(url):
+    kwargs = connection_pool.engine_kwargs(url, {"url": url, "connect_args": {"timeout": 10}})
+
+    if "asyncpg" in url:
+        name_func = kwargs["connect_args"].pop("prepared_statement_name_func")
+        assert name_func() != name_func()
+        assert kwargs["connect_args"] == {
+            "timeout": 10,
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+        }
+    elif "psycopg2" in url:
+        assert kwargs["connect_args"] == {"timeout": 10}
+    else:
+        assert kwargs["connect_args"] == {"timeout": 10, "prepare_threshold": None}
+
+
+def test_with_checkout_metrics():
+    pool_class = connection_pool.with_checkout_metrics(QueuePool)
+
+    assert pool_class.__name__ == "QueuePool"
+    assert issubclass(pool_class, QueuePool)
+    assert connection_pool.with_checkout_metrics(QueuePool) is pool_class
+
+
+def test_checkout_metrics_record():
+    checkout_metrics = connection_pool.CheckoutMetrics()
+
+    checkout_metrics.record(0.5)
+    checkout_metrics.record(1.5)
+    checkout_metrics.record(1.0)
+
+    assert checkout_metrics.checkouts == 3
+    assert checkout_metrics.wait_total == 3.0
+    assert checkout_metrics.wait_max == 1.5
+
+
+def test_pool_metrics(postgresql_sync_url):
+    engine = create_engine(
+        postgresql_sync_url, poolclass=connection_pool.with_checkout_metrics(QueuePool)
+    )
+
+    try:
+        with mock.patch("duffy.database.connection_pool.time.perf_counter") as perf_counter:
+            perf_counter.side_effect = [1.0, 1.25, 2.0, 2.5]
+            with engine.connect() as conn1, engine.connect() as conn2:
+                conn1.execute(text("SELECT 1"))
+                conn2.execute(text("SELECT 1"))
+                metrics_during = connection_pool.pool_metrics(engine)
+        metrics_after = connection_pool.pool_metrics(engine)
+    finally:
+        engine.dispose()
+
+    assert metrics_during == {
+        "size": 5,
+        "checked_in": 0,
+        "checked_out": 2,
+        "overflow": -3,
+        "checkouts": 2,
+        "checkout_wait_total": 0.75,
+        "checkout_wait_max": 0.5,
+    }
+    assert metrics_after == {**metrics_during, "checked_in": 2, "checked_out": 0}
+
+
+def test_pool_metrics_not_instrumented():
+    engine = create_engine("sqlite:///")
+    assert connection_pool.pool_metrics(engine) is None
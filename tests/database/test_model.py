@@ -1,13 +1,15 @@
 import datetime as dt
-from typing import Any, Dict
+from typing import Any, Dict, Tuple
 from unittest import mock
 from uuid import uuid4
 
 import pytest
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import create_engine, insert, select, text, update
+from sqlalchemy.orm import Session as DBSession
+from sqlalchemy.orm import load_only, selectinload
 
 from duffy.database import model, types
+from duffy.database.model.pool_level import adjust_pool_levels, apply_pool_level_deltas
 from duffy.database.model.tenant import _defaults_config
 
 
@@ -207,6 +209,92 @@ class TestNode(ModelTestBase):
             "detail": "information about the error",
         }
 
+    @pytest.mark.parametrize("dialect_name", ("postgresql", "sqlite"))
+    def test_data_matches(self, dialect_name, db_sync_session):
+        with db_sync_session.begin():
+            for idx, data in enumerate(
+                (
+                    {"arch": "x86_64", "gen": 1, "other": "foo"},
+                    {"arch": "x86_64", "gen": 2},
+                    {"arch": "x86_64", "gen": "1"},
+                    {"arch": "aarch64", "gen": 1},
+                ),
+                start=1,
+            ):
+                db_sync_session.add(model.Node(**_gen_node_attrs(idx, data=data)))
+
+        clause = model.Node.data_matches({"arch": "x86_64", "gen": 1}, dialect_name=dialect_name)
+
+        if dialect_name == "sqlite":
+            # Only check the generated SQL, the tests run against PostgreSQL.
+            assert "data @>" not in str(clause)
+            return
+
+        with db_sync_session.begin():
+            hostnames = db_sync_session.execute(
+                select(model.Node.hostname).filter(clause)
+            ).scalars()
+            assert set(hostnames) == {"lolcathost-1"}
+
+    @pytest.mark.parametrize("remove", (True, False), ids=("remove", "set-only"))
+    @pytest.mark.parametrize("dialect_name", ("postgresql", "sqlite"))
+    def test_data_patched(self, dialect_name, remove, db_sync_session):
+        data = {"keep": {"nested": True}, "drop": 1, "also_drop": "foo", "replace": [1]}
+        expected = {"keep": {"nested": True}, "replace": {"new": [2]}, "add": None}
+        if remove:
+            remove_keys = ("drop", "also_drop", "missing")
+        else:
+            remove_keys = ()
+            expected.update(drop=1, also_drop="foo")
+
+        patched = model.Node.data_patched(
+            set_items={"replace": {"new": [2]}, "add": None},
+            remove_keys=remove_keys,
+            dialect_name=dialect_name,
+        )
+
+        if dialect_name == "sqlite":
+            engine = create_engine("sqlite://")
+            model.Node.__table__.create(engine)
+            db_session = DBSession(engine)
+        else:
+            db_session = db_sync_session
+
+        with db_session.begin():
+            db_session.add(model.Node(**_gen_node_attrs(1, data=data)))
+
+        with db_session.begin():
+            db_session.execute(update(model.Node.__table__).values(data=patched))
+
+        with db_session.begin():
+            assert db_session.execute(select(model.Node.data)).scalar_one() == expected
+
+    def test_data_matches_uses_index(self, db_sync_session, db_sync_explain):
+        # The planner only prefers the index over others if there are enough unused nodes.
+        with db_sync_session.begin():
+            db_sync_session.execute(
+                insert(model.Node),
+                [
+                    {
+                        "hostname": f"node-{idx}",
+                        "ipaddr": f"192.0.2.{idx}",
+                        "state": types.NodeState.unused,
+                        "reusable": True,
+                        "data": {"serial": f"S{idx}"},
+                    }
+                    for idx in range(2000)
+                ],
+            )
+            db_sync_session.execute(text("ANALYZE nodes"))
+
+        query = (
+            select(model.Node)
+            .filter_by(active=True, pool=None, reusable=True, state=types.NodeState.unused)
+            .filter(model.Node.data_matches({"serial": "S10"}))
+        )
+
+        assert "reusable_nodes_data_index" in db_sync_explain(query)
+
 
 class TestSessionNode(ModelTestBase):
     klass = model.SessionNode
@@ -233,3 +321,163 @@ class TestSessionNode(ModelTestBase):
         assert str(result.ipaddr) == node.ipaddr
         assert result.pool == node.pool
         assert result.data == node.data
+
+
+class TestPoolLevel(ModelTestBase):
+    klass = model.PoolLevel
+    attrs = {"pool": "virtual-centos8stream-x86_64-small", "state": "ready", "quantity": 5}
+
+
+class TestPoolLevelMaintenance:
+    @staticmethod
+    def pool_levels(db_sync_session) -> Dict[Tuple[str, str], int]:
+        with db_sync_session.begin():
+            return {
+                (level.pool, level.state.name): level.quantity
+                for level in db_sync_session.execute(select(model.PoolLevel)).scalars()
+                if level.quantity
+            }
+
+    def test_node_lifecycle(self, db_sync_session):
+        with db_sync_session.begin():
+            nodes = [
+                model.Node(**_gen_node_attrs(idx, pool="pool-a", state="provisioning"))
+                for idx in range(1, 4)
+            ]
+            db_sync_session.add_all(nodes)
+            # Nodes without a pool or retired nodes aren't counted.
+            db_sync_session.add(model.Node(**_gen_node_attrs(4)))
+            db_sync_session.add(
+                model.Node(
+                    **_gen_node_attrs(
+                        5, pool="pool-a", retired_at=dt.datetime.now(tz=dt.timezone.utc)
+                    )
+                )
+            )
+            # Other objects are ignored.
+            tenant = model.Tenant(name="tenant", api_key=uuid4(), ssh_key="BOOP")
+            db_sync_session.add(tenant)
+
+        assert self.pool_levels(db_sync_session) == {("pool-a", "provisioning"): 3}
+
+        with db_sync_session.begin():
+            for node in nodes:
+                node.state = "ready"
+            # Unrelated changes don't affect levels.
+            nodes[0].comment = "BOOP"
+
+        assert self.pool_levels(db_sync_session) == {("pool-a", "ready"): 3}
+
+        with db_sync_session.begin():
+            nodes[0].state = "deployed"
+            nodes[1].pool = "pool-b"
+            nodes[2].active = False
+
+        assert self.pool_levels(db_sync_session) == {
+            ("pool-a", "deployed"): 1,
+            ("pool-b", "ready"): 1,
+        }
+
+        with db_sync_session.begin():
+            for node in nodes:
+                db_sync_session.delete(node)
+            db_sync_session.delete(tenant)
+
+        assert self.pool_levels(db_sync_session) == {}
+
+    def test_adjusted_after_commit(self, db_sync_session):
+        with db_sync_session.begin():
+            db_sync_session.add(model.Node(**_gen_node_attrs(pool="pool-a")))
+            db_sync_session.flush()
+            # The counters aren't touched in the transaction changing nodes.
+            assert not db_sync_session.execute(select(model.PoolLevel)).scalars().all()
+
+        assert self.pool_levels(db_sync_session) == {("pool-a", "ready"): 1}
+
+    @pytest.mark.parametrize("dialect_name", ("postgresql", "sqlite"))
+    def test_apply_pool_level_deltas(self, dialect_name, db_sync_engine, db_sync_session):
+        if dialect_name == "sqlite":
+            engine = create_engine("sqlite://")
+            model.PoolLevel.__table__.create(engine)
+            db_session = DBSession(engine)
+        else:
+            engine = db_sync_engine
+            db_session = db_sync_session
+
+        apply_pool_level_deltas(engine, {("pool-a", types.NodeState.ready): 2})
+
+        assert self.pool_levels(db_session) == {("pool-a", "ready"): 2}
+
+    def test_apply_pool_level_deltas_failure(self, caplog):
+        # The table doesn't exist.
+        engine = create_engine("sqlite://")
+
+        with caplog.at_level("WARNING"):
+            apply_pool_level_deltas(engine, {("pool-a", types.NodeState.ready): 2})
+
+        assert any("Couldn't adjust the levels of 1 pool(s)" in msg for msg in caplog.messages)
+
+    def test_rollback(self, db_sync_session):
+        with pytest.raises(RuntimeError), db_sync_session.begin():
+            db_sync_session.add(model.Node(**_gen_node_attrs(pool="pool-a")))
+            db_sync_session.flush()
+            raise RuntimeError("BOOP")
+
+        assert self.pool_levels(db_sync_session) == {}
+
+    def test_attributes_not_loaded(self, db_sync_session):
+        with db_sync_session.begin():
+            db_sync_session.add(model.Node(**_gen_node_attrs(pool="pool-a")))
+
+        db_sync_session.expunge_all()
+
+        with db_sync_session.begin():
+            node = db_sync_session.execute(
+                select(model.Node).options(load_only(model.Node.pool))
+            ).scalar_one()
+            # The state isn't loaded, which means it's unchanged.
+            node.pool = "pool-b"
+
+        assert self.pool_levels(db_sync_session) == {("pool-b", "ready"): 1}
+
+        with db_sync_session.begin():
+            db_sync_session.expire(node, ["pool"])
+            # The previous pool is unknown, so only the new one is counted.
+            node.pool = "pool-c"
+
+        assert self.pool_levels(db_sync_session) == {
+            ("pool-b", "ready"): 1,
+            ("pool-c", "ready"): 1,
+        }
+
+    def test_adjust_pool_levels(self, db_sync_session):
+        with db_sync_session.begin():
+            db_sync_session.add(model.Node(**_gen_node_attrs(pool="pool-a")))
+
+        with db_sync_session.begin():
+            adjust_pool_levels(
+                db_sync_session.connection(),
+                {
+                    ("pool-a", types.NodeState.ready): -1,
+                    ("pool-a", types.NodeState.deployed): 1,
+                    ("pool-b", types.NodeState.ready): 0,
+                },
+            )
+
+        assert self.pool_levels(db_sync_session) == {("pool-a", "deployed"): 1}
+
+        with db_sync_session.begin():
+            # Nothing to adjust
+            adjust_pool_levels(db_sync_session.connection(), {("pool-a", types.NodeState.ready): 0})
+
+        assert self.pool_levels(db_sync_session) == {("pool-a", "deployed"): 1}
+
+    async def test_async(self, db_async_session):
+        async with db_async_session.begin():
+            db_async_session.add(model.Node(**_gen_node_attrs(pool="pool-a")))
+
+        async with db_async_session.begin():
+            levels = (await db_async_session.execute(select(model.PoolLevel))).scalars().all()
+            assert [(level.pool, level.state.name, level.quantity) for level in levels] == [
+                ("pool-a", "ready", 1)
+            ]
@@ -1,6 +1,10 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from unittest import mock
 
 import pytest
+from sqlalchemy import text
 
 from duffy import configuration, database, exceptions
 
@@ -9,6 +13,7 @@ TEST_CONFIG = {
         "sqlalchemy": {
             "sync_url": "sqlite:///",
             "async_url": "sqlite+aiosqlite:///",
+            "async_read_urls": ["sqlite+aiosqlite:///replica1", "sqlite+aiosqlite:///replica2"],
         }
     }
 }
@@ -36,17 +41,96 @@ def test_init_sync_model(get_sync_engine, sync_session_maker, with_engine):
         sync_session_maker.configure.assert_called_once_with(bind=sync_engine)
 
 
+@mock.patch.object(database.sync_session_maker, "lazy", False)
+@mock.patch.dict(database.sync_session_maker.kw, clear=True)
+@mock.patch("duffy.database.get_sync_engine")
+def test_init_sync_model_lazy(get_sync_engine, db_sync_engine):
+    get_sync_engine.return_value = db_sync_engine
+
+    database.init_sync_model(lazy=True)
+
+    get_sync_engine.assert_not_called()
+    assert "bind" not in database.sync_session_maker.kw
+
+    with database.sync_session_maker() as db_sync_session:
+        assert db_sync_session.get_bind() is db_sync_engine
+
+    get_sync_engine.assert_called_once_with()
+
+    # Subsequent sessions use the same engine.
+    with database.sync_session_maker() as db_sync_session:
+        assert db_sync_session.get_bind() is db_sync_engine
+
+    get_sync_engine.assert_called_once_with()
+
+
+@mock.patch.object(database.sync_session_maker, "lazy", False)
+@mock.patch.dict(database.sync_session_maker.kw, clear=True)
+@mock.patch.object(database._SyncSessionMaker, "_init_lock")
+@mock.patch("duffy.database.get_sync_engine")
+def test_init_sync_model_lazy_initialized_while_waiting(
+    get_sync_engine, _init_lock, db_sync_engine
+):
+    def acquire_lock():
+        # Another thread creates the engine while this one waits for the lock.
+        database.sync_session_maker.configure(bind=db_sync_engine)
+
+    _init_lock.__enter__.side_effect = acquire_lock
+
+    database.init_sync_model(lazy=True)
+
+    with database.sync_session_maker() as db_sync_session:
+        assert db_sync_session.get_bind() is db_sync_engine
+
+    _init_lock.__enter__.assert_called_once_with()
+    get_sync_engine.assert_not_called()
+
+
+@mock.patch.object(database.sync_session_maker, "lazy", False)
+@mock.patch.dict(database.sync_session_maker.kw, clear=True)
+@mock.patch("duffy.database.get_sync_engine")
+def test_init_sync_model_lazy_concurrently(get_sync_engine, db_sync_engine):
+    no_threads = 4
+    barrier = threading.Barrier(no_threads)
+
+    def get_sync_engine_side_effect():
+        # Give other threads the chance to race for creating the engine.
+        time.sleep(0.1)
+        return db_sync_engine
+
+    get_sync_engine.side_effect = get_sync_engine_side_effect
+
+    def get_bind():
+        barrier.wait()
+        with database.sync_session_maker() as db_sync_session:
+            return db_sync_session.get_bind()
+
+    database.init_sync_model(lazy=True)
+
+    with ThreadPoolExecutor(max_workers=no_threads) as executor:
+        binds = list(executor.map(lambda _: get_bind(), range(no_threads)))
+
+    get_sync_engine.assert_called_once_with()
+    assert binds == no_threads * [db_sync_engine]
+
+
 @pytest.mark.duffy_config(TEST_CONFIG)
 @pytest.mark.parametrize("with_engine", (False, True), ids=("with-engine", "without-engine"))
+@mock.patch("duffy.database.async_read_engines", new_callable=list)
 @mock.patch("duffy.database.async_session_maker", new_callable=mock.AsyncMock)
+@mock.patch("duffy.database.get_async_read_engines")
 @mock.patch("duffy.database.get_async_engine")
-async def test_init_async_model(get_async_engine, async_session_maker, with_engine):
+async def test_init_async_model(
+    get_async_engine, get_async_read_engines, async_session_maker, async_read_engines, with_engine
+):
     if with_engine:
         async_engine = object()
     else:
         async_engine = None
     sentinel = object()
     get_async_engine.return_value = sentinel
+    read_sentinels = [object(), object()]
+    get_async_read_engines.return_value = read_sentinels
     # configure() is not an async coroutine, avoid warning
     async_session_maker.configure = mock.MagicMock()
 
@@ -54,10 +138,28 @@ async def test_init_async_model(get_async_engine, async_session_maker, with_engi
 
     if not with_engine:
         get_async_engine.assert_called_once_with()
+        get_async_read_engines.assert_called_once_with()
         async_session_maker.configure.assert_called_once_with(bind=sentinel)
+        assert async_read_engines == read_sentinels
     else:
         get_async_engine.assert_not_called()
+        get_async_read_engines.assert_not_called()
         async_session_maker.configure.assert_called_once_with(bind=async_engine)
+        assert async_read_engines == []
+
+
+@mock.patch("duffy.database.async_read_engines", new_callable=list)
+def test_next_async_read_engine(async_read_engines):
+    assert database.next_async_read_engine() is None
+
+    async_read_engines.extend(["replica1", "replica2"])
+
+    engines = [database.next_async_read_engine() for i in range(4)]
+
+    # The engines are used in turn.
+    assert sorted(engines) == ["replica1", "replica1", "replica2", "replica2"]
+    assert engines[0] != engines[1]
+    assert engines[:2] == engines[2:]
 
 
 @mock.patch("duffy.database.init_async_model")
@@ -72,75 +174,104 @@ def test_init_model(init_sync_model, init_async_model):
     init_async_model.assert_called_once_with(sentinel)
 
 
-def test__pgsql_disable_seqscan():
-    dbapi_connection = mock.Mock()
-    dbapi_connection.cursor.return_value = cursor = mock.Mock()
+@pytest.mark.parametrize("dialect", ("postgresql", "sqlite"))
+def test_disable_seqscan(dialect):
+    db_session = mock.Mock()
+    db_session.get_bind.return_value.dialect.name = dialect
+
+    database.disable_seqscan(db_session)
+
+    if dialect == "postgresql":
+        db_session.execute.assert_called_once()
+        assert str(db_session.execute.call_args.args[0]) == "SET LOCAL enable_seqscan = off"
+    else:
+        db_session.execute.assert_not_called()
+
+
+def test_disable_seqscan_in_transaction(db_sync_session):
+    with db_sync_session.begin():
+        database.disable_seqscan(db_sync_session)
+        assert db_sync_session.execute(text("SHOW enable_seqscan")).scalar() == "off"
 
-    database._pgsql_disable_seqscan(dbapi_connection, connection_record=object())
+    # Other transactions use the default planner settings.
+    with db_sync_session.begin():
+        assert db_sync_session.execute(text("SHOW enable_seqscan")).scalar() == "on"
 
-    dbapi_connection.cursor.assert_called_once_with()
-    cursor.execute.assert_called_once_with("SET enable_seqscan=off")
-    cursor.close.assert_called_once_with()
+
+async def test_disable_seqscan_async(db_async_session):
+    async with db_async_session.begin():
+        await db_async_session.run_sync(database.disable_seqscan)
+        assert (await db_async_session.execute(text("SHOW enable_seqscan"))).scalar() == "off"
 
 
 @pytest.mark.duffy_config(TEST_CONFIG)
-@pytest.mark.parametrize("testcase", ("works-sqlite", "works-postgresql", "config-broken"))
-@mock.patch("duffy.database.event")
+@pytest.mark.parametrize("testcase", ("works", "config-broken"))
 @mock.patch("duffy.database.create_engine")
-def test_get_sync_engine(create_engine, event, testcase):
+def test_get_sync_engine(create_engine, testcase):
     if testcase == "config-broken":
         del configuration.config["database"]["sqlalchemy"]
         with pytest.raises(exceptions.DuffyConfigurationError):
             database.get_sync_engine()
         create_engine.assert_not_called()
     else:  # "works" in testcase
-        db_engine = create_engine.return_value
-
-        if "postgresql" in testcase:
-            db_engine.name = "postgresql"
-        else:
-            db_engine.name = "sqlite"
-
-        database.get_sync_engine()
+        assert database.get_sync_engine() is create_engine.return_value
         create_engine.assert_called_once_with(
             url=TEST_CONFIG["database"]["sqlalchemy"]["sync_url"],
             isolation_level="SERIALIZABLE",
         )
 
-        if "postgresql" in testcase:
-            event.listen.assert_called_once_with(
-                db_engine, "connect", database._pgsql_disable_seqscan
-            )
-        else:
-            event.listen.assert_not_called()
-
 
 @pytest.mark.duffy_config(TEST_CONFIG)
-@pytest.mark.parametrize("testcase", ("works-sqlite", "works-postgresql", "config-broken"))
-@mock.patch("duffy.database.event")
+@pytest.mark.parametrize("testcase", ("works", "config-broken"))
 @mock.patch("duffy.database.create_async_engine")
-def test_get_async_engine(create_async_engine, event, testcase):
+def test_get_async_engine(create_async_engine, testcase):
     if testcase == "config-broken":
         del configuration.config["database"]["sqlalchemy"]
         with pytest.raises(exceptions.DuffyConfigurationError):
             database.get_async_engine()
         create_async_engine.assert_not_called()
     else:  # "works" in testcase
-        async_db_engine = create_async_engine.return_value
-        if "postgresql" in testcase:
-            async_db_engine.name = "postgresql"
-        else:
-            async_db_engine.name = "sqlite"
-
-        database.get_async_engine()
+        assert database.get_async_engine() is create_async_engine.return_value
         create_async_engine.assert_called_once_with(
             url=TEST_CONFIG["database"]["sqlalchemy"]["async_url"],
             isolation_level="SERIALIZABLE",
         )
 
-        if "postgresql" in testcase:
-            event.listen.assert_called_once_with(
-                async_db_engine.sync_engine, "connect", database._pgsql_disable_seqscan
-            )
-        else:
-            event.listen.assert_not_called()
+
+@pytest.mark.duffy_config(TEST_CONFIG)
+@pytest.mark.parametrize("testcase", ("works", "works-no-replicas", "config-broken"))
+@mock.patch("duffy.database.create_async_engine")
+def test_get_async_read_engines(create_async_engine, testcase):
+    if testcase == "config-broken":
+        del configuration.config["database"]["sqlalchemy"]
+        with pytest.raises(exceptions.DuffyConfigurationError):
+            database.get_async_read_engines()
+        create_async_engine.assert_not_called()
+    elif testcase == "works-no-replicas":
+        del configuration.config["database"]["sqlalchemy"]["async_read_urls"]
+        assert database.get_async_read_engines() == []
+        create_async_engine.assert_not_called()
+    else:  # "works" in testcase
+        engines = database.get_async_read_engines()
+
+        assert engines == 2 * [create_async_engine.return_value]
+        assert create_async_engine.call_args_list == [
+            mock.call(url=url, isolation_level="REPEATABLE READ")
+            for url in TEST_CONFIG["database"]["sqlalchemy"]["async_read_urls"]
+        ]
+
+
+@mock.patch("duffy.database.async_read_engines", new_callable=list)
+@mock.patch("duffy.database.async_session_maker")
+@mock.patch("duffy.database.get_async_read_engines")
+@mock.patch("duffy.database.get_async_engine")
+async def test_init_async_model_with_read_engines(
+    get_async_engine, get_async_read_engines, async_session_maker, async_read_engines
+):
+    read_engines = [object()]
+
+    await database.init_async_model(read_engines=read_engines)
+
+    get_async_engine.assert_called_once_with()
+    get_async_read_engines.assert_not_called()
+    assert async_read_engines == read_engines
@@ -0,0 +1,81 @@
+"""Check that hot queries use the indexes meant for them.
+
+The query planner only prefers an index over others if the table holds
+enough rows with a realistic distribution, so the tests populate it
+first.
+"""
+
+import random
+
+import pytest
+from sqlalchemy import func, insert, select, text
+
+from duffy.database.model import Node
+from duffy.database.types import NodeState
+
+POOLS = [f"pool-{idx}" for idx in range(50)]
+STATES = (
+    NodeState.ready,
+    NodeState.provisioning,
+    NodeState.deployed,
+    NodeState.done,
+    NodeState.failed,
+)
+
+
+@pytest.fixture
+def populated_nodes(db_sync_session):
+    rnd = random.Random(0)
+    with db_sync_session.begin():
+        db_sync_session.execute(
+            insert(Node),
+            [
+                {
+                    "hostname": f"node-{idx}",
+                    "ipaddr": f"192.0.2.{idx}",
+                    "pool": rnd.choice(POOLS),
+                    "state": rnd.choice(STATES),
+                    "data": {},
+                }
+                for idx in range(5000)
+            ],
+        )
+        # Most nodes in the database are retired.
+        db_sync_session.execute(
+            text("UPDATE nodes SET retired_at = NOW() WHERE state IN ('done', 'failed')")
+        )
+        db_sync_session.execute(text("ANALYZE nodes"))
+
+
+@pytest.mark.usefixtures("populated_nodes")
+@pytest.mark.parametrize("query_name", ("reserve-nodes", "fill-level", "pool-levels"))
+def test_active_pool_state_index(query_name, db_sync_explain):
+    if query_name == "reserve-nodes":
+        # see duffy.app.controllers.session.create_session()
+        query = (
+            select(Node)
+            .filter_by(active=True, state=NodeState.ready, pool="pool-3")
+            .limit(2)
+            .with_for_update()
+        )
+    elif query_name == "fill-level":
+        # see duffy.tasks.provision.fill_single_pool()
+        query = select(func.count()).select_from(
+            select(Node)
+            .filter(
+                Node.active == True,  # noqa: E712
+                Node.pool == "pool-3",
+                Node.state.in_((NodeState.ready, NodeState.provisioning)),
+            )
+            .subquery()
+        )
+    else:  # pool-levels
+        # see duffy.app.controllers.pool.get_pool()
+        query = (
+            select(Node.state, func.count(Node.state))
+            .filter(Node.active == True, Node.pool == "pool-3")  # noqa: E712
+            .group_by(Node.state)
+        )
+
+    plan = db_sync_explain(query)
+    assert "active_pool_state_index" in plan
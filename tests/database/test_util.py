@@ -2,11 +2,11 @@ import datetime as dt
 from contextlib import nullcontext
 
 import pytest
-from sqlalchemy import Column, Integer, select
+from sqlalchemy import Column, Integer, Text, select, update
 from sqlalchemy.exc import StatementError
 
 from duffy.database import Base
-from duffy.database.util import CreatableMixin, DeclEnum, RetirableMixin, TZDateTime
+from duffy.database.util import CreatableMixin, DeclEnum, RetirableMixin, TZDateTime, VersionedMixin
 
 
 class UselessEnum(DeclEnum):
@@ -124,6 +124,13 @@ class Retirable(Base, RetirableMixin):
     id = Column(Integer, primary_key=True)
 
 
+class Versioned(Base, VersionedMixin):
+    __tablename__ = "versioneds"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(Text, nullable=True)
+
+
 class TestCreatableMixin:
     def test_created_at_gets_set(self, db_sync_session):
         """Test that created_at gets set."""
@@ -184,3 +191,20 @@ class TestRetirableMixin:
         ).scalar_one()
 
         assert queried_obj is objs[value]
+
+
+class TestVersionedMixin:
+    def test_version_gets_incremented(self, db_sync_session):
+        obj = Versioned()
+        db_sync_session.add(obj)
+        db_sync_session.flush()
+        assert obj.version == 1
+
+        obj.name = "foo"
+        db_sync_session.flush()
+        assert obj.version == 2
+
+        # Bulk updates count as well.
+        db_sync_session.execute(update(Versioned).filter_by(id=obj.id).values(name="bar"))
+        db_sync_session.refresh(obj)
+        assert obj.version == 3
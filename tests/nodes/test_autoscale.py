@@ -0,0 +1,138 @@
+import datetime as dt
+
+import pytest
+
+from duffy.database.model import Node, Session, SessionNode, Tenant
+from duffy.nodes.autoscale import AutoscalePolicy
+
+
+class TestAutoscalePolicy:
+    @pytest.mark.parametrize(
+        "testcase", ("full", "minimal", "fill-level-fallback", "no-maximum", "min-exceeds-max")
+    )
+    def test_from_configuration(self, testcase):
+        fill_level = 10
+        expectation = None
+
+        if testcase == "full":
+            configuration = {
+                "min-fill-level": 2,
+                "max-fill-level": 20,
+                "window": "2h",
+                "interval": "10m",
+                "smoothing": 0.5,
+                "lead-time": "20m",
+            }
+            expected = AutoscalePolicy(
+                min_fill_level=2,
+                max_fill_level=20,
+                window=dt.timedelta(hours=2),
+                interval=dt.timedelta(minutes=10),
+                smoothing=0.5,
+                lead_time=dt.timedelta(minutes=20),
+            )
+        elif testcase == "minimal":
+            configuration = {"max-fill-level": 20}
+            expected = AutoscalePolicy(min_fill_level=0, max_fill_level=20)
+        elif testcase == "fill-level-fallback":
+            configuration = {"min-fill-level": 1}
+            expected = AutoscalePolicy(min_fill_level=1, max_fill_level=10)
+        elif testcase == "no-maximum":
+            configuration = {}
+            fill_level = None
+            expectation = "needs either"
+        else:  # min-exceeds-max
+            configuration = {"min-fill-level": 11}
+            expectation = "must not exceed"
+
+        if expectation:
+            with pytest.raises(ValueError, match=expectation):
+                AutoscalePolicy.from_configuration(configuration, fill_level=fill_level)
+        else:
+            policy = AutoscalePolicy.from_configuration(configuration, fill_level=fill_level)
+            assert policy == expected
+
+    def test_bucket_boundaries(self):
+        policy = AutoscalePolicy(
+            min_fill_level=0,
+            max_fill_level=1,
+            window=dt.timedelta(hours=1),
+            interval=dt.timedelta(minutes=25),
+        )
+        now = dt.datetime(2022, 1, 1, 12, 0, tzinfo=dt.timezone.utc)
+
+        assert policy.no_buckets == 3
+        assert policy.bucket_boundaries(now) == [
+            dt.datetime(2022, 1, 1, 10, 45, tzinfo=dt.timezone.utc),
+            dt.datetime(2022, 1, 1, 11, 10, tzinfo=dt.timezone.utc),
+            dt.datetime(2022, 1, 1, 11, 35, tzinfo=dt.timezone.utc),
+        ]
+
+        boundaries = policy.bucket_boundaries()
+        assert len(boundaries) == 3
+        assert all(boundary.tzinfo for boundary in boundaries)
+
+    @pytest.mark.parametrize(
+        "cumulative_counts, expected_rate",
+        (
+            ((), 0.0),
+            ((0, 0, 0), 0.0),
+            ((6, 6, 6), 3.0),
+            ((6, 4, 2), 2.0),
+            ((3, 3, 2), 1.25),
+        ),
+    )
+    def test_allocation_rate(self, cumulative_counts, expected_rate):
+        policy = AutoscalePolicy(min_fill_level=0, max_fill_level=1, smoothing=0.5)
+        assert policy.allocation_rate(cumulative_counts) == pytest.approx(expected_rate)
+
+    @pytest.mark.parametrize(
+        "cumulative_counts, lead_time, expected_target",
+        (
+            ((0, 0, 0), None, 2),
+            ((6, 4, 2), None, 2),
+            ((6, 4, 2), dt.timedelta(minutes=30), 4),
+            ((60, 40, 20), None, 10),
+        ),
+    )
+    def test_target_fill_level(self, cumulative_counts, lead_time, expected_target):
+        policy = AutoscalePolicy(
+            min_fill_level=2,
+            max_fill_level=10,
+            interval=dt.timedelta(minutes=15),
+            smoothing=0.5,
+            lead_time=lead_time,
+        )
+        assert policy.target_fill_level(cumulative_counts) == expected_target
+
+    def test_allocations_query(self, db_sync_session):
+        policy = AutoscalePolicy(
+            min_fill_level=0,
+            max_fill_level=10,
+            window=dt.timedelta(hours=3),
+            interval=dt.timedelta(hours=1),
+        )
+        now = dt.datetime.utcnow().replace(tzinfo=dt.timezone.utc)
+
+        with db_sync_session.begin():
+            tenant = Tenant(name="tenant", api_key="key", ssh_key="ssh key")
+            db_sync_session.add(tenant)
+            idx = 0
+            # Sessions created 4h (outside of the window), 150min, 90min and 30min ago
+            for age_minutes, pools in (
+                (240, ("foo", "foo")),
+                (150, ("foo", "bar")),
+                (90, ("foo", "foo", "foo")),
+                (30, ("foo",)),
+            ):
+                session = Session(tenant=tenant, created_at=now - dt.timedelta(minutes=age_minutes))
+                db_sync_session.add(session)
+                for pool in pools:
+                    idx += 1
+                    node = Node(hostname=f"node-{idx}", ipaddr=f"192.168.0.{idx}", pool=pool)
+                    db_sync_session.add(SessionNode(session=session, node=node, pool=pool, data={}))
+
+        with db_sync_session.begin():
+            result = db_sync_session.execute(policy.allocations_query("foo", now=now)).one()
+
+        assert tuple(result) == (5, 4, 1)
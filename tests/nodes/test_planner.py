@@ -0,0 +1,44 @@
+import pytest
+
+from duffy.nodes.planner import plan_reusable_nodes
+
+
+@pytest.mark.parametrize(
+    "deficits, eligible_pools, priorities, expected",
+    (
+        pytest.param({"foo": 2}, {}, None, {}, id="no-nodes"),
+        pytest.param({"foo": 0, "bar": -1}, {1: ["foo", "bar"]}, None, {}, id="pools-filled"),
+        pytest.param(
+            {"foo": 2},
+            {1: ["foo"], 2: [], 3: ["foo"], 4: ["foo"]},
+            None,
+            {"foo": [1, 3]},
+            id="single-pool",
+        ),
+        pytest.param(
+            # Node 1 can be used for both pools, but node 2 only for `foo`. Greedily assigning node
+            # 1 to `foo` would leave `bar` empty-handed.
+            {"foo": 1, "bar": 1},
+            {1: ["foo", "bar"], 2: ["foo"]},
+            None,
+            {"foo": [2], "bar": [1]},
+            id="least-flexible-first",
+        ),
+        pytest.param(
+            {"foo": 2, "bar": 4},
+            {node: ["foo", "bar"] for node in range(3)},
+            None,
+            {"foo": [1], "bar": [0, 2]},
+            id="fair-share",
+        ),
+        pytest.param(
+            {"foo": 2, "bar": 4},
+            {node: ["foo", "bar"] for node in range(3)},
+            {"foo": 1},
+            {"foo": [0, 1], "bar": [2]},
+            id="priorities",
+        ),
+    ),
+)
+def test_plan_reusable_nodes(deficits, eligible_pools, priorities, expected):
+    assert plan_reusable_nodes(deficits, eligible_pools, priorities=priorities) == expected
@@ -1,8 +1,11 @@
+import datetime as dt
 from unittest import mock
 
 import pytest
 
 from duffy.configuration import config
+from duffy.database.model import Node
+from duffy.nodes.autoscale import AutoscalePolicy
 from duffy.nodes.pools import AbstractNodePool, ConcreteNodePool, NodePool
 
 
@@ -145,6 +148,111 @@ class TestConcreteNodePool:
 
         assert set(pool.name for pool in ConcreteNodePool.iter_pools()) == expected
 
+    @pytest.mark.usefixtures("test_mechanism")
+    @pytest.mark.parametrize("autoscale", (None, False, {"min-fill-level": 2}))
+    def test_autoscale_policy(self, autoscale):
+        configuration = {"mechanism": {"type": "test", "test": {}}, "fill-level": 5}
+        if autoscale is not None:
+            configuration["autoscale"] = autoscale
+
+        pool = ConcreteNodePool(name="test", **configuration)
+
+        if autoscale:
+            assert pool.autoscale_policy == AutoscalePolicy(min_fill_level=2, max_fill_level=5)
+        else:
+            assert pool.autoscale_policy is None
+
+    @pytest.mark.usefixtures("test_mechanism")
+    @pytest.mark.parametrize(
+        "testcase, expected",
+        (
+            ("plain", 5),
+            ("profile-inactive", 5),
+            ("profile-active", 20),
+            ("profile-pre-warm", 30),
+            ("autoscale", 2),
+            ("autoscale-profile-active", 20),
+            ("autoscale-busy", 8),
+        ),
+    )
+    def test_target_fill_level(self, testcase, expected):
+        # 2022-01-03 was a Monday.
+        now = dt.datetime(2022, 1, 3, 11, 45, tzinfo=dt.timezone.utc)
+        configuration = {"mechanism": {"type": "test", "test": {}}, "fill-level": 5}
+        allocation_counts = None
+
+        if "profile" in testcase:
+            configuration["fill-level-profiles"] = profiles = [
+                {"name": "business-hours", "weekdays": ["mon"], "start": "08:00", "end": "18:00"},
+                {"name": "lunch", "start": "12:00", "end": "13:00", "pre-warm": "15m"},
+            ]
+            if testcase.endswith("inactive"):
+                profiles[0]["weekdays"] = ["tue"]
+                profiles[1]["pre-warm"] = "10m"
+            profiles[0]["fill-level"] = 20
+            profiles[1]["fill-level"] = 30 if "pre-warm" in testcase else 10
+        if "autoscale" in testcase:
+            configuration["autoscale"] = {"min-fill-level": 2, "max-fill-level": 10}
+            allocation_counts = (24, 16, 8) if "busy" in testcase else (0, 0, 0)
+
+        pool = ConcreteNodePool(name="test", **configuration)
+
+        effective_profile = pool.effective_fill_level_profile(now=now)
+        if testcase in ("profile-active", "autoscale-profile-active"):
+            assert effective_profile.name == "business-hours"
+        elif testcase == "profile-pre-warm":
+            assert effective_profile.name == "lunch"
+        else:
+            assert effective_profile is None
+
+        assert pool.target_fill_level(allocation_counts, now=now) == expected
+
+    @pytest.mark.usefixtures("test_mechanism")
+    def test_effective_fill_level_profile_now(self):
+        pool = ConcreteNodePool(
+            name="test",
+            mechanism={"type": "test", "test": {}},
+            **{"fill-level": 5, "fill-level-profiles": [{"fill-level": 10}]},
+        )
+
+        assert pool.effective_fill_level_profile().fill_level == 10
+        assert pool.target_fill_level() == 10
+
+    @pytest.mark.usefixtures("test_mechanism")
+    @pytest.mark.parametrize("testcase", ("matching", "not-matching", "no-reuse", "broken-spec"))
+    def test_can_reuse_node(self, testcase):
+        reuse_nodes = {"architecture": "{{ architecture }}", "generation": 5}
+        if testcase == "no-reuse":
+            reuse_nodes = False
+        elif testcase == "broken-spec":
+            reuse_nodes["foo"] = ["bar"]
+
+        pool = ConcreteNodePool(
+            name="test",
+            mechanism={"type": "test", "test": {}},
+            architecture="x86_64",
+            **{"reuse-nodes": reuse_nodes},
+        )
+
+        if testcase == "not-matching":
+            data = {"architecture": "x86_64", "generation": "5"}
+        else:
+            data = {"architecture": "x86_64", "generation": 5, "other": "value"}
+        node = Node(data=data)
+
+        if testcase == "broken-spec":
+            with pytest.raises(ValueError, match=r"\[test\] Unsupported reuse-nodes value"):
+                pool.reuse_nodes_spec
+            return
+
+        if testcase == "no-reuse":
+            assert pool.reuse_nodes_spec is None
+        else:
+            assert pool.reuse_nodes_spec == {"architecture": "x86_64", "generation": 5}
+
+        assert pool.can_reuse_node(node) is (testcase == "matching")
+        assert pool.can_reuse_node(Node(), spec={"architecture": "x86_64"}) is False
+
     @pytest.mark.usefixtures("test_mechanism")
     @pytest.mark.parametrize("method", ("provision", "deprovision"))
     def test_provision_deprovision(self, method):
@@ -0,0 +1,104 @@
+import datetime as dt
+
+import pytest
+
+from duffy.nodes.profiles import FillLevelProfile
+
+UTC = dt.timezone.utc
+
+# 2022-01-03 was a Monday.
+MONDAY = dt.date(2022, 1, 3)
+
+
+def _at(days: int, hour: int, minute: int = 0) -> dt.datetime:
+    return dt.datetime.combine(MONDAY + dt.timedelta(days=days), dt.time(hour, minute), tzinfo=UTC)
+
+
+class TestFillLevelProfile:
+    def test_from_configuration(self):
+        profile = FillLevelProfile.from_configuration(
+            {
+                "name": "workdays",
+                "weekdays": ["mon", "fri"],
+                "start": "08:00",
+                "end": "18:30",
+                "fill-level": 30,
+                "pre-warm": "30m",
+            }
+        )
+        assert profile == FillLevelProfile(
+            name="workdays",
+            weekdays=frozenset((0, 4)),
+            start=dt.time(8),
+            end=dt.time(18, 30),
+            fill_level=30,
+            pre_warm=dt.timedelta(minutes=30),
+        )
+
+    def test_from_configuration_defaults(self):
+        profile = FillLevelProfile.from_configuration({"fill-level": 3})
+        assert profile == FillLevelProfile(fill_level=3)
+        assert profile.duration == dt.timedelta(days=1)
+
+    @pytest.mark.parametrize(
+        "at, expected",
+        (
+            (_at(0, 7, 59), False),
+            (_at(0, 8), True),
+            (_at(0, 17, 59), True),
+            (_at(0, 18), False),
+            # Tuesday isn't configured
+            (_at(1, 12), False),
+            (_at(4, 12), True),
+        ),
+    )
+    def test_is_active(self, at, expected):
+        profile = FillLevelProfile(
+            fill_level=1, weekdays=frozenset((0, 4)), start=dt.time(8), end=dt.time(18)
+        )
+        assert profile.is_active(at) is expected
+
+    @pytest.mark.parametrize(
+        "at, expected",
+        (
+            (_at(0, 21, 59), False),
+            (_at(0, 22), True),
+            (_at(1, 5, 59), True),
+            (_at(1, 6), False),
+            # The window opens on Mondays only.
+            (_at(1, 22), False),
+            (_at(6, 23), False),
+        ),
+    )
+    def test_is_active_overnight(self, at, expected):
+        profile = FillLevelProfile(
+            fill_level=1, weekdays=frozenset((0,)), start=dt.time(22), end=dt.time(6)
+        )
+        assert profile.duration == dt.timedelta(hours=8)
+        assert profile.is_active(at) is expected
+
+    @pytest.mark.parametrize(
+        "now, expected",
+        ((_at(0, 7, 29), False), (_at(0, 7, 30), True), (_at(0, 12), True), (_at(0, 18), False)),
+    )
+    def test_is_effective(self, now, expected):
+        profile = FillLevelProfile(
+            fill_level=1,
+            start=dt.time(8),
+            end=dt.time(18),
+            pre_warm=dt.timedelta(minutes=30),
+        )
+        assert profile.is_effective(now) is expected
+
+    @pytest.mark.parametrize(
+        "weekdays, after, expected",
+        (
+            (frozenset((0, 4)), _at(0, 7), _at(0, 8)),
+            (frozenset((0, 4)), _at(0, 8), _at(4, 8)),
+            (frozenset((0,)), _at(0, 9), _at(7, 8)),
+            (frozenset(), _at(0, 7), None),
+        ),
+    )
+    def test_next_start(self, weekdays, after, expected):
+        profile = FillLevelProfile(fill_level=1, weekdays=weekdays, start=dt.time(8))
+        assert profile.next_start(after) == expected
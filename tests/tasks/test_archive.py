@@ -0,0 +1,28 @@
+from contextlib import nullcontext
+from unittest import mock
+
+import pytest
+
+from duffy.tasks import archive_retired
+
+
+@pytest.mark.parametrize("archived_something", (True, False))
+@mock.patch("duffy.tasks.archive.archive")
+@mock.patch("duffy.tasks.archive.Lock")
+def test_archive_retired(Lock, archive, archived_something, caplog):
+    Lock.return_value = nullcontext()
+    if archived_something:
+        archive.archive_retired.return_value = {"sessions": 2, "nodes": 3}
+    else:
+        archive.archive_retired.return_value = {"sessions": 0, "nodes": 0}
+
+    with caplog.at_level("DEBUG", "duffy"):
+        archive_retired()
+
+    Lock.assert_called_once_with(key="duffy:archive-retired")
+    archive.archive_retired.assert_called_once_with()
+
+    if archived_something:
+        assert "Archived 2 sessions and 3 nodes" in caplog.messages
+    else:
+        assert not any("Archived" in msg for msg in caplog.messages)
@@ -0,0 +1,180 @@
+import datetime as dt
+import json
+import uuid
+
+import pytest
+from sqlalchemy import select
+
+from duffy.database.model import Node, PoolLevel, Session, Tenant
+from duffy.database.types import NodeState
+from duffy.tasks import bulk, events
+
+
+def published_events(events_redis):
+    pipeline = events_redis.pipeline.return_value.__enter__.return_value
+    published = [json.loads(call.args[1]) for call in pipeline.publish.call_args_list]
+    pipeline.publish.reset_mock()
+    return published
+
+
+def pool_levels(db_sync_session):
+    with db_sync_session.begin():
+        return {
+            (level.pool, level.state.name): level.quantity
+            for level in db_sync_session.execute(select(PoolLevel)).scalars()
+            if level.quantity
+        }
+
+
+@pytest.mark.duffy_config(example_config=True)
+class TestTransitionNodes:
+    @pytest.fixture
+    def nodes(self, db_sync_session, events_redis):
+        with db_sync_session.begin():
+            for idx, (pool, state) in enumerate(
+                (
+                    ("pool-a", "deployed"),
+                    ("pool-a", "deployed"),
+                    ("pool-a", "ready"),
+                    ("pool-b", "deployed"),
+                    ("pool-a", "failed"),
+                ),
+                1,
+            ):
+                db_sync_session.add(
+                    Node(
+                        hostname=f"node-{idx}",
+                        ipaddr=f"192.0.2.{idx}",
+                        pool=pool,
+                        state=state,
+                        data={"provision": {"id": idx}},
+                    )
+                )
+        published_events(events_redis)
+
+    @pytest.mark.usefixtures("nodes")
+    def test_transition_nodes(self, db_sync_session, events_redis):
+        with db_sync_session.begin():
+            rows = bulk.transition_nodes(
+                db_sync_session,
+                [1, 2, 3, 4, 5, 6],
+                (NodeState.deployed, NodeState.ready),
+                NodeState.deprovisioning,
+                in_pool="pool-a",
+                values={"pool": None},
+                returning=(Node.ipaddr,),
+            )
+
+        assert sorted((row.id, row.pool, row.ipaddr) for row in rows) == [
+            (1, None, "192.0.2.1"),
+            (2, None, "192.0.2.2"),
+            (3, None, "192.0.2.3"),
+        ]
+
+        with db_sync_session.begin():
+            nodes = db_sync_session.execute(select(Node).order_by(Node.id)).scalars().all()
+            assert [(node.pool, node.state.name, node.version) for node in nodes] == [
+                (None, "deprovisioning", 2),
+                (None, "deprovisioning", 2),
+                (None, "deprovisioning", 2),
+                ("pool-b", "deployed", 1),
+                ("pool-a", "failed", 1),
+            ]
+
+        # Nodes without a pool don't count, nodes of other pools aren't touched.
+        assert pool_levels(db_sync_session) == {
+            ("pool-a", "failed"): 1,
+            ("pool-b", "deployed"): 1,
+        }
+        assert published_events(events_redis) == [
+            {
+                "type": "pool",
+                "data": {
+                    "name": "pool-a",
+                    "levels": {state.name: 0 for state in events.LEVEL_STATES},
+                },
+            }
+        ]
+
+    @pytest.mark.usefixtures("nodes")
+    @pytest.mark.parametrize("retire", (False, True), ids=("stay-active", "retire"))
+    def test_transition_nodes_keep_pool(self, retire, db_sync_session, events_redis):
+        values = {"retired_at": dt.datetime.now(dt.timezone.utc)} if retire else None
+
+        with db_sync_session.begin():
+            rows = bulk.transition_nodes(
+                db_sync_session, [1, 4], NodeState.deployed, NodeState.done, values=values
+            )
+
+        assert sorted(row.id for row in rows) == [1, 4]
+
+        expected_levels = {
+            ("pool-a", "deployed"): 1,
+            ("pool-a", "ready"): 1,
+            ("pool-a", "failed"): 1,
+        }
+        if not retire:
+            expected_levels[("pool-a", "done")] = 1
+            expected_levels[("pool-b", "done")] = 1
+        assert pool_levels(db_sync_session) == expected_levels
+
+        assert [evt["data"]["name"] for evt in published_events(events_redis)] == [
+            "pool-a",
+            "pool-b",
+        ]
+
+    @pytest.mark.usefixtures("nodes")
+    @pytest.mark.parametrize("node_ids", ([], [3, 5]), ids=("no-ids", "no-match"))
+    def test_transition_nodes_nothing(self, node_ids, db_sync_session, events_redis):
+        with db_sync_session.begin():
+            rows = bulk.transition_nodes(
+                db_sync_session, node_ids, NodeState.deployed, NodeState.deprovisioning
+            )
+
+        assert rows == []
+        assert published_events(events_redis) == []
+
+
+@pytest.mark.duffy_config(example_config=True)
+def test_retire_sessions(db_sync_session, events_redis):
+    now = dt.datetime.now(dt.timezone.utc)
+
+    with db_sync_session.begin():
+        tenant = Tenant(name="tenant", ssh_key="BOOP", api_key=uuid.uuid4())
+        sessions = [
+            Session(tenant=tenant, expires_at=now - dt.timedelta(hours=1)),
+            Session(tenant=tenant, expires_at=now + dt.timedelta(hours=1)),
+            Session(
+                tenant=tenant,
+                expires_at=now - dt.timedelta(hours=1),
+                retired_at=now - dt.timedelta(minutes=30),
+            ),
+        ]
+        db_sync_session.add_all(sessions)
+    published_events(events_redis)
+
+    with db_sync_session.begin():
+        rows = bulk.retire_sessions(db_sync_session, Session.expires_at < now, retired_at=now)
+
+    assert [(row.id, row.tenant_id, row.retired_at) for row in rows] == [
+        (sessions[0].id, tenant.id, now)
+    ]
+
+    with db_sync_session.begin():
+        for session in sessions:
+            db_sync_session.refresh(session)
+        assert [session.active for session in sessions] == [False, True, False]
+        assert sessions[0].version == 2
+
+    assert published_events(events_redis) == [
+        {
+            "type": "session",
+            "data": {
+                "id": sessions[0].id,
+                "tenant_id": tenant.id,
+                "transition": "retired",
+                "active": False,
+                "expires_at": sessions[0].expires_at.isoformat(),
+            },
+        }
+    ]
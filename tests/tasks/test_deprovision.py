@@ -187,6 +187,7 @@ def test_deprovision_pool_nodes(testcase, test_mechanism, db_sync_session, caplo
                             counts["final_state"] += 1
                         else:
                             assert node.state == "failed"
+                            assert node.data["error"]["detail"] == "deprovisioning node failed"
                             counts["failed"] += 1
                     assert counts["active"] == 1
                     assert counts["failed"] == 1
@@ -202,6 +203,10 @@ def test_deprovision_pool_nodes(testcase, test_mechanism, db_sync_session, caplo
                 assert str(excinfo.value) == "you should have bought a squirrel"
                 assert all(node.active for node in nodes)
                 assert all(node.state == "failed" for node in nodes)
+                assert all(
+                    node.data["error"]["detail"] == "deprovisioning mechanism failed"
+                    for node in nodes
+                )
         else:
             pool_deprovision.assert_not_called()
             assert all(node.state == "deployed" for node in nodes)
@@ -0,0 +1,241 @@
+import datetime as dt
+import json
+import uuid
+from unittest import mock
+
+import pytest
+from redis import RedisError
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import selectinload
+
+from duffy.database.model import Node, Session, SessionNode, Tenant
+from duffy.tasks import events
+
+# The autouse events_redis fixture replaces this during tests.
+real__redis = events._redis
+
+
+def published_events(events_redis):
+    pipeline = events_redis.pipeline.return_value.__enter__.return_value
+    published = [json.loads(call.args[1]) for call in pipeline.publish.call_args_list]
+    assert all(call.args[0] == events.CHANNEL for call in pipeline.publish.call_args_list)
+    pipeline.publish.reset_mock()
+    return published
+
+
+def pool_event(name, **levels):
+    return {
+        "type": "pool",
+        "data": {
+            "name": name,
+            "levels": {
+                "provisioning": 0,
+                "ready": 0,
+                "contextualizing": 0,
+                "deployed": 0,
+                "deprovisioning": 0,
+                **levels,
+            },
+        },
+    }
+
+
+@pytest.mark.duffy_config(example_config=True)
+class TestEvents:
+    def test_session_lifecycle(self, db_sync_session, events_redis):
+        expires_at = dt.datetime(2026, 1, 1, 12, 0, tzinfo=dt.timezone.utc)
+
+        with db_sync_session.begin():
+            tenant = Tenant(name="tenant", ssh_key="BOOP", api_key=uuid.uuid4())
+            db_sync_session.add(tenant)
+            for idx in range(3):
+                db_sync_session.add(
+                    Node(
+                        hostname=f"node-{idx}",
+                        ipaddr=f"192.0.2.{idx}",
+                        pool="pool-a",
+                        state="ready",
+                    )
+                )
+
+        assert published_events(events_redis) == [pool_event("pool-a", ready=3)]
+
+        with db_sync_session.begin():
+            nodes = db_sync_session.execute(select(Node).limit(2)).scalars().all()
+            session = Session(tenant=tenant, expires_at=expires_at)
+            for node in nodes:
+                node.state = "contextualizing"
+                db_sync_session.add(SessionNode(session=session, node=node, pool="pool-a"))
+            db_sync_session.flush()
+            session_id = session.id
+
+        session_data = {
+            "id": session_id,
+            "tenant_id": tenant.id,
+            "active": True,
+            "expires_at": "2026-01-01T12:00:00+00:00",
+        }
+        assert published_events(events_redis) == [
+            {"type": "session", "data": {**session_data, "transition": "created"}},
+            pool_event("pool-a", ready=1, contextualizing=2),
+        ]
+
+        # Nodes are deployed in a new transaction, with the session loaded along with them.
+        db_sync_session.expunge_all()
+        with db_sync_session.begin():
+            session = db_sync_session.execute(
+                select(Session)
+                .filter_by(id=session_id)
+                .options(selectinload(Session.session_nodes).selectinload(SessionNode.node))
+            ).scalar_one()
+            for session_node in session.session_nodes:
+                session_node.node.state = "deployed"
+
+        assert published_events(events_redis) == [
+            {"type": "session", "data": {**session_data, "transition": "deployed"}},
+            pool_event("pool-a", ready=1, deployed=2),
+        ]
+
+        with db_sync_session.begin():
+            session.expires_at = expires_at + dt.timedelta(hours=1)
+
+        session_data["expires_at"] = "2026-01-01T13:00:00+00:00"
+        assert published_events(events_redis) == [
+            {"type": "session", "data": {**session_data, "transition": "updated"}}
+        ]
+
+        with db_sync_session.begin():
+            session.active = False
+            for session_node in session.session_nodes:
+                session_node.node.state = "done"
+                session_node.node.active = False
+
+        assert published_events(events_redis) == [
+            {"type": "session", "data": {**session_data, "active": False, "transition": "retired"}},
+            pool_event("pool-a", ready=1),
+        ]
+
+    def test_node_changes_pool(self, db_sync_session, events_redis):
+        with db_sync_session.begin():
+            node = Node(hostname="node", ipaddr="192.0.2.1", pool="pool-a", state="ready")
+            db_sync_session.add(node)
+
+        published_events(events_redis)
+
+        with db_sync_session.begin():
+            node.pool = "pool-b"
+
+        assert published_events(events_redis) == [
+            pool_event("pool-a"),
+            pool_event("pool-b", ready=1),
+        ]
+
+    def test_unrelated_changes(self, db_sync_session, events_redis):
+        with db_sync_session.begin():
+            node = Node(hostname="node", ipaddr="192.0.2.1", state="ready")
+            db_sync_session.add(node)
+
+        with db_sync_session.begin():
+            node.comment = "Just a comment."
+
+        assert published_events(events_redis) == []
+
+    def test_rollback(self, db_sync_session, events_redis):
+        with pytest.raises(RuntimeError):
+            with db_sync_session.begin():
+                db_sync_session.add(
+                    Node(hostname="node", ipaddr="192.0.2.1", pool="pool-a", state="ready")
+                )
+                db_sync_session.flush()
+                raise RuntimeError("BOOP")
+
+        with db_sync_session.begin():
+            pass
+
+        assert published_events(events_redis) == []
+
+    def test_local_subscribers(self, db_sync_session, events_redis):
+        subscriber = mock.Mock()
+
+        with mock.patch.object(events, "local_subscribers", [subscriber]):
+            with db_sync_session.begin():
+                db_sync_session.add(
+                    Node(hostname="node", ipaddr="192.0.2.1", pool="pool-a", state="ready")
+                )
+
+        # Local subscribers don't wait for the levels of pools.
+        subscriber.assert_called_once_with([{"type": "pool", "data": {"name": "pool-a"}}])
+        assert published_events(events_redis) == [pool_event("pool-a", ready=1)]
+
+    def test_publisher(self, db_sync_session):
+        publisher = mock.Mock()
+
+        with mock.patch.object(events, "publisher", publisher):
+            with db_sync_session.begin():
+                with db_sync_session.begin_nested():
+                    db_sync_session.add(
+                        Node(hostname="node", ipaddr="192.0.2.1", pool="pool-a", state="ready")
+                    )
+                    db_sync_session.flush()
+                # Changes are only handed over when the outermost transaction has ended.
+                publisher.assert_not_called()
+
+        publisher.assert_called_once_with([], {"pool-a"})
+
+    @pytest.mark.parametrize("read_committed", (True, False))
+    def test_pool_events(self, read_committed, db_sync_session):
+        with db_sync_session.begin():
+            db_sync_session.add(
+                Node(hostname="node", ipaddr="192.0.2.1", pool="pool-a", state="ready")
+            )
+
+        with mock.patch.dict(events.LEVELS_EXECUTION_OPTIONS, clear=not read_committed):
+            assert events.pool_events({"pool-b", "pool-a"}) == [
+                pool_event("pool-a", ready=1),
+                pool_event("pool-b"),
+            ]
+
+    @pytest.mark.parametrize("with_session_events", (True, False))
+    @mock.patch.object(events, "pool_events")
+    def test_publish_changes_levels_failure(
+        self, pool_events, with_session_events, events_redis, caplog
+    ):
+        pool_events.side_effect = OperationalError("SELECT", {}, Exception("BOOP"))
+        session_events = [{"type": "session", "data": {"id": 1}}] if with_session_events else []
+
+        with caplog.at_level("DEBUG", "duffy"):
+            events.publish_changes(session_events, {"pool-a"})
+
+        assert any(
+            message.startswith("Couldn't look up levels of 1 pool(s) to publish:")
+            for message in caplog.messages
+        )
+        assert published_events(events_redis) == session_events
+
+    def test_publish_failure(self, events_redis, caplog):
+        events_redis.pipeline.return_value.__enter__.return_value.execute.side_effect = RedisError(
+            "BOOP"
+        )
+
+        with caplog.at_level("WARNING", "duffy.tasks.events"):
+            events.publish([{"type": "pool", "data": {}}])
+
+        assert "Couldn't publish 1 event(s): BOOP" in caplog.messages
+
+
+@pytest.mark.duffy_config({})
+def test_publish_unconfigured(events_redis):
+    events.publish([{"type": "pool", "data": {}}])
+
+    events_redis.pipeline.assert_not_called()
+
+
+@mock.patch("duffy.tasks.events.Redis")
+def test__redis(Redis):
+    real__redis.cache_clear()
+    try:
+        assert real__redis("redis://localhost") is Redis.from_url.return_value
+        Redis.from_url.assert_called_once_with("redis://localhost")
+    finally:
+        real__redis.cache_clear()
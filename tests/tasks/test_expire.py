@@ -77,3 +77,20 @@ def test_expire_sessions(Lock, deprovision_nodes, db_sync_session, caplog):
                     assert session_node.node_id not in kwargs["node_ids"]
 
         async_result.forget.assert_has_calls([mock.call()] for session in sessions_to_expire)
+
+
+@mock.patch("duffy.tasks.expire.deprovision_nodes")
+@mock.patch("duffy.tasks.expire.Lock")
+def test_expire_sessions_none_expired(Lock, deprovision_nodes, db_sync_session):
+    Lock.return_value = nullcontext()
+
+    with db_sync_session.begin():
+        now = dt.datetime.utcnow().replace(tzinfo=dt.timezone.utc)
+        tenant = Tenant(
+            name="tenant", ssh_key="BOOP", api_key=uuid.uuid5(uuid.NAMESPACE_OID, "tenant")
+        )
+        db_sync_session.add(Session(tenant=tenant, expires_at=now + dt.timedelta(hours=1)))
+
+    expire_sessions()
+
+    deprovision_nodes.delay.assert_not_called()
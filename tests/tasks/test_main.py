@@ -12,43 +12,79 @@ TEST_CONFIG = {
             "result_backend": "redis://localhost:6379",
         },
         "locking": {"url": "redis:///"},
-        "periodic": {"fill-pools": {"interval": 5}, "expire-sessions": {"interval": 7}},
+        "periodic": {
+            "fill-pools": {"interval": 5},
+            "expire-sessions": {"interval": 7},
+            "reconcile-pool-levels": {"interval": 11},
+        },
     }
 }
 
 
 @pytest.mark.duffy_config(TEST_CONFIG)
+@pytest.mark.parametrize(
+    "archive_configured", (False, True), ids=("without-archive", "with-archive")
+)
 @pytest.mark.parametrize("period_type", ("dimensionless", "complex"))
+@mock.patch("duffy.tasks.main.archive_retired")
+@mock.patch("duffy.tasks.main.reconcile_pool_levels")
 @mock.patch("duffy.tasks.main.expire_sessions")
 @mock.patch("duffy.tasks.main.fill_pools")
-def test_setup_periodic_tasks(fill_pools, expire_sessions, period_type):
+def test_setup_periodic_tasks(
+    fill_pools,
+    expire_sessions,
+    reconcile_pool_levels,
+    archive_retired,
+    period_type,
+    archive_configured,
+):
     sender = mock.MagicMock()
     fill_pools.signature.return_value = fill_pools_sentinel = object()
     expire_sessions.signature.return_value = expire_sessions_sentinel = object()
+    reconcile_pool_levels.signature.return_value = reconcile_pool_levels_sentinel = object()
+    archive_retired.signature.return_value = archive_retired_sentinel = object()
+
+    if archive_configured:
+        config["tasks"]["periodic"]["archive-retired"] = {"interval": "1d"}
 
     if period_type == "dimensionless":
         expected_fill_pool_schedule = TEST_CONFIG["tasks"]["periodic"]["fill-pools"]["interval"]
         expected_expire_sessions_schedule = TEST_CONFIG["tasks"]["periodic"]["expire-sessions"][
             "interval"
         ]
+        expected_reconcile_pool_levels_schedule = TEST_CONFIG["tasks"]["periodic"][
+            "reconcile-pool-levels"
+        ]["interval"]
     else:
         config["tasks"]["periodic"]["fill-pools"]["interval"] = "5m"
         expected_fill_pool_schedule = 300
         config["tasks"]["periodic"]["expire-sessions"]["interval"] = "7m"
         expected_expire_sessions_schedule = 420
+        config["tasks"]["periodic"]["reconcile-pool-levels"]["interval"] = "11m"
+        expected_reconcile_pool_levels_schedule = 660
 
     main.setup_periodic_tasks(sender)
 
     fill_pools.signature.assert_called_once_with()
     expire_sessions.signature.assert_called_once_with()
+    reconcile_pool_levels.signature.assert_called_once_with()
     sender.add_periodic_task.assert_has_calls(
         [
             mock.call(expected_fill_pool_schedule, fill_pools_sentinel),
             mock.call(expected_expire_sessions_schedule, expire_sessions_sentinel),
+            mock.call(expected_reconcile_pool_levels_schedule, reconcile_pool_levels_sentinel),
         ],
         any_order=True,
     )
 
+    if archive_configured:
+        archive_retired.signature.assert_called_once_with()
+        sender.add_periodic_task.assert_any_call(86400, archive_retired_sentinel)
+        assert sender.add_periodic_task.call_count == 4
+    else:
+        archive_retired.signature.assert_not_called()
+        assert sender.add_periodic_task.call_count == 3
+
 
 @mock.patch("duffy.tasks.main.expire_sessions")
 @mock.patch("duffy.tasks.main.fill_pools")
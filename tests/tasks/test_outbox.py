@@ -0,0 +1,103 @@
+from unittest import mock
+
+import pytest
+from sqlalchemy import select
+
+from duffy.database.model import OutboxMessage
+from duffy.tasks import deprovision_nodes, fill_pools, outbox
+
+
+def outbox_contents(db_sync_session):
+    with db_sync_session.begin():
+        return [
+            (message.task, message.kwargs)
+            for message in db_sync_session.execute(
+                select(OutboxMessage).order_by(OutboxMessage.id)
+            ).scalars()
+        ]
+
+
+@pytest.fixture
+def relay():
+    relay = mock.Mock()
+    outbox.local_relays.append(relay)
+    yield relay
+    outbox.local_relays.remove(relay)
+
+
+@pytest.mark.parametrize("committed", (True, False), ids=("committed", "rolled-back"))
+def test_enqueue(committed, relay, db_sync_session):
+    db_sync_session.begin()
+    outbox.enqueue(db_sync_session, fill_pools, pool_names=["pool-a"])
+    outbox.enqueue(db_sync_session, deprovision_nodes, node_ids=[1, 2])
+
+    if committed:
+        db_sync_session.commit()
+        relay.assert_called_once_with()
+        assert outbox_contents(db_sync_session) == [
+            ("duffy.tasks.provision.fill_pools", {"pool_names": ["pool-a"]}),
+            ("duffy.tasks.deprovision.deprovision_nodes", {"node_ids": [1, 2]}),
+        ]
+    else:
+        db_sync_session.rollback()
+        relay.assert_not_called()
+        assert outbox_contents(db_sync_session) == []
+
+    # Only committing messages wakes up relays.
+    with db_sync_session.begin():
+        pass
+    assert relay.call_count == (1 if committed else 0)
+
+
+class TestRelayOutbox:
+    @pytest.fixture
+    def messages(self, db_sync_session):
+        with db_sync_session.begin():
+            for idx in range(3):
+                outbox.enqueue(db_sync_session, fill_pools, pool_names=[f"pool-{idx}"])
+
+    @pytest.fixture
+    def celery(self):
+        with mock.patch.object(outbox, "celery") as celery:
+            yield celery
+
+    @pytest.mark.parametrize("batch_size", (2, 5))
+    def test_relay(self, batch_size, celery, messages, db_sync_session):
+        assert outbox.relay_outbox(batch_size) == min(batch_size, 3)
+
+        producer = celery.producer_or_acquire.return_value.__enter__.return_value
+        assert celery.send_task.call_args_list == [
+            mock.call(
+                "duffy.tasks.provision.fill_pools",
+                kwargs={"pool_names": [f"pool-{idx}"]},
+                producer=producer,
+            )
+            for idx in range(min(batch_size, 3))
+        ]
+        assert celery.send_task.return_value.forget.call_count == min(batch_size, 3)
+
+        assert outbox_contents(db_sync_session) == [
+            ("duffy.tasks.provision.fill_pools", {"pool_names": [f"pool-{idx}"]})
+            for idx in range(min(batch_size, 3), 3)
+        ]
+
+    @pytest.mark.parametrize("read_committed", (True, False))
+    def test_relay_empty(self, read_committed, celery, db_sync_session):
+        with mock.patch.dict(outbox.RELAY_EXECUTION_OPTIONS, clear=not read_committed):
+            assert outbox.relay_outbox() == 0
+        celery.send_task.assert_not_called()
+
+    def test_relay_failure(self, celery, messages, db_sync_session, caplog):
+        celery.send_task.side_effect = [mock.Mock(), OSError("broker unavailable")]
+
+        with caplog.at_level("DEBUG", "duffy"):
+            assert outbox.relay_outbox() == 1
+
+        assert (
+            "Sending messages from the outbox failed, 1 of 3 sent: broker unavailable"
+            in caplog.messages
+        )
+        # Only the message which was sent is removed.
+        assert outbox_contents(db_sync_session) == [
+            ("duffy.tasks.provision.fill_pools", {"pool_names": [f"pool-{idx}"]}) for idx in (1, 2)
+        ]
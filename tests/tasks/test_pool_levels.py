@@ -0,0 +1,108 @@
+import datetime as dt
+from contextlib import nullcontext
+from unittest import mock
+
+from sqlalchemy import insert, select
+
+from duffy.database.model import Node, PoolLevel
+from duffy.database.types import NodeState
+from duffy.tasks import reconcile_pool_levels
+from duffy.tasks.bulk import transition_nodes
+
+
+def stored_levels(db_sync_session):
+    with db_sync_session.begin():
+        return {
+            (level.pool, level.state.name): level.quantity
+            for level in db_sync_session.execute(select(PoolLevel)).scalars()
+        }
+
+
+@mock.patch("duffy.tasks.pool_levels.Lock")
+def test_reconcile_pool_levels(Lock, db_sync_session, caplog):
+    Lock.return_value = nullcontext()
+
+    with db_sync_session.begin():
+        db_sync_session.add_all(
+            [
+                Node(hostname="node-1", ipaddr="192.0.2.1", pool="pool-a", state="ready"),
+                Node(hostname="node-2", ipaddr="192.0.2.2", pool="pool-a", state="deployed"),
+            ]
+        )
+        # Bulk inserts bypass maintaining the counters.
+        db_sync_session.execute(
+            insert(Node),
+            [
+                {"hostname": "node-3", "ipaddr": "192.0.2.3", "pool": "pool-a", "state": "ready"},
+                {"hostname": "node-4", "ipaddr": "192.0.2.4", "pool": "pool-b", "state": "ready"},
+            ],
+        )
+
+    with db_sync_session.begin():
+        # A stale counter.
+        db_sync_session.add(PoolLevel(pool="pool-c", state="ready", quantity=2))
+
+    with caplog.at_level("DEBUG", "duffy"):
+        reconcile_pool_levels()
+
+    Lock.assert_called_once_with(key="duffy:reconcile-pool-levels")
+
+    assert stored_levels(db_sync_session) == {
+        ("pool-a", "ready"): 2,
+        ("pool-a", "deployed"): 1,
+        ("pool-b", "ready"): 1,
+        ("pool-c", "ready"): 0,
+    }
+    assert [msg for msg in caplog.messages if "Correcting" in msg] == [
+        "[pool-a] Correcting level of ready nodes: 1 -> 2",
+        "[pool-b] Correcting level of ready nodes: 0 -> 1",
+        "[pool-c] Correcting level of ready nodes: 2 -> 0",
+    ]
+
+
+@mock.patch("duffy.tasks.pool_levels.Lock")
+def test_reconcile_pool_levels_after_bulk_transitions(Lock, db_sync_session, caplog):
+    Lock.return_value = nullcontext()
+
+    with db_sync_session.begin():
+        nodes = [
+            Node(hostname=f"node-{idx}", ipaddr=f"192.0.2.{idx}", pool="pool-a", state="ready")
+            for idx in range(4)
+        ]
+        db_sync_session.add_all(nodes)
+    node_ids = [node.id for node in nodes]
+
+    with db_sync_session.begin():
+        transition_nodes(db_sync_session, node_ids[:3], NodeState.ready, NodeState.contextualizing)
+        transition_nodes(
+            db_sync_session, node_ids[:2], NodeState.contextualizing, NodeState.deployed
+        )
+        # Nodes moving to another pool or retiring count towards other levels, or none.
+        transition_nodes(
+            db_sync_session,
+            node_ids[2:3],
+            NodeState.contextualizing,
+            NodeState.ready,
+            values={"pool": "pool-b"},
+        )
+        transition_nodes(
+            db_sync_session,
+            node_ids[:1],
+            NodeState.deployed,
+            NodeState.done,
+            values={"retired_at": dt.datetime.now(dt.timezone.utc)},
+        )
+
+    maintained_levels = stored_levels(db_sync_session)
+
+    with caplog.at_level("DEBUG", "duffy"):
+        reconcile_pool_levels()
+
+    # The counters maintained along with the bulk transitions were right all along.
+    assert not [msg for msg in caplog.messages if "Correcting" in msg]
+    assert stored_levels(db_sync_session) == maintained_levels
+    assert {key: quantity for key, quantity in maintained_levels.items() if quantity} == {
+        ("pool-a", "ready"): 1,
+        ("pool-a", "deployed"): 1,
+        ("pool-b", "ready"): 1,
+    }
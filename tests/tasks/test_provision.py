@@ -1,8 +1,10 @@
+import datetime as dt
 from contextlib import nullcontext
 from pathlib import Path
 from unittest import mock
 
 import pytest
+from redis import RedisError
 from sqlalchemy import func, select
 
 from duffy.database.model import Node
@@ -265,6 +267,7 @@ def test_provision_nodes_into_pool(reuse_nodes, testcase, foo_pool, db_sync_sess
     (
         "fresh-nodes-run-once",
         "fresh-nodes-run-parallel",
+        "fresh-nodes-autoscale",
         "reuse-nodes-run-once",
         "reuse-nodes-run-parallel",
         "reuse-nodes-no-reusable",
@@ -285,6 +288,13 @@ def test_fill_single_pool(
     if "run-once" in testcase:
         foo_pool["run-parallel"] = False
 
+    if "autoscale" in testcase:
+        # No allocation history, i.e. the pool should be filled to the minimum.
+        foo_pool["autoscale"] = {"min-fill-level": 3, "max-fill-level": 10}
+        wanted_fill_level = 3
+    else:
+        wanted_fill_level = foo_pool["fill-level"]
+
     if "reuse-nodes" in testcase or "pool-is-filled" in testcase:
         # Create 30 nodes
         with db_sync_session.begin():
@@ -376,7 +386,7 @@ def test_fill_single_pool(
                     .scalars()
                     .all()
                 )
-                assert len(nodes) == foo_pool["fill-level"]
+                assert len(nodes) == wanted_fill_level
             node_ids = {node.id for node in nodes}
 
             if "run-once" in testcase:
@@ -386,7 +396,7 @@ def test_fill_single_pool(
                 assert not kwargs
                 assert set(node_ids_in_call) == node_ids
             else:
-                assert provision_nodes_into_pool.delay.call_count == foo_pool["fill-level"]
+                assert provision_nodes_into_pool.delay.call_count == wanted_fill_level
                 for call, node in zip(provision_nodes_into_pool.delay.call_args_list, nodes):
                     assert not call.kwargs
                     pool_name, node_ids_in_call = call.args
@@ -394,28 +404,44 @@ def test_fill_single_pool(
                     assert node_ids_in_call == [node.id]
 
             assert any(
-                f"we want {foo_pool['fill-level']}, i.e. need {foo_pool['fill-level']}" in msg
+                f"we want {wanted_fill_level}, i.e. need {wanted_fill_level}" in msg
                 for msg in caplog.messages
             )
 
             if "reuse-nodes" in testcase:
                 assert "[foo] Searching for 5 reusable nodes in database" in caplog.messages
             else:
-                assert "[foo] Allocating 5 new node objects in database" in caplog.messages
+                assert (
+                    f"[foo] Allocating {wanted_fill_level} new node objects in database"
+                    in caplog.messages
+                )
+
+            if "autoscale" in testcase:
+                assert "[foo] Computing fill level from allocation history ..." in caplog.messages
                 if "fewer-provisions" in testcase:
                     assert "[foo] Cleaning up 3 left-over preallocated nodes" in caplog.messages
 
 
 @pytest.mark.usefixtures("test_mechanism")
-@pytest.mark.parametrize("testcase", ("all-pools", "one-pool", "unknown-pool"))
+@pytest.mark.parametrize("testcase", ("all-pools", "one-pool", "unknown-pool", "reuse-nodes"))
+@mock.patch("duffy.tasks.provision.fill_reusable_pools")
 @mock.patch("duffy.tasks.provision.fill_single_pool")
 @mock.patch.dict("duffy.nodes.pools.ConcreteNodePool.known_pools", clear=True)
-def test_fill_pools(fill_single_pool, testcase):
+def test_fill_pools(fill_single_pool, fill_reusable_pools, testcase):
     all_pool_names = ("foo", "bar")
     for name in all_pool_names:
         ConcreteNodePool(name=name, mechanism={"type": "test", "test": {}})
 
-    if testcase == "all-pools":
+    reusing_pool_names = ("baz", "quux")
+    if testcase == "reuse-nodes":
+        for name in reusing_pool_names:
+            ConcreteNodePool(
+                name=name,
+                mechanism={"type": "test", "test": {}},
+                **{"reuse-nodes": {"architecture": "x86_64"}},
+            )
+
+    if testcase in ("all-pools", "reuse-nodes"):
         pool_names = None
     elif testcase == "one-pool":
         pool_names = ["foo"]
@@ -423,14 +449,237 @@ def test_fill_pools(fill_single_pool, testcase):
         pool_names = ["unknown"]
 
     fill_single_pool.delay.return_value = celery_async_result = mock.Mock()
+    fill_reusable_pools.delay.return_value = reusable_async_result = mock.Mock()
 
     provision.fill_pools(pool_names=pool_names)
 
-    if testcase == "all-pools":
+    if testcase in ("all-pools", "reuse-nodes"):
         assert fill_single_pool.delay.call_args_list == [mock.call(pool) for pool in all_pool_names]
         assert celery_async_result.forget.call_args_list == [mock.call() for _ in all_pool_names]
+        if testcase == "reuse-nodes":
+            fill_reusable_pools.delay.assert_called_once_with(pool_names=list(reusing_pool_names))
+            reusable_async_result.forget.assert_called_once_with()
+        else:
+            fill_reusable_pools.delay.assert_not_called()
     elif testcase == "one-pool":
         fill_single_pool.delay.assert_called_once_with("foo")
         celery_async_result.forget.assert_called_once_with()
     else:  # testcase == "unknown-pool"
         fill_single_pool.delay.assert_not_called()
+
+
+@pytest.mark.usefixtures("test_mechanism")
+@pytest.mark.parametrize("periodic_config", (False, "empty", True))
+@mock.patch("duffy.tasks.provision.Redis")
+@mock.patch("duffy.tasks.provision.fill_single_pool")
+@mock.patch.dict("duffy.nodes.pools.ConcreteNodePool.known_pools", clear=True)
+def test_fill_pools_pre_warming(fill_single_pool, Redis, periodic_config, caplog):
+    now = dt.datetime.utcnow().replace(tzinfo=dt.timezone.utc)
+    soon = (now + dt.timedelta(minutes=2)).time()
+    later = (now + dt.timedelta(hours=2)).time()
+
+    ConcreteNodePool(
+        name="foo",
+        mechanism={"type": "test", "test": {}},
+        **{
+            "fill-level": 5,
+            "fill-level-profiles": [
+                {"name": "soon", "start": soon, "fill-level": 10, "pre-warm": "1m"},
+                {"name": "later", "start": later, "fill-level": 10, "pre-warm": "10m"},
+                {"name": "never", "weekdays": [], "fill-level": 10},
+            ],
+        },
+    )
+
+    tasks_config = {"locking": {"url": "redis://localhost:6379"}}
+    if periodic_config == "empty":
+        tasks_config["periodic"] = None
+    elif periodic_config:
+        tasks_config["periodic"] = {"fill-pools": {"interval": "10m"}}
+
+    # Pre-warming is scheduled once, even if fill_pools() runs in different worker processes.
+    redis_keys = {}
+
+    def redis_set(key, value, nx, px):
+        assert nx
+        assert 0 < px <= 90_000
+        if key in redis_keys:
+            return None
+        redis_keys[key] = value
+        return True
+
+    Redis.from_url.return_value.set.side_effect = redis_set
+
+    fill_single_pool.delay.return_value = mock.Mock()
+
+    with mock.patch.dict(
+        "duffy.tasks.provision.config", {"tasks": tasks_config}
+    ), mock.patch.object(provision.fill_pools, "apply_async") as apply_async, caplog.at_level(
+        "INFO"
+    ):
+        apply_async.return_value = celery_async_result = mock.Mock()
+        provision.fill_pools()
+        # Pre-warming isn't scheduled again.
+        provision.fill_pools()
+
+    Redis.from_url.assert_called_with("redis://localhost:6379")
+    assert fill_single_pool.delay.call_args_list == 2 * [mock.call("foo")]
+    apply_async.assert_called_once()
+    args, kwargs = apply_async.call_args
+    assert not args
+    assert kwargs["kwargs"] == {"pool_names": ["foo"]}
+    assert now < kwargs["eta"] <= now + dt.timedelta(minutes=1, seconds=30)
+    celery_async_result.forget.assert_called_once_with()
+    assert any("Pre-warming pool for fill level profile soon" in msg for msg in caplog.messages)
+    assert list(redis_keys) == [f"duffy:pre-warm:foo:{kwargs['eta'].isoformat()}"]
+
+
+@pytest.mark.usefixtures("test_mechanism")
+@mock.patch("duffy.tasks.provision.Redis")
+@mock.patch("duffy.tasks.provision.fill_single_pool")
+@mock.patch.dict("duffy.nodes.pools.ConcreteNodePool.known_pools", clear=True)
+def test_fill_pools_pre_warming_redis_error(fill_single_pool, Redis, caplog):
+    now = dt.datetime.utcnow().replace(tzinfo=dt.timezone.utc)
+
+    ConcreteNodePool(
+        name="foo",
+        mechanism={"type": "test", "test": {}},
+        **{
+            "fill-level": 5,
+            "fill-level-profiles": [
+                {
+                    "name": "soon",
+                    "start": (now + dt.timedelta(minutes=2)).time(),
+                    "fill-level": 10,
+                    "pre-warm": "1m",
+                },
+            ],
+        },
+    )
+
+    Redis.from_url.return_value.set.side_effect = RedisError("connection refused")
+
+    with mock.patch.dict(
+        "duffy.tasks.provision.config", {"tasks": {"locking": {"url": "redis://localhost:6379"}}}
+    ), mock.patch.object(provision.fill_pools, "apply_async") as apply_async:
+        provision.fill_pools()
+
+    fill_single_pool.delay.assert_called_once_with("foo")
+    apply_async.assert_not_called()
+    assert "[foo] Couldn't schedule pre-warming pool: connection refused" in caplog.messages
+
+
+@pytest.mark.duffy_config(example_config=True)
+@pytest.mark.usefixtures("db_sync_model_initialized", "test_mechanism")
+@pytest.mark.parametrize(
+    "testcase",
+    ("shared-nodes", "pools-filled", "no-pools", "broken-spec", "no-candidates", "autoscale"),
+)
+@mock.patch("duffy.tasks.provision.provision_nodes_into_pool")
+@mock.patch("duffy.tasks.provision.Lock")
+@mock.patch.dict("duffy.nodes.pools.ConcreteNodePool.known_pools", clear=True)
+def test_fill_reusable_pools(Lock, provision_nodes_into_pool, testcase, db_sync_session, caplog):
+    Lock.return_value = nullcontext()
+
+    # Pool `gen1` can only use generation 1 nodes, `any` can use nodes of any generation, so the
+    # scarce generation 1 nodes should go into `gen1`.
+    pool_configs = {
+        "gen1": {"reuse-nodes": {"arch": "x86_64", "gen": 1}, "fill-level": 2},
+        "any": {"reuse-nodes": {"arch": "{{ arch }}"}, "fill-level": 4, "run-parallel": False},
+    }
+    if testcase == "broken-spec":
+        pool_configs["gen1"]["reuse-nodes"]["foo"] = ["bar"]
+    elif testcase == "no-candidates":
+        # No unused nodes of this generation exist.
+        pool_configs["gen1"]["reuse-nodes"]["gen"] = 3
+    elif testcase == "autoscale":
+        # No allocation history, i.e. the pool should be filled to the minimum.
+        pool_configs["any"]["autoscale"] = {"min-fill-level": 1}
+
+    if testcase != "no-pools":
+        for name, pool_config in pool_configs.items():
+            ConcreteNodePool(
+                name=name, arch="x86_64", mechanism={"type": "test", "test": {}}, **pool_config
+            )
+
+    with db_sync_session.begin():
+        for idx, gen in enumerate((1, 2, 1, 2, 2)):
+            db_sync_session.add(
+                Node(
+                    hostname=f"node-{idx}",
+                    ipaddr=f"192.168.1.{idx}",
+                    state="unused",
+                    reusable=True,
+                    data={"arch": "x86_64", "gen": gen},
+                )
+            )
+        if testcase == "pools-filled":
+            for idx, pool in enumerate(("gen1", "gen1", "any", "any", "any", "any")):
+                db_sync_session.add(
+                    Node(
+                        hostname=f"ready-{idx}",
+                        ipaddr=f"192.168.2.{idx}",
+                        state="ready",
+                        pool=pool,
+                        data={},
+                    )
+                )
+
+    with caplog.at_level("DEBUG", "duffy"):
+        provision.fill_reusable_pools()
+
+    with db_sync_session.begin():
+        allocated = {
+            node.hostname: node.pool
+            for node in db_sync_session.execute(
+                select(Node).filter_by(state="provisioning")
+            ).scalars()
+        }
+
+    if testcase == "no-pools":
+        Lock.assert_not_called()
+        assert "No pools reusing nodes to fill up." in caplog.messages
+        assert not allocated
+        return
+
+    Lock.assert_called_once()
+
+    if testcase == "pools-filled":
+        assert "Pools are filled to or above spec." in caplog.messages
+        assert not allocated
+        provision_nodes_into_pool.delay.assert_not_called()
+        return
+
+    if testcase == "broken-spec":
+        assert any(
+            rec.levelname == "ERROR" and "[gen1] Unsupported reuse-nodes value" in rec.message
+            for rec in caplog.records
+        )
+        expected = {"node-0": "any", "node-1": "any", "node-2": "any", "node-3": "any"}
+    elif testcase == "no-candidates":
+        assert "[gen1] Allocating 0 of 2 wanted reusable node(s)." in caplog.messages
+        expected = {"node-0": "any", "node-1": "any", "node-2": "any", "node-3": "any"}
+    elif testcase == "autoscale":
+        assert "[any] Computing fill level from allocation history ..." in caplog.messages
+        expected = {"node-0": "gen1", "node-1": "any", "node-2": "gen1"}
+    else:
+        expected = {
+            "node-0": "gen1",
+            "node-1": "any",
+            "node-2": "gen1",
+            "node-3": "any",
+            "node-4": "any",
+        }
+        assert "[any] Allocating 3 of 4 wanted reusable node(s)." in caplog.messages
+
+    assert allocated == expected
+
+    delay_calls = {}
+    for call in provision_nodes_into_pool.delay.call_args_list:
+        pool_name, node_ids = call.args
+        delay_calls.setdefault(pool_name, []).append(len(node_ids))
+    if "gen1" in expected.values():
+        # `gen1` provisions nodes in parallel.
+        assert delay_calls.pop("gen1") == [1, 1]
+    # `any` provisions nodes in one go.
+    assert delay_calls == {"any": [len([pool for pool in expected.values() if pool == "any"])]}
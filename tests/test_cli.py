@@ -182,6 +182,49 @@ def test_setup_db(
             assert "Please install the duffy[database] extra" in result.output
 
 
+@pytest.mark.duffy_config(example_config=True)
+@pytest.mark.parametrize(
+    "testcase", ("normal", "with-options", "bad-option", "config-error", "missing-modules")
+)
+@mock.patch("duffy.cli.database")
+@mock.patch("duffy.cli.archive_retired")
+def test_archive(archive_retired, database, testcase, duffy_config_files, runner, caplog):
+    (config_file,) = duffy_config_files
+
+    archive_retired.return_value = {"sessions": 3, "nodes": 5}
+    if "config-error" in testcase:
+        database.init_sync_model.side_effect = DuffyConfigurationError("database")
+
+    args = [f"--config={config_file.absolute()}", "archive"]
+
+    if testcase == "with-options":
+        args.extend(["--retired-for", "1w", "--batch-size", "10"])
+    elif testcase == "bad-option":
+        args.extend(["--batch-size", "0"])
+
+    if "missing-modules" in testcase:
+        duffy.cli.archive_retired = None
+
+    result = runner.invoke(cli, args)
+
+    if testcase in ("normal", "with-options"):
+        assert result.exit_code == 0
+        database.init_sync_model.assert_called_once_with()
+        if testcase == "normal":
+            archive_retired.assert_called_once_with(retired_for=None, batch_size=None)
+        else:
+            archive_retired.assert_called_once_with(retired_for=timedelta(weeks=1), batch_size=10)
+        assert "Archived 3 sessions and 5 nodes." in result.output
+    else:
+        assert result.exit_code != 0
+        if testcase == "config-error":
+            assert "Configuration key missing or wrong: database" in caplog.messages
+        elif testcase == "missing-modules":
+            assert "Please install the duffy[database] extra" in result.output
+        if testcase != "config-error":
+            database.init_sync_model.assert_not_called()
+
+
 @duffy.cli.migration.command("test")
 def _test_migration():
     pass
@@ -679,11 +722,43 @@ class TestClientCLI:
 
         runner.invoke(cli, parameters)
 
-        client.list_sessions.assert_called_once_with()
+        client.list_sessions.assert_called_once_with(include_retired=False)
         formatter.format.assert_called_once_with(sessions_sentinel)
 
         click.echo.assert_called_once_with(formatted_result_sentinel, nl=formatted_result_sentinel)
 
+    @mock.patch.object(duffy.cli.click, "echo")
+    def test_list_sessions_stream(
+        self, click_echo, DuffyClient, DuffyFormatter, runner, duffy_config_files
+    ):
+        (config_file,) = duffy_config_files
+
+        DuffyClient.return_value = client = mock.MagicMock()
+        client.iter_sessions.return_value = sessions_sentinel = object()
+        DuffyFormatter.new_for_format.return_value = formatter = mock.MagicMock()
+
+        formatter.format_stream.return_value = iter(["session 1", "", "session 2"])
+
+        parameters = [
+            f"--config={config_file.absolute()}",
+            "client",
+            "list-sessions",
+            "--stream",
+            "--include-retired",
+        ]
+
+        runner.invoke(cli, parameters)
+
+        client.iter_sessions.assert_called_once_with(include_retired=True)
+        client.list_sessions.assert_not_called()
+        formatter.format_stream.assert_called_once_with("sessions", sessions_sentinel)
+
+        assert click.echo.call_args_list == [
+            mock.call("session 1", nl="session 1"),
+            mock.call("", nl=""),
+            mock.call("session 2", nl="session 2"),
+        ]
+
     @mock.patch.object(duffy.cli.click, "echo")
     def test_show_session(
         self, click_echo, DuffyClient, DuffyFormatter, runner, duffy_config_files
@@ -756,7 +831,10 @@ class TestClientCLI:
         click_echo.assert_called_once_with(result_sentinel)
 
     @mock.patch.object(duffy.cli.click, "echo")
-    def test_list_pools(self, click_echo, DuffyClient, DuffyFormatter, runner, duffy_config_files):
+    @pytest.mark.parametrize("levels", (False, True))
+    def test_list_pools(
+        self, click_echo, DuffyClient, DuffyFormatter, runner, duffy_config_files, levels
+    ):
         (config_file,) = duffy_config_files
 
         DuffyClient.return_value = client = mock.MagicMock()
@@ -766,10 +844,12 @@ class TestClientCLI:
         formatter.format.return_value = formatted_result_sentinel = object()
 
         parameters = [f"--config={config_file.absolute()}", "client", "list-pools"]
+        if levels:
+            parameters.append("--levels")
 
         runner.invoke(cli, parameters)
 
-        client.list_pools.assert_called_once_with()
+        client.list_pools.assert_called_once_with(levels=levels)
         formatter.format.assert_called_once_with(pools_sentinel)
 
         click_echo.assert_called_once_with(formatted_result_sentinel, nl=formatted_result_sentinel)
@@ -3,8 +3,10 @@ from pathlib import Path
 
 import pytest
 import yaml
+from pydantic import ValidationError
 
 from duffy.configuration import main
+from duffy.configuration.validation import AutoscaleModel, OutboxRelayModel
 from duffy.util import merge_dicts
 
 EXAMPLE_CONFIG = {"app": {"host": "127.0.0.1", "port": 8080}}
@@ -79,3 +81,39 @@ class TestConfiguration:
 )
 def test_config_get(keys, result):
     assert main.config_get(*keys, default="test-default") == result
+
+
+@pytest.mark.parametrize(
+    "autoscale,valid",
+    (
+        ({"min-fill-level": 2, "max-fill-level": 10}, True),
+        ({"min-fill-level": 10, "max-fill-level": 10}, True),
+        ({"min-fill-level": 11}, True),
+        ({"min-fill-level": 11, "max-fill-level": 10}, False),
+    ),
+)
+def test_autoscale_fill_level_bounds(autoscale, valid):
+    if valid:
+        AutoscaleModel.model_validate(autoscale)
+    else:
+        with pytest.raises(ValidationError, match="must not exceed `max-fill-level`"):
+            AutoscaleModel.model_validate(autoscale)
+
+
+@pytest.mark.parametrize("key", ("window", "interval"))
+@pytest.mark.parametrize("value, valid", ((0, False), ("0s", False), ("5m", True)))
+def test_autoscale_timedeltas_positive(key, value, valid):
+    if valid:
+        AutoscaleModel.model_validate({key: value})
+    else:
+        with pytest.raises(ValidationError, match="must be positive"):
+            AutoscaleModel.model_validate({key: value})
+
+
+@pytest.mark.parametrize("value, valid", ((0, False), ("0s", False), ("5s", True)))
+def test_outbox_relay_interval_positive(value, valid):
+    if valid:
+        OutboxRelayModel.model_validate({"interval": value})
+    else:
+        with pytest.raises(ValidationError, match="must be positive"):
+            OutboxRelayModel.model_validate({"interval": value})